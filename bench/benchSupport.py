@@ -0,0 +1,54 @@
+"""
+Helpers for the benchmark scripts in this directory. Run a benchmark with
+scripts/run-bench, e.g. scripts/run-bench bench/bench_wasmEmit.py
+"""
+from __future__ import annotations
+from typing import *
+import contextlib
+import io
+import time
+import common.testsupport as testsupport
+
+def measure[T](f: Callable[[], T], repeat: int = 3) -> tuple[float, T]:
+    """
+    Runs f repeat times and returns the best wall clock time (in seconds) together
+    with the result of the last run.
+    """
+    best = float('inf')
+    res: Any = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        res = f()
+        best = min(best, time.perf_counter() - start)
+    return (best, cast(T, res))
+
+def quiet() -> contextlib.redirect_stdout[io.StringIO]:
+    """
+    Context manager discarding everything printed to stdout (some compiler phases
+    print debug output).
+    """
+    return contextlib.redirect_stdout(io.StringIO())
+
+def testFiles(langs: list[str]) -> list[tuple[str, str]]:
+    """
+    Returns tuples (lang, file) for all test files of the given languages that
+    do not expect an error. Each file is only returned for its own language.
+    """
+    res: list[tuple[str, str]] = []
+    for (lang, f) in testsupport.collectTestFiles(langOnly=langs, ignoreErrorFiles=True):
+        if f'lang_{lang}/' in f:
+            res.append((lang, f))
+    return sorted(res)
+
+def ms(secs: float) -> str:
+    return f'{secs * 1000:.2f}'
+
+def printTable(header: list[str], rows: list[list[str]]):
+    widths = [max(len(r[i]) for r in [header] + rows) for i in range(len(header))]
+    def fmt(r: list[str]) -> str:
+        return '  '.join(x.ljust(w) if i == 0 else x.rjust(w)
+                         for i, (x, w) in enumerate(zip(r, widths)))
+    print(fmt(header))
+    print('  '.join('-' * w for w in widths))
+    for r in rows:
+        print(fmt(r))
@@ -0,0 +1,111 @@
+"""
+Bounds checks of array subscripts left in the wasm code of the lang_array and lang_fun
+test programs, without and with the range analysis (CompilerConfig.boundsCheckElim).
+With --run, generated lang_array programs with array-heavy loops are also run with
+iwasm, at -O0 and -O2.
+"""
+import argparse
+import importlib
+import os
+import tempfile
+from benchSupport import *
+import common.genericCompiler as genCompiler
+import common.wasmOpt as wasmOpt
+from common.compilerSupport import CompilerConfig
+from common.wasm import *
+import common.utils as utils
+import shell
+
+def prefixSums(n: int, rounds: int) -> str:
+    return f'''a = {n} * [0]
+r = 0
+s = 0
+while r < {rounds}:
+    i = 0
+    while i < len(a):
+        a[i] = a[i] + i
+        i = i + 1
+    i = 1
+    while i < len(a):
+        a[i] = a[i] + a[i - 1]
+        i = i + 1
+    j = len(a) - 1
+    while j >= 0:
+        s = s + a[j]
+        j = j - 1
+    r = r + 1
+print(s)
+'''
+
+def innerProduct(n: int, rounds: int) -> str:
+    return f'''n = {n}
+a = n * [1]
+b = n * [2]
+r = 0
+s = 0
+while r < {rounds}:
+    i = 0
+    while i < n:
+        s = s + a[i] * b[i]
+        b[i] = b[i] + 1
+        i = i + 1
+    r = r + 1
+print(s)
+'''
+
+GENERATED = {'prefix sums': prefixSums, 'inner product': innerProduct}
+
+def countChecks(m: WasmModule) -> int:
+    return sum(1 for f in m.funcs for i in wasmOpt.allInstrs(f.instrs)
+               if i == WasmInstrIntRelOp('i64', 'ge_u'))
+
+def main():
+    ap = argparse.ArgumentParser(description='Bounds checks with and without range analysis')
+    ap.add_argument('--langs', default='array,fun')
+    ap.add_argument('--run', action='store_true', help='Also run generated programs with iwasm')
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--size', type=int, default=10000, help='Array length of generated programs')
+    ap.add_argument('--rounds', type=int, default=3000)
+    args = ap.parse_args()
+    cfgs = [CompilerConfig(CompilerConfig.defaultMaxMemSize, CompilerConfig.defaultMaxArraySize,
+                           elim) for elim in [False, True]]
+    rows: list[list[str]] = []
+    for lang in args.langs.split(','):
+        compiler = importlib.import_module(f'compilers.lang_{lang}.{lang}_compiler')
+        astMod = importlib.import_module(f'lang_{lang}.{lang}_ast')
+        totals = [0, 0]
+        for (_, f) in testFiles([lang]):
+            for k, cfg in enumerate(cfgs):
+                with quiet():
+                    m = genCompiler.compileToModule(compiler.compileModule, astMod, cfg, f)
+                totals[k] += countChecks(m)
+        rows.append([lang, str(totals[0]), str(totals[1])])
+    printTable(['bounds checks in test programs', 'without', 'with analysis'], rows)
+    if not args.run:
+        return
+    import compilers.lang_array.array_compiler as array_compiler
+    import lang_array.array_ast as array_ast
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'generated.py')
+        wasm = os.path.join(tmp, 'out.wasm')
+        for (name, gen) in GENERATED.items():
+            utils.writeTextFile(src, gen(args.size, args.rounds))
+            for level in genCompiler.OPT_LEVELS[::2]:
+                row = [f'{name} -O{level}']
+                for cfg in cfgs:
+                    with quiet():
+                        m = genCompiler.compileToModule(array_compiler.compileModule, array_ast,
+                                                        cfg, src, wasmOpt.passesForLevel(level))
+                    genCompiler.writeWasm(m, wasm)
+                    cmd = ['bash', './wasm-support/run_iwasm', wasm]
+                    (t, _) = measure(lambda: shell.run(cmd, onError='ignore', captureStdout=True),
+                                     args.repeat)
+                    row += [str(countChecks(m)), ms(t)]
+                rows.append(row)
+    print()
+    printTable(['generated program', 'checks', 'without (ms)', 'checks', 'with analysis (ms)'],
+               rows)
+
+if __name__ == '__main__':
+    main()
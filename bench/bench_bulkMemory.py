@@ -0,0 +1,93 @@
+"""
+Array initialization by element-wise stores versus memory.fill for dynamic arrays with
+a constant element and memory.copy from a data segment for constant array literals
+(CompilerConfig.bulkMemory). Reports the code size of the lang_array and lang_fun test
+programs; with --run, generated lang_array programs that create many arrays are also
+run with iwasm.
+"""
+import argparse
+import importlib
+import os
+import tempfile
+from benchSupport import *
+import common.genericCompiler as genCompiler
+from common.compilerSupport import CompilerConfig
+import common.wasmOpt as wasmOpt
+import common.utils as utils
+import shell
+
+def zeroArrays(n: int, rounds: int) -> str:
+    return f'''r = 0
+s = 0
+while r < {rounds}:
+    a = {n} * [0]
+    s = s + len(a) + a[{n - 1}]
+    r = r + 1
+print(s)
+'''
+
+def constArrays(n: int, rounds: int) -> str:
+    elems = ', '.join(str(i * 7 + 1) for i in range(n))
+    return f'''r = 0
+s = 0
+while r < {rounds}:
+    a = [{elems}]
+    s = s + a[{n - 1}]
+    r = r + 1
+print(s)
+'''
+
+def main():
+    ap = argparse.ArgumentParser(description='Array initialization with and without bulk memory')
+    ap.add_argument('--langs', default='array,fun')
+    ap.add_argument('--run', action='store_true', help='Also run generated programs with iwasm')
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--size', type=int, default=10000, help='Array length of n * [0]')
+    ap.add_argument('--literal', type=int, default=64, help='Array length of literals')
+    ap.add_argument('--rounds', type=int, default=1000)
+    ap.add_argument('--literal-rounds', type=int, default=150000)
+    args = ap.parse_args()
+    cfgs = [CompilerConfig(CompilerConfig.defaultMaxMemSize, CompilerConfig.defaultMaxArraySize,
+                           bulkMemory=bulk) for bulk in [False, True]]
+    rows: list[list[str]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        wasm = os.path.join(tmp, 'out.wasm')
+        for lang in args.langs.split(','):
+            compiler = importlib.import_module(f'compilers.lang_{lang}.{lang}_compiler')
+            astMod = importlib.import_module(f'lang_{lang}.{lang}_ast')
+            totals = [0, 0, 0, 0]
+            for (_, f) in testFiles([lang]):
+                for k, cfg in enumerate(cfgs):
+                    with quiet():
+                        m = genCompiler.compileToModule(compiler.compileModule, astMod, cfg, f)
+                    genCompiler.writeWasm(m, wasm)
+                    totals[k] += sum(wasmOpt.countInstrs(g.instrs) for g in m.funcs)
+                    totals[2 + k] += os.path.getsize(wasm)
+            rows.append([lang] + [str(t) for t in totals])
+        printTable(['test programs', 'instrs', 'instrs (bulk)', 'bytes', 'bytes (bulk)'], rows)
+        if not args.run:
+            return
+        import compilers.lang_array.array_compiler as array_compiler
+        import lang_array.array_ast as array_ast
+        src = os.path.join(tmp, 'generated.py')
+        gens = {f'{args.size} * [0]': zeroArrays(args.size, args.rounds),
+                f'literal of length {args.literal}': constArrays(args.literal, args.literal_rounds)}
+        rows = []
+        for (name, code) in gens.items():
+            utils.writeTextFile(src, code)
+            row = [name]
+            for cfg in cfgs:
+                with quiet():
+                    m = genCompiler.compileToModule(array_compiler.compileModule, array_ast, cfg,
+                                                    src, wasmOpt.passesForLevel(2))
+                genCompiler.writeWasm(m, wasm)
+                cmd = ['bash', './wasm-support/run_iwasm', wasm]
+                (t, _) = measure(lambda: shell.run(cmd, onError='ignore', captureStdout=True),
+                                 args.repeat)
+                row.append(ms(t))
+            rows.append(row)
+    print()
+    printTable(['generated program (-O2)', 'stores (ms)', 'bulk memory (ms)'], rows)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Stress test for the heap of lang_array: generated programs allocate arrays in a loop,
+in total far more than the maximal memory, and keep only a few of them alive. Without
+the garbage collector these programs run out of memory; with it they run in bounded
+memory. Reports the time and the outcome with iwasm for each program.
+"""
+import argparse
+import os
+import tempfile
+from benchSupport import *
+import common.genericCompiler as genCompiler
+from common.compilerSupport import CompilerConfig
+import common.wasmOpt as wasmOpt
+import common.utils as utils
+import compilers.lang_array.array_compiler as array_compiler
+import lang_array.array_ast as array_ast
+import shell
+
+def flatArrays(n: int, rounds: int) -> str:
+    return f'''r = 0
+s = 0
+while r < {rounds}:
+    a = {n} * [r]
+    s = s + a[{n - 1}]
+    r = r + 1
+print(s)
+'''
+
+def nestedArrays(n: int, rounds: int) -> str:
+    return f'''keep = 16 * [[0]]
+r = 0
+k = 0
+s = 0
+while r < {rounds}:
+    a = {n} * [[r, r + 1]]
+    a[0] = {n} * [r]
+    s = s + a[0][{n - 1}] + a[1][1]
+    keep[k] = a[1]
+    k = k + 1
+    if k == 16:
+        k = 0
+    r = r + 1
+print(s)
+'''
+
+def mixedSizes(rounds: int) -> str:
+    return f'''r = 0
+s = 0
+n = 1
+while r < {rounds}:
+    a = n * [True]
+    b = (n * 3 + 1) * [r]
+    s = s + len(a) + b[0]
+    n = n * 2
+    if n > 4096:
+        n = 1
+    r = r + 1
+print(s)
+'''
+
+def main():
+    ap = argparse.ArgumentParser(description='Allocation stress test for the garbage collector')
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--size', type=int, default=1000, help='Array length')
+    ap.add_argument('--rounds', type=int, default=20000)
+    ap.add_argument('--max-mem-size', type=int, default=4, help='Maximal memory in pages')
+    args = ap.parse_args()
+    cfg = CompilerConfig(args.max_mem_size, CompilerConfig.defaultMaxArraySize)
+    gens = {f'{args.size} * [r]': flatArrays(args.size, args.rounds),
+            f'{args.size} * [[r, r + 1]]': nestedArrays(args.size, args.rounds),
+            'mixed sizes': mixedSizes(args.rounds)}
+    rows: list[list[str]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'generated.py')
+        wasm = os.path.join(tmp, 'out.wasm')
+        for (name, code) in gens.items():
+            utils.writeTextFile(src, code)
+            with quiet():
+                m = genCompiler.compileToModule(array_compiler.compileModule, array_ast, cfg,
+                                                src, wasmOpt.passesForLevel(2))
+            genCompiler.writeWasm(m, wasm)
+            cmd = ['bash', './wasm-support/run_iwasm', f'--max-mem-size={args.max_mem_size}', wasm]
+            (t, res) = measure(lambda: shell.run(cmd, onError='ignore', captureStdout=True),
+                               args.repeat)
+            outcome = 'ok' if res.exitcode == 0 else 'out of memory'
+            rows.append([name, outcome, ms(t)])
+    printTable([f'generated program (-O2, {args.max_mem_size} pages)', 'outcome', 'time (ms)'],
+               rows)
+
+if __name__ == '__main__':
+    main()
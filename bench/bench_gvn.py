@@ -0,0 +1,42 @@
+"""
+Instructions eliminated by the value numbering of -O2, for every test file of lang_var
+and lang_loop: TAC instructions after -O1, instructions and phi functions eliminated
+by valueNumbering, and TAC instructions after -O2.
+"""
+import argparse
+import os
+import tempfile
+from benchSupport import *
+import common.genericCompiler as genCompiler
+import assembly.ssa as ssa
+import assembly.tacOptimize as tacOptimize
+from assembly.loopToTac import loopToTac
+
+def main():
+    ap = argparse.ArgumentParser(description='Instructions eliminated by value numbering')
+    ap.add_argument('--all', action='store_true',
+                    help='Also print files without eliminated instructions')
+    args = ap.parse_args()
+    rows: list[list[str]] = []
+    totals = [0, 0, 0]
+    n = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for (_, f) in testFiles(['var', 'loop']):
+            try:
+                with quiet():
+                    instrs = loopToTac(genCompiler.Args(f, os.path.join(tmp, 'out.wasm')))
+            except (Exception, SystemExit):
+                continue
+            o1 = tacOptimize.optimize(instrs, 1)
+            eliminated = tacOptimize.valueNumbering(ssa.toSSA(o1))
+            o2 = tacOptimize.optimize(instrs, 2)
+            counts = [len(o1), eliminated, len(o2)]
+            totals = [x + y for x, y in zip(totals, counts)]
+            n += 1
+            if eliminated > 0 or args.all:
+                rows.append([f] + [str(x) for x in counts])
+    rows.append([f'total ({n} programs)'] + [str(x) for x in totals])
+    printTable(['program', 'tac -O1', 'eliminated', 'tac -O2'], rows)
+
+if __name__ == '__main__':
+    main()
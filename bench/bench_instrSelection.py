@@ -0,0 +1,62 @@
+"""
+MIPS instruction counts of the test programs of lang_var and lang_loop with the
+instruction selection for TACspill assignments, compared to always loading constant
+operands into a register with li (one instruction per assignment, plus one for a
+constant operand of a binary operation). Also counts the immediate instructions
+(addi, slti) selected.
+"""
+import argparse
+import os
+import tempfile
+from benchSupport import *
+import common.genericCompiler as genCompiler
+import assembly.tacSpill_ast as tacSpill
+import assembly.mips_ast as mips
+import assembly.tacOptimize as tacOptimize
+from assembly.tacToTacSpill import tacToTacSpill
+from assembly.tacSpillToMips import tacSpillToMips
+from assembly.loopToTac import loopToTac
+from compilers.assembly.tacSpillAssignToMips import assignToMips
+
+def naiveCount(i: tacSpill.Assign) -> int:
+    match i.left:
+        case tacSpill.BinOp(tacSpill.Name(_), _, tacSpill.Const(_)) | \
+                tacSpill.BinOp(tacSpill.Const(_), _, tacSpill.Name(_)):
+            return 2
+        case _:
+            return 1
+
+def main():
+    ap = argparse.ArgumentParser(description='MIPS instruction counts of instruction selection')
+    ap.add_argument('--max-registers', type=int, default=8)
+    ap.add_argument('-O', dest='optLevel', type=int, default=0, choices=[0, 1, 2])
+    ap.add_argument('--verbose', action='store_true', help='Print a row for every program')
+    args = ap.parse_args()
+    rows: list[list[str]] = []
+    totals = [0, 0, 0]
+    n = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for (_, f) in testFiles(['var', 'loop']):
+            try:
+                with quiet():
+                    instrs = loopToTac(genCompiler.Args(f, os.path.join(tmp, 'out.wasm')))
+            except (Exception, SystemExit):
+                continue
+            spill = tacToTacSpill(tacOptimize.optimize(instrs, args.optLevel), args.max_registers)
+            selected = tacSpillToMips(spill)
+            naive = len(selected)
+            for i in spill:
+                if isinstance(i, tacSpill.Assign):
+                    naive += naiveCount(i) - len(assignToMips(i))
+            imms = sum(1 for i in selected if isinstance(i, mips.OpI))
+            counts = [naive, len(selected), imms]
+            totals = [x + y for x, y in zip(totals, counts)]
+            n += 1
+            if args.verbose:
+                rows.append([f] + [str(x) for x in counts])
+    rows.append([f'total ({n} programs)'] + [str(x) for x in totals])
+    printTable(['program', 'li + op', 'selected', 'immediate instrs'], rows)
+    print(f'{100 * (1 - totals[1] / totals[0]):.1f}% fewer instructions')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Compares the AST interpreters with the closure-compiling interpreters on loop-heavy
+programs. The time of the closure engine includes translating the AST into closures.
+"""
+import argparse
+import importlib
+import os
+import tempfile
+from benchSupport import *
+import common.genericParser as genericParser
+
+PROGRAMS: dict[str, str] = {
+    'count': '''
+i = 0
+s = 0
+while i < 200000:
+    s = s + i * 2 - 1
+    i = i + 1
+print(s)
+''',
+    'nested': '''
+i = 0
+s = 0
+while i < 300:
+    j = 0
+    while j < 300:
+        if i < j and not (j == 7):
+            s = s + 1
+        else:
+            s = s - 1
+        j = j + 1
+    i = i + 1
+print(s)
+''',
+    'sieve': '''
+n = 50000
+a = n * [True]
+i = 2
+count = 0
+while i < n:
+    if a[i]:
+        count = count + 1
+        j = i * i
+        while j < n:
+            a[j] = False
+            j = j + i
+    i = i + 1
+print(count)
+''',
+    'fib': '''
+def fib(n: int) -> int:
+    if n < 2:
+        return n
+    else:
+        return fib(n - 1) + fib(n - 2)
+print(fib(20))
+''',
+}
+
+LANGS: dict[str, list[str]] = {
+    'count': ['loop', 'array', 'fun'],
+    'nested': ['loop', 'array', 'fun'],
+    'sieve': ['array', 'fun'],
+    'fib': ['fun'],
+}
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark the interpreter engines')
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+    rows: list[list[str]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'input.py')
+        for (name, code) in PROGRAMS.items():
+            with open(src, 'w') as f:
+                f.write(code)
+            for lang in LANGS[name]:
+                astMod = importlib.import_module(f'lang_{lang}.{lang}_ast')
+                times: list[float] = []
+                for kind in ['interp', 'closureInterp']:
+                    interpMod = importlib.import_module(f'lang_{lang}.{lang}_{kind}')
+                    def run():
+                        m = genericParser.parseFile(src, astMod)
+                        with quiet():
+                            interpMod.interpModule(m)
+                    (t, _) = measure(run, args.repeat)
+                    times.append(t)
+                rows.append([f'{name} ({lang})', ms(times[0]), ms(times[1]),
+                             f'{times[0] / times[1]:.1f}x'])
+    printTable(['program', 'ast (ms)', 'closure (ms)', 'speedup'], rows)
+
+if __name__ == '__main__':
+    main()
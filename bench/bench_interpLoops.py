@@ -0,0 +1,72 @@
+"""
+Runs while loops with a growing number of iterations through the interpreters of
+the loop, array and fun languages. Reports the time per iteration (should be constant)
+and the maximal depth of the Python stack (should not depend on the number of
+iterations).
+"""
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+from types import FrameType
+from benchSupport import *
+import common.genericParser as genericParser
+
+def mkProgram(n: int) -> str:
+    return f'''
+i = 0
+s = 0
+while i < {n}:
+    if i < {n // 2}:
+        s = s + i
+    else:
+        s = s - 1
+    i = i + 1
+print(s)
+'''
+
+def maxStackDepth(f: Callable[[], object]) -> int:
+    depth = 0
+    maxDepth = 0
+    def profile(_frame: FrameType, event: str, _arg: object):
+        nonlocal depth, maxDepth
+        if event == 'call':
+            depth += 1
+            maxDepth = max(maxDepth, depth)
+        elif event == 'return':
+            depth -= 1
+    sys.setprofile(profile)
+    try:
+        f()
+    finally:
+        sys.setprofile(None)
+    return maxDepth
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark long running loops in the interpreters')
+    ap.add_argument('--sizes', default='1000,10000,100000',
+                    help='Comma-separated numbers of loop iterations')
+    ap.add_argument('--langs', default='loop,array,fun')
+    ap.add_argument('--repeat', type=int, default=1)
+    args = ap.parse_args()
+    rows: list[list[str]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'input.py')
+        for lang in args.langs.split(','):
+            astMod = importlib.import_module(f'lang_{lang}.{lang}_ast')
+            interpMod = importlib.import_module(f'lang_{lang}.{lang}_interp')
+            for n in [int(x) for x in args.sizes.split(',')]:
+                with open(src, 'w') as f:
+                    f.write(mkProgram(n))
+                m = genericParser.parseFile(src, astMod)
+                def run(m: object = m):
+                    with quiet():
+                        interpMod.interpModule(m)
+                (t, _) = measure(run, args.repeat)
+                depth = maxStackDepth(run)
+                rows.append([lang, str(n), ms(t), f'{t / n * 1e6:.2f}', str(depth)])
+    printTable(['lang', 'iterations', 'time (ms)', 'per iteration (us)', 'max stack depth'], rows)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Compares linear-scan register allocation with graph coloring on generated TAC programs
+of increasing size: allocation time (including the control flow graph and, for graph
+coloring, liveness and the interference graph), peak memory as reported by tracemalloc,
+and the number of spilled variables with their spill cost (definitions and uses weighted
+by loop depth, see assembly.loops.spillCosts). Graph coloring is skipped above --color-limit
+instructions because its memory grows quadratically.
+"""
+import argparse
+import tracemalloc
+from benchSupport import *
+import common.genericCompiler as genCompiler
+import assembly.tac_ast as tac
+import assembly.tacToTacSpill as tacToTacSpill
+from assembly.common import RegisterMap
+from assembly.controlFlow import buildControlFlowGraph
+from assembly.loops import spillCosts
+from bench_liveness import genTac
+
+def peakMemory(f: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        f()
+        (_, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def spilled(instrs: list[tac.instr], regMap: RegisterMap) -> tuple[int, float]:
+    """
+    Returns the number of spilled variables and the sum of their spill costs.
+    """
+    vars: set[tac.ident] = set()
+    for i in instrs:
+        match i:
+            case tac.Assign(x, _) | tac.Call(x, _, _) if x is not None:
+                vars.add(x)
+            case _:
+                pass
+    costs = spillCosts(buildControlFlowGraph(instrs))
+    xs = [x for x in vars if regMap.resolve(x) is None]
+    return (len(xs), sum(costs.get(x, 0.0) for x in xs))
+
+def main():
+    ap = argparse.ArgumentParser(description='Compare linear scan with graph coloring')
+    ap.add_argument('--sizes', default='1000,10000,30000,100000',
+                    help='Comma-separated (approximate) numbers of TAC instructions')
+    ap.add_argument('--max-registers', type=int, default=8)
+    ap.add_argument('--allocators', default='color,linear')
+    ap.add_argument('--color-limit', type=int, default=30000,
+                    help='Skip graph coloring and irc for larger programs')
+    ap.add_argument('--repeat', type=int, default=1)
+    args = ap.parse_args()
+    rows: list[list[str]] = []
+    for n in [int(x) for x in args.sizes.split(',')]:
+        # genTac produces a bit more than four instructions per block
+        instrs = genTac(max(1, n // 4))
+        for alloc in args.allocators.split(','):
+            mode: genCompiler.RegAllocMode = cast(genCompiler.RegAllocMode, alloc)
+            if mode != 'linear' and len(instrs) > args.color_limit:
+                rows.append([str(len(instrs)), alloc, '-', '-', '-', '-'])
+                continue
+            alloc1 = lambda: tacToTacSpill.allocRegisters(instrs, args.max_registers, mode)
+            (t, regMap) = measure(alloc1, args.repeat)
+            peak = peakMemory(alloc1)
+            (count, cost) = spilled(instrs, regMap)
+            rows.append([str(len(instrs)), alloc, ms(t), f'{peak / 2**20:.1f}', str(count),
+                         f'{cost:.0f}'])
+    print(f'{args.max_registers} registers')
+    printTable(['instructions', 'allocator', 'time (ms)', 'peak memory (MB)', 'spilled vars',
+                'spill cost'], rows)
+
+if __name__ == '__main__':
+    main()
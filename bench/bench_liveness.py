@@ -0,0 +1,90 @@
+"""
+Scaling of the liveness analysis and of building the interference graph on generated
+TAC with many variables and blocks. For comparison, the liveness sets are also computed
+with a round-robin fixpoint iteration over Python sets (the previous implementation).
+"""
+import argparse
+import random
+from benchSupport import *
+from assembly.common import *
+import assembly.tac_ast as tac
+import assembly.controlFlow as controlFlow
+import compilers.assembly.liveness as liveness
+from compilers.assembly.liveness import InstrId
+
+def genTac(blocks: int, seed: int = 0) -> list[tac.instr]:
+    """
+    Generates TAC with the given number of blocks. Each block defines three new
+    variables and uses variables defined shortly before. Blocks are grouped into loops.
+    """
+    rnd = random.Random(seed)
+    def v(i: int) -> tac.prim:
+        return tac.Name(tac.Ident(f'$x{i}'))
+    instrs: list[tac.instr] = [tac.Call(tac.Ident('$x0'), tac.Ident('$input_i64'), [])]
+    nvars = 1
+    def recent() -> int:
+        return rnd.randrange(max(0, nvars - 30), nvars)
+    for b in range(blocks):
+        instrs.append(tac.Label(f'L{b}'))
+        for _ in range(3):
+            instrs.append(tac.Assign(tac.Ident(f'$x{nvars}'),
+                                     tac.BinOp(v(recent()), tac.Op('ADD'), v(recent()))))
+            nvars += 1
+        # Every group of five blocks forms a loop, with branches back to its header
+        header = b - b % 5
+        if b % 5 == 4 or rnd.random() < 0.3:
+            instrs.append(tac.GotoIf(v(nvars - 1), f'L{header}'))
+    for i in range(max(0, nvars - 10), nvars):
+        instrs.append(tac.Call(None, tac.Ident('$print_i64'), [v(i)]))
+    return instrs
+
+def roundRobin(g: ControlFlowGraph) -> dict[InstrId, set[tac.ident]]:
+    """
+    The previous implementation: iterates over all blocks until nothing changes and
+    recomputes the sets before each instruction in every pass.
+    """
+    liveIn: dict[int, set[tac.ident]] = {b: set() for b in g.vertices}
+    before: dict[InstrId, set[tac.ident]] = {}
+    changed = True
+    while changed:
+        changed = False
+        for b in sorted(g.vertices, reverse=True):
+            live: set[tac.ident] = set()
+            for s in g.succs(b):
+                live |= liveIn[s]
+            instrs = g.getData(b).instrs
+            for k in range(len(instrs) - 1, -1, -1):
+                live = (live - liveness.instrDef(instrs[k])) | liveness.instrUse(instrs[k])
+                before[(b, k)] = live
+            if live != liveIn[b]:
+                liveIn[b] = live
+                changed = True
+    return before
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark liveness analysis')
+    ap.add_argument('--sizes', default='500,1000,2000,4000',
+                    help='Comma-separated numbers of generated blocks')
+    ap.add_argument('--repeat', type=int, default=1)
+    ap.add_argument('--no-baseline', action='store_true',
+                    help='Do not run the round-robin baseline')
+    args = ap.parse_args()
+    rows: list[list[str]] = []
+    for n in [int(x) for x in args.sizes.split(',')]:
+        instrs = genTac(n)
+        g = controlFlow.buildControlFlowGraph(instrs)
+        (tLive, _) = measure(lambda: liveness.InterfGraphBuilder().analyze(g), args.repeat)
+        (tBuild, interfG) = measure(lambda: liveness.buildInterfGraph(g), args.repeat)
+        nvars = len(list(interfG.vertices))
+        nedges = len(interfG.edges) // 2
+        base = '-'
+        if not args.no_baseline:
+            (tBase, _) = measure(lambda: roundRobin(g), args.repeat)
+            base = ms(tBase)
+        rows.append([str(n), str(len(list(g.vertices))), str(nvars), str(nedges),
+                     ms(tLive), base, ms(tBuild)])
+    printTable(['size', 'blocks', 'variables', 'interferences', 'liveness (ms)',
+                'round-robin liveness (ms)', 'interf graph (ms)'], rows)
+
+if __name__ == '__main__':
+    main()
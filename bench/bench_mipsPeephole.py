@@ -0,0 +1,52 @@
+"""
+MIPS instruction counts of the test programs of lang_var and lang_loop before and after
+the peephole optimizer (mipsPeephole), for unoptimized TAC and for TAC optimized with
+-O2, with the given number of registers.
+"""
+import argparse
+import os
+import tempfile
+from benchSupport import *
+import common.genericCompiler as genCompiler
+import assembly.tac_ast as tac
+import assembly.mips_ast as mips
+import assembly.tacOptimize as tacOptimize
+import assembly.mipsPeephole as mipsPeephole
+from assembly.tacToTacSpill import tacToTacSpill
+from assembly.tacSpillToMips import tacSpillToMips
+from assembly.loopToTac import loopToTac
+
+def toMips(instrs: list[tac.instr], maxRegs: int) -> list[mips.instr]:
+    return tacSpillToMips(tacToTacSpill(instrs, maxRegs))
+
+def main():
+    ap = argparse.ArgumentParser(description='MIPS instruction counts with and without peephole')
+    ap.add_argument('--max-registers', type=int, default=4)
+    ap.add_argument('--verbose', action='store_true', help='Print a row for every program')
+    args = ap.parse_args()
+    rows: list[list[str]] = []
+    totals = [0, 0, 0, 0]
+    n = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for (_, f) in testFiles(['var', 'loop']):
+            try:
+                with quiet():
+                    instrs = loopToTac(genCompiler.Args(f, os.path.join(tmp, 'out.wasm')))
+            except (Exception, SystemExit):
+                continue
+            m0 = toMips(instrs, args.max_registers)
+            m2 = toMips(tacOptimize.optimize(instrs, 2), args.max_registers)
+            counts = [len(m0), len(mipsPeephole.peephole(m0)),
+                      len(m2), len(mipsPeephole.peephole(m2))]
+            totals = [x + y for x, y in zip(totals, counts)]
+            n += 1
+            if args.verbose:
+                rows.append([f] + [str(x) for x in counts])
+    rows.append([f'total ({n} programs)'] + [str(x) for x in totals])
+    printTable(['program', 'tac -O0', 'tac -O0 + peephole', 'tac -O2', 'tac -O2 + peephole'],
+               rows)
+    print(f'Peephole: {100 * (1 - totals[1] / totals[0]):.1f}% fewer instructions '
+          f'(tac -O0), {100 * (1 - totals[3] / totals[2]):.1f}% fewer (tac -O2)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Parse latency with a cold parser cache (parser built from scratch), with only the
+on-disk cache of LALR tables (a fresh process), and with a warm in-process cache.
+
+Earley parsers are only used for lexing (as in mkLexer), because parsing with
+debug=True tries to render the parse forest with graphviz.
+"""
+import argparse
+import shutil
+import tempfile
+from benchSupport import *
+import parsers.common as p
+
+GRAMMARS = [('simple', './src/parsers/lang_simple/simple_grammar.lark', 'exp',
+             '1 + 2 * (3 + 4) * 5'),
+            ('var', './src/parsers/lang_var/var_grammar.lark', 'lvar',
+             'x = 1\ny = input_int()\nprint(x + 2 * -y)\n')]
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark the parser cache')
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args()
+    rows: list[list[str]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        p.PARSER_CACHE_DIR = tmp
+        for (name, grammar, start, code) in GRAMMARS:
+            algs: list[p.ParseAlg] = ['earley', 'lalr']
+            for alg in algs:
+                def parse(alg: p.ParseAlg = alg) -> object:
+                    parser = p.mkParser(alg, grammar, start)
+                    if alg == 'earley':
+                        return list(parser.lex(code))
+                    return parser.parse(code)
+                def cold():
+                    p.clearParserCache()
+                    shutil.rmtree(tmp, ignore_errors=True)
+                    parse()
+                def disk():
+                    p.clearParserCache()
+                    parse()
+                (tCold, _) = measure(cold, args.repeat)
+                cold() # populate the disk cache
+                (tDisk, _) = measure(disk, args.repeat)
+                (tWarm, _) = measure(parse, args.repeat)
+                diskStr = ms(tDisk) if alg == 'lalr' else '-'
+                rows.append([f'{name}/{alg}', ms(tCold), diskStr, ms(tWarm),
+                             f'{tCold / tWarm:.0f}x'])
+    printTable(['grammar', 'cold (ms)', 'disk cache (ms)', 'warm (ms)', 'cold/warm'], rows)
+
+if __name__ == '__main__':
+    main()
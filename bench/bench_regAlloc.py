@@ -0,0 +1,89 @@
+"""
+Compares the register allocators of the assembly command on the test files of
+lang_loop: number of spilled variables, spill instructions (loads and stores) in the
+generated TACspill code, and moves eliminated because source and target share a
+register. Spill instructions are counted statically and weighted with 10^(loop depth).
+"""
+import argparse
+import os
+import tempfile
+from benchSupport import *
+import common.genericCompiler as genCompiler
+import assembly.tac_ast as tac
+import assembly.tacSpill_ast as tacSpill
+import assembly.controlFlow as controlFlow
+import assembly.tacToTacSpill as tacToTacSpill
+from assembly.ircAlloc import moveOf
+from assembly.loops import loopDepths
+from assembly.loopToTac import loopToTac
+
+type Counts = list[float]
+
+def countAlloc(instrs: list[tac.instr], maxRegs: int, regAlloc: genCompiler.RegAllocMode) -> Counts:
+    regMap = tacToTacSpill.allocRegisters(instrs, maxRegs, regAlloc)
+    g = controlFlow.buildControlFlowGraph(instrs)
+    depths = loopDepths(g)
+    vars: set[tac.ident] = set()
+    spillInstrs = 0
+    weighted = 0.0
+    moves = 0
+    eliminated = 0
+    for b in g.vertices:
+        for i in g.getData(b).instrs:
+            out = tacToTacSpill.spillInstr(i, regMap)
+            n = sum(1 for x in out if isinstance(x, tacSpill.Spill | tacSpill.Unspill))
+            spillInstrs += n
+            weighted += n * 10 ** depths[b]
+            match i:
+                case tac.Assign(x, _) | tac.Call(x, _, _) if x is not None:
+                    vars.add(x)
+                case _:
+                    pass
+            mv = moveOf(i)
+            if mv is not None:
+                moves += 1
+                r = regMap.resolve(mv[0])
+                if r is not None and r == regMap.resolve(mv[1]):
+                    eliminated += 1
+    spilled = sum(1 for x in vars if regMap.resolve(x) is None)
+    return [spilled, spillInstrs, weighted, moves, eliminated]
+
+def loopPrograms() -> list[tuple[str, list[tac.instr]]]:
+    """
+    Returns the TAC of all test files of lang_loop the loop compiler can translate.
+    """
+    programs: list[tuple[str, list[tac.instr]]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for (_, f) in testFiles(['loop']):
+            try:
+                with quiet():
+                    instrs = loopToTac(genCompiler.Args(f, os.path.join(tmp, 'out.wasm'), 'wat2wasm', 1, 1))
+                controlFlow.buildControlFlowGraph(instrs)
+            except (Exception, SystemExit):
+                # Programs the loop compiler cannot translate to TAC
+                continue
+            programs.append((f, instrs))
+    return programs
+
+def main():
+    ap = argparse.ArgumentParser(description='Compare register allocators on lang_loop')
+    ap.add_argument('--max-registers', default='1,2,4,8',
+                    help='Comma-separated numbers of registers')
+    ap.add_argument('--allocators', default=','.join(genCompiler.REGALLOC_MODES))
+    args = ap.parse_args()
+    programs = loopPrograms()
+    rows: list[list[str]] = []
+    for k in [int(x) for x in args.max_registers.split(',')]:
+        for alloc in args.allocators.split(','):
+            total: Counts = [0, 0, 0, 0, 0]
+            for (_, instrs) in programs:
+                c = countAlloc(instrs, k, cast(genCompiler.RegAllocMode, alloc))
+                total = [x + y for x, y in zip(total, c)]
+            rows.append([str(k), alloc, str(int(total[0])), str(int(total[1])), f'{total[2]:.0f}',
+                         f'{int(total[4])}/{int(total[3])}'])
+    print(f'{len(programs)} programs from test_files/lang_loop')
+    printTable(['registers', 'allocator', 'spilled vars', 'spill instrs', 'weighted spill instrs',
+                'moves eliminated'], rows)
+
+if __name__ == '__main__':
+    main()
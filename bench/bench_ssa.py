@@ -0,0 +1,58 @@
+"""
+Effect of the SSA round trip of -O2 on register allocation: spilled variables and
+spill instructions (statically and weighted with 10^(loop depth)) after -O1 and after
+-O2, for the test files of lang_loop and some generated lang_loop programs. Also
+reports the time for the translation into SSA form and back.
+"""
+import argparse
+import os
+import tempfile
+from benchSupport import *
+import common.genericCompiler as genCompiler
+import common.utils as utils
+import assembly.tac_ast as tac
+import assembly.ssa as ssa
+import assembly.tacOptimize as tacOptimize
+from assembly.loopToTac import loopToTac
+from bench_regAlloc import countAlloc, loopPrograms
+from bench_wasmToTac import genProgram
+
+def generatedPrograms(sizes: list[int]) -> list[tuple[str, list[tac.instr]]]:
+    programs: list[tuple[str, list[tac.instr]]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            src = os.path.join(tmp, 'prog.py')
+            utils.writeTextFile(src, genProgram(n, n))
+            with quiet():
+                instrs = loopToTac(genCompiler.Args(src, os.path.join(tmp, 'out.wasm')))
+            programs.append((f'generated {n}', instrs))
+    return programs
+
+def main():
+    ap = argparse.ArgumentParser(description='Spills after -O1 and -O2')
+    ap.add_argument('--max-registers', default='2,4,8',
+                    help='Comma-separated numbers of registers')
+    ap.add_argument('--regalloc', choices=genCompiler.REGALLOC_MODES, default='color')
+    ap.add_argument('--sizes', default='50,100,200',
+                    help='Comma-separated numbers of statements of generated programs')
+    args = ap.parse_args()
+    programs = loopPrograms() + generatedPrograms([int(x) for x in args.sizes.split(',')])
+    o1 = [tacOptimize.optimize(instrs, 1) for (_, instrs) in programs]
+    (t, o2) = measure(lambda: [tacOptimize.optimize(instrs, 2) for (_, instrs) in programs])
+    (tSSA, _) = measure(lambda: [ssa.fromSSA(ssa.toSSA(instrs)) for instrs in o1])
+    rows: list[list[str]] = []
+    for k in [int(x) for x in args.max_registers.split(',')]:
+        row = [str(k)]
+        for level in [o1, o2]:
+            total = [0.0, 0.0, 0.0]
+            for instrs in level:
+                c = countAlloc(instrs, k, args.regalloc)
+                total = [x + y for x, y in zip(total, c[:3])]
+            row.extend(f'{x:.0f}' for x in total)
+        rows.append(row)
+    printTable(['registers', 'spilled -O1', 'spill instrs -O1', 'weighted -O1',
+                'spilled -O2', 'spill instrs -O2', 'weighted -O2'], rows)
+    print(f'{len(programs)} programs, -O2 in {ms(t)} ms, SSA round trip in {ms(tSSA)} ms')
+
+if __name__ == '__main__':
+    main()
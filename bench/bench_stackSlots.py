@@ -0,0 +1,54 @@
+"""
+Stack frame sizes of the programs in test_files/lang_loop before and after sharing stack
+slots between spilled variables. Before, every spilled variable had its own 4-byte
+slot; now variables whose live intervals do not overlap share a slot.
+"""
+import argparse
+from benchSupport import *
+import common.genericCompiler as genCompiler
+import assembly.tac_ast as tac
+import assembly.tacSpill_ast as tacSpill
+import assembly.tacToTacSpill as tacToTacSpill
+from bench_regAlloc import loopPrograms
+
+def slotNames(instrs: list[tacSpill.instr]) -> set[str]:
+    res: set[str] = set()
+    for i in instrs:
+        match i:
+            case tacSpill.Spill(_, name) | tacSpill.Unspill(_, name):
+                res.add(name)
+            case _:
+                pass
+    return res
+
+def frameSizes(instrs: list[tac.instr], maxRegs: int,
+               regAlloc: genCompiler.RegAllocMode) -> tuple[int, int]:
+    """
+    Returns the frame size in bytes with one slot per spilled variable and with
+    shared slots.
+    """
+    regMap = tacToTacSpill.allocRegisters(instrs, maxRegs, regAlloc)
+    unshared = slotNames([x for i in instrs for x in tacToTacSpill.spillInstr(i, regMap)])
+    shared = slotNames(tacToTacSpill.tacToTacSpill(instrs, maxRegs, regAlloc))
+    return (len(unshared) * 4, len(shared) * 4)
+
+def main():
+    ap = argparse.ArgumentParser(description='Compare stack frame sizes on lang_loop')
+    ap.add_argument('--max-registers', default='0,1,2,4,8',
+                    help='Comma-separated numbers of registers')
+    ap.add_argument('--regalloc', choices=genCompiler.REGALLOC_MODES, default='color')
+    args = ap.parse_args()
+    programs = loopPrograms()
+    rows: list[list[str]] = []
+    for k in [int(x) for x in args.max_registers.split(',')]:
+        sizes = [frameSizes(instrs, k, args.regalloc) for (_, instrs) in programs]
+        before = [b for (b, _) in sizes]
+        after = [a for (_, a) in sizes]
+        rows.append([str(k), str(sum(before)), str(sum(after)), str(max(before)),
+                     str(max(after))])
+    print(f'{len(programs)} programs from test_files/lang_loop, allocator {args.regalloc}')
+    printTable(['registers', 'total before (bytes)', 'total after (bytes)',
+                'largest before', 'largest after'], rows)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Instruction counts of the test programs of lang_var and lang_loop without and with
+the TAC optimizations of -O1: TAC instructions and MIPS instructions generated from
+the TAC (with the given number of registers).
+"""
+import argparse
+import os
+import tempfile
+from benchSupport import *
+import common.genericCompiler as genCompiler
+import assembly.tac_ast as tac
+import assembly.tacOptimize as tacOptimize
+from assembly.tacToTacSpill import tacToTacSpill
+from assembly.tacSpillToMips import tacSpillToMips
+from assembly.loopToTac import loopToTac
+
+def mipsCount(instrs: list[tac.instr], maxRegs: int) -> int:
+    return len(tacSpillToMips(tacToTacSpill(instrs, maxRegs)))
+
+def main():
+    ap = argparse.ArgumentParser(description='Instruction counts with and without -O1')
+    ap.add_argument('--max-registers', type=int, default=8)
+    ap.add_argument('--verbose', action='store_true', help='Print a row for every program')
+    args = ap.parse_args()
+    rows: list[list[str]] = []
+    totals = [0, 0, 0, 0]
+    n = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for (_, f) in testFiles(['var', 'loop']):
+            try:
+                with quiet():
+                    instrs = loopToTac(genCompiler.Args(f, os.path.join(tmp, 'out.wasm')))
+            except (Exception, SystemExit):
+                continue
+            optimized = tacOptimize.optimize(instrs, 1)
+            counts = [len(instrs), len(optimized), mipsCount(instrs, args.max_registers),
+                      mipsCount(optimized, args.max_registers)]
+            totals = [x + y for x, y in zip(totals, counts)]
+            n += 1
+            if args.verbose:
+                rows.append([f] + [str(x) for x in counts])
+    rows.append([f'total ({n} programs)'] + [str(x) for x in totals])
+    printTable(['program', 'tac -O0', 'tac -O1', 'mips -O0', 'mips -O1'], rows)
+    print(f'TAC instructions: {100 * (1 - totals[1] / totals[0]):.1f}% fewer, '
+          f'MIPS instructions: {100 * (1 - totals[3] / totals[2]):.1f}% fewer')
+
+if __name__ == '__main__':
+    main()
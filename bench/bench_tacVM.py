@@ -0,0 +1,77 @@
+"""
+Compares the reference TAC interpreter (assembly.tacInterp.interpInstrs) with the
+pre-decoded virtual machine (assembly.tacVM) on loop-heavy L_loop programs. The time
+of the virtual machine includes decoding.
+"""
+import argparse
+import os
+import tempfile
+from benchSupport import *
+import common.genericCompiler as genCompiler
+import assembly.tacInterp as tacInterp
+import assembly.tacVM as tacVM
+from assembly.loopToTac import loopToTac
+
+PROGRAMS: dict[str, str] = {
+    'count': '''
+i = 0
+s = 0
+while i < {n}:
+    s = s + i * 2 - 1
+    i = i + 1
+print(s)
+''',
+    'branchy': '''
+i = 0
+s = 0
+while i < {n}:
+    if i < 500 and not (i == 7):
+        s = s + 1
+    else:
+        s = s - 1
+    i = i + 1
+print(s)
+''',
+    # Straight-line code before the loop makes the program longer, which slows down
+    # label lookup in the reference interpreter.
+    'padded': '''
+i = 0
+s = 0
+''' + ''.join(f'x{k} = {k} + s\n' for k in range(200)) + '''
+while i < {n}:
+    s = s + i
+    i = i + 1
+print(s)
+'''
+}
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark the TAC interpreter against the TAC VM')
+    ap.add_argument('--sizes', default='1000,10000',
+                    help='Comma-separated numbers of loop iterations')
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+    rows: list[list[str]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'input.py')
+        for (name, code) in PROGRAMS.items():
+            for n in [int(x) for x in args.sizes.split(',')]:
+                with open(src, 'w') as f:
+                    f.write(code.replace('{n}', str(n)))
+                compileArgs = genCompiler.Args(src, os.path.join(tmp, 'out.wasm'), 'wat2wasm', 1, 1)
+                with quiet():
+                    instrs = loopToTac(compileArgs)
+                def interp():
+                    with quiet():
+                        tacInterp.interpInstrs(instrs)
+                def vm():
+                    with quiet():
+                        tacVM.run(tacVM.decode(instrs))
+                (tInterp, _) = measure(interp, args.repeat)
+                (tVM, _) = measure(vm, args.repeat)
+                rows.append([name, str(n), str(len(instrs)), ms(tInterp), ms(tVM),
+                             f'{tInterp / tVM:.1f}x'])
+    printTable(['program', 'iterations', 'TAC instrs', 'interp (ms)', 'vm (ms)', 'speedup'], rows)
+
+if __name__ == '__main__':
+    main()
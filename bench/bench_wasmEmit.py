@@ -0,0 +1,56 @@
+"""
+Compares the two ways of producing .wasm files: the direct binary encoder and the
+detour via the textual format and wat2wasm. Only the emit step is measured, each
+module is compiled once beforehand.
+"""
+import argparse
+import importlib
+import os
+import shutil
+import tempfile
+from benchSupport import *
+import common.genericCompiler as genCompiler
+from common.compilerSupport import CompilerConfig
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark emitting .wasm files')
+    ap.add_argument('--wat2wasm', default='wat2wasm', help='Path to the wat2wasm tool')
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--langs', default='var,loop,array,fun')
+    args = ap.parse_args()
+    haveWat2wasm = shutil.which(args.wat2wasm) is not None
+    if not haveWat2wasm:
+        print(f'{args.wat2wasm} not found, only measuring the direct encoder')
+    cfg = CompilerConfig(CompilerConfig.defaultMaxMemSize, CompilerConfig.defaultMaxArraySize)
+    rows: list[list[str]] = []
+    totalDirect = 0.0
+    totalWat = 0.0
+    with tempfile.TemporaryDirectory() as tmp:
+        wat = os.path.join(tmp, 'out.wat')
+        wasm = os.path.join(tmp, 'out.wasm')
+        for (lang, f) in testFiles(args.langs.split(',')):
+            compiler = importlib.import_module(f'compilers.lang_{lang}.{lang}_compiler')
+            astMod = importlib.import_module(f'lang_{lang}.{lang}_ast')
+            with quiet():
+                m = genCompiler.compileToModule(compiler.compileModule, astMod, cfg, f)
+            (tDirect, _) = measure(lambda: genCompiler.writeWasm(m, wasm), args.repeat)
+            size = os.path.getsize(wasm)
+            totalDirect += tDirect
+            row = [f, str(size), ms(tDirect)]
+            if haveWat2wasm:
+                def viaWat():
+                    genCompiler.writeWat(m, wat)
+                    genCompiler.wat2wasm(args.wat2wasm, wat, wasm)
+                (tWat, _) = measure(viaWat, args.repeat)
+                totalWat += tWat
+                row += [ms(tWat), f'{tWat / tDirect:.1f}x']
+            rows.append(row)
+    header = ['file', 'bytes', 'direct (ms)']
+    total = ['TOTAL', '', ms(totalDirect)]
+    if haveWat2wasm:
+        header += ['wat2wasm (ms)', 'speedup']
+        total += [ms(totalWat), f'{totalWat / totalDirect:.1f}x']
+    printTable(header, rows + [total])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Number of locals per function of the test programs of lang_array and lang_fun at -O2,
+without and with the coalescing of locals (common.wasmOpt.coalesce). With --run, a
+generated lang_array program with many temporaries is also run with iwasm, without and
+with coalescing.
+"""
+import argparse
+import importlib
+import os
+import tempfile
+from benchSupport import *
+import common.genericCompiler as genCompiler
+import common.wasmOpt as wasmOpt
+from common.compilerSupport import CompilerConfig
+import common.utils as utils
+import shell
+
+def manyTemporaries(stmts: int, iterations: int) -> str:
+    # Every index that is not a constant or a variable needs a temporary
+    lines = ['a = 8 * [1]', 's = 0', 'i = 0', 'j = 0', f'while i < {iterations}:']
+    for k in range(stmts):
+        lines.append(f'    a[j + {k % 8}] = a[j + {(k + 1) % 8}] + a[j + {(k + 3) % 8}] * 2 '
+                     f'- a[j + {k % 8}]')
+    lines += ['    s = s + a[0]', '    i = i + 1', 'print(s)']
+    return '\n'.join(lines) + '\n'
+
+def main():
+    ap = argparse.ArgumentParser(description='Locals per function with and without coalescing')
+    ap.add_argument('--langs', default='array,fun')
+    ap.add_argument('--verbose', action='store_true', help='Print a row for every function')
+    ap.add_argument('--run', action='store_true', help='Also run a generated program with iwasm')
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--stmts', type=int, default=200,
+                    help='Statements in the loop of the generated program')
+    args = ap.parse_args()
+    cfg = CompilerConfig(CompilerConfig.defaultMaxMemSize, CompilerConfig.defaultMaxArraySize)
+    noCoalesce = [p for p in wasmOpt.O2_PASSES if p.name != 'coalesce']
+    rows: list[list[str]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        gen = os.path.join(tmp, 'lang_array', 'generated.py')
+        os.makedirs(os.path.dirname(gen))
+        utils.writeTextFile(gen, manyTemporaries(args.stmts, 10000))
+        for lang in args.langs.split(','):
+            compiler = importlib.import_module(f'compilers.lang_{lang}.{lang}_compiler')
+            astMod = importlib.import_module(f'lang_{lang}.{lang}_ast')
+            files = [f for (_, f) in testFiles([lang])] + ([gen] if lang == 'array' else [])
+            totals = [0, 0]
+            nFuncs = 0
+            for f in files:
+                with quiet():
+                    m1 = genCompiler.compileToModule(compiler.compileModule, astMod, cfg, f,
+                                                     noCoalesce)
+                    m2 = genCompiler.compileToModule(compiler.compileModule, astMod, cfg, f,
+                                                     wasmOpt.O2_PASSES)
+                for (f1, f2) in zip(m1.funcs, m2.funcs):
+                    (n1, n2) = (len(f1.locals), len(f2.locals))
+                    totals[0] += n1
+                    totals[1] += n2
+                    nFuncs += 1
+                    if args.verbose or f == gen:
+                        name = 'generated' if f == gen else f
+                        rows.append([f'{name} {f1.id.id}', str(n1), str(n2)])
+            rows.append([f'{lang} total ({nFuncs} functions)', str(totals[0]), str(totals[1])])
+        printTable(['function', 'locals', 'locals (coalesced)'], rows)
+        if args.run:
+            import compilers.lang_array.array_compiler as array_compiler
+            import lang_array.array_ast as array_ast
+            wasm = os.path.join(tmp, 'out.wasm')
+            times: list[str] = []
+            for passes in [noCoalesce, wasmOpt.O2_PASSES]:
+                with quiet():
+                    m = genCompiler.compileToModule(array_compiler.compileModule, array_ast, cfg,
+                                                    gen, passes)
+                genCompiler.writeWasm(m, wasm)
+                cmd = ['bash', './wasm-support/run_iwasm', wasm]
+                (t, _) = measure(lambda: shell.run(cmd, onError='ignore', captureStdout=True),
+                                 args.repeat)
+                times.append(ms(t))
+            print()
+            printTable(['run time of generated program (ms)', 'without', 'with coalescing'],
+                       [[f'{args.stmts} statements', times[0], times[1]]])
+
+if __name__ == '__main__':
+    main()
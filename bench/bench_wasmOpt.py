@@ -0,0 +1,90 @@
+"""
+Wasm instruction counts of the test programs without and with the wasm optimizations
+(common.wasmOpt) of -O1 and -O2, per language. With --run, the programs are also run
+with iwasm and the total run times are compared, including a generated lang_loop
+program whose loop body contains negations, not and constant subexpressions.
+"""
+import argparse
+import importlib
+import os
+import tempfile
+from benchSupport import *
+import common.genericCompiler as genCompiler
+import common.wasmOpt as wasmOpt
+from common.compilerSupport import CompilerConfig
+import common.utils as utils
+import shell
+
+def hotLoop(n: int) -> str:
+    return f'''s = 0
+i = 0
+while i < {n}:
+    b = not (i < 3)
+    if b and not (i == {n} + 1):
+        s = s + -i * 2 + 60 * 60 - 3600
+    else:
+        s = s - 1
+    i = i + 1
+print(s)
+'''
+
+def runTime(wasm: str, input: str | None, repeat: int) -> float:
+    cmd = ['bash', './wasm-support/run_iwasm', wasm]
+    (t, _) = measure(lambda: shell.run(cmd, onError='ignore', captureStdout=True, input=input),
+                     repeat)
+    return t
+
+def main():
+    ap = argparse.ArgumentParser(description='Wasm instruction counts with and without -O1/-O2')
+    ap.add_argument('--langs', default='var,loop,array,fun')
+    ap.add_argument('--run', action='store_true', help='Also measure run times with iwasm')
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--iterations', type=int, default=1000000,
+                    help='Iterations of the generated program')
+    args = ap.parse_args()
+    cfg = CompilerConfig(CompilerConfig.defaultMaxMemSize, CompilerConfig.defaultMaxArraySize)
+    levels = [0, 1, 2]
+    rows: list[list[str]] = []
+    times = {l: 0.0 for l in levels}
+    hotTimes: list[str] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        wasm = os.path.join(tmp, 'out.wasm')
+        hot = os.path.join(tmp, 'lang_loop', 'hot.py')
+        os.makedirs(os.path.dirname(hot))
+        utils.writeTextFile(hot, hotLoop(args.iterations))
+        for lang in args.langs.split(','):
+            compiler = importlib.import_module(f'compilers.lang_{lang}.{lang}_compiler')
+            astMod = importlib.import_module(f'lang_{lang}.{lang}_ast')
+            files = [f for (_, f) in testFiles([lang])]
+            counts = {l: 0 for l in levels}
+            for f in files:
+                inFile = os.path.splitext(f)[0] + '.in'
+                input = utils.readTextFile(inFile) if os.path.isfile(inFile) else None
+                for l in levels:
+                    with quiet():
+                        m = genCompiler.compileToModule(compiler.compileModule, astMod, cfg, f,
+                                                        wasmOpt.passesForLevel(l))
+                    counts[l] += sum(wasmOpt.countInstrs(fn.instrs) for fn in m.funcs)
+                    if args.run:
+                        genCompiler.writeWasm(m, wasm)
+                        times[l] += runTime(wasm, input, args.repeat)
+            rows.append([f'{lang} ({len(files)} programs)'] + [str(counts[l]) for l in levels] +
+                        [f'{100 * (1 - counts[2] / counts[0]):.1f}%'])
+        if args.run:
+            import compilers.lang_loop.loop_compiler as loop_compiler
+            import lang_loop.loop_ast as loop_ast
+            for l in levels:
+                with quiet():
+                    m = genCompiler.compileToModule(loop_compiler.compileModule, loop_ast, cfg,
+                                                    hot, wasmOpt.passesForLevel(l))
+                genCompiler.writeWasm(m, wasm)
+                hotTimes.append(ms(runTime(wasm, None, args.repeat)))
+    printTable(['wasm instructions', '-O0', '-O1', '-O2', 'saved (-O2)'], rows)
+    if args.run:
+        print()
+        printTable(['run time (ms)', '-O0', '-O1', '-O2'],
+                   [['test programs'] + [ms(times[l]) for l in levels],
+                    [f'generated loop ({args.iterations} iterations)'] + hotTimes])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Scaling of the translation from Wasm to TAC on generated lang_loop programs with many
+statements, if statements and (nested) while loops. The time per Wasm instruction
+should stay roughly constant as the programs grow. For large programs, Python's cyclic
+garbage collector (triggered by the many objects allocated) adds time proportional to
+all live objects, so the translation is also timed with the collector disabled.
+"""
+import argparse
+import gc
+import os
+import random
+import tempfile
+from benchSupport import *
+import common.genericCompiler as genCompiler
+import common.utils as utils
+from common.wasm import *
+import assembly.wasmToTac as wasmToTac
+
+def genProgram(stmts: int, seed: int = 0) -> str:
+    """
+    Generates a lang_loop program with about the given number of statements.
+    """
+    rnd = random.Random(seed)
+    lines = ['x0 = input_int()']
+    nvars = 1
+    count = 0
+    def var() -> str:
+        return f'x{rnd.randrange(nvars)}'
+    def block(indent: str, depth: int):
+        nonlocal nvars, count
+        for _ in range(rnd.randrange(3, 8)):
+            count += 1
+            r = rnd.random()
+            if r < 0.15 and depth < 3:
+                lines.append(f'{indent}if {var()} > {rnd.randrange(100)}:')
+                block(indent + '    ', depth + 1)
+            elif r < 0.25 and depth < 3:
+                lines.append(f'{indent}while {var()} < {rnd.randrange(100)}:')
+                block(indent + '    ', depth + 1)
+            elif r < 0.3:
+                lines.append(f'{indent}print({var()})')
+            elif depth > 0:
+                # Variables first assigned inside if or while are not initialized afterwards
+                lines.append(f'{indent}{var()} = {var()} + {var()} * {rnd.randrange(10)}')
+            else:
+                lines.append(f'{indent}x{nvars} = {var()} + {var()} * {rnd.randrange(10)}')
+                nvars += 1
+    while count < stmts:
+        block('', 0)
+    return '\n'.join(lines) + '\n'
+
+def countInstrs(instrs: list[WasmInstr]) -> int:
+    n = 0
+    for i in instrs:
+        n += 1
+        match i:
+            case WasmInstrIf(_, thenInstrs, elseInstrs):
+                n += countInstrs(thenInstrs) + countInstrs(elseInstrs)
+            case WasmInstrLoop(_, body) | WasmInstrBlock(_, _, body):
+                n += countInstrs(body)
+            case _:
+                pass
+    return n
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark the translation from Wasm to TAC')
+    ap.add_argument('--sizes', default='500,2000,8000,32000',
+                    help='Comma-separated numbers of generated statements')
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+    c = utils.importModuleNotInStudent('compilers.lang_loop.loop_compiler')
+    import lang_loop.loop_ast as ast
+    rows: list[list[str]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in [int(x) for x in args.sizes.split(',')]:
+            src = os.path.join(tmp, 'prog.py')
+            utils.writeTextFile(src, genProgram(n))
+            with quiet():
+                wasmMod = genCompiler.compileMain(
+                    genCompiler.Args(src, os.path.join(tmp, 'out.wasm'), 'wat2wasm', 1, 1),
+                    c.compileModule, ast)
+            instrs = wasmMod.funcs[0].instrs
+            size = countInstrs(instrs)
+            translate = lambda: wasmToTac.wasmToTac(wasmToTac.downcast(instrs))
+            (t, (_, tacInstrs)) = measure(translate, args.repeat)
+            gc.disable()
+            try:
+                (tNoGc, _) = measure(translate, args.repeat)
+            finally:
+                gc.enable()
+            rows.append([str(n), str(size), str(len(tacInstrs)), ms(t), ms(tNoGc),
+                         f'{tNoGc / size * 1e6:.2f}'])
+    printTable(['statements', 'wasm instrs', 'tac instrs', 'wasmToTac (ms)', 'without gc (ms)',
+                'us/instr without gc'], rows)
+
+if __name__ == '__main__':
+    main()
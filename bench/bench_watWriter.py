@@ -0,0 +1,60 @@
+"""
+Compares the pretty printer layout of .wat files with the streaming writer on
+programs with large array literals (each element becomes a few instructions).
+"""
+import argparse
+import io
+import os
+import tempfile
+import tracemalloc
+from benchSupport import *
+import common.genericCompiler as genCompiler
+import common.sexp as sexp
+import compilers.lang_array.array_compiler as array_compiler
+import lang_array.array_ast as array_ast
+from common.compilerSupport import CompilerConfig
+from common.wasm import WasmModule
+
+def mkProgram(n: int) -> str:
+    elems = ', '.join(str(i) for i in range(n))
+    return f'x = [{elems}]\nprint(x[{n - 1}])\n'
+
+def peakMem(f: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        f()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark writing .wat files')
+    ap.add_argument('--sizes', default='100,1000,5000',
+                    help='Comma-separated numbers of array elements')
+    ap.add_argument('--repeat', type=int, default=1)
+    args = ap.parse_args()
+    cfg = CompilerConfig(CompilerConfig.defaultMaxMemSize, 10 * 1000 * 1000)
+    rows: list[list[str]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'input.py')
+        for n in [int(x) for x in args.sizes.split(',')]:
+            with open(src, 'w') as f:
+                f.write(mkProgram(n))
+            with quiet():
+                m = genCompiler.compileToModule(array_compiler.compileModule, array_ast, cfg, src)
+            def pretty(m: WasmModule = m) -> str:
+                return sexp.renderSExp(m.render())
+            def stream(m: WasmModule = m) -> str:
+                out = io.StringIO()
+                sexp.writeSExp(m.render(), out)
+                return out.getvalue()
+            (tPretty, _) = measure(pretty, args.repeat)
+            (tStream, code) = measure(stream, args.repeat)
+            lines = code.count('\n')
+            rows.append([str(n), str(lines), ms(tPretty), ms(tStream), f'{tPretty / tStream:.1f}x',
+                         f'{peakMem(pretty) // 1024}', f'{peakMem(stream) // 1024}'])
+    printTable(['elements', 'lines', 'pretty (ms)', 'stream (ms)', 'speedup',
+                'pretty peak (kB)', 'stream peak (kB)'], rows)
+
+if __name__ == '__main__':
+    main()
@@ -8,11 +8,44 @@ from dataclasses import dataclass
 import assembly.tac_ast as tac
 import assembly.tacSpill_ast as tacSpill
 import assembly.tacPretty as tacPretty
-from assembly.graph import Graph
+from assembly.graph import Graph, CompactGraph
+
+class InstrRange(Sequence[tac.instr]):
+    """
+    A read-only view of the instructions source[start:end], without copying them.
+    """
+    def __init__(self, source: list[tac.instr], start: int, end: int):
+        self.source = source
+        self.start = start
+        self.end = end
+    @overload
+    def __getitem__(self, i: int) -> tac.instr: ...
+    @overload
+    def __getitem__(self, i: slice) -> list[tac.instr]: ...
+    def __getitem__(self, i: int | slice) -> tac.instr | list[tac.instr]:
+        if isinstance(i, slice):
+            return [self.source[self.start + j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError(f'Instruction index {i} out of range')
+        return self.source[self.start + i]
+    def __len__(self) -> int:
+        return self.end - self.start
+    def __iter__(self) -> Iterator[tac.instr]:
+        # islice would step over the first self.start instructions
+        source = self.source
+        return (source[i] for i in range(self.start, self.end))
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Sequence):
+            return list(self) == list(cast(Sequence[Any], other))
+        return False
+    def __repr__(self):
+        return f'InstrRange({list(self)})'
 
 @dataclass
 class BasicBlock:
-    instrs: list[tac.instr]
+    instrs: Sequence[tac.instr]
     index: int
     labels: list[str]
     @property
@@ -22,12 +55,27 @@ class BasicBlock:
         else:
             return self.instrs[-1]
     def __repr__(self):
-        instrs = tacPretty.prettyInstrs(self.instrs, True)
+        instrs = tacPretty.prettyInstrs(list(self.instrs), True)
         return f'BasicBlock({self.index}, {self.labels}, {instrs})'
 
+class ControlFlowGraph(Graph[int, BasicBlock]):
+    """
+    A control flow graph. Vertex i is the basic block with index i, block 0 is the entry.
+    Besides the successors, the graph stores the predecessors of each block and the
+    blocks reachable from the entry in reverse postorder.
+    """
+    def __init__(self):
+        super().__init__('directed')
+        self.predecessors: dict[int, list[int]] = {}
+        self.reversePostorder: list[int] = []
+    def preds(self, v: int) -> list[int]:
+        """
+        Given a vertex v, returns all vertices w such that there exists an edge
+        from w to v.
+        """
+        return self.predecessors.get(v, [])
 
-type ControlFlowGraph = Graph[int, BasicBlock]
-type InterfGraph = Graph[tac.ident, None]
+type InterfGraph = Graph[tac.ident, None] | CompactGraph[tac.ident, None]
 
 class RegisterMap(Protocol):
     def resolve(self, x: tac.ident) -> Optional[tacSpill.ident]:
@@ -13,6 +13,7 @@ import common.utils as utils
 import common.log as log
 import common.genericCompiler as genCompiler
 import assembly.mipsPretty as mipsPretty
+import assembly.mipsPeephole as mipsPeephole
 from assembly.loopToTac import loopToTac
 import assembly.tacSpillPretty as tacSpillPretty
 
@@ -37,9 +38,11 @@ def compileFile(args: genCompiler.Args):
     tacInstrs = loopToTac(args)
     log.debug('TAC:\n' + tacPretty.prettyInstrs(tacInstrs))
     maxRegs = args.maxRegisters if args.maxRegisters is not None else MAX_REGISTERS
-    tacSpillInstrs = tacToTacSpill(tacInstrs, maxRegs)
+    tacSpillInstrs = tacToTacSpill(tacInstrs, maxRegs, args.regAlloc)
     log.debug('TAC spill:\n' + tacSpillPretty.prettyInstrs(tacSpillInstrs))
     mipsInstrs = tacSpillToMips(tacSpillInstrs)
+    if args.optLevel >= 1:
+        mipsInstrs = mipsPeephole.peephole(mipsInstrs)
     s = mipsPretty.mipsPretty(mipsInstrs)
     utils.writeTextFile(args.output, MIPS_START + s + MIPS_END)
     log.info(f'Wrote assembly file {args.output}')
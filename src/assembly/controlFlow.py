@@ -3,66 +3,86 @@ This module exports the function `buildControlFlowGraph` which translates a list
 of TAC instructions into a control flow graph.
 """
 
-import assembly.tac_ast as tac
 from typing import *
 from assembly.common import *
+import assembly.tac_ast as tac
 import common.log as log
 
-def _firstBasicBlock(instrs: list[tac.instr], blockIdx: int) -> tuple[BasicBlock, list[tac.instr]]:
-    # First, strip off all labels
-    labels: list[str] = []
-    firstNonLabelIdx = 0
-    for idx, instr in enumerate(instrs):
-        if not isinstance(instr, tac.Label):
-            firstNonLabelIdx = idx
-            break
-        else:
+def _basicBlocks(instrs: list[tac.instr]) -> list[BasicBlock]:
+    """
+    Splits the instructions into basic blocks with a single scan. A block starts with
+    its labels and ends before the next label or after a jump. The instructions of a
+    block are a view into instrs.
+    """
+    blocks: list[BasicBlock] = []
+    n = len(instrs)
+    i = 0
+    while i < n:
+        labels: list[str] = []
+        while i < n:
+            instr = instrs[i]
+            if not isinstance(instr, tac.Label):
+                break
             labels.append(instr.label)
-    else:
-        # only labels or no instructions at all
-        return (BasicBlock([], blockIdx, labels), [])
-    instrs = instrs[firstNonLabelIdx:]
-    # Now find the first instruction that is a jump or a label
-    firstJumpOrLabelIdx = 0
-    for idx, instr in enumerate(instrs):
-        if not isinstance(instr, tac.Assign) and not isinstance(instr, tac.Call):
-            firstJumpOrLabelIdx = idx
-            break
-    else:
-        # instrs only contains assign or calls
-        return (BasicBlock(instrs, blockIdx, labels), [])
-    # idx is the index of the first instruction that is a jump or a label.
-    offset = 0 if isinstance(instrs[firstJumpOrLabelIdx], tac.Label) else 1
-    # jumps are part of the basic block, labels not
-    basicInstrs = instrs[:firstJumpOrLabelIdx+offset]
-    rest = instrs[firstJumpOrLabelIdx+offset:]
-    return (BasicBlock(basicInstrs, blockIdx, labels), rest)
+            i += 1
+        start = i
+        while i < n:
+            instr = instrs[i]
+            if isinstance(instr, tac.Label):
+                break
+            i += 1
+            if isinstance(instr, tac.Goto | tac.GotoIf):
+                break
+        blocks.append(BasicBlock(InstrRange(instrs, start, i), len(blocks), labels))
+    return blocks
+
+def reversePostorder(g: Graph[int, BasicBlock], entry: int) -> list[int]:
+    """
+    Returns the blocks reachable from entry in reverse postorder.
+    """
+    order: list[int] = []
+    visited = {entry}
+    stack = [(entry, iter(sorted(g.succs(entry))))]
+    while stack:
+        (v, succs) = stack[-1]
+        for w in succs:
+            if w not in visited:
+                visited.add(w)
+                stack.append((w, iter(sorted(g.succs(w)))))
+                break
+        else:
+            stack.pop()
+            order.append(v)
+    order.reverse()
+    return order
 
 def buildControlFlowGraph(instrs: list[tac.instr]) -> ControlFlowGraph:
-    g = Graph[int, BasicBlock]('directed')
-    idx = 0
+    g = ControlFlowGraph()
     labelToIdx: dict[str, int] = {}
-    while instrs:
-        (bb, instrs) = _firstBasicBlock(instrs, idx)
+    blocks = _basicBlocks(instrs)
+    for bb in blocks:
         log.debug(f'{bb}')
-        g.addVertex(idx, bb)
+        g.addVertex(bb.index, bb)
+        g.predecessors[bb.index] = []
         for l in bb.labels:
-            labelToIdx[l] = idx
-        idx += 1
-    for bb in g.values:
+            # As in the TAC interpreter, a jump goes to the first label with the given name
+            labelToIdx.setdefault(l, bb.index)
+    for bb in blocks:
         succs: list[int] = []
+        nextIdx = bb.index + 1
         match bb.last:
             case tac.Goto(label):
                 succs.append(labelToIdx[label])
             case tac.GotoIf(_, label):
                 succs.append(labelToIdx[label])
-                nextIdx = bb.index + 1
-                if g.hasVertex(nextIdx):
+                if nextIdx < len(blocks):
                     succs.append(nextIdx)
             case _:
-                nextIdx = bb.index + 1
-                if g.hasVertex(nextIdx):
+                if nextIdx < len(blocks):
                     succs.append(nextIdx)
-        for s in succs:
+        for s in dict.fromkeys(succs):
             g.addEdge(bb.index, s)
+            g.predecessors[s].append(bb.index)
+    if blocks:
+        g.reversePostorder = reversePostorder(g, 0)
     return g
@@ -3,6 +3,8 @@ This module implements a generatel purpose graph data structure.
 """
 
 from typing import *
+from array import array
+import common.utils as utils
 
 type GraphKind = Literal['directed', 'undirected']
 
@@ -14,7 +16,7 @@ class Graph[V, T]:
     The graph can be directed or undirected, depending on the flag passed to the constructor.
     """
     def __init__(self, kind: GraphKind):
-        self.kind = kind
+        self.kind: GraphKind = kind
         self.__vertexData: dict[V, T] = {}
         self.__edges: dict[V, set[V]] = {}
     def __repr__(self):
@@ -83,3 +85,130 @@ class Graph[V, T]:
             for tgt in tgts:
                 res.append((src, tgt))
         return res
+
+class CompactGraph[V, T]:
+    """
+    A frozen graph whose vertices are numbered 0, ..., n-1 in the order they were added
+    to the original graph. Successors are stored in CSR format: the successors of vertex i
+    are targets[offsets[i]:offsets[i+1]], sorted by index. Undirected graphs additionally
+    have a triangular adjacency bit matrix, so hasEdge is O(1) (for directed graphs,
+    hasEdge uses a set of edge numbers). The bit matrix is built on the first call of
+    hasEdge.
+
+    The methods with suffix Idx work on vertex indices, the other methods accept and
+    return vertices as Graph does.
+    """
+    def __init__(self, kind: GraphKind, vertices: list[V], data: list[T],
+                 succs: Iterable[Iterable[int]]):
+        """
+        succs holds, for every vertex index, the indices of its successors. For undirected
+        graphs, every edge must be given in both directions.
+        """
+        self.kind = kind
+        self.vertexList = vertices
+        self.dataList = data
+        self.index: dict[V, int] = {v: i for i, v in enumerate(vertices)}
+        n = len(vertices)
+        self.offsets = array('l', [0])
+        self.targets = array('l')
+        for ws in succs:
+            self.targets.extend(sorted(set(ws)))
+            self.offsets.append(len(self.targets))
+        if len(self.offsets) != n + 1:
+            raise ValueError(f'Expected successors for {n} vertices, got {len(self.offsets) - 1}')
+        self.__targetsView = memoryview(self.targets)
+        # Built on the first call of hasEdgeIdx
+        self.__edgeSet: Optional[set[int]] = None
+        self.__bitMatrix: Optional[bytearray] = None
+
+    def __buildEdgeIndex(self):
+        n = len(self.vertexList)
+        if self.kind == 'undirected':
+            m = bytearray((n * (n - 1) // 2 + 7) // 8)
+            for i in range(n):
+                row = i * (i - 1) // 2
+                for j in self.succsIdx(i):
+                    if j >= i:
+                        break
+                    k = row + j
+                    m[k >> 3] |= 1 << (k & 7)
+            self.__bitMatrix = m
+        else:
+            self.__edgeSet = {i * n + j for i in range(n) for j in self.succsIdx(i)}
+
+    @staticmethod
+    def fromGraph[W, U](g: Graph[W, U]) -> 'CompactGraph[W, U]':
+        """
+        Converts a graph into a compact graph.
+        """
+        vertices = list(g.vertices)
+        index = {v: i for i, v in enumerate(vertices)}
+        data = [g.getData(v) for v in vertices]
+        succs = [[index[w] for w in g.succs(v)] for v in vertices]
+        return CompactGraph[W, U](g.kind, vertices, data, succs)
+
+    def __repr__(self):
+        edges = {self.vertexList[i]: self.succs(self.vertexList[i])
+                 for i in range(len(self.vertexList)) if self.degreeIdx(i) > 0}
+        return f'CompactGraph(vertices={self.vertexList}, edges={edges})'
+
+    def __len__(self) -> int:
+        return len(self.vertexList)
+
+    def hasVertex(self, v: V) -> bool:
+        return v in self.index
+
+    def getData(self, v: V) -> T:
+        """
+        Returns the data associated with vertex v.
+        """
+        return self.dataList[self.index[v]]
+
+    @property
+    def values(self) -> Iterable[T]:
+        return self.dataList
+
+    @property
+    def vertices(self) -> Iterable[V]:
+        return self.vertexList
+
+    def succsIdx(self, i: int) -> memoryview:
+        """
+        Returns the indices of the successors of vertex i, without copying them.
+        """
+        return self.__targetsView[self.offsets[i]:self.offsets[i+1]]
+
+    def degreeIdx(self, i: int) -> int:
+        return self.offsets[i+1] - self.offsets[i]
+
+    def hasEdgeIdx(self, i: int, j: int) -> bool:
+        if self.__bitMatrix is None and self.__edgeSet is None:
+            self.__buildEdgeIndex()
+        if self.__bitMatrix is not None:
+            if i == j:
+                return False
+            if i < j:
+                (i, j) = (j, i)
+            k = i * (i - 1) // 2 + j
+            return (self.__bitMatrix[k >> 3] >> (k & 7)) & 1 == 1
+        else:
+            return i * len(self.vertexList) + j in utils.assertNotNone(self.__edgeSet)
+
+    def succs(self, v: V) -> list[V]:
+        """
+        Given a vertex v, returns all vertices w such that there exists an edge
+        from v to w.
+        """
+        vs = self.vertexList
+        return [vs[j] for j in self.succsIdx(self.index[v])]
+
+    def hasEdge(self, v: V, w: V) -> bool:
+        return self.hasEdgeIdx(self.index[v], self.index[w])
+
+    @property
+    def edges(self) -> list[tuple[V, V]]:
+        """
+        Returns all edges of the graph.
+        """
+        vs = self.vertexList
+        return [(vs[i], vs[j]) for i in range(len(vs)) for j in self.succsIdx(i)]
@@ -0,0 +1,284 @@
+"""
+Register allocation by iterated register coalescing (George and Appel, 1996).
+
+The allocator works on the interference graph of the TAC variables and repeatedly
+simplifies (removes a node of insignificant degree), coalesces moves (Briggs'
+conservative test), freezes moves and selects potential spills until the graph is
+empty. Nodes are then colored in reverse order of removal; potential spills that
+cannot be colored become actual spills.
+
+Spilled variables do not need a rewrite of the program: tacToTacSpill loads and
+stores them through the temporary registers, which are not part of the K colors.
+The spill cost of a variable is the number of its definitions and uses, each weighted
+by 10^(loop depth of the block). The potential spill with the lowest cost per degree is
+taken from a binary heap.
+"""
+from dataclasses import dataclass
+import heapq
+from assembly.common import *
+import assembly.tac_ast as tac
+from assembly.graph import CompactGraph
+from assembly.loops import spillCosts
+import common.log as log
+
+@dataclass
+class AllocStats:
+    variables: int
+    spilled: int
+    moves: int
+    # Moves whose source and target got the same register
+    eliminatedMoves: int
+
+def moveOf(instr: tac.instr) -> Optional[tuple[tac.ident, tac.ident]]:
+    """
+    Returns (x, y) if the instruction is a move x = y between distinct variables.
+    """
+    match instr:
+        case tac.Assign(x, tac.Prim(tac.Name(y))) if x != y:
+            return (x, y)
+        case _:
+            return None
+
+class _IRC:
+    """
+    The worklist algorithm as described in Appel's "Modern Compiler Implementation",
+    without precolored nodes. Nodes and moves are ints.
+    """
+    def __init__(self, k: int, adj: list[set[int]], moves: list[tuple[int, int]],
+                 costs: list[float]):
+        n = len(adj)
+        self.k = k
+        self.adjList = adj
+        self.degree = [len(a) for a in adj]
+        self.moves = moves
+        self.costs = costs
+        self.moveList: list[set[int]] = [set() for _ in range(n)]
+        for m, (x, y) in enumerate(moves):
+            self.moveList[x].add(m)
+            self.moveList[y].add(m)
+        self.worklistMoves: set[int] = set(range(len(moves)))
+        self.activeMoves: set[int] = set()
+        self.coalescedMoves: set[int] = set()
+        self.constrainedMoves: set[int] = set()
+        self.frozenMoves: set[int] = set()
+        self.simplifyWorklist: set[int] = set()
+        self.freezeWorklist: set[int] = set()
+        self.spillWorklist: set[int] = set()
+        # Entries (cost / degree, node) for the nodes of spillWorklist. A node gets a new
+        # entry whenever its cost or degree changes, outdated entries are skipped.
+        self.spillHeap: list[tuple[float, int]] = []
+        self.coalescedNodes: set[int] = set()
+        self.spilledNodes: set[int] = set()
+        self.selectStack: list[int] = []
+        self.onStack = [False] * n
+        self.alias = list(range(n))
+        self.color: list[Optional[int]] = [None] * n
+        for u in range(n):
+            if self.degree[u] >= k:
+                self.addSpill(u)
+            elif self.moveRelated(u):
+                self.freezeWorklist.add(u)
+            else:
+                self.simplifyWorklist.add(u)
+
+    def run(self) -> list[Optional[int]]:
+        while True:
+            if self.simplifyWorklist:
+                self.simplify()
+            elif self.worklistMoves:
+                self.coalesce()
+            elif self.freezeWorklist:
+                self.freeze()
+            elif self.spillWorklist:
+                self.selectSpill()
+            else:
+                break
+        self.assignColors()
+        return self.color
+
+    def adjacent(self, u: int) -> list[int]:
+        return [v for v in self.adjList[u] if not self.onStack[v] and v not in self.coalescedNodes]
+
+    def nodeMoves(self, u: int) -> set[int]:
+        return {m for m in self.moveList[u] if m in self.activeMoves or m in self.worklistMoves}
+
+    def moveRelated(self, u: int) -> bool:
+        return any(m in self.activeMoves or m in self.worklistMoves for m in self.moveList[u])
+
+    def addEdge(self, u: int, v: int):
+        if u != v and v not in self.adjList[u]:
+            self.adjList[u].add(v)
+            self.adjList[v].add(u)
+            self.degree[u] += 1
+            self.degree[v] += 1
+            self.updateSpill(u)
+            self.updateSpill(v)
+
+    def spillPrio(self, u: int) -> float:
+        # Chaitin's heuristic: cheap nodes of high degree first
+        return self.costs[u] / max(self.degree[u], 1)
+
+    def addSpill(self, u: int):
+        self.spillWorklist.add(u)
+        heapq.heappush(self.spillHeap, (self.spillPrio(u), u))
+
+    def updateSpill(self, u: int):
+        if u in self.spillWorklist:
+            heapq.heappush(self.spillHeap, (self.spillPrio(u), u))
+
+    def simplify(self):
+        u = self.simplifyWorklist.pop()
+        self.selectStack.append(u)
+        self.onStack[u] = True
+        for v in self.adjacent(u):
+            self.decrementDegree(v)
+
+    def decrementDegree(self, u: int):
+        d = self.degree[u]
+        self.degree[u] = d - 1
+        self.updateSpill(u)
+        if d == self.k:
+            self.enableMoves([u] + self.adjacent(u))
+            self.spillWorklist.discard(u)
+            if self.moveRelated(u):
+                self.freezeWorklist.add(u)
+            else:
+                self.simplifyWorklist.add(u)
+
+    def enableMoves(self, nodes: list[int]):
+        for u in nodes:
+            for m in self.nodeMoves(u):
+                if m in self.activeMoves:
+                    self.activeMoves.remove(m)
+                    self.worklistMoves.add(m)
+
+    def addWorkList(self, u: int):
+        if not self.moveRelated(u) and self.degree[u] < self.k:
+            self.freezeWorklist.discard(u)
+            self.simplifyWorklist.add(u)
+
+    def conservative(self, nodes: set[int]) -> bool:
+        significant = 0
+        for u in nodes:
+            if self.degree[u] >= self.k:
+                significant += 1
+        return significant < self.k
+
+    def getAlias(self, u: int) -> int:
+        while u in self.coalescedNodes:
+            u = self.alias[u]
+        return u
+
+    def coalesce(self):
+        m = self.worklistMoves.pop()
+        (x, y) = self.moves[m]
+        u = self.getAlias(x)
+        v = self.getAlias(y)
+        if u == v:
+            self.coalescedMoves.add(m)
+            self.addWorkList(u)
+        elif v in self.adjList[u]:
+            self.constrainedMoves.add(m)
+            self.addWorkList(u)
+            self.addWorkList(v)
+        elif self.conservative(set(self.adjacent(u)) | set(self.adjacent(v))):
+            self.coalescedMoves.add(m)
+            self.combine(u, v)
+            self.addWorkList(u)
+        else:
+            self.activeMoves.add(m)
+
+    def combine(self, u: int, v: int):
+        if v in self.freezeWorklist:
+            self.freezeWorklist.remove(v)
+        else:
+            self.spillWorklist.discard(v)
+        self.coalescedNodes.add(v)
+        self.alias[v] = u
+        self.moveList[u] |= self.moveList[v]
+        self.costs[u] += self.costs[v]
+        self.updateSpill(u)
+        self.enableMoves([v])
+        for t in self.adjacent(v):
+            self.addEdge(t, u)
+            self.decrementDegree(t)
+        if self.degree[u] >= self.k and u in self.freezeWorklist:
+            self.freezeWorklist.remove(u)
+            self.addSpill(u)
+
+    def freeze(self):
+        u = self.freezeWorklist.pop()
+        self.simplifyWorklist.add(u)
+        self.freezeMoves(u)
+
+    def freezeMoves(self, u: int):
+        for m in self.nodeMoves(u):
+            (x, y) = self.moves[m]
+            if self.getAlias(y) == self.getAlias(u):
+                v = self.getAlias(x)
+            else:
+                v = self.getAlias(y)
+            self.activeMoves.discard(m)
+            self.worklistMoves.discard(m)
+            self.frozenMoves.add(m)
+            if not self.moveRelated(v) and self.degree[v] < self.k:
+                self.freezeWorklist.discard(v)
+                self.simplifyWorklist.add(v)
+
+    def selectSpill(self):
+        # the node with the lowest priority, ties by node number
+        while True:
+            (prio, u) = heapq.heappop(self.spillHeap)
+            if u in self.spillWorklist and prio == self.spillPrio(u):
+                break
+        self.spillWorklist.remove(u)
+        self.simplifyWorklist.add(u)
+        self.freezeMoves(u)
+
+    def assignColors(self):
+        while self.selectStack:
+            u = self.selectStack.pop()
+            self.onStack[u] = False
+            forbidden: set[int] = set()
+            for v in self.adjList[u]:
+                c = self.color[self.getAlias(v)]
+                if c is not None:
+                    forbidden.add(c)
+            c = 0
+            while c in forbidden:
+                c += 1
+            if c < self.k:
+                self.color[u] = c
+            else:
+                self.spilledNodes.add(u)
+        for u in self.coalescedNodes:
+            self.color[u] = self.color[self.getAlias(u)]
+
+def colorIRC(g: ControlFlowGraph, interfG: InterfGraph,
+             maxRegs: int=MAX_REGISTERS) -> tuple[RegisterAllocMap, AllocStats]:
+    """
+    Computes a register map for the variables of g with at most maxRegs registers.
+    Variables that do not get a register are mapped to -1.
+    """
+    cg = interfG if isinstance(interfG, CompactGraph) else CompactGraph.fromGraph(interfG)
+    n = len(cg)
+    adj = [set(cg.succsIdx(i)) for i in range(n)]
+    costsById = spillCosts(g)
+    costs = [costsById.get(x, 0.0) for x in cg.vertices]
+    moves: list[tuple[int, int]] = []
+    for b in g.vertices:
+        for instr in g.getData(b).instrs:
+            mv = moveOf(instr)
+            if mv is not None:
+                moves.append((cg.index[mv[0]], cg.index[mv[1]]))
+    irc = _IRC(maxRegs, adj, moves, costs)
+    colors = irc.run()
+    m: dict[tac.ident, int] = {}
+    for i, x in enumerate(cg.vertices):
+        c = colors[i]
+        m[x] = c if c is not None else -1
+    spilled = sum(1 for c in colors if c is None)
+    eliminated = sum(1 for (x, y) in moves if colors[x] is not None and colors[x] == colors[y])
+    stats = AllocStats(n, spilled, len(moves), eliminated)
+    log.info(f'IRC register allocation: {stats}')
+    return (RegisterAllocMap(m, maxRegs), stats)
@@ -0,0 +1,165 @@
+"""
+Linear-scan register allocation (Poletto and Sarkar, 1999).
+
+The instructions are numbered in the order of the basic blocks: instruction k of the
+program reads its operands at position 2k and writes its result at position 2k+1. The
+live interval of a variable is the smallest range of positions covering all positions
+where it is live. Liveness is computed separately for each variable, only the blocks in
+which the variable is live are visited, and no per-instruction liveness and no
+interference graph is needed. The intervals are then
+scanned in order of their start. If no register is free, one of the active intervals
+and the current interval is spilled: the one with the lowest spill weight, and among
+those with the same weight the one ending last. The spill weight is the spill cost
+(definitions and uses weighted with 10^(loop depth), see assembly.loops) divided by
+the length of the interval, so long intervals with few uses are spilled first.
+
+The same intervals are used to share stack slots between spilled variables that are
+never live at the same time, whatever register allocator was used.
+"""
+from dataclasses import dataclass
+import bisect
+import heapq
+from assembly.common import *
+import assembly.tac_ast as tac
+from assembly.loops import spillCosts
+import common.log as log
+
+@dataclass
+class Interval:
+    var: tac.ident
+    start: int
+    end: int
+
+def _defsUses(instr: tac.instr) -> tuple[list[tac.ident], list[tac.ident]]:
+    def names(ps: list[tac.prim]) -> list[tac.ident]:
+        return [p.var for p in ps if isinstance(p, tac.Name)]
+    match instr:
+        case tac.Assign(x, tac.Prim(p)):
+            return ([x], names([p]))
+        case tac.Assign(x, tac.BinOp(p1, _, p2)):
+            return ([x], names([p1, p2]))
+        case tac.Call(x, _, args):
+            return ([x] if x is not None else [], names(args))
+        case tac.GotoIf(p, _):
+            return ([], names([p]))
+        case _:
+            return ([], [])
+
+def liveIntervals(g: ControlFlowGraph) -> list[Interval]:
+    """
+    Computes the live intervals of all variables, sorted by start position.
+    """
+    # Liveness is computed per variable: starting from the blocks where the variable is
+    # used before being defined, walk backwards until a definition is found. Only the
+    # first and last live position of each variable are recorded.
+    varIdx: dict[tac.ident, int] = {}
+    vars: list[tac.ident] = []
+    first: list[int] = []
+    last: list[int] = []
+    # blocks defining the variable, blocks using the variable before any definition
+    defBlocks: list[set[int]] = []
+    useBlocks: list[list[int]] = []
+    def touch(x: tac.ident, pos: int) -> int:
+        i = varIdx.get(x)
+        if i is None:
+            i = len(vars)
+            varIdx[x] = i
+            vars.append(x)
+            first.append(pos)
+            last.append(pos)
+            defBlocks.append(set())
+            useBlocks.append([])
+        else:
+            first[i] = min(first[i], pos)
+            last[i] = max(last[i], pos)
+        return i
+    blockStart: dict[int, int] = {}
+    blockEnd: dict[int, int] = {}
+    k = 0
+    for b in sorted(g.vertices):
+        blockStart[b] = 2 * k
+        for instr in g.getData(b).instrs:
+            (defs, uses) = _defsUses(instr)
+            for x in uses:
+                i = touch(x, 2 * k)
+                if b not in defBlocks[i] and (not useBlocks[i] or useBlocks[i][-1] != b):
+                    useBlocks[i].append(b)
+            for x in defs:
+                defBlocks[touch(x, 2 * k + 1)].add(b)
+            k += 1
+        blockEnd[b] = 2 * k - 1
+    for i in range(len(vars)):
+        liveIn = set(useBlocks[i])
+        stack = list(useBlocks[i])
+        while stack:
+            b = stack.pop()
+            if blockStart[b] <= blockEnd[b]:
+                first[i] = min(first[i], blockStart[b])
+            for p in g.preds(b):
+                # i is live at the end of p
+                if blockStart[p] <= blockEnd[p]:
+                    last[i] = max(last[i], blockEnd[p])
+                if p not in defBlocks[i] and p not in liveIn:
+                    liveIn.add(p)
+                    stack.append(p)
+    intervals = [Interval(x, first[i], last[i]) for i, x in enumerate(vars)]
+    intervals.sort(key=lambda iv: iv.start)
+    return intervals
+
+def linearScan(g: ControlFlowGraph, maxRegs: int=MAX_REGISTERS) -> RegisterAllocMap:
+    """
+    Computes a register map for the variables of g with at most maxRegs registers.
+    Variables that do not get a register are mapped to -1.
+    """
+    intervals = liveIntervals(g)
+    costs = spillCosts(g)
+    def weight(iv: Interval) -> float:
+        return costs[iv.var] / (iv.end - iv.start + 1)
+    regs: dict[tac.ident, int] = {}
+    free = list(range(maxRegs - 1, -1, -1))
+    # active intervals sorted by end, as tuples (end, order of insertion, interval)
+    active: list[tuple[int, int, Interval]] = []
+    spilled = 0
+    for n, iv in enumerate(intervals):
+        while active and active[0][0] < iv.start:
+            (_, _, old) = active.pop(0)
+            free.append(regs[old.var])
+        if free:
+            regs[iv.var] = free.pop()
+            bisect.insort(active, (iv.end, n, iv))
+        else:
+            # The active interval with the lowest weight, the last one for equal weights
+            j = min(range(len(active)), key=lambda j: (weight(active[j][2]), -j), default=None)
+            if j is not None and \
+                    (weight(active[j][2]), -active[j][0]) < (weight(iv), -iv.end):
+                victim = active[j][2]
+                del active[j]
+                regs[iv.var] = regs[victim.var]
+                regs[victim.var] = -1
+                bisect.insort(active, (iv.end, n, iv))
+            else:
+                regs[iv.var] = -1
+            spilled += 1
+    log.info(f'Linear scan register allocation: {len(intervals)} intervals, {spilled} spilled')
+    return RegisterAllocMap(regs, maxRegs)
+
+def stackSlots(g: ControlFlowGraph, regMap: RegisterMap) -> dict[tac.ident, int]:
+    """
+    Assigns stack slots 0, 1, ... to the variables without a register in regMap such that variables whose
+    live intervals overlap get different slots (interval packing). The slot with the
+    lowest number is reused first.
+    """
+    slots: dict[tac.ident, int] = {}
+    free: list[int] = []
+    # (end, slot) of the intervals currently occupying a slot
+    active: list[tuple[int, int]] = []
+    for iv in liveIntervals(g):
+        if regMap.resolve(iv.var) is not None:
+            continue
+        while active and active[0][0] < iv.start:
+            (_, s) = heapq.heappop(active)
+            heapq.heappush(free, s)
+        s = heapq.heappop(free) if free else len(active)
+        slots[iv.var] = s
+        heapq.heappush(active, (iv.end, s))
+    return slots
@@ -9,7 +9,7 @@ import assembly.wasmToTac as wasmToTac
 from assembly.tac_ast import *
 import common.log as log
 import common.genericCompiler as genCompiler
-import assembly.wasmToTac as wasmToTac
+import assembly.tacOptimize as tacOptimize
 import common.sexp as sexp
 import common.utils as utils
 
@@ -24,4 +24,4 @@ def loopToTac(args: genCompiler.Args) -> list[tac.instr]:
     (res, tacInstrs) = wasmToTac.wasmToTac(wasmToTac.downcast(wasmInstrs))
     if res is not None:
         raise ValueError(f'Value returned from tac.toTac is not None: {res}')
-    return tacInstrs
+    return tacOptimize.optimize(tacInstrs, args.optLevel)
@@ -0,0 +1,141 @@
+"""
+Natural loops of a control flow graph.
+
+Back edges are the edges u -> h whose target dominates their source. The natural loop
+of a back edge u -> h consists of h and all blocks that reach u without passing
+through h. Loops with the same header are merged. The loops form a forest: a loop is
+nested in the smallest other loop containing its header.
+
+The loop depth of a block is the number of loops containing it. The register
+allocators weight definitions and uses of variables with 10^(loop depth) when
+choosing which variables to spill.
+"""
+from dataclasses import dataclass
+from assembly.common import *
+import assembly.tac_ast as tac
+from assembly.ssa import dominators, dominates
+
+@dataclass
+class Loop:
+    header: int
+    body: set[int]
+    # Header of the enclosing loop
+    parent: Optional[int] = None
+    # 1 for outermost loops
+    depth: int = 1
+
+def backEdges(g: ControlFlowGraph) -> list[tuple[int, int]]:
+    idom = dominators(g)
+    pos = {b: i for i, b in enumerate(g.reversePostorder)}
+    res: list[tuple[int, int]] = []
+    for u in g.reversePostorder:
+        for h in sorted(g.succs(u)):
+            # Only an edge going backwards in reverse postorder can be a back edge
+            if pos[h] <= pos[u] and dominates(idom, h, u):
+                res.append((u, h))
+    return res
+
+def naturalLoops(g: ControlFlowGraph) -> list[Loop]:
+    """
+    Returns the natural loops of g, one per loop header, ordered by the position of the
+    header in reverse postorder. An enclosing loop comes before the loops nested in it.
+    """
+    loops: dict[int, Loop] = {}
+    reachable = set(g.reversePostorder)
+    for (u, h) in backEdges(g):
+        loop = loops.setdefault(h, Loop(h, {h}))
+        stack = [u]
+        while stack:
+            b = stack.pop()
+            if b not in loop.body:
+                loop.body.add(b)
+                stack.extend(p for p in g.preds(b) if p in reachable)
+    pos = {b: i for i, b in enumerate(g.reversePostorder)}
+    # Natural loops are either disjoint or nested. Visiting them from the largest,
+    # the innermost loop seen so far containing the header of a loop is its parent.
+    innermost: dict[int, Loop] = {}
+    for loop in sorted(loops.values(), key=lambda l: -len(l.body)):
+        parent = innermost.get(loop.header)
+        if parent is not None:
+            loop.parent = parent.header
+            loop.depth = parent.depth + 1
+        for b in loop.body:
+            innermost[b] = loop
+    return sorted(loops.values(), key=lambda l: pos[l.header])
+
+def loopDepths(g: ControlFlowGraph) -> dict[int, int]:
+    """
+    Returns, for every block, the number of loops containing it.
+    """
+    depths = {b: 0 for b in g.vertices}
+    for loop in naturalLoops(g):
+        for b in loop.body:
+            depths[b] += 1
+    return depths
+
+def _vars(instr: tac.instr) -> list[tac.ident]:
+    match instr:
+        case tac.Assign(x, e):
+            match e:
+                case tac.Prim(p): ps = [p]
+                case tac.BinOp(p1, _, p2): ps = [p1, p2]
+            return [x] + [p.var for p in ps if isinstance(p, tac.Name)]
+        case tac.Call(x, _, args):
+            return ([x] if x is not None else []) + [a.var for a in args if isinstance(a, tac.Name)]
+        case tac.GotoIf(tac.Name(x), _):
+            return [x]
+        case _:
+            return []
+
+def spillCosts(g: ControlFlowGraph) -> dict[tac.ident, float]:
+    """
+    Returns the spill cost of every variable: its definitions and uses, each weighted by
+    10^(loop depth).
+    """
+    depths = loopDepths(g)
+    costs: dict[tac.ident, float] = {}
+    for b in g.vertices:
+        w = 10.0 ** depths[b]
+        for instr in g.getData(b).instrs:
+            for x in _vars(instr):
+                costs[x] = costs.get(x, 0.0) + w
+    return costs
+
+def insertPreheader(g: ControlFlowGraph, loop: Loop, label: str,
+                    instrs: list[tac.instr]) -> Optional[list[tac.instr]]:
+    """
+    Returns the instructions of g with a new block right before the header of the loop.
+    The block has the given label and contains instrs. All edges entering the loop from
+    outside now go through the new block, the back edges still go to the header.
+    Returns None if the header has no label that jumps can be redirected to.
+    """
+    targets: dict[str, int] = {}
+    for b in sorted(g.vertices):
+        for l in g.getData(b).labels:
+            # As in the TAC interpreter, a jump goes to the first label with the given name
+            targets.setdefault(l, b)
+    h = loop.header
+    headerLabel = next((l for l in g.getData(h).labels if targets[l] == h), None)
+    if headerLabel is None:
+        return None
+    res: list[tac.instr] = []
+    for b in sorted(g.vertices):
+        bb = g.getData(b)
+        if b == h:
+            res.append(tac.Label(label))
+            res.extend(instrs)
+        res.extend(tac.Label(l) for l in bb.labels)
+        body = list(bb.instrs)
+        match bb.last:
+            case tac.Goto(l) if targets[l] == h and b not in loop.body:
+                body[-1] = tac.Goto(label)
+            case tac.GotoIf(p, l) if targets[l] == h and b not in loop.body:
+                body[-1] = tac.GotoIf(p, label)
+            case tac.Goto(_):
+                pass
+            case _:
+                if b + 1 == h and b in loop.body:
+                    # A back edge falling through to the header
+                    body.append(tac.Goto(headerLabel))
+        res.extend(body)
+    return res
@@ -18,7 +18,29 @@ class Regs:
 def reg(x: tacSpill.ident) -> mips.reg:
     return mips.Reg(x.name)
 
+def fitsImm(i: int) -> bool:
+    """
+    Immediate operands of MIPS instructions are signed 16 bit numbers.
+    """
+    return -2**15 <= i <= 2**15 - 1
+
 def imm(i: int) -> mips.imm:
-    if i < -2**15 or i > 2.**15 - 1:
+    if not fitsImm(i):
         raise ValueError(f'Constant too large: {i}')
     return mips.Imm(i)
+
+def loadConst(r: mips.reg, i: int) -> list[mips.instr]:
+    """
+    Loads a signed 32 bit constant into r: with li if it fits into 16 bit, otherwise
+    the upper half with lui and the lower half with ori.
+    """
+    if fitsImm(i):
+        return [mips.LoadI(r, mips.Imm(i))]
+    if i < -2**31 or i > 2**31 - 1:
+        raise ValueError(f'Constant too large: {i}')
+    hi = (i >> 16) & 0xffff
+    lo = i & 0xffff
+    res: list[mips.instr] = [mips.LoadUpper(r, mips.Imm(hi))]
+    if lo != 0:
+        res.append(mips.OpI(mips.OrI(), r, r, mips.Imm(lo)))
+    return res
@@ -0,0 +1,255 @@
+"""
+A peephole optimizer for the MIPS code generated by tacSpillToMips, enabled with -O1.
+
+The code is generated instruction by instruction, so it contains many redundant
+instructions. The passes below are repeated until nothing changes any more:
+
+- values: tracks, within straight-line code, registers holding known constants and
+  stack slots whose value is also in a register. A load of a constant already in
+  the register is removed, a load from a stack slot becomes a move (or is removed),
+  a store of the value already in the slot is removed, and a conditional branch on
+  a known constant becomes an unconditional branch or is removed.
+- jumps: a branch to a label followed by an unconditional branch goes directly to
+  the final target (jump threading).
+- unreachable: instructions after an unconditional branch up to the next label are
+  removed.
+- branchToNext: branches to an immediately following label are removed.
+- labels: labels no branch refers to are removed, so straight-line code gets longer.
+- deadCode: writes to dead scratch registers are removed, and a move from a scratch
+  register that is dead afterwards is merged into the instruction computing it.
+
+The generated code uses the scratch registers ($t0, $t1, $t2, $v0 and $a0) only
+within the code for one TACspill instruction. So they are dead at every label and
+branch, the peephole optimizer relies on this. All other registers are always
+considered live.
+"""
+from typing import *
+import assembly.mips_ast as mips
+import common.log as log
+
+SCRATCH_REGS = {'$t0', '$t1', '$t2', '$v0', '$a0'}
+
+_SP = '$sp'
+
+def defUses(i: mips.instr) -> tuple[Optional[str], list[str]]:
+    """
+    Returns the register written by the instruction and the registers read.
+    """
+    match i:
+        case mips.Op(_, t, l, r):
+            return (t.name, [l.name, r.name])
+        case mips.OpI(_, t, l, _):
+            return (t.name, [l.name])
+        case mips.LoadWord(t, _, src):
+            return (t.name, [src.name])
+        case mips.LoadI(t, _) | mips.LoadUpper(t, _) | mips.LoadA(t, _):
+            return (t.name, [])
+        case mips.StoreWord(src, _, base):
+            return (None, [src.name, base.name])
+        case mips.BranchNeqZero(r, _):
+            return (None, [r.name])
+        case mips.Move(t, s):
+            return (t.name, [s.name])
+        case mips.Syscall():
+            return ('$v0', ['$v0', '$a0'])
+        case mips.Branch(_) | mips.Label(_):
+            return (None, [])
+
+def _withTarget(i: mips.instr, t: mips.reg) -> Optional[mips.instr]:
+    """
+    Returns the instruction writing to t instead, if it has no other side effect.
+    """
+    match i:
+        case mips.Op(op, _, l, r):
+            return mips.Op(op, t, l, r)
+        case mips.OpI(op, _, l, imm):
+            return mips.OpI(op, t, l, imm)
+        case mips.LoadWord(_, off, src):
+            return mips.LoadWord(t, off, src)
+        case mips.LoadI(_, imm):
+            return mips.LoadI(t, imm)
+        case mips.LoadUpper(_, imm):
+            return mips.LoadUpper(t, imm)
+        case mips.LoadA(_, label):
+            return mips.LoadA(t, label)
+        case mips.Move(_, s):
+            return mips.Move(t, s)
+        case _:
+            return None
+
+def values(instrs: list[mips.instr]) -> list[mips.instr]:
+    consts: dict[str, int] = {}
+    # stack offset -> register with the same value
+    slots: dict[int, str] = {}
+    def invalidate(r: str):
+        consts.pop(r, None)
+        for off in [off for off, s in slots.items() if s == r]:
+            del slots[off]
+    res: list[mips.instr] = []
+    for i in instrs:
+        match i:
+            case mips.Label(_) | mips.Branch(_):
+                consts.clear()
+                slots.clear()
+            case mips.LoadI(t, imm):
+                if consts.get(t.name) == imm.value:
+                    continue
+                invalidate(t.name)
+                consts[t.name] = imm.value
+            case mips.LoadWord(t, off, mips.Reg(base)) if base == _SP:
+                s = slots.get(off.value)
+                if s == t.name:
+                    continue
+                invalidate(t.name)
+                if s is not None:
+                    i = mips.Move(t, mips.Reg(s))
+                    if s in consts:
+                        consts[t.name] = consts[s]
+                slots[off.value] = t.name
+            case mips.StoreWord(src, off, mips.Reg(base)) if base == _SP:
+                if slots.get(off.value) == src.name:
+                    continue
+                slots[off.value] = src.name
+            case mips.StoreWord(_, _, _):
+                slots.clear()
+            case mips.Move(t, s):
+                if t == s:
+                    continue
+                invalidate(t.name)
+                if s.name in consts:
+                    consts[t.name] = consts[s.name]
+            case mips.BranchNeqZero(r, label) if r.name in consts:
+                if consts[r.name] == 0:
+                    continue
+                i = mips.Branch(label)
+                consts.clear()
+                slots.clear()
+            case _:
+                (d, _) = defUses(i)
+                if d is not None:
+                    invalidate(d)
+        res.append(i)
+    return res
+
+def _labelPositions(instrs: list[mips.instr]) -> dict[str, int]:
+    pos: dict[str, int] = {}
+    for k, i in enumerate(instrs):
+        if isinstance(i, mips.Label):
+            pos.setdefault(i.label, k)
+    return pos
+
+def jumps(instrs: list[mips.instr]) -> list[mips.instr]:
+    pos = _labelPositions(instrs)
+    def final(label: str) -> str:
+        seen = {label}
+        while True:
+            k = pos.get(label)
+            if k is None:
+                return label
+            while k < len(instrs) and isinstance(instrs[k], mips.Label):
+                k += 1
+            match instrs[k] if k < len(instrs) else None:
+                case mips.Branch(l) if l not in seen:
+                    seen.add(l)
+                    label = l
+                case _:
+                    return label
+    res: list[mips.instr] = []
+    for i in instrs:
+        match i:
+            case mips.Branch(l):
+                i = mips.Branch(final(l))
+            case mips.BranchNeqZero(r, l):
+                i = mips.BranchNeqZero(r, final(l))
+            case _:
+                pass
+        res.append(i)
+    return res
+
+def unreachable(instrs: list[mips.instr]) -> list[mips.instr]:
+    res: list[mips.instr] = []
+    reachable = True
+    for i in instrs:
+        if isinstance(i, mips.Label):
+            reachable = True
+        if reachable:
+            res.append(i)
+        if isinstance(i, mips.Branch):
+            reachable = False
+    return res
+
+def branchToNext(instrs: list[mips.instr]) -> list[mips.instr]:
+    res: list[mips.instr] = []
+    for k, i in enumerate(instrs):
+        match i:
+            case mips.Branch(l) | mips.BranchNeqZero(_, l):
+                j = k + 1
+                nextLabels: set[str] = set()
+                while j < len(instrs) and isinstance(instrs[j], mips.Label):
+                    nextLabels.add(cast(mips.Label, instrs[j]).label)
+                    j += 1
+                if l in nextLabels:
+                    continue
+            case _:
+                pass
+        res.append(i)
+    return res
+
+def labels(instrs: list[mips.instr]) -> list[mips.instr]:
+    used: set[str] = set()
+    for i in instrs:
+        match i:
+            case mips.Branch(l) | mips.BranchNeqZero(_, l):
+                used.add(l)
+            case _:
+                pass
+    return [i for i in instrs if not (isinstance(i, mips.Label) and i.label not in used)]
+
+def deadCode(instrs: list[mips.instr]) -> list[mips.instr]:
+    # The scratch registers live after each instruction
+    liveAfter: list[set[str]] = [set() for _ in instrs]
+    live: set[str] = set()
+    for k in range(len(instrs) - 1, -1, -1):
+        i = instrs[k]
+        if isinstance(i, mips.Label | mips.Branch):
+            live = set()
+        liveAfter[k] = set(live)
+        (d, uses) = defUses(i)
+        if d is not None:
+            live.discard(d)
+        live.update(u for u in uses if u in SCRATCH_REGS)
+    res: list[mips.instr] = []
+    for k, i in enumerate(instrs):
+        (d, _) = defUses(i)
+        if d in SCRATCH_REGS and d not in liveAfter[k] and _withTarget(i, mips.Reg(d)) is not None:
+            continue
+        match i:
+            case mips.Move(t, s) if s.name in SCRATCH_REGS and s.name not in liveAfter[k] and res:
+                prev = res[-1]
+                if defUses(prev)[0] == s.name:
+                    newPrev = _withTarget(prev, t)
+                    if newPrev is not None:
+                        res[-1] = newPrev
+                        continue
+            case _:
+                pass
+        res.append(i)
+    return res
+
+PASSES: list[Callable[[list[mips.instr]], list[mips.instr]]] = [
+    values, jumps, unreachable, branchToNext, labels, deadCode
+]
+
+def peephole(instrs: list[mips.instr], maxRounds: int = 10) -> list[mips.instr]:
+    """
+    Runs the passes in order, repeatedly, until none of them changes the code.
+    """
+    res = instrs
+    for _ in range(maxRounds):
+        old = res
+        for p in PASSES:
+            res = p(res)
+        if res == old:
+            break
+    log.info(f'MIPS peephole optimization: {len(instrs)} -> {len(res)} instructions')
+    return res
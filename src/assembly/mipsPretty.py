@@ -19,6 +19,7 @@ def prettyOpI(o: opI) -> str:
     match o:
         case AddI(): return 'addi'
         case LessI(): return 'slti'
+        case OrI(): return 'ori'
 
 def pr(r: reg) -> str:
     return r.name
@@ -37,6 +38,8 @@ def mipsPrettyInstr(i: instr) -> str:
             return f'  lw {pr(r1)} {pi(off)}({pr(r2)})'
         case LoadI(r, j):
             return f'  li {pr(r)}, {pi(j)}'
+        case LoadUpper(r, j):
+            return f'  lui {pr(r)}, {pi(j)}'
         case LoadA(r, l):
             return f'  la {pr(r)}, {l}'
         case StoreWord(r1, off, r2):
@@ -1,4 +1,4 @@
-# AUTOMATICALLY GENERATED (2024-04-03 17:32:36)
+# AUTOMATICALLY GENERATED (2026-10-18 16:04:34)
 from __future__ import annotations
 from dataclasses import dataclass
 
@@ -57,7 +57,11 @@ class AddI:
 class LessI:
     pass
 
-type opI = AddI | LessI
+@dataclass
+class OrI:
+    pass
+
+type opI = AddI | LessI | OrI
 
 @dataclass
 class Imm:
@@ -96,6 +100,11 @@ class LoadI:
     target: reg
     value: imm
 
+@dataclass
+class LoadUpper:
+    target: reg
+    value: imm
+
 @dataclass
 class LoadA:
     target: reg
@@ -129,4 +138,4 @@ class Syscall:
 class Label:
     label: string
 
-type instr = Op | OpI | LoadWord | LoadI | LoadA | StoreWord | BranchNeqZero | Branch | Move | Syscall | Label
\ No newline at end of file
+type instr = Op | OpI | LoadWord | LoadI | LoadUpper | LoadA | StoreWord | BranchNeqZero | Branch | Move | Syscall | Label
\ No newline at end of file
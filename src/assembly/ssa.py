@@ -0,0 +1,449 @@
+"""
+Static single assignment form for TAC.
+
+Construction (Cytron et al.) works on the control flow graph from
+assembly.controlFlow:
+
+- Dominators are computed with the iterative algorithm of Cooper, Harvey and Kennedy
+  ("A Simple, Fast Dominance Algorithm") over the blocks in reverse postorder.
+- Phi functions are placed at the iterated dominance frontiers of the definitions,
+  only for variables used in some block before being defined there (semi-pruned SSA).
+- Variables are renamed in a walk over the dominator tree. Version k of variable x is
+  called x.k. A use without a reaching definition keeps the original name, which is
+  never defined and thus stays undefined, as in the original program.
+
+Blocks not reachable from the entry are dropped. If the entry block has predecessors,
+a jump to it is put in front, so the entry block of the SSA form has no predecessors.
+
+Destruction first coalesces the variables of a phi function with its arguments where
+their live ranges do not interfere, so that they get the same name and need no copy.
+Then it replaces every phi function by copies at the end of the predecessors.
+Critical edges (from a block with several successors to a block with several
+predecessors) are split first. The copies of one edge are executed in parallel, they
+are sequentialized with a temporary if they form a cycle.
+"""
+from dataclasses import dataclass
+from assembly.common import *
+import assembly.tac_ast as tac
+import assembly.controlFlow as controlFlow
+
+@dataclass
+class Phi:
+    var: tac.ident
+    # The variable of the original program
+    origin: tac.ident
+    # predecessor block -> value flowing in from that block
+    args: dict[int, tac.prim]
+
+@dataclass
+class SSAForm:
+    g: ControlFlowGraph
+    phis: dict[int, list[Phi]]
+    idom: dict[int, int]
+    # The reachable blocks in reverse postorder
+    blocks: list[int]
+
+def dominators(g: ControlFlowGraph) -> dict[int, int]:
+    """
+    Returns the immediate dominator of every block reachable from the entry. The entry
+    block is its own immediate dominator.
+    """
+    order = g.reversePostorder
+    if not order:
+        return {}
+    pos = {b: i for i, b in enumerate(order)}
+    entry = order[0]
+    idom: dict[int, int] = {entry: entry}
+    def intersect(b1: int, b2: int) -> int:
+        while b1 != b2:
+            while pos[b1] > pos[b2]:
+                b1 = idom[b1]
+            while pos[b2] > pos[b1]:
+                b2 = idom[b2]
+        return b1
+    changed = True
+    while changed:
+        changed = False
+        for b in order[1:]:
+            newIdom: Optional[int] = None
+            for p in g.preds(b):
+                if p in idom:
+                    newIdom = p if newIdom is None else intersect(p, newIdom)
+            if newIdom is not None and idom.get(b) != newIdom:
+                idom[b] = newIdom
+                changed = True
+    return idom
+
+def dominates(idom: dict[int, int], a: int, b: int) -> bool:
+    """
+    Returns True if block a dominates block b.
+    """
+    while True:
+        if a == b:
+            return True
+        p = idom[b]
+        if p == b:
+            return False
+        b = p
+
+def dominatorTree(idom: dict[int, int]) -> dict[int, list[int]]:
+    children: dict[int, list[int]] = {b: [] for b in idom}
+    for b, d in idom.items():
+        if b != d:
+            children[d].append(b)
+    for c in children.values():
+        c.sort()
+    return children
+
+def dominanceFrontiers(g: ControlFlowGraph, idom: dict[int, int]) -> dict[int, set[int]]:
+    """
+    Returns the dominance frontier of every reachable block.
+    """
+    df: dict[int, set[int]] = {b: set() for b in idom}
+    for b in idom:
+        preds = [p for p in g.preds(b) if p in idom]
+        if len(preds) >= 2:
+            for p in preds:
+                runner = p
+                while runner != idom[b]:
+                    df[runner].add(b)
+                    runner = idom[runner]
+    return df
+
+def _defUses(instr: tac.instr) -> tuple[Optional[tac.ident], list[tac.ident]]:
+    match instr:
+        case tac.Assign(x, tac.Prim(p)):
+            ps = [p]
+        case tac.Assign(x, tac.BinOp(p1, _, p2)):
+            ps = [p1, p2]
+        case tac.Call(x, _, args):
+            ps = args
+        case tac.GotoIf(p, _):
+            x = None
+            ps = [p]
+        case _:
+            x = None
+            ps = []
+    return (x, [p.var for p in ps if isinstance(p, tac.Name)])
+
+def _renameInstr(instr: tac.instr, use: Callable[[tac.ident], tac.ident],
+                 define: Callable[[tac.ident], tac.ident]) -> tac.instr:
+    def prim(p: tac.prim) -> tac.prim:
+        match p:
+            case tac.Name(x): return tac.Name(use(x))
+            case tac.Const(_): return p
+    match instr:
+        case tac.Assign(x, tac.Prim(p)):
+            e = tac.Prim(prim(p))
+            return tac.Assign(define(x), e)
+        case tac.Assign(x, tac.BinOp(p1, op, p2)):
+            e = tac.BinOp(prim(p1), op, prim(p2))
+            return tac.Assign(define(x), e)
+        case tac.Call(x, name, args):
+            newArgs = [prim(a) for a in args]
+            return tac.Call(define(x) if x is not None else None, name, newArgs)
+        case tac.GotoIf(p, label):
+            return tac.GotoIf(prim(p), label)
+        case _:
+            return instr
+
+def toSSA(instrs: list[tac.instr]) -> SSAForm:
+    """
+    Converts the instructions into SSA form.
+    """
+    g = controlFlow.buildControlFlowGraph(instrs)
+    if g.reversePostorder and g.preds(0):
+        # The entry must not be a jump target. It has a label because it is.
+        g = controlFlow.buildControlFlowGraph([tac.Goto(g.getData(0).labels[0])] + instrs)
+    idom = dominators(g)
+    blocks = list(g.reversePostorder)
+    # Definitions and upward exposed uses
+    defSites: dict[tac.ident, set[int]] = {}
+    globalVars: set[tac.ident] = set()
+    for b in blocks:
+        defined: set[tac.ident] = set()
+        for instr in g.getData(b).instrs:
+            (x, uses) = _defUses(instr)
+            for y in uses:
+                if y not in defined:
+                    globalVars.add(y)
+            if x is not None:
+                defined.add(x)
+                defSites.setdefault(x, set()).add(b)
+    # Phi placement at the iterated dominance frontiers
+    df = dominanceFrontiers(g, idom)
+    phis: dict[int, list[Phi]] = {b: [] for b in blocks}
+    for x in sorted(globalVars, key=lambda x: x.name):
+        hasPhi: set[int] = set()
+        work = sorted(defSites.get(x, set()))
+        inWork = set(work)
+        while work:
+            b = work.pop()
+            for d in sorted(df[b]):
+                if d not in hasPhi:
+                    hasPhi.add(d)
+                    phis[d].append(Phi(x, x, {}))
+                    if d not in inWork:
+                        inWork.add(d)
+                        work.append(d)
+    # Renaming, iteratively over the dominator tree
+    children = dominatorTree(idom)
+    counters: dict[tac.ident, int] = {}
+    stacks: dict[tac.ident, list[tac.ident]] = {}
+    def current(x: tac.ident) -> tac.ident:
+        s = stacks.get(x)
+        return s[-1] if s else x
+    def newVersion(x: tac.ident, pushed: list[tac.ident]) -> tac.ident:
+        k = counters.get(x, 0)
+        counters[x] = k + 1
+        v = tac.Ident(f'{x.name}.{k}')
+        stacks.setdefault(x, []).append(v)
+        pushed.append(x)
+        return v
+    newInstrs: dict[int, list[tac.instr]] = {}
+    pushedIn: dict[int, list[tac.ident]] = {}
+    work2: list[tuple[int, bool]] = [(blocks[0], False)] if blocks else []
+    while work2:
+        (b, done) = work2.pop()
+        if done:
+            for x in pushedIn.pop(b):
+                stacks[x].pop()
+            continue
+        pushed: list[tac.ident] = []
+        for phi in phis[b]:
+            phi.var = newVersion(phi.origin, pushed)
+        newInstrs[b] = [_renameInstr(i, current, lambda x: newVersion(x, pushed))
+                        for i in g.getData(b).instrs]
+        for s in g.succs(b):
+            for phi in phis[s]:
+                phi.args[b] = tac.Name(current(phi.origin))
+        pushedIn[b] = pushed
+        work2.append((b, True))
+        for c in reversed(children[b]):
+            work2.append((c, False))
+    # Build the SSA graph with the reachable blocks only
+    ssaG = ControlFlowGraph()
+    for b in blocks:
+        bb = g.getData(b)
+        ssaG.addVertex(b, BasicBlock(newInstrs[b], b, bb.labels))
+        ssaG.predecessors[b] = [p for p in g.preds(b) if p in idom]
+    for b in blocks:
+        for s in g.succs(b):
+            ssaG.addEdge(b, s)
+    ssaG.reversePostorder = blocks
+    return SSAForm(ssaG, phis, idom, blocks)
+
+def sequentialize(copies: list[tuple[tac.ident, tac.prim]],
+                  fresh: Callable[[], tac.ident]) -> list[tac.instr]:
+    """
+    Returns assignments that have the same effect as executing the copies (target,
+    source) in parallel. The targets must be distinct.
+    """
+    pending: dict[tac.ident, tac.prim] = {}
+    for (x, p) in copies:
+        if p != tac.Name(x):
+            pending[x] = p
+    res: list[tac.instr] = []
+    while pending:
+        read = {p.var for p in pending.values() if isinstance(p, tac.Name)}
+        ready = [x for x in pending if x not in read]
+        if ready:
+            for x in ready:
+                res.append(tac.Assign(x, tac.Prim(pending.pop(x))))
+        else:
+            # All targets are still read: a cycle. Save one target in a temporary.
+            x = next(iter(pending))
+            t = fresh()
+            res.append(tac.Assign(t, tac.Prim(tac.Name(x))))
+            for y, p in pending.items():
+                if p == tac.Name(x):
+                    pending[y] = tac.Name(t)
+    return res
+
+def _liveOut(ssa: SSAForm) -> dict[int, set[tac.ident]]:
+    """
+    Liveness on SSA form: the arguments of a phi function are live at the end of the
+    corresponding predecessor, the variable of a phi function is defined at the start
+    of its block.
+    """
+    g = ssa.g
+    uses: dict[int, set[tac.ident]] = {}
+    defs: dict[int, set[tac.ident]] = {}
+    for b in ssa.blocks:
+        u: set[tac.ident] = set()
+        d: set[tac.ident] = {phi.var for phi in ssa.phis[b]}
+        for instr in g.getData(b).instrs:
+            (x, ys) = _defUses(instr)
+            u.update(y for y in ys if y not in d)
+            if x is not None:
+                d.add(x)
+        uses[b] = u
+        defs[b] = d
+    phiUses: dict[int, set[tac.ident]] = {b: set() for b in ssa.blocks}
+    for b in ssa.blocks:
+        for phi in ssa.phis[b]:
+            for p, a in phi.args.items():
+                if isinstance(a, tac.Name):
+                    phiUses[p].add(a.var)
+    liveIn: dict[int, set[tac.ident]] = {b: set() for b in ssa.blocks}
+    liveOut: dict[int, set[tac.ident]] = {b: set(phiUses[b]) for b in ssa.blocks}
+    changed = True
+    while changed:
+        changed = False
+        for b in reversed(ssa.blocks):
+            out = set(phiUses[b])
+            for s in g.succs(b):
+                out |= liveIn[s]
+            liveOut[b] = out
+            new = uses[b] | (out - defs[b])
+            if new != liveIn[b]:
+                liveIn[b] = new
+                changed = True
+    return liveOut
+
+def _coalescePhis(ssa: SSAForm) -> dict[tac.ident, tac.ident]:
+    """
+    Returns a renaming that gives the variable of a phi function and its arguments the
+    same name wherever their live ranges do not interfere.
+    """
+    g = ssa.g
+    candidates: set[tac.ident] = set()
+    for b in ssa.blocks:
+        for phi in ssa.phis[b]:
+            candidates.add(phi.var)
+            candidates.update(a.var for a in phi.args.values() if isinstance(a, tac.Name))
+    if not candidates:
+        return {}
+    # The variables live at the definition of a candidate. Two variables interfere if
+    # one is live at the definition of the other. The source of a copy does not
+    # interfere with its target, both have the same value.
+    liveAtDef: dict[tac.ident, set[tac.ident]] = {}
+    liveOut = _liveOut(ssa)
+    for b in ssa.blocks:
+        live = set(liveOut[b])
+        for instr in reversed(list(g.getData(b).instrs)):
+            (x, ys) = _defUses(instr)
+            if x is not None:
+                live.discard(x)
+                if x in candidates:
+                    match instr:
+                        case tac.Assign(_, tac.Prim(tac.Name(y))):
+                            liveAtDef[x] = live - {y}
+                        case _:
+                            liveAtDef[x] = set(live)
+            live.update(ys)
+        phiVars = {phi.var for phi in ssa.phis[b]}
+        for phi in ssa.phis[b]:
+            liveAtDef[phi.var] = (live | phiVars) - {phi.var}
+    parent: dict[tac.ident, tac.ident] = {}
+    members: dict[tac.ident, list[tac.ident]] = {}
+    def find(x: tac.ident) -> tac.ident:
+        while parent.get(x, x) != x:
+            x = parent[x]
+        return x
+    def interfere(c1: tac.ident, c2: tac.ident) -> bool:
+        for x in members.get(c1, [c1]):
+            for y in members.get(c2, [c2]):
+                if y in liveAtDef.get(x, ()) or x in liveAtDef.get(y, ()):
+                    return True
+        return False
+    for b in ssa.blocks:
+        for phi in ssa.phis[b]:
+            for a in phi.args.values():
+                if not isinstance(a, tac.Name):
+                    continue
+                c1 = find(phi.var)
+                c2 = find(a.var)
+                if c1 != c2 and not interfere(c1, c2):
+                    parent[c2] = c1
+                    members[c1] = members.get(c1, [c1]) + members.pop(c2, [c2])
+    return {x: find(x) for x in candidates if find(x) != x}
+
+def _renamePrim(p: tac.prim, names: dict[tac.ident, tac.ident]) -> tac.prim:
+    match p:
+        case tac.Name(x) if x in names:
+            return tac.Name(names[x])
+        case _:
+            return p
+
+def fromSSA(ssa: SSAForm) -> list[tac.instr]:
+    """
+    Translates the SSA form back to TAC without phi functions.
+    """
+    g = ssa.g
+    names = _coalescePhis(ssa)
+    if names:
+        rename: Callable[[tac.ident], tac.ident] = lambda x: names.get(x, x)
+        newG = ControlFlowGraph()
+        for b in ssa.blocks:
+            bb = g.getData(b)
+            newInstrs = [_renameInstr(i, rename, rename) for i in bb.instrs]
+            newG.addVertex(b, BasicBlock(newInstrs, b, bb.labels))
+            newG.predecessors[b] = g.preds(b)
+        for b in ssa.blocks:
+            for s in g.succs(b):
+                newG.addEdge(b, s)
+        newG.reversePostorder = ssa.blocks
+        phis = {b: [Phi(rename(phi.var), phi.origin,
+                        {p: _renamePrim(a, names) for p, a in phi.args.items()})
+                    for phi in ps]
+                for b, ps in ssa.phis.items()}
+        ssa = SSAForm(newG, phis, ssa.idom, ssa.blocks)
+        g = newG
+    blocks = sorted(ssa.blocks)
+    counter = 0
+    def freshLabel() -> str:
+        nonlocal counter
+        counter += 1
+        return f'L_ssa_{counter - 1}'
+    tmpCounter = 0
+    def freshTmp() -> tac.ident:
+        nonlocal tmpCounter
+        tmpCounter += 1
+        return tac.Ident(f'%ssa{tmpCounter - 1}')
+    def edgeCopies(p: int, b: int) -> list[tac.instr]:
+        copies = [(phi.var, phi.args[p]) for phi in ssa.phis.get(b, [])]
+        return sequentialize(copies, freshTmp)
+    res: list[tac.instr] = []
+    # Blocks on split edges that are jump targets, placed after the program
+    splitBlocks: list[tac.instr] = []
+    for b in blocks:
+        bb = g.getData(b)
+        res.extend(tac.Label(l) for l in bb.labels)
+        instrs = list(bb.instrs)
+        succs = list(g.succs(b))
+        last = instrs[-1] if instrs else None
+        jump = last if isinstance(last, tac.Goto | tac.GotoIf) else None
+        body = instrs[:-1] if jump else instrs
+        res.extend(body)
+        # A fall through edge always leads to the next block, it is reachable.
+        match jump:
+            case tac.GotoIf(test, label) if len(succs) == 2:
+                target = next(s for s in succs if label in g.getData(s).labels)
+                fallThrough = next(s for s in succs if s != target)
+                targetCopies = edgeCopies(b, target)
+                if targetCopies:
+                    l = freshLabel()
+                    splitBlocks.extend([tac.Label(l)] + targetCopies + [tac.Goto(label)])
+                    res.append(tac.GotoIf(test, l))
+                else:
+                    res.append(jump)
+                res.extend(edgeCopies(b, fallThrough))
+            case tac.GotoIf(tac.Name(t), label) if succs and edgeCopies(b, succs[0]):
+                # Both edges lead to the same block. The copies must not change the
+                # tested variable.
+                tmp = freshTmp()
+                res.append(tac.Assign(tmp, tac.Prim(tac.Name(t))))
+                res.extend(edgeCopies(b, succs[0]))
+                res.append(tac.GotoIf(tac.Name(tmp), label))
+            case _:
+                if succs:
+                    res.extend(edgeCopies(b, succs[0]))
+                if jump:
+                    res.append(jump)
+    if splitBlocks:
+        end = freshLabel()
+        res.append(tac.Goto(end))
+        res.extend(splitBlocks)
+        res.append(tac.Label(end))
+    return res
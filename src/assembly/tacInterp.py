@@ -1,10 +1,12 @@
 """
-An interpreter for TAC.
+An interpreter for TAC. interpInstrs is the reference implementation, the tacInterp command
+runs the faster virtual machine from assembly.tacVM.
 """
 from assembly.tac_ast import *
 import common.utils as utils
 import common.genericCompiler as genCompiler
 import assembly.tacPretty as tacPretty
+import assembly.tacVM as tacVM
 from assembly.loopToTac import loopToTac
 
 type Vars = dict[ident, int]
@@ -82,4 +84,4 @@ def interpFile(args: genCompiler.Args, printTac: bool):
         print(delim)
         print(tacPretty.prettyInstrs(tacInstrs))
         print(delim)
-    interpInstrs(tacInstrs)
+    tacVM.runInstrs(tacInstrs)
@@ -0,0 +1,625 @@
+"""
+Optimizations on TAC, enabled with -O1 and -O2.
+
+The optimizer is a small pass manager: every pass rewrites the instructions of the
+basic blocks of a control flow graph in place and reports whether it changed anything.
+After each changing pass, the program is linearized and the control flow graph is
+rebuilt. The passes are repeated until nothing changes any more.
+
+Passes for -O1:
+
+- constProp: conditional constant propagation. Only blocks reachable through
+  executable edges are analyzed; a conditional jump on a known constant makes only
+  one of its edges executable. Uses of constant variables are replaced by the
+  constant, operations on constants are folded, branches on constants are resolved
+  and blocks that are never executed are removed.
+- copyProp: propagation of the copies x = y available on all paths.
+- deadCode: removal of assignments to variables that are not live afterwards (calls
+  are kept because of their side effects).
+- jumps: removal of jumps to the next block.
+
+-O2 additionally translates the result of -O1 into SSA form (assembly.ssa), runs
+valueNumbering on it, translates it back and runs the passes of -O1 again. The round
+trip through SSA form splits variables that are assigned unrelated values into separate
+variables with shorter live ranges.
+
+- licm: loop-invariant code motion (after the translation back from SSA form). An
+  assignment whose operands are not changed in the loop, and whose target is assigned
+  only there and not live at the loop header, is moved to a new preheader block
+  before the loop. Loops are processed from the innermost, so an assignment can move
+  out of several loops. The moved assignment is also executed if the loop is not,
+  which is harmless, except for ADD, SUB and MUL: they trap on overflow in MIPS (add,
+  sub and mulo). They are only moved from blocks executed in every iteration and
+  before leaving the loop.
+
+- valueNumbering: dominator-based value numbering (Briggs, Cooper and Simpson). An
+  operation computed before in a dominating block, or a phi function with the same
+  arguments as another one, is replaced by the earlier value. Copies and constants
+  are propagated and phi functions with only one distinct argument are removed.
+
+Constants are only folded if the operands and the result fit into 32 bits, so the
+folded program computes the same values on MIPS (32 bit registers) as the original one.
+"""
+from dataclasses import dataclass
+from assembly.common import *
+import assembly.tac_ast as tac
+import assembly.controlFlow as controlFlow
+import assembly.ssa as ssa
+import assembly.loops as loops
+import common.log as log
+from common.genericCompiler import OptLevel
+
+# A pass rewrites the blocks of the graph and returns True if something changed.
+type Pass = Callable[[ControlFlowGraph], bool]
+
+@dataclass
+class OptPass:
+    name: str
+    run: Pass
+
+_INT32_MIN = -2**31
+_INT32_MAX = 2**31 - 1
+
+_FOLD: dict[str, Callable[[int, int], int]] = {
+    'ADD': lambda a, b: a + b,
+    'SUB': lambda a, b: a - b,
+    'MUL': lambda a, b: a * b,
+    'EQ': lambda a, b: 1 if a == b else 0,
+    'NE': lambda a, b: 1 if a != b else 0,
+    'LT_S': lambda a, b: 1 if a < b else 0,
+    'GT_S': lambda a, b: 1 if a > b else 0,
+    'LE_S': lambda a, b: 1 if a <= b else 0,
+    'GE_S': lambda a, b: 1 if a >= b else 0,
+}
+
+def _fits(v: int) -> bool:
+    return _INT32_MIN <= v <= _INT32_MAX
+
+def foldBinOp(v1: int, op: str, v2: int) -> Optional[int]:
+    """
+    Returns the value of v1 op v2, or None if the operation cannot be folded.
+    """
+    f = _FOLD.get(op)
+    if f is None or not _fits(v1) or not _fits(v2):
+        return None
+    v = f(v1, v2)
+    return v if _fits(v) else None
+
+def instrDef(instr: tac.instr) -> Optional[tac.ident]:
+    match instr:
+        case tac.Assign(x, _):
+            return x
+        case tac.Call(x, _, _):
+            return x
+        case _:
+            return None
+
+def instrUses(instr: tac.instr) -> list[tac.ident]:
+    match instr:
+        case tac.Assign(_, tac.Prim(p)):
+            ps = [p]
+        case tac.Assign(_, tac.BinOp(p1, _, p2)):
+            ps = [p1, p2]
+        case tac.Call(_, _, args):
+            ps = args
+        case tac.GotoIf(p, _):
+            ps = [p]
+        case _:
+            ps = []
+    return [p.var for p in ps if isinstance(p, tac.Name)]
+
+def mapPrims(instr: tac.instr, f: Callable[[tac.prim], tac.prim]) -> tac.instr:
+    """
+    Applies f to all primitives used by the instruction.
+    """
+    match instr:
+        case tac.Assign(x, tac.Prim(p)):
+            return tac.Assign(x, tac.Prim(f(p)))
+        case tac.Assign(x, tac.BinOp(p1, op, p2)):
+            return tac.Assign(x, tac.BinOp(f(p1), op, f(p2)))
+        case tac.Call(x, name, args):
+            return tac.Call(x, name, [f(a) for a in args])
+        case tac.GotoIf(p, label):
+            return tac.GotoIf(f(p), label)
+        case _:
+            return instr
+
+def _labelTargets(g: ControlFlowGraph) -> dict[str, int]:
+    targets: dict[str, int] = {}
+    for b in sorted(g.vertices):
+        for l in g.getData(b).labels:
+            # As in the TAC interpreter, a jump goes to the first label with the given name
+            targets.setdefault(l, b)
+    return targets
+
+def _meet[K, V](maps: list[dict[K, V]]) -> dict[K, V]:
+    """
+    Returns the entries present with the same value in all maps.
+    """
+    if not maps:
+        return {}
+    res = dict(maps[0])
+    for m in maps[1:]:
+        for k in [k for k, v in res.items() if m.get(k) != v]:
+            del res[k]
+    return res
+
+type ConstEnv = dict[tac.ident, int]
+
+def _constPrim(p: tac.prim, env: ConstEnv) -> Optional[int]:
+    match p:
+        case tac.Const(v): return v
+        case tac.Name(x): return env.get(x)
+
+def _constExp(e: tac.exp, env: ConstEnv) -> Optional[int]:
+    match e:
+        case tac.Prim(p):
+            return _constPrim(p, env)
+        case tac.BinOp(p1, op, p2):
+            v1 = _constPrim(p1, env)
+            v2 = _constPrim(p2, env)
+            if v1 is None or v2 is None:
+                return None
+            return foldBinOp(v1, op.name, v2)
+
+def _constTransfer(instr: tac.instr, env: ConstEnv):
+    match instr:
+        case tac.Assign(x, e):
+            v = _constExp(e, env)
+            if v is None:
+                env.pop(x, None)
+            else:
+                env[x] = v
+        case tac.Call(x, _, _) if x is not None:
+            env.pop(x, None)
+        case _:
+            pass
+
+def constProp(g: ControlFlowGraph) -> bool:
+    """
+    Conditional constant propagation, see the module documentation.
+    """
+    targets = _labelTargets(g)
+    n = len(list(g.vertices))
+    def execSuccs(b: int, env: ConstEnv) -> list[int]:
+        fallThrough = [b + 1] if b + 1 < n else []
+        match g.getData(b).last:
+            case tac.Goto(label):
+                return [targets[label]]
+            case tac.GotoIf(p, label):
+                v = _constPrim(p, env)
+                if v is None:
+                    return [targets[label]] + fallThrough
+                return [targets[label]] if v != 0 else fallThrough
+            case _:
+                return fallThrough
+    # Variables are unknown at the entry; a block is analyzed once one of its
+    # incoming edges is executable.
+    outEnv: dict[int, ConstEnv] = {}
+    execEdges: set[tuple[int, int]] = set()
+    def inEnv(b: int) -> ConstEnv:
+        if b == 0:
+            return {}
+        return _meet([outEnv[p] for p in g.preds(b) if (p, b) in execEdges])
+    worklist = [0] if n > 0 else []
+    while worklist:
+        b = worklist.pop()
+        env = inEnv(b)
+        for instr in g.getData(b).instrs:
+            _constTransfer(instr, env)
+        succs = execSuccs(b, env)
+        if outEnv.get(b) != env or any((b, s) not in execEdges for s in succs):
+            outEnv[b] = env
+            for s in succs:
+                execEdges.add((b, s))
+                worklist.append(s)
+    changed = False
+    for b in g.vertices:
+        bb = g.getData(b)
+        if b not in outEnv:
+            # Never executed: no executable jump refers to its labels
+            if bb.instrs or bb.labels:
+                bb.instrs = []
+                bb.labels = []
+                changed = True
+            continue
+        env = inEnv(b)
+        def subst(p: tac.prim) -> tac.prim:
+            match p:
+                case tac.Name(x) if x in env:
+                    return tac.Const(env[x])
+                case _:
+                    return p
+        newInstrs: list[tac.instr] = []
+        for instr in bb.instrs:
+            match mapPrims(instr, subst):
+                case tac.Assign(x, tac.BinOp(tac.Const(v1), op, tac.Const(v2))) as new:
+                    v = foldBinOp(v1, op.name, v2)
+                    if v is not None:
+                        new = tac.Assign(x, tac.Prim(tac.Const(v)))
+                    newInstrs.append(new)
+                case tac.GotoIf(tac.Const(v), label):
+                    if v != 0:
+                        newInstrs.append(tac.Goto(label))
+                case new:
+                    newInstrs.append(new)
+            _constTransfer(instr, env)
+        if newInstrs != list(bb.instrs):
+            bb.instrs = newInstrs
+            changed = True
+    return changed
+
+type CopyEnv = dict[tac.ident, tac.ident]
+
+def _copyTransfer(instr: tac.instr, copies: CopyEnv):
+    x = instrDef(instr)
+    if x is None:
+        return
+    src: Optional[tac.ident] = None
+    match instr:
+        case tac.Assign(_, tac.Prim(tac.Name(y))):
+            src = copies.get(y, y)
+        case _:
+            pass
+    copies.pop(x, None)
+    for k in [k for k, v in copies.items() if v == x]:
+        del copies[k]
+    if src is not None and src != x:
+        copies[x] = src
+
+def copyProp(g: ControlFlowGraph) -> bool:
+    """
+    Replaces uses of x by y if the copy x = y is available on all paths, i.e. neither x
+    nor y has been assigned since. Copies that are already available are removed.
+    """
+    order = g.reversePostorder
+    outCopies: dict[int, CopyEnv] = {}
+    def inCopies(b: int) -> CopyEnv:
+        if b == 0:
+            return {}
+        # Predecessors not analyzed yet do not restrict the copies (optimistic start)
+        return _meet([outCopies[p] for p in g.preds(b) if p in outCopies])
+    changedFlow = True
+    while changedFlow:
+        changedFlow = False
+        for b in order:
+            copies = inCopies(b)
+            for instr in g.getData(b).instrs:
+                _copyTransfer(instr, copies)
+            if outCopies.get(b) != copies:
+                outCopies[b] = copies
+                changedFlow = True
+    changed = False
+    for b in order:
+        bb = g.getData(b)
+        copies = inCopies(b)
+        def subst(p: tac.prim) -> tac.prim:
+            match p:
+                case tac.Name(x) if x in copies:
+                    return tac.Name(copies[x])
+                case _:
+                    return p
+        newInstrs: list[tac.instr] = []
+        for instr in bb.instrs:
+            new = mapPrims(instr, subst)
+            match new:
+                case tac.Assign(x, tac.Prim(tac.Name(y))) if x == y or copies.get(x) == y:
+                    # x already holds the value of y
+                    pass
+                case _:
+                    newInstrs.append(new)
+            _copyTransfer(instr, copies)
+        if newInstrs != list(bb.instrs):
+            bb.instrs = newInstrs
+            changed = True
+    return changed
+
+def liveIn(g: ControlFlowGraph) -> dict[int, set[tac.ident]]:
+    """
+    Returns the variables live at the start of every block.
+    """
+    blocks = sorted(g.vertices)
+    gen: dict[int, set[tac.ident]] = {}
+    kill: dict[int, set[tac.ident]] = {}
+    for b in blocks:
+        genB: set[tac.ident] = set()
+        killB: set[tac.ident] = set()
+        for instr in reversed(g.getData(b).instrs):
+            x = instrDef(instr)
+            if x is not None:
+                genB.discard(x)
+                killB.add(x)
+            genB.update(instrUses(instr))
+        gen[b] = genB
+        kill[b] = killB
+    res: dict[int, set[tac.ident]] = {b: set() for b in blocks}
+    worklist = list(blocks)
+    inWorklist = set(blocks)
+    while worklist:
+        b = worklist.pop()
+        inWorklist.discard(b)
+        out: set[tac.ident] = set()
+        for s in g.succs(b):
+            out |= res[s]
+        newIn = gen[b] | (out - kill[b])
+        if newIn != res[b]:
+            res[b] = newIn
+            for p in g.preds(b):
+                if p not in inWorklist:
+                    inWorklist.add(p)
+                    worklist.append(p)
+    return res
+
+def deadCode(g: ControlFlowGraph) -> bool:
+    """
+    Removes assignments whose target is not live afterwards.
+    """
+    blocks = sorted(g.vertices)
+    liveIns = liveIn(g)
+    changed = False
+    for b in blocks:
+        bb = g.getData(b)
+        live: set[tac.ident] = set()
+        for s in g.succs(b):
+            live |= liveIns[s]
+        newInstrs: list[tac.instr] = []
+        for instr in reversed(bb.instrs):
+            match instr:
+                case tac.Assign(x, _) if x not in live:
+                    continue
+                case _:
+                    pass
+            x = instrDef(instr)
+            if x is not None:
+                live.discard(x)
+            live.update(instrUses(instr))
+            newInstrs.append(instr)
+        if len(newInstrs) != len(bb.instrs):
+            newInstrs.reverse()
+            bb.instrs = newInstrs
+            changed = True
+    return changed
+
+def jumps(g: ControlFlowGraph) -> bool:
+    """
+    Removes jumps to the block that directly follows.
+    """
+    targets = _labelTargets(g)
+    changed = False
+    for b in g.vertices:
+        bb = g.getData(b)
+        match bb.last:
+            case tac.Goto(label) | tac.GotoIf(_, label) if targets[label] == b + 1:
+                bb.instrs = list(bb.instrs)[:-1]
+                changed = True
+            case _:
+                pass
+    return changed
+
+O1_PASSES: list[OptPass] = [
+    OptPass('constProp', constProp),
+    OptPass('copyProp', copyProp),
+    OptPass('deadCode', deadCode),
+    OptPass('jumps', jumps),
+]
+
+_COMMUTATIVE = {'ADD', 'MUL', 'EQ', 'NE'}
+
+# Primitives are not hashable, constants are represented by their value
+type PrimKey = int | tac.ident
+type ExpKey = tuple[str, PrimKey, PrimKey]
+
+def _primKey(p: tac.prim) -> PrimKey:
+    match p:
+        case tac.Const(v):
+            return v
+        case tac.Name(x):
+            return x
+
+def _expKey(p1: tac.prim, op: str, p2: tac.prim) -> ExpKey:
+    if op in _COMMUTATIVE and repr(p2) < repr(p1):
+        (p1, p2) = (p2, p1)
+    return (op, _primKey(p1), _primKey(p2))
+
+def valueNumbering(form: ssa.SSAForm) -> int:
+    """
+    Replaces redundant computations in the SSA form by earlier values. Returns the
+    number of eliminated instructions and phi functions.
+    """
+    g = form.g
+    # SSA variable -> primitive with the same value
+    values: dict[tac.ident, tac.prim] = {}
+    def value(p: tac.prim) -> tac.prim:
+        match p:
+            case tac.Name(x):
+                return values.get(x, p)
+            case tac.Const(_):
+                return p
+    # Operations available in the current block, scoped over the dominator tree
+    available: dict[ExpKey, tac.ident] = {}
+    children = ssa.dominatorTree(form.idom)
+    eliminated = 0
+    addedIn: dict[int, list[ExpKey]] = {}
+    work: list[tuple[int, bool]] = [(form.blocks[0], False)] if form.blocks else []
+    while work:
+        (b, done) = work.pop()
+        if done:
+            for k in addedIn.pop(b):
+                del available[k]
+            continue
+        added: list[ExpKey] = []
+        phiKeys: dict[tuple[PrimKey, ...], tac.ident] = {}
+        phis: list[ssa.Phi] = []
+        for phi in form.phis[b]:
+            # Arguments from blocks not yet visited (back edges) are not numbered yet,
+            # comparing them by name is still correct.
+            args = [value(phi.args[p]) for p in sorted(phi.args)]
+            distinct = {_primKey(a): a for a in args if a != tac.Name(phi.var)}
+            key = tuple(_primKey(a) for a in args)
+            if len(distinct) == 1:
+                values[phi.var] = next(iter(distinct.values()))
+                eliminated += 1
+            elif key in phiKeys:
+                values[phi.var] = tac.Name(phiKeys[key])
+                eliminated += 1
+            else:
+                phiKeys[key] = phi.var
+                phis.append(phi)
+        form.phis[b] = phis
+        bb = g.getData(b)
+        instrs: list[tac.instr] = []
+        for instr in bb.instrs:
+            instr = mapPrims(instr, value)
+            match instr:
+                case tac.Assign(x, tac.Prim(p)):
+                    values[x] = p
+                    eliminated += 1
+                    continue
+                case tac.Assign(x, tac.BinOp(p1, op, p2)):
+                    if isinstance(p1, tac.Const) and isinstance(p2, tac.Const):
+                        v = foldBinOp(p1.value, op.name, p2.value)
+                        if v is not None:
+                            values[x] = tac.Const(v)
+                            eliminated += 1
+                            continue
+                    k = _expKey(p1, op.name, p2)
+                    y = available.get(k)
+                    if y is not None:
+                        values[x] = tac.Name(y)
+                        eliminated += 1
+                        continue
+                    available[k] = x
+                    added.append(k)
+                case _:
+                    pass
+            instrs.append(instr)
+        bb.instrs = instrs
+        for s in g.succs(b):
+            for phi in form.phis[s]:
+                phi.args[b] = value(phi.args[b])
+        addedIn[b] = added
+        work.append((b, True))
+        for c in reversed(children[b]):
+            work.append((c, False))
+    return eliminated
+
+# Operations that may trap in the generated MIPS code
+_MAY_TRAP = {'ADD', 'SUB', 'MUL'}
+
+def _invariants(g: ControlFlowGraph, loop: loops.Loop, idom: dict[int, int],
+                live: dict[int, set[tac.ident]]) -> list[tuple[int, tac.instr]]:
+    """
+    Returns the assignments of the loop that can be moved to a preheader, as
+    (block, instruction), in an order respecting their dependencies.
+    """
+    defCount: dict[tac.ident, int] = {}
+    for b in loop.body:
+        for instr in g.getData(b).instrs:
+            x = instrDef(instr)
+            if x is not None:
+                defCount[x] = defCount.get(x, 0) + 1
+    # Blocks that leave the loop, end the program or jump back to the header
+    leaving = [b for b in loop.body
+               if not g.succs(b) or any(s not in loop.body or s == loop.header for s in g.succs(b))]
+    order = [b for b in g.reversePostorder if b in loop.body]
+    res: list[tuple[int, tac.instr]] = []
+    moved: set[int] = set()
+    invariant: set[tac.ident] = set()
+    changed = True
+    while changed:
+        changed = False
+        for b in order:
+            for instr in g.getData(b).instrs:
+                if id(instr) in moved:
+                    continue
+                match instr:
+                    case tac.Assign(x, e) if defCount[x] == 1 and x not in live[loop.header]:
+                        if any(y in defCount and y not in invariant for y in instrUses(instr)):
+                            continue
+                        if isinstance(e, tac.BinOp) and e.op.name in _MAY_TRAP and \
+                                not all(ssa.dominates(idom, b, l) for l in leaving):
+                            continue
+                        res.append((b, instr))
+                        moved.add(id(instr))
+                        invariant.add(x)
+                        changed = True
+                    case _:
+                        pass
+    return res
+
+def licm(instrs: list[tac.instr]) -> list[tac.instr]:
+    """
+    Moves loop-invariant assignments out of loops.
+    """
+    counter = 0
+    while True:
+        g = controlFlow.buildControlFlowGraph(instrs)
+        idom = ssa.dominators(g)
+        live = liveIn(g)
+        found = False
+        for loop in sorted(loops.naturalLoops(g), key=lambda l: -l.depth):
+            hoisted = _invariants(g, loop, idom, live)
+            if not hoisted:
+                continue
+            movedIds = {id(i) for (_, i) in hoisted}
+            for b in {b for (b, _) in hoisted}:
+                bb = g.getData(b)
+                bb.instrs = [i for i in bb.instrs if id(i) not in movedIds]
+            res = loops.insertPreheader(g, loop, f'L_pre_{counter}', [i for (_, i) in hoisted])
+            if res is None:
+                # Restore the blocks
+                g = controlFlow.buildControlFlowGraph(instrs)
+                continue
+            log.debug(f'licm: {len(hoisted)} instructions moved out of the loop at block {loop.header}')
+            counter += 1
+            instrs = res
+            found = True
+            break
+        if not found:
+            return instrs
+
+def linearize(g: ControlFlowGraph) -> list[tac.instr]:
+    """
+    Returns the instructions of all blocks, in the order of the blocks.
+    """
+    res: list[tac.instr] = []
+    for b in sorted(g.vertices):
+        bb = g.getData(b)
+        res.extend(tac.Label(l) for l in bb.labels)
+        res.extend(bb.instrs)
+    return res
+
+def runPasses(instrs: list[tac.instr], passes: list[OptPass],
+              maxRounds: int = 10) -> list[tac.instr]:
+    """
+    Runs the passes in order, repeatedly, until none of them changes the program.
+    """
+    for _ in range(maxRounds):
+        changed = False
+        for p in passes:
+            g = controlFlow.buildControlFlowGraph(instrs)
+            if p.run(g):
+                instrs = linearize(g)
+                log.debug(f'{p.name}: {len(instrs)} instructions')
+                changed = True
+        if not changed:
+            break
+    return instrs
+
+def passesForLevel(level: OptLevel) -> list[OptPass]:
+    if level <= 0:
+        return []
+    return O1_PASSES
+
+def optimize(instrs: list[tac.instr], level: OptLevel) -> list[tac.instr]:
+    passes = passesForLevel(level)
+    if not passes:
+        return instrs
+    res = runPasses(instrs, passes)
+    if level >= 2:
+        form = ssa.toSSA(res)
+        n = valueNumbering(form)
+        log.debug(f'valueNumbering: {n} instructions eliminated')
+        res = runPasses(licm(ssa.fromSSA(form)), passes)
+    log.info(f'TAC optimization -O{level}: {len(instrs)} -> {len(res)} instructions')
+    return res
@@ -6,13 +6,14 @@ compilers.assembly.tacSpillAssignToMips, see templates/assembly for a
 template file.
 """
 
-import assembly.tacSpill_ast as tacSpill
-import assembly.mips_ast as mips
 from typing import *
 from assembly.common import *
 from assembly.mipsHelper import *
 from common.compilerSupport import *
+import assembly.tacSpill_ast as tacSpill
+import assembly.mips_ast as mips
 import common.utils as utils
+import common.log as log
 
 class StackLocs:
     def __init__(self):
@@ -24,6 +25,12 @@ class StackLocs:
             off = len(self._d) * 4
             self._d[name] = off
         return off
+    @property
+    def frameSize(self) -> int:
+        """
+        The number of bytes used on the stack.
+        """
+        return len(self._d) * 4
 
 printNewlineInstrs: list[mips.instr] = [
     mips.LoadI(mips.Reg('$v0'), mips.Imm(4)), # system call code for print_str
@@ -41,9 +48,8 @@ def toMips(i: tacSpill.instr, locs: StackLocs) -> list[mips.instr]:
             inputs = ['$input_i64']
             match (x, f.name, args):
                 case (None, name, [tacSpill.Const(n)]) if name in prints:
-                    return [mips.LoadI(Regs.a0, imm(n)),
-                            mips.LoadI(Regs.v0, imm(1)),
-                            mips.Syscall()] + printNewlineInstrs
+                    return loadConst(Regs.a0, n) + [mips.LoadI(Regs.v0, imm(1)),
+                                                    mips.Syscall()] + printNewlineInstrs
                 case (None, name, [tacSpill.Name(y)]) if name in prints:
                     return [mips.Move(Regs.a0, reg(y)),
                             mips.LoadI(Regs.v0, imm(1)),
@@ -56,7 +62,7 @@ def toMips(i: tacSpill.instr, locs: StackLocs) -> list[mips.instr]:
                     raise ValueError(f'Invalid call in tacSpill: {i}')
         case tacSpill.GotoIf(tacSpill.Const(n), label):
             tmp = Regs.t3
-            return [mips.LoadI(tmp, imm(n)), mips.BranchNeqZero(tmp, label)]
+            return loadConst(tmp, n) + [mips.BranchNeqZero(tmp, label)]
         case tacSpill.GotoIf(tacSpill.Name(y), label):
             return [mips.BranchNeqZero(reg(y), label)]
         case tacSpill.GotoIf(_, _):
@@ -74,4 +80,6 @@ def toMips(i: tacSpill.instr, locs: StackLocs) -> list[mips.instr]:
 
 def tacSpillToMips(instrs: list[tacSpill.instr]) -> list[mips.instr]:
     locs = StackLocs()
-    return [x for i in instrs for x in toMips(i, locs)]
+    res = [x for i in instrs for x in toMips(i, locs)]
+    log.debug(f'Stack frame size: {locs.frameSize} bytes')
+    return res
@@ -4,6 +4,8 @@ It first turn the TAC program into a control flow graph, then
 computes variable interference graph from, then performs
 register allocation by graph coloring, and then assigns
 variable to register. Some variables potentially require spilling.
+Spilled variables that are never live at the same time share a stack
+slot; the slots are named $slot0, $slot1, ...
 
 The resulting TACspill program use MIPS register names as variable
 names. It uses at most as many $s registers as specified in the
@@ -18,15 +20,18 @@ by students (for templates see the templates/assembly directory):
 - compilers.assembly.graphColoring
 """
 
+from typing import *
+from assembly.common import *
 import assembly.tac_ast as tac
 import assembly.tacSpill_ast as tacSpill
 import assembly.mips_ast as mips
-from typing import *
-from assembly.common import *
 import assembly.controlFlow as controlFlow
 import assembly.loopToTac as asCommon
 from common.compilerSupport import *
 import common.utils as utils
+from common.genericCompiler import RegAllocMode
+import assembly.ircAlloc as ircAlloc
+import assembly.linearScan as linearScan
 
 class Regs:
     t1 = tacSpill.Ident('$t0')
@@ -98,14 +103,60 @@ def spillInstr(i: tac.instr, regMap: RegisterMap) -> list[tacSpill.instr]:
         case tac.Label(label):
             return [tacSpill.Label(label)]
 
-def tacToTacSpill(instrs: list[tac.instr], maxRegs: int=asCommon.MAX_REGISTERS) -> list[tacSpill.instr]:
-    log.info(f'Starting TAC to TACspill transformation, maxRegs={maxRegs}')
-    liveness =  utils.importModuleNotInStudent('compilers.assembly.liveness')
-    graphColoring = utils.importModuleNotInStudent('compilers.assembly.graphColoring')
+def allocRegisters(instrs: list[tac.instr], maxRegs: int=asCommon.MAX_REGISTERS,
+                   regAlloc: RegAllocMode='color') -> RegisterMap:
     ctrlFlowG = controlFlow.buildControlFlowGraph(instrs)
+    return allocRegistersForGraph(ctrlFlowG, maxRegs, regAlloc)
+
+def allocRegistersForGraph(ctrlFlowG: ControlFlowGraph, maxRegs: int=asCommon.MAX_REGISTERS,
+                           regAlloc: RegAllocMode='color') -> RegisterMap:
     log.debug(f'control flow graph: {ctrlFlowG}')
+    if regAlloc == 'linear':
+        # Works on live intervals, no interference graph needed
+        return linearScan.linearScan(ctrlFlowG, maxRegs)
+    liveness =  utils.importModuleNotInStudent('compilers.assembly.liveness')
     interfGraph = liveness.buildInterfGraph(ctrlFlowG)
     log.debug(f'interference graph: {interfGraph}')
-    regMap = graphColoring.colorInterfGraph(interfGraph, maxRegs=maxRegs)
+    match regAlloc:
+        case 'color':
+            graphColoring = utils.importModuleNotInStudent('compilers.assembly.graphColoring')
+            return graphColoring.colorInterfGraph(interfGraph, maxRegs=maxRegs)
+        case 'irc':
+            (regMap, _) = ircAlloc.colorIRC(ctrlFlowG, interfGraph, maxRegs)
+            return regMap
+
+def spillSlots(ctrlFlowG: ControlFlowGraph, regMap: RegisterMap) -> dict[str, str]:
+    """
+    Returns the name of the stack slot for every spilled variable. Spilled variables
+    that are never live at the same time share a slot.
+    """
+    slots = linearScan.stackSlots(ctrlFlowG, regMap)
+    log.debug(f'{len(slots)} spilled variables in {len(set(slots.values()))} stack slots')
+    return {x.name: f'$slot{s}' for x, s in slots.items()}
+
+def renameSlot(i: tacSpill.instr, slots: dict[str, str]) -> tacSpill.instr:
+    match i:
+        case tacSpill.Spill(x, name):
+            return tacSpill.Spill(x, slots.get(name, name))
+        case tacSpill.Unspill(x, name):
+            return tacSpill.Unspill(x, slots.get(name, name))
+        case _:
+            return i
+
+def isSelfMove(i: tacSpill.instr) -> bool:
+    match i:
+        case tacSpill.Assign(x, tacSpill.Prim(tacSpill.Name(y))):
+            return x == y
+        case _:
+            return False
+
+def tacToTacSpill(instrs: list[tac.instr], maxRegs: int=asCommon.MAX_REGISTERS,
+                  regAlloc: RegAllocMode='color') -> list[tacSpill.instr]:
+    log.info(f'Starting TAC to TACspill transformation, maxRegs={maxRegs}, regAlloc={regAlloc}')
+    ctrlFlowG = controlFlow.buildControlFlowGraph(instrs)
+    regMap = allocRegistersForGraph(ctrlFlowG, maxRegs, regAlloc)
     log.debug(f'Register map: {regMap}')
-    return [x for i in instrs for x in spillInstr(i, regMap)]
+    slots = spillSlots(ctrlFlowG, regMap)
+    # Moves between variables in the same register are dropped
+    return [renameSlot(x, slots) for i in instrs for x in spillInstr(i, regMap)
+            if not isSelfMove(x)]
@@ -0,0 +1,186 @@
+"""
+A virtual machine for TAC. The instructions are decoded once into a compact program:
+opcodes are ints, jump targets are resolved to instruction indices and all operands
+(variables and constants) are slots of a single frame list.
+
+The semantics are the same as the ones of the reference interpreter assembly.tacInterp.
+In particular, a jump goes to the first label with the given name, and jumping to an
+unknown label or computing with an undefined variable is an error.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import *
+from assembly.tac_ast import *
+import common.utils as utils
+
+OP_MOVE = 0
+OP_ADD = 1
+OP_SUB = 2
+OP_MUL = 3
+OP_EQ = 4
+OP_NE = 5
+OP_LT = 6
+OP_GT = 7
+OP_LE = 8
+OP_GE = 9
+OP_GOTO = 10
+OP_GOTO_IF = 11
+OP_INPUT = 12
+OP_PRINT = 13
+OP_HALT = 14
+OP_ERROR = 15
+
+_BINOPS: dict[str, int] = {
+    'ADD': OP_ADD, 'SUB': OP_SUB, 'MUL': OP_MUL, 'EQ': OP_EQ, 'NE': OP_NE,
+    'LT_S': OP_LT, 'GT_S': OP_GT, 'LE_S': OP_LE, 'GE_S': OP_GE
+}
+
+# An instruction is a tuple (opcode, a, b, c). a is the destination slot (or the
+# tested slot for OP_GOTO_IF), b and c are operand slots or jump targets.
+type VMInstr = tuple[int, int, int, int]
+
+class Undefined:
+    """
+    Initial value of variable slots. Every use as a number raises an error.
+    """
+    def __init__(self, var: ident):
+        self.var = var
+    def _fail(self, *_args: Any) -> Any:
+        raise ValueError(f'Variable {self.var.name} is undefined')
+    __bool__ = __str__ = __eq__ = __ne__ = __lt__ = __le__ = __gt__ = __ge__ = _fail
+    __hash__ = None # type: ignore
+    def __repr__(self):
+        return f'Undefined({self.var.name})'
+
+@dataclass
+class Program:
+    code: list[VMInstr]
+    initialFrame: list[Any]
+    slots: dict[ident, int]
+    errors: list[str]
+
+class _Decoder:
+    def __init__(self):
+        self.frame: list[Any] = []
+        self.slots: dict[ident, int] = {}
+        self.consts: dict[int, int] = {}
+        self.errors: list[str] = []
+    def var(self, x: ident) -> int:
+        i = self.slots.get(x)
+        if i is None:
+            i = len(self.frame)
+            self.frame.append(Undefined(x))
+            self.slots[x] = i
+        return i
+    def const(self, v: int) -> int:
+        i = self.consts.get(v)
+        if i is None:
+            i = len(self.frame)
+            self.frame.append(v)
+            self.consts[v] = i
+        return i
+    def prim(self, p: prim) -> int:
+        match p:
+            case Const(v): return self.const(v)
+            case Name(x): return self.var(x)
+    def error(self, msg: str) -> VMInstr:
+        self.errors.append(msg)
+        return (OP_ERROR, len(self.errors) - 1, 0, 0)
+
+def decode(instrs: list[instr]) -> Program:
+    """
+    Decodes the given instructions. Labels do not occupy space in the decoded program.
+    """
+    d = _Decoder()
+    labels: dict[str, int] = {}
+    pc = 0
+    for i in instrs:
+        match i:
+            case Label(l):
+                if l not in labels:
+                    labels[l] = pc
+            case _:
+                pc += 1
+    haltPc = pc
+    # Jumps to unknown labels go to error instructions after the final halt instruction
+    errorCode: list[VMInstr] = []
+    def target(label: str) -> int:
+        if label not in labels:
+            labels[label] = haltPc + 1 + len(errorCode)
+            errorCode.append(d.error(f'Label {label} not found'))
+        return labels[label]
+    code: list[VMInstr] = []
+    for i in instrs:
+        match i:
+            case Assign(x, e):
+                match e:
+                    case Prim(p):
+                        code.append((OP_MOVE, d.var(x), d.prim(p), 0))
+                    case BinOp(p1, op, p2):
+                        if op.name not in _BINOPS:
+                            code.append(d.error(f'Unhandled operator: {op.name}'))
+                        else:
+                            code.append((_BINOPS[op.name], d.var(x), d.prim(p1), d.prim(p2)))
+            case Call(x, fun, args):
+                match (fun, args):
+                    case (Ident('$input_i64'), []):
+                        code.append((OP_INPUT, d.var(utils.assertNotNone(x)), 0, 0))
+                    case (Ident('$print_i32'), [p]) | (Ident('$print_i64'), [p]):
+                        code.append((OP_PRINT, d.prim(p), 0, 0))
+                    case _:
+                        code.append(d.error(f'Invalid call: {i}'))
+            case GotoIf(test, label):
+                code.append((OP_GOTO_IF, d.prim(test), target(label), 0))
+            case Goto(label):
+                code.append((OP_GOTO, 0, target(label), 0))
+            case Label(_):
+                pass
+    code.append((OP_HALT, 0, 0, 0))
+    return Program(code + errorCode, d.frame, d.slots, d.errors)
+
+def run(p: Program) -> list[Any]:
+    """
+    Runs the program and returns the final frame.
+    """
+    code = p.code
+    f = p.initialFrame.copy()
+    pc = 0
+    while True:
+        (op, a, b, c) = code[pc]
+        pc += 1
+        if op == OP_MOVE:
+            f[a] = f[b]
+        elif op == OP_ADD:
+            f[a] = f[b] + f[c]
+        elif op == OP_SUB:
+            f[a] = f[b] - f[c]
+        elif op == OP_MUL:
+            f[a] = f[b] * f[c]
+        elif op == OP_GOTO_IF:
+            if f[a] != 0:
+                pc = b
+        elif op == OP_GOTO:
+            pc = b
+        elif op == OP_LT:
+            f[a] = 1 if f[b] < f[c] else 0
+        elif op == OP_EQ:
+            f[a] = 1 if f[b] == f[c] else 0
+        elif op == OP_NE:
+            f[a] = 1 if f[b] != f[c] else 0
+        elif op == OP_GT:
+            f[a] = 1 if f[b] > f[c] else 0
+        elif op == OP_LE:
+            f[a] = 1 if f[b] <= f[c] else 0
+        elif op == OP_GE:
+            f[a] = 1 if f[b] >= f[c] else 0
+        elif op == OP_PRINT:
+            print(f[a])
+        elif op == OP_INPUT:
+            f[a] = utils.inputInt('Enter some int: ')
+        elif op == OP_HALT:
+            return f
+        else:
+            raise ValueError(p.errors[a])
+
+def runInstrs(instrs: list[instr]):
+    run(decode(instrs))
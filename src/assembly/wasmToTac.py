@@ -15,8 +15,6 @@ class _Emitter:
         self.labelCount: int = 0
     def emit(self, i: tac.instr):
         self.instrs.append(i)
-    def add(self, l: list[tac.instr]):
-        self.instrs.extend(l)
     def freshReg(self) -> tac.ident:
         i = self.regCount
         self.regCount = i + 1
@@ -27,16 +25,34 @@ class _Emitter:
         return f'L_{hint}_{i}'
 
 def wasmToTac(instrs: list[WasmInstrL]) -> tuple[Optional[tac.prim], list[tac.instr]]:
-    return _toTacR(list(reversed(instrs)))
-
-def _toTacR(rInstrs: list[WasmInstrL]) -> tuple[Optional[tac.prim], list[tac.instr]]:
     e = _Emitter()
-    (val, rest) = _toTacSingle(rInstrs, None, e)
-    if rest:
-        (_, l) = _toTacR(rest)
-    else:
-        l = []
-    return (val, l + e.instrs)
+    val = _toTacSeq(instrs, e)
+    return (val, e.instrs)
+
+def _toTacSeq(instrs: Sequence[WasmInstrL], e: _Emitter) -> Optional[tac.prim]:
+    """
+    Translates a sequence of Wasm instructions and appends the TAC instructions to
+    e.instrs. Returns the value left on the stack by the last instruction.
+
+    The instructions are consumed from the end: each call to _toTacSingle translates
+    the instruction before the cursor together with the instructions computing its
+    operands. Such a group is emitted into its own chunk, the chunks are appended in
+    reverse order at the end.
+    """
+    outer = e.instrs
+    chunks: list[list[tac.instr]] = []
+    val: Optional[tac.prim] = None
+    i = len(instrs)
+    while i > 0:
+        e.instrs = []
+        (v, i) = _toTacSingle(instrs, i, None, e)
+        if not chunks:
+            val = v
+        chunks.append(e.instrs)
+    e.instrs = outer
+    for chunk in reversed(chunks):
+        outer.extend(chunk)
+    return val
 
 def _callInfo(id: WasmId) -> tuple[int, bool]:
     """
@@ -52,74 +68,81 @@ def _callInfo(id: WasmId) -> tuple[int, bool]:
 def downcast(l: list[WasmInstr]) -> list[WasmInstrL]:
     return cast(list[WasmInstrL], l)
 
-def _toTacSingle(rInstrs: list[WasmInstrL], targetVar: Optional[tac.ident], e: _Emitter) -> tuple[Optional[tac.prim], list[WasmInstrL]]:
-    match rInstrs:
-        case [WasmInstrVarLocal(op, x), *rest]:
+def _toTacSingle(instrs: Sequence[WasmInstrL], i: int, targetVar: Optional[tac.ident],
+                 e: _Emitter) -> tuple[Optional[tac.prim], int]:
+    """
+    Translates instrs[i-1] and the instructions computing its operands. Returns the
+    result of the instruction and the position of the first instruction consumed.
+    """
+    if i <= 0:
+        return (None, 0)
+    instr = instrs[i - 1]
+    rest = i - 1
+    match instr:
+        case WasmInstrVarLocal(op, x):
             if op == 'get':
                 return (tac.Name(tac.Ident(x.id)), rest)
             else:
                 tacVar = tac.Ident(x.id)
-                (val, rest) = _toTacSingleNotNone(rest, tacVar, e)
+                (val, rest) = _toTacSingleNotNone(instrs, rest, tacVar, e)
                 e.emit(tac.Assign(tacVar, tac.Prim(val)))
                 if op == 'set':
                     res = None
                 else:
                     res = tac.Name(tacVar)
                 return (res, rest)
-        case [WasmInstrNumBinOp(_, op), *rest] | [WasmInstrIntRelOp(_, op), *rest]:
-            (right, rest) = _toTacSingleNotNone(rest, None, e)
-            (left, rest) = _toTacSingleNotNone(rest, None, e)
+        case WasmInstrNumBinOp(_, op) | WasmInstrIntRelOp(_, op):
+            (right, rest) = _toTacSingleNotNone(instrs, rest, None, e)
+            (left, rest) = _toTacSingleNotNone(instrs, rest, None, e)
             # no optimization
             opCode = op.upper()
             targetReg = targetVar or e.freshReg()
             e.emit(tac.Assign(targetReg, tac.BinOp(left, tac.Op(opCode), right)))
             return (tac.Name(targetReg), rest)
-        case [WasmInstrCall(name), *rest]:
+        case WasmInstrCall(name):
             (n, hasResult) = _callInfo(name)
-            args = []
+            args: list[tac.prim] = []
             for _ in range(n):
-                (arg, rest) = _toTacSingleNotNone(rest, None, e)
-                args = [arg] + args
+                (arg, rest) = _toTacSingleNotNone(instrs, rest, None, e)
+                args.append(arg)
+            args.reverse()
             if hasResult:
                 targetReg = targetVar or e.freshReg()
             else:
                 targetReg = None
             e.emit(tac.Call(targetReg, tac.Ident(name.id), args))
             return (tac.Name(targetReg) if targetReg else None, rest)
-        case [WasmInstrConst(_, v), *rest]:
+        case WasmInstrConst(_, v):
             if isinstance(v, int):
                 return (tac.Const(v), rest)
             else:
                 raise ValueError(f'float constants not supported in TAC')
-        case [WasmInstrBranch(target, True), *rest]: # conditional branch
-            (val, rest) = _toTacSingleNotNone(rest, None, e)
+        case WasmInstrBranch(target, True): # conditional branch
+            (val, rest) = _toTacSingleNotNone(instrs, rest, None, e)
             e.emit(tac.GotoIf(val, target.id))
             return (None, rest)
-        case [WasmInstrBranch(target, False), *rest]: # unconditional branch
+        case WasmInstrBranch(target, False): # unconditional branch
             e.emit(tac.Goto(target.id))
             return (None, rest)
-        case [WasmInstrIf(_, [], elseInstrs), *rest]:
-            (val, rest) = _toTacSingleNotNone(rest, None, e)
+        case WasmInstrIf(_, [], elseInstrs):
+            (val, rest) = _toTacSingleNotNone(instrs, rest, None, e)
             labelEnd = e.freshLabel('end')
             e.emit(tac.GotoIf(val, labelEnd))
-            (_, elseInstrsTac) = wasmToTac(downcast(elseInstrs))
-            e.add(elseInstrsTac)
+            _toTacSeq(downcast(elseInstrs), e)
             e.emit(tac.Label(labelEnd))
             return (None, rest)
-        case [WasmInstrIf(resTy, thenInstrs, elseInstrs), *rest]:
-            (val, rest) = _toTacSingleNotNone(rest, None, e)
+        case WasmInstrIf(resTy, thenInstrs, elseInstrs):
+            (val, rest) = _toTacSingleNotNone(instrs, rest, None, e)
             targetReg = targetVar or e.freshReg()
-            (valElse, elseInstrsTac) = wasmToTac(downcast(elseInstrs))
-            (valThen, thenInstrsTac) = wasmToTac(downcast(thenInstrs))
             labelThen = e.freshLabel('then')
             labelEnd = e.freshLabel('end')
             e.emit(tac.GotoIf(val, labelThen))
-            e.add(elseInstrsTac)
+            valElse = _toTacSeq(downcast(elseInstrs), e)
             if resTy is not None:
                 e.emit(tac.Assign(targetReg, tac.Prim(assertNotNone(valElse))))
             e.emit(tac.Goto(labelEnd))
             e.emit(tac.Label(labelThen))
-            e.add(thenInstrsTac)
+            valThen = _toTacSeq(downcast(thenInstrs), e)
             if resTy is not None:
                 e.emit(tac.Assign(targetReg, tac.Prim(assertNotNone(valThen))))
             e.emit(tac.Label(labelEnd))
@@ -127,14 +150,12 @@ def _toTacSingle(rInstrs: list[WasmInstrL], targetVar: Optional[tac.ident], e: _
                 return (tac.Name(targetReg), rest)
             else:
                 return (None, rest)
-        case [WasmInstrLoop(label, body), *rest]:
-            (_, instrsTac) = wasmToTac(downcast(body))
+        case WasmInstrLoop(label, body):
             e.emit(tac.Label(label.id))
-            e.add(instrsTac)
+            _toTacSeq(downcast(body), e)
             return (None, rest)
-        case [WasmInstrBlock(label, resultTy, body), *rest]:
-            (val, instrsTac) = wasmToTac(downcast(body))
-            e.add(instrsTac)
+        case WasmInstrBlock(label, resultTy, body):
+            val = _toTacSeq(downcast(body), e)
             if resultTy is not None:
                 targetReg = targetVar or e.freshReg()
                 e.emit(tac.Assign(targetReg, tac.Prim(assertNotNone(val))))
@@ -143,13 +164,13 @@ def _toTacSingle(rInstrs: list[WasmInstrL], targetVar: Optional[tac.ident], e: _
             else:
                 e.emit(tac.Label(label.id))
                 return (None, rest)
-        case []:
-            return (None, [])
         case _:
-            raise ValueError(f"Don't know what to do with reversed stack {rInstrs}")
+            raise ValueError(f"Don't know what to do with instruction {instr}")
 
-def _toTacSingleNotNone(rInstrs: list[WasmInstrL], targetVar: Optional[tac.ident], e: _Emitter) -> tuple[tac.prim, list[WasmInstrL]]:
-    (x, rest) = _toTacSingle(rInstrs, targetVar, e)
+def _toTacSingleNotNone(instrs: Sequence[WasmInstrL], i: int, targetVar: Optional[tac.ident],
+                        e: _Emitter) -> tuple[tac.prim, int]:
+    (x, rest) = _toTacSingle(instrs, i, targetVar, e)
     if x is None:
-        raise ValueError(f'toTacSingle returned None for rInstrs={rInstrs}')
+        instr = instrs[i - 1] if i > 0 else None
+        raise ValueError(f'toTacSingle returned None for instruction {instr}')
     return (x, rest)
@@ -0,0 +1,119 @@
+"""
+Building blocks for the closure-compiling interpreters (lang_*/*_closureInterp.py).
+
+A type-checked AST is translated once into nested Python closures, one per node. At
+runtime, the closures operate on a frame: a list holding the values of all variables,
+each variable being resolved to a fixed slot at translation time. Statement closures
+return None to continue with the next statement; a return statement yields a
+1-tuple with the returned value.
+"""
+from __future__ import annotations
+from typing import *
+
+type Frame = list[Any]
+type ExpCode = Callable[[Frame], Any]
+type Returned = tuple[Any]
+type StmtCode = Callable[[Frame], Optional[Returned]]
+
+class _Undefined:
+    def __repr__(self):
+        return 'UNDEFINED'
+
+UNDEFINED: Any = _Undefined()
+
+class Slots[K]:
+    """
+    Assigns consecutive slot indices to variables.
+    """
+    def __init__(self, vars: Iterable[K] = []):
+        self.indices: dict[K, int] = {}
+        for x in vars:
+            self.slot(x)
+    def slot(self, x: K) -> int:
+        i = self.indices.get(x)
+        if i is None:
+            i = len(self.indices)
+            self.indices[x] = i
+        return i
+    def newFrame(self) -> Frame:
+        return [UNDEFINED] * len(self.indices)
+
+def mkConst(v: Any) -> ExpCode:
+    return lambda f: v
+
+def mkGetVar(i: int, name: str) -> ExpCode:
+    def get(f: Frame) -> Any:
+        v = f[i]
+        if v is UNDEFINED:
+            raise KeyError(f'Variable {name} not defined')
+        return v
+    return get
+
+def mkSetVar(i: int, e: ExpCode) -> StmtCode:
+    def set(f: Frame) -> None:
+        f[i] = e(f)
+    return set
+
+def mkExpStmt(e: ExpCode) -> StmtCode:
+    def run(f: Frame) -> None:
+        e(f)
+    return run
+
+def mkUnOp(op: str, e: ExpCode) -> ExpCode:
+    match op:
+        case 'USub': return lambda f: -e(f)
+        case 'Not': return lambda f: not e(f)
+        case _: raise ValueError(f'Unknown unary operator {op}')
+
+def mkBinOp(op: str, l: ExpCode, r: ExpCode) -> ExpCode:
+    """
+    Resolves the operator with the given name (the class name of the operator in the AST).
+    As in the AST interpreters, the right operand is evaluated after the left one, and
+    And/Or short-circuit. Is and IsNot compare by identity; use them for arrays, which are
+    represented as Python lists.
+    """
+    match op:
+        case 'Add': return lambda f: l(f) + r(f)
+        case 'Sub': return lambda f: l(f) - r(f)
+        case 'Mul': return lambda f: l(f) * r(f)
+        case 'Less': return lambda f: l(f) < r(f)
+        case 'LessEq': return lambda f: l(f) <= r(f)
+        case 'Greater': return lambda f: l(f) > r(f)
+        case 'GreaterEq': return lambda f: l(f) >= r(f)
+        case 'Eq': return lambda f: l(f) == r(f)
+        case 'NotEq': return lambda f: l(f) != r(f)
+        case 'Is': return lambda f: l(f) is r(f)
+        case 'IsNot': return lambda f: l(f) is not r(f)
+        case 'And': return lambda f: r(f) if l(f) else False
+        case 'Or': return lambda f: True if l(f) else r(f)
+        case _: raise ValueError(f'Unknown binary operator {op}')
+
+def mkSeq(stmts: list[StmtCode]) -> StmtCode:
+    match stmts:
+        case []:
+            return lambda f: None
+        case [s]:
+            return s
+        case _:
+            def seq(f: Frame) -> Optional[Returned]:
+                for s in stmts:
+                    r = s(f)
+                    if r is not None:
+                        return r
+            return seq
+
+def mkIf(cond: ExpCode, thenCode: StmtCode, elseCode: StmtCode) -> StmtCode:
+    def run(f: Frame) -> Optional[Returned]:
+        if cond(f):
+            return thenCode(f)
+        else:
+            return elseCode(f)
+    return run
+
+def mkWhile(cond: ExpCode, body: StmtCode) -> StmtCode:
+    def run(f: Frame) -> Optional[Returned]:
+        while cond(f):
+            r = body(f)
+            if r is not None:
+                return r
+    return run
@@ -5,8 +5,10 @@ import common.log as log
 import sys
 import traceback
 
-def wasmImports(maxMemSize: int) -> list[WasmImport]: return [
-    WasmImport("env", "memory", WasmImportMemory(maxMemSize, None)),
+# With initialMemSize, the memory can grow up to maxMemSize pages
+def wasmImports(maxMemSize: int, initialMemSize: Optional[int] = None) -> list[WasmImport]: return [
+    WasmImport("env", "memory", WasmImportMemory(maxMemSize, None) if initialMemSize is None
+               else WasmImportMemory(initialMemSize, maxMemSize)),
     WasmImport("env", "print", WasmImportFunc(WasmId('$print'), ['i32', 'i32'], None)),
     WasmImport("env", "print_err", WasmImportFunc(WasmId('$print_err'), ['i32', 'i32'], None)),
     WasmImport("env", "print_i32", WasmImportFunc(WasmId("$print_i32"), ['i32'], None)),
@@ -34,4 +36,6 @@ class CompilerConfig:
     defaultMaxMemSize = (100 * 1024) // 64  # 100MB
     maxArraySize: int # (in bytes)
     defaultMaxArraySize = 50 * 1024 * 1024 # 50MB
+    boundsCheckElim: bool = True # drop bounds checks proven redundant by the range analysis
+    bulkMemory: bool = True # initialize arrays with constant elements by memory.fill/memory.copy
 
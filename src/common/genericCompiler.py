@@ -5,6 +5,8 @@ from typing import *
 from dataclasses import dataclass
 from common.wasm import *
 import common.sexp as sexp
+import common.wasmBinary as wasmBinary
+import common.wasmOpt as wasmOpt
 import common.utils as utils
 from common.compilerSupport import CompilerConfig
 import common.compilerSupport as compilerSupport
@@ -12,17 +14,51 @@ import shell
 
 type CompileFun = Callable[[Any, CompilerConfig], WasmModule]
 
-def compileToWat(compileFun: CompileFun, astMod: Any, cfg: CompilerConfig,
-                 input: str, output: str) -> WasmModule:
+# How .wasm files are produced: binary-direct encodes the module in-process,
+# wat2wasm writes the textual format first and then invokes the external tool.
+type EmitMode = Literal['binary-direct', 'wat2wasm']
+EMIT_MODES: list[EmitMode] = ['binary-direct', 'wat2wasm']
+
+# Register allocators of the assembly command: color is the graph coloring from
+# compilers.assembly.graphColoring, irc is iterated register coalescing (assembly.ircAlloc),
+# linear is linear scan over live intervals (assembly.linearScan).
+type RegAllocMode = Literal['color', 'irc', 'linear']
+REGALLOC_MODES: list[RegAllocMode] = ['color', 'irc', 'linear']
+
+# Optimization levels for TAC (assembly.tacOptimize) and for wasm (common.wasmOpt):
+# 0 means no optimization.
+type OptLevel = Literal[0, 1, 2]
+OPT_LEVELS: list[OptLevel] = [0, 1, 2]
+
+def compileToModule(compileFun: CompileFun, astMod: Any, cfg: CompilerConfig,
+                    input: str, passes: Sequence[wasmOpt.OptPass] = ()) -> WasmModule:
     ast = parser.parseFile(input, astMod)
     log.info(f'Compiling AST with {compileFun}')
     try:
         wasmMod = compileFun(ast, cfg)
     except compilerSupport.CompileError as e:
         e.displayAndDie()
-    code = sexp.renderSExp(wasmMod.render())
-    utils.writeTextFile(output, code)
+    return wasmOpt.optimizeModule(wasmMod, passes)
+
+def writeWat(wasmMod: WasmModule, output: str, prettyWat: bool = False):
+    if prettyWat:
+        code = sexp.renderSExp(wasmMod.render())
+        utils.writeTextFile(output, code)
+    else:
+        with open(output, 'w') as f:
+            sexp.writeSExp(wasmMod.render(), f)
     log.info(f'Wrote textual representation of wasm to {output}')
+
+def writeWasm(wasmMod: WasmModule, output: str):
+    with open(output, 'wb') as f:
+        f.write(wasmBinary.encodeModule(wasmMod))
+    log.info(f'Wrote binary representation of wasm to {output}')
+
+def compileToWat(compileFun: CompileFun, astMod: Any, cfg: CompilerConfig,
+                 input: str, output: str, prettyWat: bool = False,
+                 passes: Sequence[wasmOpt.OptPass] = ()) -> WasmModule:
+    wasmMod = compileToModule(compileFun, astMod, cfg, input, passes)
+    writeWat(wasmMod, output, prettyWat)
     return wasmMod
 
 def wat2wasm(wat2wasmCmd: str, input: str, output: str):
@@ -41,6 +77,15 @@ class Args:
     maxMemSize: Optional[int] = None
     maxArraySize: Optional[int] = None
     maxRegisters: Optional[int] = None
+    emit: EmitMode = 'binary-direct'
+    prettyWat: bool = False
+    regAlloc: RegAllocMode = 'color'
+    # For TAC (assembly and tacInterp commands)
+    optLevel: OptLevel = 0
+    # For the wasm code (compile and run commands). wasmPasses overrides the passes
+    # of the level.
+    wasmOptLevel: OptLevel = 0
+    wasmPasses: Optional[list[str]] = None
 
 def compileMain(args: Args, compileFun: CompileFun, astMod: Any) -> WasmModule:
     output = args.output
@@ -50,11 +95,19 @@ def compileMain(args: Args, compileFun: CompileFun, astMod: Any) -> WasmModule:
         utils.abort(f'Extension of output file must be .wat or .wasm or .as')
     cfg = CompilerConfig(maxMemSize=args.maxMemSize or CompilerConfig.defaultMaxMemSize,
                          maxArraySize=args.maxArraySize or CompilerConfig.defaultMaxArraySize)
-    wasmMod = compileToWat(compileFun, astMod, cfg, args.input, outputWat)
-    if outputExt == '.wat':
-        return wasmMod
     outputBin = outputBase + '.wasm'
-    wat2wasm(args.wat2wasm, outputWat, outputBin)
+    passes = wasmOpt.selectPasses(args.wasmOptLevel, args.wasmPasses)
+    if outputExt == '.wat':
+        return compileToWat(compileFun, astMod, cfg, args.input, outputWat, args.prettyWat,
+                            passes)
+    match args.emit:
+        case 'binary-direct':
+            wasmMod = compileToModule(compileFun, astMod, cfg, args.input, passes)
+            writeWasm(wasmMod, outputBin)
+        case 'wat2wasm':
+            wasmMod = compileToWat(compileFun, astMod, cfg, args.input, outputWat, args.prettyWat,
+                                   passes)
+            wat2wasm(args.wat2wasm, outputWat, outputBin)
     return wasmMod
 
 
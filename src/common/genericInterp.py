@@ -22,3 +22,41 @@ def interpMain(args: Args, interpFun: Callable[[Any], None], astMod: Any):
     except Exception:
         traceback.print_exc()
         sys.exit(constants.RUN_ERROR_EXIT_CODE)
+
+@dataclass(frozen=True)
+class Block[S]:
+    """
+    Statements to execute next, returned by the step function of execStmts. If repeat is
+    True, the statement that produced the block is stepped again after the block has
+    finished (this is how while loops are executed).
+    """
+    stmts: list[S]
+    repeat: bool = False
+
+def execStmts[S](stmts: list[S], step: Callable[[S], Optional[Block[S]]]):
+    """
+    Executes stmts without recursion: step executes a single statement and returns the
+    block of nested statements to continue with (if any). Nested blocks are kept on an
+    explicit stack of (statements, program counter) pairs, so neither the Python stack
+    nor the statement lists grow with the number of loop iterations.
+    """
+    blocks: list[list[S]] = [stmts]
+    pcs: list[int] = [0]
+    repeats: list[Optional[S]] = [None]
+    while blocks:
+        block = blocks[-1]
+        pc = pcs[-1]
+        if pc < len(block):
+            s = block[pc]
+            pcs[-1] = pc + 1
+        else:
+            blocks.pop()
+            pcs.pop()
+            s = repeats.pop()
+            if s is None:
+                continue
+        next = step(s)
+        if next is not None:
+            blocks.append(next.stmts)
+            pcs.append(0)
+            repeats.append(s if next.repeat else None)
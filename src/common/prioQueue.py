@@ -1,4 +1,5 @@
 from typing import *
+import common.utils as utils
 
 type PrioDict[T] = dict[T, int]
 
@@ -34,6 +35,109 @@ class PrioQueue[T]:
     def isEmpty(self) -> bool:
         return self.heap.size == 0
 
+class _BucketNode[T]:
+    __slots__ = ('key', 'prio', 'secondary', 'prev', 'next')
+    def __init__(self, key: T, prio: int, secondary: int):
+        self.key = key
+        self.prio = prio
+        self.secondary = secondary
+        self.prev: Optional[_BucketNode[T]] = None
+        self.next: Optional[_BucketNode[T]] = None
+
+class BucketPrioQueue[T]:
+    """
+    A drop-in alternative to PrioQueue for small integer priorities. Bucket i holds
+    the elements with priority i as a doubly linked list, sorted by decreasing
+    secondary order. push, incPrio and pop run in O(1) if no secondary order is given
+    (elements with equal priority are then popped in LIFO order). With a secondary
+    order, inserting into a bucket scans the elements ordered before the new one.
+    """
+    def __init__(self, secondaryOrder: dict[T, int]={}):
+        self.secondaryOrder = secondaryOrder
+        self.buckets: list[Optional[_BucketNode[T]]] = []
+        self.nodes: dict[T, _BucketNode[T]] = {}
+        self.maxPrio = -1
+        self.size = 0
+
+    def __repr__(self):
+        l: list[tuple[T, int]] = []
+        for head in reversed(self.buckets):
+            node = head
+            while node is not None:
+                l.append((node.key, node.prio))
+                node = node.next
+        return f'BucketPrioQueue({l})'
+
+    def __link(self, node: _BucketNode[T]):
+        p = node.prio
+        while len(self.buckets) <= p:
+            self.buckets.append(None)
+        prev: Optional[_BucketNode[T]] = None
+        next = self.buckets[p]
+        while next is not None and next.secondary > node.secondary:
+            prev = next
+            next = next.next
+        node.prev = prev
+        node.next = next
+        if prev is None:
+            self.buckets[p] = node
+        else:
+            prev.next = node
+        if next is not None:
+            next.prev = node
+        if p > self.maxPrio:
+            self.maxPrio = p
+
+    def __unlink(self, node: _BucketNode[T]):
+        if node.prev is None:
+            self.buckets[node.prio] = node.next
+        else:
+            node.prev.next = node.next
+        if node.next is not None:
+            node.next.prev = node.prev
+
+    def push(self, key: T, prio: int=0):
+        """
+        Adds an element to the priority queue.
+        """
+        if key in self.nodes:
+            raise ValueError(f'Key {key} already present in priority queue')
+        if prio < 0:
+            raise ValueError('negative priorities are not allowed')
+        node = _BucketNode(key, prio, self.secondaryOrder.get(key, 0))
+        self.nodes[key] = node
+        self.__link(node)
+        self.size += 1
+
+    def pop(self) -> T:
+        """
+        Removes an element with the highest priority from the priority queue.
+        """
+        if self.size == 0:
+            raise ValueError('pop from empty priority queue')
+        while self.buckets[self.maxPrio] is None:
+            self.maxPrio -= 1
+        node = utils.assertNotNone(self.buckets[self.maxPrio])
+        self.__unlink(node)
+        del self.nodes[node.key]
+        self.size -= 1
+        return node.key
+
+    def incPrio(self, key: T, by: int=1):
+        """
+        Increase priority of the given key by the given amount. The amount must not be
+        negative (priorities never decrease).
+        """
+        if by < 0:
+            raise ValueError('priorities must not decrease')
+        node = self.nodes[key]
+        self.__unlink(node)
+        node.prio += by
+        self.__link(node)
+
+    def isEmpty(self) -> bool:
+        return self.size == 0
+
 class Heap[T]:
     def __init__(self, data: list[T]=[], prios: dict[T, int]={}, secondaryOrder: dict[T, int]={}):
         self.secondaryOrder = secondaryOrder
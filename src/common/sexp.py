@@ -64,3 +64,130 @@ def mkSeq(*es: SExp) -> SExpSeq:
 
 def mkNamedSeq(i: str, *es: SExp) -> SExpSeq:
     return mkSeq(SExpId(i), *es)
+
+# Lines of the streaming writer are at most this wide (unless a single atom is wider).
+STREAM_WIDTH = 80
+_INDENT = '  '
+# Sequences with these heads stay on the header line of a block
+_BLOCK_ANNOTATIONS = ['result', 'param']
+# Sequences with these heads are never written on a single line if they contain more
+# than labels and declarations, so that each instruction of a function gets its own line.
+_BREAK_HEADS = ['module', 'func']
+_DECLARATIONS = ['result', 'param', 'local']
+
+def _atomStr(s: SExpNum | SExpStr | SExpId) -> str:
+    match s:
+        case SExpNum(v): return str(v)
+        case SExpStr(v): return json.dumps(v)
+        case SExpId(i): return i
+
+def _flatWidth(s: SExp, limit: int) -> int:
+    """
+    Width of s when written on a single line, or some value > limit if s is wider
+    than limit or contains a block. The cutoff keeps the costs bounded by limit.
+    """
+    match s:
+        case SExpNum() | SExpStr() | SExpId():
+            return len(_atomStr(s))
+        case SExpBlock():
+            return limit + 1
+        case SExpSeq(l):
+            w = 1 + len(l)
+            for x in l:
+                if w > limit:
+                    break
+                w += _flatWidth(x, limit - w)
+            return w
+
+def _writeFlat(s: SExp, out: TextIO):
+    match s:
+        case SExpNum() | SExpStr() | SExpId():
+            out.write(_atomStr(s))
+        case SExpSeq(l):
+            out.write('(')
+            for i, x in enumerate(l):
+                if i > 0:
+                    out.write(' ')
+                _writeFlat(x, out)
+            out.write(')')
+        case SExpBlock():
+            raise ValueError('Blocks cannot be written on a single line')
+
+def _isLabel(s: SExp) -> bool:
+    return isinstance(s, SExpId) and s.id.startswith('$')
+
+def _hasHead(s: SExp, heads: list[str]) -> bool:
+    match s:
+        case SExpSeq([SExpId(i), *_]) if i in heads:
+            return True
+        case _:
+            return False
+
+def _isAnnotation(s: SExp) -> bool:
+    return _hasHead(s, _BLOCK_ANNOTATIONS)
+
+def _mustBreak(s: SExpSeq) -> bool:
+    if not _hasHead(s, _BREAK_HEADS):
+        return False
+    return any(not (_isLabel(x) or _hasHead(x, _DECLARATIONS)) for x in s.sexps[1:])
+
+def _writeLines(s: SExp, out: TextIO, indent: str):
+    """
+    Writes s starting on a fresh line with the given indentation.
+    """
+    out.write(indent)
+    match s:
+        case SExpNum() | SExpStr() | SExpId():
+            out.write(_atomStr(s))
+            out.write('\n')
+        case SExpSeq(l):
+            limit = STREAM_WIDTH - len(indent)
+            if not _mustBreak(s) and _flatWidth(s, limit) <= limit:
+                _writeFlat(s, out)
+                out.write('\n')
+                return
+            # leading atoms (e.g. the name of a function) go on the header line, as long as
+            # they fit
+            out.write('(')
+            width = len(indent) + 1
+            i = 0
+            while i < len(l):
+                x = l[i]
+                if not isinstance(x, SExpNum | SExpStr | SExpId):
+                    break
+                a = _atomStr(x)
+                if i > 0 and width + 1 + len(a) > STREAM_WIDTH:
+                    break
+                if i > 0:
+                    out.write(' ')
+                    width += 1
+                out.write(a)
+                width += len(a)
+                i += 1
+            out.write('\n')
+            for x in l[i:]:
+                _writeLines(x, out, indent + _INDENT)
+            out.write(indent + ')\n')
+        case SExpBlock(items):
+            for (k, item) in enumerate(items):
+                if k > 0:
+                    out.write(indent)
+                out.write(item.start)
+                i = 0
+                while i < len(item.sexps) and \
+                        (_isLabel(item.sexps[i]) or _isAnnotation(item.sexps[i])):
+                    out.write(' ')
+                    _writeFlat(item.sexps[i], out)
+                    i += 1
+                out.write('\n')
+                for x in item.sexps[i:]:
+                    _writeLines(x, out, indent + _INDENT)
+            out.write(indent + 'end\n')
+
+def writeSExp(s: SExp, out: TextIO):
+    """
+    Writes s to out without going through the pretty printer. Runs in linear time:
+    sequences fitting into STREAM_WIDTH are written on a single line, otherwise
+    each element (e.g. each instruction of a function) gets its own line.
+    """
+    _writeLines(s, out, '')
@@ -113,10 +113,19 @@ class WasmGlobal:
 
 @dataclass(frozen=True)
 class WasmData:
+    """
+    Data segment, e.g. (data (i32.const 0) "foo"). Binary content is written with
+    escapes such as "\\01\\00".
+    """
     start: int
-    content: str
+    content: str | bytes
     def render(self) -> SExp:
-        return mkNamedSeq('data', SExpId(f'(i32.const {self.start})'), SExpStr(self.content))
+        match self.content:
+            case str(s):
+                content = SExpStr(s)
+            case bytes(b):
+                content = SExpId('"' + ''.join(f'\\{x:02x}' for x in b) + '"')
+        return mkNamedSeq('data', SExpId(f'(i32.const {self.start})'), content)
 
 @dataclass(frozen=True)
 class WasmFuncTable:
@@ -165,7 +174,7 @@ class WasmInstrNumBinOp:
     Binary operators on numbers, e.g. i32.add
     """
     ty: WasmValtype
-    op: Literal['add', 'sub', 'mul', 'shr_u', 'shl', 'xor']
+    op: Literal['add', 'sub', 'mul', 'shr_u', 'shl', 'xor', 'and', 'or']
     def render(self) -> SExp:
         return SExpId(f'{self.ty}.{self.op}')
 
@@ -176,6 +185,16 @@ class WasmInstrIntRelOp:
     def render(self) -> SExp:
         return SExpId(f'{self.ty}.{self.op}')
 
+@dataclass(frozen=True)
+class WasmInstrIntTestOp:
+    """
+    Test for zero, e.g. i32.eqz
+    """
+    ty: Literal['i32', 'i64']
+    op: Literal['eqz'] = 'eqz'
+    def render(self) -> SExp:
+        return SExpId(f'{self.ty}.{self.op}')
+
 @dataclass(frozen=True)
 class WasmInstrConvOp:
     op: Literal['i32.wrap_i64', 'i64.extend_i32_u', 'i64.extend_i32_s']
@@ -232,6 +251,27 @@ class WasmInstrMem:
     def render(self) -> SExp:
         return SExpId(f'{self.ty}.{self.op}')
 
+@dataclass(frozen=True)
+class WasmInstrBulkMem:
+    """
+    Bulk memory instructions. memory.fill takes the destination address, the byte value
+    and the number of bytes, memory.copy the destination, the source and the number of
+    bytes.
+    """
+    op: Literal['fill', 'copy']
+    def render(self) -> SExp:
+        return SExpId(f'memory.{self.op}')
+
+@dataclass(frozen=True)
+class WasmInstrMemPages:
+    """
+    memory.size pushes the size of the memory in pages of 64KB. memory.grow takes the
+    number of pages to add and pushes the old size, or -1 if the memory cannot grow.
+    """
+    op: Literal['size', 'grow']
+    def render(self) -> SExp:
+        return SExpId(f'memory.{self.op}')
+
 @dataclass(frozen=True)
 class WasmInstrBranch:
     """
@@ -295,10 +335,11 @@ class WasmInstrTrap:
         return SExpId('unreachable')
 
 
-type WasmInstr = WasmInstrConst | WasmInstrNumBinOp | WasmInstrIntRelOp | WasmInstrConvOp \
+type WasmInstr = WasmInstrConst | WasmInstrNumBinOp | WasmInstrIntRelOp | WasmInstrIntTestOp \
+               | WasmInstrConvOp \
                | WasmInstrCall | WasmInstrCallIndirect | WasmInstrVarLocal | WasmInstrVarGlobal \
                | WasmInstrBranch | WasmInstrIf | WasmInstrLoop | WasmInstrBlock | WasmInstrMem \
-               | WasmInstrComment | WasmInstrTrap | WasmInstrDrop
+               | WasmInstrBulkMem | WasmInstrMemPages | WasmInstrComment | WasmInstrTrap | WasmInstrDrop
 
 # instructions used for loop and for compiling to assembly
 type WasmInstrL = WasmInstrConst | WasmInstrNumBinOp | WasmInstrIntRelOp \
@@ -0,0 +1,356 @@
+"""
+Direct encoder from WasmModule to the binary wasm format.
+
+This avoids the detour via the textual format and the external wat2wasm tool. See
+https://webassembly.github.io/spec/core/binary/index.html for the specification of the
+binary format.
+"""
+from __future__ import annotations
+from typing import *
+import struct
+from common.wasm import *
+
+_MAGIC = b'\x00asm'
+_VERSION = b'\x01\x00\x00\x00'
+
+_SEC_TYPE = 1
+_SEC_IMPORT = 2
+_SEC_FUNC = 3
+_SEC_TABLE = 4
+_SEC_GLOBAL = 6
+_SEC_EXPORT = 7
+_SEC_ELEM = 9
+_SEC_CODE = 10
+_SEC_DATA = 11
+
+_VALTYPES: dict[str, int] = {'i32': 0x7f, 'i64': 0x7e, 'f32': 0x7d, 'f64': 0x7c}
+_FUNCREF = 0x70
+_BLOCKTYPE_EMPTY = 0x40
+
+_NUM_BINOPS: dict[tuple[str, str], int] = {
+    ('i32', 'add'): 0x6a, ('i32', 'sub'): 0x6b, ('i32', 'mul'): 0x6c,
+    ('i32', 'and'): 0x71, ('i32', 'or'): 0x72,
+    ('i32', 'xor'): 0x73, ('i32', 'shl'): 0x74, ('i32', 'shr_u'): 0x76,
+    ('i64', 'add'): 0x7c, ('i64', 'sub'): 0x7d, ('i64', 'mul'): 0x7e,
+    ('i64', 'and'): 0x83, ('i64', 'or'): 0x84,
+    ('i64', 'xor'): 0x85, ('i64', 'shl'): 0x86, ('i64', 'shr_u'): 0x88,
+    ('f32', 'add'): 0x92, ('f32', 'sub'): 0x93, ('f32', 'mul'): 0x94,
+    ('f64', 'add'): 0xa0, ('f64', 'sub'): 0xa1, ('f64', 'mul'): 0xa2,
+}
+
+_REL_OPS = ['eq', 'ne', 'lt_s', 'lt_u', 'gt_s', 'gt_u', 'le_s', 'le_u', 'ge_s', 'ge_u']
+_INT_RELOPS: dict[tuple[str, str], int] = \
+    {('i32', op): 0x46 + i for i, op in enumerate(_REL_OPS)} | \
+    {('i64', op): 0x51 + i for i, op in enumerate(_REL_OPS)}
+
+_INT_TESTOPS: dict[tuple[str, str], int] = {('i32', 'eqz'): 0x45, ('i64', 'eqz'): 0x50}
+
+_CONV_OPS: dict[str, int] = {
+    'i32.wrap_i64': 0xa7, 'i64.extend_i32_s': 0xac, 'i64.extend_i32_u': 0xad
+}
+
+# opcode and natural alignment (log2 of the number of bytes)
+_MEM_OPS: dict[tuple[str, str], tuple[int, int]] = {
+    ('i32', 'load'): (0x28, 2), ('i64', 'load'): (0x29, 3),
+    ('f32', 'load'): (0x2a, 2), ('f64', 'load'): (0x2b, 3),
+    ('i32', 'store'): (0x36, 2), ('i64', 'store'): (0x37, 3),
+    ('f32', 'store'): (0x38, 2), ('f64', 'store'): (0x39, 3),
+}
+
+# prefix of the bulk memory instructions
+_PREFIX_FC = 0xfc
+
+_INT_BITS: dict[str, int] = {'i32': 32, 'i64': 64}
+
+type FuncType = tuple[tuple[WasmValtype, ...], tuple[WasmValtype, ...]]
+
+def encodeU32(n: int) -> bytes:
+    """Unsigned LEB128 encoding."""
+    if n < 0:
+        raise ValueError(f'Cannot encode negative number {n} as unsigned LEB128')
+    out = bytearray()
+    while True:
+        b = n & 0x7f
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+def encodeSigned(n: int) -> bytes:
+    """Signed LEB128 encoding."""
+    out = bytearray()
+    while True:
+        b = n & 0x7f
+        n >>= 7
+        if (n == 0 and not b & 0x40) or (n == -1 and b & 0x40):
+            out.append(b)
+            return bytes(out)
+        out.append(b | 0x80)
+
+def encodeName(s: str) -> bytes:
+    b = s.encode('utf-8')
+    return encodeU32(len(b)) + b
+
+def _vec(items: list[bytes]) -> bytes:
+    return encodeU32(len(items)) + b''.join(items)
+
+def _section(id: int, items: list[bytes]) -> bytes:
+    if not items:
+        return b''
+    payload = _vec(items)
+    return bytes([id]) + encodeU32(len(payload)) + payload
+
+def _intConst(ty: str, val: int) -> int:
+    """
+    Normalizes an integer constant to its signed representation. As wat2wasm, we accept
+    all values from -2^(n-1) to 2^n - 1.
+    """
+    bits = _INT_BITS[ty]
+    if val < -(1 << (bits - 1)) or val >= (1 << bits):
+        raise ValueError(f'Constant {val} out of range for {ty}')
+    if val >= (1 << (bits - 1)):
+        val -= (1 << bits)
+    return val
+
+def _funcType(params: Iterable[WasmValtype], result: Optional[WasmValtype]) -> FuncType:
+    return (tuple(params), (result,) if result else ())
+
+class _ModuleEnv:
+    """
+    Index spaces of a module. Function types are deduplicated in order of their
+    first occurrence.
+    """
+    def __init__(self):
+        self.types: dict[FuncType, int] = {}
+        self.funcs: dict[WasmId, int] = {}
+        self.globals: dict[WasmId, int] = {}
+    def typeIndex(self, ft: FuncType) -> int:
+        if ft not in self.types:
+            self.types[ft] = len(self.types)
+        return self.types[ft]
+    def funcIndex(self, id: WasmId) -> int:
+        if id not in self.funcs:
+            raise ValueError(f'Unknown function {id.id}')
+        return self.funcs[id]
+    def globalIndex(self, id: WasmId) -> int:
+        if id not in self.globals:
+            raise ValueError(f'Unknown global {id.id}')
+        return self.globals[id]
+
+class _FuncEncoder:
+    """
+    Encodes the instructions of a single function (or of a constant expression).
+    Symbolic labels are resolved to relative branch depths via a stack of enclosing
+    structured instructions. Unlabeled constructs (if) push None.
+    """
+    def __init__(self, env: _ModuleEnv, locals: dict[WasmId, int]):
+        self.env = env
+        self.locals = locals
+        self.labels: list[Optional[WasmId]] = []
+        self.out = bytearray()
+
+    def localIndex(self, id: WasmId) -> int:
+        if id not in self.locals:
+            raise ValueError(f'Unknown local {id.id}')
+        return self.locals[id]
+
+    def labelDepth(self, id: WasmId) -> int:
+        for depth, l in enumerate(reversed(self.labels)):
+            if l == id:
+                return depth
+        raise ValueError(f'Unknown label {id.id}')
+
+    def blockType(self, t: Optional[WasmValtype]):
+        self.out.append(_VALTYPES[t] if t else _BLOCKTYPE_EMPTY)
+
+    def body(self, label: Optional[WasmId], instrs: list[WasmInstr]):
+        self.labels.append(label)
+        self.instrs(instrs)
+        self.labels.pop()
+
+    def instrs(self, instrs: list[WasmInstr]):
+        for i in instrs:
+            self.instr(i)
+
+    def instr(self, i: WasmInstr):
+        out = self.out
+        match i:
+            case WasmInstrConst(ty, val):
+                match ty:
+                    case 'i32':
+                        out.append(0x41)
+                        out += encodeSigned(_intConst(ty, int(val)))
+                    case 'i64':
+                        out.append(0x42)
+                        out += encodeSigned(_intConst(ty, int(val)))
+                    case 'f32':
+                        out.append(0x43)
+                        out += struct.pack('<f', val)
+                    case 'f64':
+                        out.append(0x44)
+                        out += struct.pack('<d', val)
+            case WasmInstrDrop():
+                out.append(0x1a)
+            case WasmInstrNumBinOp(ty, op):
+                out.append(_NUM_BINOPS[(ty, op)])
+            case WasmInstrIntRelOp(ty, op):
+                out.append(_INT_RELOPS[(ty, op)])
+            case WasmInstrIntTestOp(ty, op):
+                out.append(_INT_TESTOPS[(ty, op)])
+            case WasmInstrConvOp(op):
+                out.append(_CONV_OPS[op])
+            case WasmInstrCall(id):
+                out.append(0x10)
+                out += encodeU32(self.env.funcIndex(id))
+            case WasmInstrCallIndirect(params, result):
+                out.append(0x11)
+                out += encodeU32(self.env.typeIndex(_funcType(params, result)))
+                out.append(0x00) # table index
+            case WasmInstrVarLocal(op, id):
+                out.append({'get': 0x20, 'set': 0x21, 'tee': 0x22}[op])
+                out += encodeU32(self.localIndex(id))
+            case WasmInstrVarGlobal(op, id):
+                out.append({'get': 0x23, 'set': 0x24}[op])
+                out += encodeU32(self.env.globalIndex(id))
+            case WasmInstrMem(ty, op):
+                (opcode, align) = _MEM_OPS[(ty, op)]
+                out.append(opcode)
+                out += encodeU32(align)
+                out += encodeU32(0) # offset
+            case WasmInstrBulkMem(op):
+                out.append(_PREFIX_FC)
+                match op:
+                    case 'copy':
+                        out += encodeU32(10) + b'\x00\x00' # destination and source memory
+                    case 'fill':
+                        out += encodeU32(11) + b'\x00' # memory index
+            case WasmInstrMemPages(op):
+                out.append(0x3f if op == 'size' else 0x40)
+                out.append(0x00) # memory index
+            case WasmInstrBranch(target, conditional):
+                out.append(0x0d if conditional else 0x0c)
+                out += encodeU32(self.labelDepth(target))
+            case WasmInstrIf(resultType, thenInstrs, elseInstrs):
+                out.append(0x04)
+                self.blockType(resultType)
+                self.body(None, thenInstrs)
+                # the else branch is required if the if produces a result
+                if elseInstrs or resultType is not None:
+                    out.append(0x05)
+                    self.body(None, elseInstrs)
+                out.append(0x0b)
+            case WasmInstrLoop(label, body):
+                out.append(0x03)
+                self.blockType(None)
+                self.body(label, body)
+                out.append(0x0b)
+            case WasmInstrBlock(label, result, body):
+                out.append(0x02)
+                self.blockType(result)
+                self.body(label, body)
+                out.append(0x0b)
+            case WasmInstrComment():
+                pass
+            case WasmInstrTrap():
+                out.append(0x00)
+
+    def expr(self, instrs: list[WasmInstr]) -> bytes:
+        self.instrs(instrs)
+        self.out.append(0x0b)
+        return bytes(self.out)
+
+def _encodeLocals(locals: list[tuple[WasmId, WasmValtype]]) -> bytes:
+    """Encodes local declarations, grouping runs of equal types."""
+    groups: list[tuple[int, WasmValtype]] = []
+    for (_, t) in locals:
+        if groups and groups[-1][1] == t:
+            groups[-1] = (groups[-1][0] + 1, t)
+        else:
+            groups.append((1, t))
+    return _vec([encodeU32(n) + bytes([_VALTYPES[t]]) for (n, t) in groups])
+
+def _encodeFunc(env: _ModuleEnv, f: WasmFunc) -> bytes:
+    localIds: dict[WasmId, int] = {}
+    for (id, _) in f.params + f.locals:
+        if id in localIds:
+            raise ValueError(f'Duplicate local {id.id} in function {f.id.id}')
+        localIds[id] = len(localIds)
+    enc = _FuncEncoder(env, localIds)
+    code = _encodeLocals(f.locals) + enc.expr(f.instrs)
+    return encodeU32(len(code)) + code
+
+def _encodeLimits(min: int, max: Optional[int]) -> bytes:
+    if max is None:
+        return b'\x00' + encodeU32(min)
+    return b'\x01' + encodeU32(min) + encodeU32(max)
+
+def _dataBytes(content: str | bytes) -> bytes:
+    match content:
+        case str(s):
+            return s.encode('utf-8')
+        case bytes(b):
+            return b
+
+def encodeModule(m: WasmModule) -> bytes:
+    """
+    Encodes the given module in the binary wasm format.
+    """
+    env = _ModuleEnv()
+    imports: list[bytes] = []
+    for imp in m.imports:
+        head = encodeName(imp.module) + encodeName(imp.name)
+        match imp.desc:
+            case WasmImportFunc(id, params, result):
+                env.funcs[id] = len(env.funcs)
+                ti = env.typeIndex(_funcType(params, result))
+                imports.append(head + b'\x00' + encodeU32(ti))
+            case WasmImportMemory(min, max):
+                imports.append(head + b'\x02' + _encodeLimits(min, max))
+    funcs: list[bytes] = []
+    for f in m.funcs:
+        if f.id in env.funcs:
+            raise ValueError(f'Duplicate function {f.id.id}')
+        env.funcs[f.id] = len(env.funcs)
+        funcs.append(encodeU32(env.typeIndex(_funcType([t for (_, t) in f.params], f.result))))
+    globals: list[bytes] = []
+    for g in m.globals:
+        env.globals[g.id] = len(env.globals)
+    for g in m.globals:
+        init = _FuncEncoder(env, {}).expr(g.init)
+        globals.append(bytes([_VALTYPES[g.ty], 1 if g.mutable else 0]) + init)
+    n = len(m.funcTable.elems)
+    tables = [bytes([_FUNCREF]) + _encodeLimits(n, n)]
+    exports: list[bytes] = []
+    for e in m.exports:
+        match e.desc:
+            case WasmExportFunc(id):
+                exports.append(encodeName(e.name) + b'\x00' + encodeU32(env.funcIndex(id)))
+    elems: list[bytes] = []
+    if n > 0:
+        offset = _FuncEncoder(env, {}).expr([WasmInstrConst('i32', 0)])
+        elems.append(b'\x00' + offset + _vec([encodeU32(env.funcIndex(id))
+                                              for id in m.funcTable.elems]))
+    code = [_encodeFunc(env, f) for f in m.funcs]
+    data: list[bytes] = []
+    for d in m.data:
+        offset = _FuncEncoder(env, {}).expr([WasmInstrConst('i32', d.start)])
+        content = _dataBytes(d.content)
+        data.append(b'\x00' + offset + encodeU32(len(content)) + content)
+    # The type section comes first but is only complete after encoding the code.
+    types = [b'\x60' + _vec([bytes([_VALTYPES[t]]) for t in ps]) +
+             _vec([bytes([_VALTYPES[t]]) for t in rs])
+             for (ps, rs) in env.types]
+    return b''.join([
+        _MAGIC, _VERSION,
+        _section(_SEC_TYPE, types),
+        _section(_SEC_IMPORT, imports),
+        _section(_SEC_FUNC, funcs),
+        _section(_SEC_TABLE, tables),
+        _section(_SEC_GLOBAL, globals),
+        _section(_SEC_EXPORT, exports),
+        _section(_SEC_ELEM, elems),
+        _section(_SEC_CODE, code),
+        _section(_SEC_DATA, data),
+    ])
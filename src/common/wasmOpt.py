@@ -0,0 +1,422 @@
+"""
+Optimizations on the wasm code produced by the compilers, enabled with compile -O1 and -O2.
+
+The compilers translate every construct on its own into stack code, so the code
+contains constant subexpressions, roundabout encodings of negation and boolean not,
+and code that is never executed. The optimizer is a small pass manager: every pass
+rewrites one function, the passes run on all functions of the module and are
+repeated until nothing changes any more.
+
+Passes for -O1:
+
+- fold: constant folding. Operators whose operands are constants are evaluated
+  (with the wrap-around semantics of wasm), if and br_if on a constant condition
+  are resolved.
+- peephole: local rewrites of short instruction sequences, e.g. i32.const 0;
+  i32.eq to i32.eqz, a comparison followed by i32.eqz to the negated comparison,
+  local.set x; local.get x to local.tee x, multiplication with -1 to a subtraction
+  from 0, multiplication with a power of two to a shift, operations with a neutral
+  constant and values that are dropped right away are removed.
+- unreachable: instructions after br and unreachable in the same block are removed.
+
+-O2 additionally runs:
+
+- deadStores: local.set of a local that is never read becomes drop, local.tee of
+  such a local is removed.
+- blocks: a block or loop whose label no branch refers to is replaced by its body.
+- coalesce: locals of the same type whose live ranges do not overlap are merged
+  into one local. The compilers introduce a fresh local for every intermediate
+  result, so functions have many short-lived locals, which make the frames of the
+  wasm runtime larger. Liveness is computed backwards over the structured code: a
+  branch continues with the locals live at its target, the locals live at a loop
+  header are computed as a fixpoint. A local interferes with all locals live after
+  an assignment to it. Locals live at the start of the function might be read
+  before they are assigned (and then have their initial value 0), they are never
+  merged.
+
+Locals that are no longer used after optimization are removed from the function.
+"""
+from __future__ import annotations
+from typing import *
+from dataclasses import dataclass, replace
+from common.wasm import *
+import common.log as log
+import common.utils as utils
+
+@dataclass
+class OptPass:
+    name: str
+    run: Callable[[WasmFunc], WasmFunc]
+
+def instrPass(name: str, f: Callable[[list[WasmInstr]], list[WasmInstr]]) -> OptPass:
+    """
+    A pass that only rewrites the instructions of a function body.
+    """
+    return OptPass(name, lambda fn: replace(fn, instrs=f(fn.instrs)))
+
+_BITS: dict[str, int] = {'i32': 32, 'i64': 64}
+
+def _signed(ty: str, v: int) -> int:
+    bits = _BITS[ty]
+    v &= (1 << bits) - 1
+    return v - (1 << bits) if v >= (1 << (bits - 1)) else v
+
+def _unsigned(ty: str, v: int) -> int:
+    return v & ((1 << _BITS[ty]) - 1)
+
+def _intConst(i: WasmInstr) -> Optional[int]:
+    match i:
+        case WasmInstrConst('i32' | 'i64', val) if isinstance(val, int):
+            return _signed(i.ty, val)
+        case _:
+            return None
+
+def mapSeqs(instrs: list[WasmInstr],
+            f: Callable[[list[WasmInstr]], list[WasmInstr]]) -> list[WasmInstr]:
+    """
+    Applies f to every instruction sequence: first to the bodies of nested blocks,
+    loops and ifs, then to the sequence containing them.
+    """
+    res: list[WasmInstr] = []
+    for i in instrs:
+        match i:
+            case WasmInstrIf(ty, thenInstrs, elseInstrs):
+                i = WasmInstrIf(ty, mapSeqs(thenInstrs, f), mapSeqs(elseInstrs, f))
+            case WasmInstrLoop(label, body):
+                i = WasmInstrLoop(label, mapSeqs(body, f))
+            case WasmInstrBlock(label, ty, body):
+                i = WasmInstrBlock(label, ty, mapSeqs(body, f))
+            case _:
+                pass
+        res.append(i)
+    return f(res)
+
+def allInstrs(instrs: list[WasmInstr]) -> Iterator[WasmInstr]:
+    """
+    Yields all instructions, including those nested in blocks, loops and ifs.
+    """
+    for i in instrs:
+        yield i
+        match i:
+            case WasmInstrIf(_, thenInstrs, elseInstrs):
+                yield from allInstrs(thenInstrs)
+                yield from allInstrs(elseInstrs)
+            case WasmInstrLoop(_, body) | WasmInstrBlock(_, _, body):
+                yield from allInstrs(body)
+            case _:
+                pass
+
+def countInstrs(instrs: list[WasmInstr]) -> int:
+    return sum(1 for i in allInstrs(instrs) if not isinstance(i, WasmInstrComment))
+
+def _evalBinOp(ty: str, op: str, x: int, y: int) -> int:
+    bits = _BITS[ty]
+    match op:
+        case 'add': r = x + y
+        case 'sub': r = x - y
+        case 'mul': r = x * y
+        case 'xor': r = x ^ y
+        case 'and': r = x & y
+        case 'or': r = x | y
+        case 'shl': r = x << (_unsigned(ty, y) % bits)
+        case 'shr_u': r = _unsigned(ty, x) >> (_unsigned(ty, y) % bits)
+        case _: raise ValueError(f'Unknown operator {ty}.{op}')
+    return _signed(ty, r)
+
+def _evalRelOp(ty: str, op: str, x: int, y: int) -> bool:
+    if op.endswith('_u'):
+        (x, y) = (_unsigned(ty, x), _unsigned(ty, y))
+    match op:
+        case 'eq': return x == y
+        case 'ne': return x != y
+        case 'lt_s' | 'lt_u': return x < y
+        case 'gt_s' | 'gt_u': return x > y
+        case 'le_s' | 'le_u': return x <= y
+        case 'ge_s' | 'ge_u': return x >= y
+        case _: raise ValueError(f'Unknown operator {ty}.{op}')
+
+def _evalConvOp(op: str, x: int) -> WasmInstrConst:
+    match op:
+        case 'i32.wrap_i64': return WasmInstrConst('i32', _signed('i32', x))
+        case 'i64.extend_i32_u': return WasmInstrConst('i64', _unsigned('i32', x))
+        case _: return WasmInstrConst('i64', _signed('i32', x))
+
+def _foldSeq(instrs: list[WasmInstr]) -> list[WasmInstr]:
+    res: list[WasmInstr] = []
+    for i in instrs:
+        y = _intConst(res[-1]) if res else None
+        x = _intConst(res[-2]) if len(res) >= 2 else None
+        match i:
+            case WasmInstrNumBinOp('i32' | 'i64', op) if x is not None and y is not None:
+                del res[-2:]
+                res.append(WasmInstrConst(i.ty, _evalBinOp(i.ty, op, x, y)))
+            case WasmInstrIntRelOp(ty, op) if x is not None and y is not None:
+                del res[-2:]
+                res.append(WasmInstrConst('i32', int(_evalRelOp(ty, op, x, y))))
+            case WasmInstrIntTestOp(_, _) if y is not None:
+                res[-1] = WasmInstrConst('i32', int(y == 0))
+            case WasmInstrConvOp(op) if y is not None:
+                res[-1] = _evalConvOp(op, y)
+            case WasmInstrIf(_, thenInstrs, elseInstrs) if y is not None:
+                res.pop()
+                res.extend(thenInstrs if y != 0 else elseInstrs)
+            case WasmInstrBranch(target, True) if y is not None:
+                res.pop()
+                if y != 0:
+                    res.append(WasmInstrBranch(target, False))
+            case _:
+                res.append(i)
+    return res
+
+def fold(instrs: list[WasmInstr]) -> list[WasmInstr]:
+    return mapSeqs(instrs, _foldSeq)
+
+_NEGATED_RELOPS: dict[str, str] = {
+    'eq': 'ne', 'ne': 'eq', 'lt_s': 'ge_s', 'ge_s': 'lt_s', 'gt_s': 'le_s', 'le_s': 'gt_s',
+    'lt_u': 'ge_u', 'ge_u': 'lt_u', 'gt_u': 'le_u', 'le_u': 'gt_u'
+}
+
+def _negate(i: WasmInstrIntRelOp) -> WasmInstrIntRelOp:
+    return WasmInstrIntRelOp(i.ty, cast(Any, _NEGATED_RELOPS[i.op]))
+
+def _isBool(i: WasmInstr) -> bool:
+    """
+    True if the instruction pushes 0 or 1.
+    """
+    return isinstance(i, WasmInstrIntRelOp | WasmInstrIntTestOp)
+
+def _isPure(i: WasmInstr) -> bool:
+    """
+    True if the instruction only pushes a value, without side effects or operands.
+    """
+    match i:
+        case WasmInstrConst() | WasmInstrVarLocal('get', _) | WasmInstrVarGlobal('get', _):
+            return True
+        case _:
+            return False
+
+def _log2(n: int) -> Optional[int]:
+    if n > 1 and n & (n - 1) == 0:
+        return n.bit_length() - 1
+    return None
+
+def _rewrite(res: list[WasmInstr]) -> bool:
+    """
+    Rewrites the instructions at the end of res, returns True if something changed.
+    """
+    last = res[-1]
+    prev = res[-2] if len(res) >= 2 else None
+    c = _intConst(prev) if prev is not None else None
+    match (prev, last):
+        case (_, WasmInstrIntRelOp(ty, 'eq')) if c == 0:
+            res[-2:] = [WasmInstrIntTestOp(ty)]
+        case (WasmInstrIntRelOp(), WasmInstrIntTestOp('i32', _)):
+            res[-2:] = [_negate(prev)]
+        case (WasmInstrIntTestOp(), WasmInstrIntTestOp('i32', _)) \
+                if len(res) >= 3 and _isBool(res[-3]):
+            del res[-2:]
+        case (_, WasmInstrIntRelOp('i32', 'eq')) if c == 1 and len(res) >= 3 and _isBool(res[-3]):
+            del res[-2:]
+        case (_, WasmInstrIntRelOp('i32', 'ne')) if c == 1 and len(res) >= 3 and \
+                isinstance(res[-3], WasmInstrIntRelOp):
+            res[-3:] = [_negate(res[-3])]
+        case (_, WasmInstrNumBinOp(_, 'add' | 'sub' | 'xor' | 'or' | 'shl' | 'shr_u')) if c == 0:
+            del res[-2:]
+        case (_, WasmInstrNumBinOp('i32' | 'i64', 'mul')) if c == 1:
+            del res[-2:]
+        case (_, WasmInstrNumBinOp('i32' | 'i64', 'mul')) if c == -1 and len(res) >= 3 and \
+                _isPure(res[-3]):
+            res[-3:] = [WasmInstrConst(last.ty, 0), res[-3], WasmInstrNumBinOp(last.ty, 'sub')]
+        case (_, WasmInstrNumBinOp('i32' | 'i64', 'mul')) if c is not None and \
+                _log2(c) is not None:
+            res[-2:] = [WasmInstrConst(last.ty, cast(int, _log2(c))),
+                        WasmInstrNumBinOp(last.ty, 'shl')]
+        case (WasmInstrVarLocal('set', x), WasmInstrVarLocal('get', y)) if x == y:
+            res[-2:] = [WasmInstrVarLocal('tee', x)]
+        case (WasmInstrVarLocal('get', x), WasmInstrVarLocal('set', y)) if x == y:
+            del res[-2:]
+        case (WasmInstrVarLocal('tee', x), WasmInstrDrop()):
+            res[-2:] = [WasmInstrVarLocal('set', x)]
+        case (_, WasmInstrDrop()) if prev is not None and _isPure(prev):
+            del res[-2:]
+        case (_, WasmInstrIf(None, [], [])):
+            res[-1] = WasmInstrDrop()
+        case _:
+            return False
+    return True
+
+def _peepholeSeq(instrs: list[WasmInstr]) -> list[WasmInstr]:
+    res: list[WasmInstr] = []
+    for i in instrs:
+        res.append(i)
+        while res and _rewrite(res):
+            pass
+    return res
+
+def peephole(instrs: list[WasmInstr]) -> list[WasmInstr]:
+    return mapSeqs(instrs, _peepholeSeq)
+
+def _unreachableSeq(instrs: list[WasmInstr]) -> list[WasmInstr]:
+    for k, i in enumerate(instrs):
+        if isinstance(i, WasmInstrTrap) or (isinstance(i, WasmInstrBranch) and not i.conditional):
+            return instrs[:k + 1]
+    return instrs
+
+def unreachable(instrs: list[WasmInstr]) -> list[WasmInstr]:
+    return mapSeqs(instrs, _unreachableSeq)
+
+def deadStores(instrs: list[WasmInstr]) -> list[WasmInstr]:
+    read = {i.id for i in allInstrs(instrs) if isinstance(i, WasmInstrVarLocal) and i.op == 'get'}
+    def f(seq: list[WasmInstr]) -> list[WasmInstr]:
+        res: list[WasmInstr] = []
+        for i in seq:
+            match i:
+                case WasmInstrVarLocal('set', x) if x not in read:
+                    res.append(WasmInstrDrop())
+                case WasmInstrVarLocal('tee', x) if x not in read:
+                    pass
+                case _:
+                    res.append(i)
+        return res
+    return mapSeqs(instrs, f)
+
+def blocks(instrs: list[WasmInstr]) -> list[WasmInstr]:
+    targets = {i.target for i in allInstrs(instrs) if isinstance(i, WasmInstrBranch)}
+    def f(seq: list[WasmInstr]) -> list[WasmInstr]:
+        res: list[WasmInstr] = []
+        for i in seq:
+            match i:
+                case WasmInstrLoop(label, body) if label not in targets:
+                    res.extend(body)
+                case WasmInstrBlock(label, _, body) if label not in targets:
+                    res.extend(body)
+                case _:
+                    res.append(i)
+        return res
+    return mapSeqs(instrs, f)
+
+def _liveIn(instrs: list[WasmInstr], live: frozenset[WasmId],
+            labels: dict[WasmId, frozenset[WasmId]],
+            onAssign: Optional[Callable[[WasmId, frozenset[WasmId]], None]]) -> frozenset[WasmId]:
+    """
+    Returns the locals live before instrs, given the locals live after them and at the
+    labels of the enclosing blocks and loops. onAssign is called for every assignment
+    with the locals live after it.
+    """
+    for i in reversed(instrs):
+        match i:
+            case WasmInstrVarLocal('get', x):
+                live = live | {x}
+            case WasmInstrVarLocal(_, x):
+                if onAssign is not None:
+                    onAssign(x, live)
+                live = live - {x}
+            case WasmInstrBranch(target, conditional):
+                atTarget = labels.get(target, frozenset())
+                live = live | atTarget if conditional else atTarget
+            case WasmInstrTrap():
+                live = frozenset()
+            case WasmInstrIf(_, thenInstrs, elseInstrs):
+                live = _liveIn(thenInstrs, live, labels, onAssign) | \
+                    _liveIn(elseInstrs, live, labels, onAssign)
+            case WasmInstrBlock(label, _, body):
+                live = _liveIn(body, live, labels | {label: live}, onAssign)
+            case WasmInstrLoop(label, body):
+                header: frozenset[WasmId] = frozenset()
+                while True:
+                    new = _liveIn(body, live, labels | {label: header}, None)
+                    if new == header:
+                        break
+                    header = new
+                live = _liveIn(body, live, labels | {label: header}, onAssign)
+            case _:
+                pass
+    return live
+
+def coalesce(f: WasmFunc) -> WasmFunc:
+    interference: dict[WasmId, set[WasmId]] = {x: set() for (x, _) in f.locals}
+    def onAssign(x: WasmId, live: frozenset[WasmId]):
+        for y in live:
+            if y != x:
+                interference.setdefault(x, set()).add(y)
+                interference.setdefault(y, set()).add(x)
+    atEntry = _liveIn(f.instrs, frozenset(), {}, onAssign)
+    # Representative, type and members of the merged locals
+    groups: list[tuple[WasmId, WasmValtype, set[WasmId]]] = []
+    rename: dict[WasmId, WasmId] = {}
+    locals: list[tuple[WasmId, WasmValtype]] = []
+    for (x, t) in f.locals:
+        group = None
+        if x not in atEntry:
+            group = next((g for g in groups if g[1] == t and not (interference[x] & g[2])), None)
+        if group is None:
+            locals.append((x, t))
+            if x not in atEntry:
+                groups.append((x, t, {x}))
+        else:
+            group[2].add(x)
+            rename[x] = group[0]
+    if not rename:
+        return f
+    log.debug(f'coalesce {f.id.id}: {len(f.locals)} -> {len(locals)} locals')
+    def renameSeq(seq: list[WasmInstr]) -> list[WasmInstr]:
+        return [WasmInstrVarLocal(i.op, rename.get(i.id, i.id))
+                if isinstance(i, WasmInstrVarLocal) else i for i in seq]
+    return replace(f, locals=locals, instrs=mapSeqs(f.instrs, renameSeq))
+
+O1_PASSES = [instrPass('fold', fold), instrPass('peephole', peephole),
+             instrPass('unreachable', unreachable)]
+O2_PASSES = O1_PASSES + [instrPass('deadStores', deadStores), instrPass('blocks', blocks),
+                         OptPass('coalesce', coalesce)]
+ALL_PASSES: dict[str, OptPass] = {p.name: p for p in O2_PASSES}
+
+def passesForLevel(level: int) -> list[OptPass]:
+    if level <= 0:
+        return []
+    return O1_PASSES if level == 1 else O2_PASSES
+
+def selectPasses(level: int, names: Optional[list[str]]) -> list[OptPass]:
+    """
+    Returns the passes with the given names, or the passes of the optimization level
+    if no names are given.
+    """
+    if names is None:
+        return passesForLevel(level)
+    for n in names:
+        if n not in ALL_PASSES:
+            utils.abort(f'Unknown wasm optimization pass {n}, known passes: ' +
+                        ', '.join(ALL_PASSES))
+    return [ALL_PASSES[n] for n in names]
+
+def runPasses(f: WasmFunc, passes: Sequence[OptPass], maxRounds: int = 10) -> WasmFunc:
+    """
+    Runs the passes in order, repeatedly, until none of them changes the function.
+    """
+    for _ in range(maxRounds):
+        changed = False
+        for p in passes:
+            new = p.run(f)
+            if new != f:
+                log.debug(f'{p.name}: {countInstrs(new.instrs)} instructions')
+                f = new
+                changed = True
+        if not changed:
+            break
+    return f
+
+def optimizeFunc(f: WasmFunc, passes: Sequence[OptPass]) -> WasmFunc:
+    res = runPasses(f, passes)
+    used = {i.id for i in allInstrs(res.instrs) if isinstance(i, WasmInstrVarLocal)}
+    res = replace(res, locals=[(x, t) for (x, t) in res.locals if x in used])
+    if passes:
+        log.info(f'Wasm optimization of {f.id.id}: {len(f.locals)} -> {len(res.locals)} locals')
+    return res
+
+def optimizeModule(m: WasmModule, passes: Sequence[OptPass]) -> WasmModule:
+    if not passes:
+        return m
+    funcs = [optimizeFunc(f, passes) for f in m.funcs]
+    before = sum(countInstrs(f.instrs) for f in m.funcs)
+    after = sum(countInstrs(f.instrs) for f in funcs)
+    log.info(f'Wasm optimization: {before} -> {after} instructions')
+    return replace(m, funcs=funcs)
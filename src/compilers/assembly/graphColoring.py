@@ -1,9 +1,11 @@
 from assembly.common import *
 import assembly.tac_ast as tac
 import common.log as log
-from common.prioQueue import PrioQueue
+import common.utils as utils
+from assembly.graph import CompactGraph
+from common.prioQueue import BucketPrioQueue
 
-def chooseColor(x: tac.ident, forbidden: dict[tac.ident, set[int]]) -> int:
+def chooseColor(x: int, forbidden: list[set[int]]) -> int:
     """
     Returns the lowest possible color for variable x that is not forbidden for x.
     """
@@ -24,15 +26,17 @@ def colorInterfGraph(g: InterfGraph, secondaryOrder: dict[tac.ident, int]={},
       if two variables have the same number of forbidden colors.
     """
     log.debug(f"Coloring interference graph with maxRegs={maxRegs}")
-    colors: dict[tac.ident, int] = {}
-    # changed this to remove error
-    forbidden: dict[tac.ident, set[int]] = {v: set() for v in g.vertices}
-    q = PrioQueue(secondaryOrder)
+    # Vertices are identified by their index in the compact graph
+    cg = g if isinstance(g, CompactGraph) else CompactGraph.fromGraph(g)
+    n = len(cg)
+    colors: list[Optional[int]] = [None] * n
+    forbidden: list[set[int]] = [set() for _ in range(n)]
+    q = BucketPrioQueue[int]({cg.index[x]: i for x, i in secondaryOrder.items() if cg.hasVertex(x)})
 
     # SEE PAGE 58 OF SLIDES
 
     # Step 1: Initialize the priority queue with all vertices
-    for v in g.vertices:
+    for v in range(n):
         q.push(v, 0)
 
     # Step 2-6: Color the graph
@@ -45,12 +49,14 @@ def colorInterfGraph(g: InterfGraph, secondaryOrder: dict[tac.ident, int]={},
         colors[u] = color
         
         # Step 5: Update the forbidden sets of all adjacent vertices
-        for v in g.succs(u):
-            if v not in forbidden:
+        for v in cg.succsIdx(u):
+            # Colored vertices are no longer in the queue
+            if colors[v] is not None or color in forbidden[v]:
                 continue
-            # Update the forbidden sets of all adjacent vertices
+            # The priority of v is the number of its forbidden colors
             forbidden[v].add(color)
             q.incPrio(v)
 
-    m = RegisterAllocMap(colors, maxRegs)
+    m = RegisterAllocMap({x: utils.assertNotNone(colors[i]) for i, x in enumerate(cg.vertices)},
+                         maxRegs)
     return m
@@ -1,5 +1,17 @@
+"""
+Liveness analysis and construction of the interference graph.
+
+Liveness is solved with a worklist algorithm. The variables are numbered densely and
+sets of live variables are represented as bitsets (Python ints, bit i stands for
+variable i). Each block is summarized once by its gen/kill sets, the worklist
+initially holds the blocks in postorder (reverse postorder is the natural order for
+forward problems, liveness is a backward problem) and a block is only revisited if the
+live-in set of one of its successors changed. The sets before and after each
+instruction are computed once after the fixpoint is reached.
+"""
+from collections import deque
 from assembly.common import *
-from assembly.graph import Graph
+from assembly.graph import CompactGraph
 import assembly.tac_ast as tac
 
 def instrDef(instr: tac.instr) -> set[tac.ident]:
@@ -17,7 +29,7 @@ def instrDef(instr: tac.instr) -> set[tac.ident]:
             return set()
         case tac.Label(label=_):
             return set()
-        
+
 def usePrim(prim: tac.prim) -> set[tac.ident]:
     """
     Returns the set of identifiers used by a primitive.
@@ -40,7 +52,6 @@ def instrUse(instr: tac.instr) -> set[tac.ident]:
                 case tac.BinOp(left=left, right=right, op=_):
                     return usePrim(left) | usePrim(right)
         case tac.Call(var=_, name=_, args=args):
-            # We have to consider the case where args is a list of Name
             return {arg.var for arg in args if isinstance(arg, tac.Name)}
         case tac.GotoIf(test=prim, label=_):
             return usePrim(prim)
@@ -49,6 +60,27 @@ def instrUse(instr: tac.instr) -> set[tac.ident]:
         case tac.Label(label=_):
             return set()
 
+def moveSource(instr: tac.instr) -> Optional[tac.ident]:
+    """
+    Returns y if the instruction is a move x = y, None otherwise.
+    """
+    match instr:
+        case tac.Assign(var=_, left=tac.Prim(p=tac.Name(var=y))):
+            return y
+        case _:
+            return None
+
+def bits(s: int) -> Iterator[int]:
+    """
+    Yields the indices of the bits set in s, lowest first.
+    """
+    # Searching the binary representation is faster than shifting large ints.
+    b = bin(s)
+    top = len(b) - 1
+    i = b.rfind('1')
+    while i > 1:
+        yield top - i
+        i = b.rfind('1', 0, i)
 
 # Each individual instruction has an identifier. This identifier is the tuple
 # (index of basic block, index of instruction inside the basic block)
@@ -56,176 +88,118 @@ type InstrId = tuple[int, int]
 
 class InterfGraphBuilder:
     def __init__(self):
-        # self.before holds, for each instruction I, to set of variables live before I.
-        self.before: dict[InstrId, set[tac.ident]] = {}
-        # self.after holds, for each instruction I, to set of variables live after I.
-        self.after: dict[InstrId, set[tac.ident]] = {}
-
-    def __liveStart(self, bb: BasicBlock, s: set[tac.ident]) -> set[tac.ident]:
+        # self.vars[i] is the variable represented by bit i.
+        self.vars: list[tac.ident] = []
+        self.varIdx: dict[tac.ident, int] = {}
+        # self.before holds, for each instruction I, the bitset of variables live before I.
+        self.before: dict[InstrId, int] = {}
+        # self.after holds, for each instruction I, the bitset of variables live after I.
+        self.after: dict[InstrId, int] = {}
+
+    def __bit(self, x: tac.ident) -> int:
+        i = self.varIdx.get(x)
+        if i is None:
+            i = len(self.vars)
+            self.vars.append(x)
+            self.varIdx[x] = i
+        return 1 << i
+
+    def __bitset(self, xs: set[tac.ident]) -> int:
+        s = 0
+        for x in sorted(xs, key=lambda x: x.name):
+            s |= self.__bit(x)
+        return s
+
+    def varSet(self, s: int) -> set[tac.ident]:
         """
-        Given a set of variables s and a basic block bb, __liveStart computes
-        the set of variables live at the beginning of bb, assuming that s
-        are the variables live at the end of the block.
-
-        Essentially, you have to implement the subalgorithm "Computing L_start" from
-        slide 46 here. You should update self.after and self.before while traversing
-        the instructions of the basic block in reverse.
+        Converts a bitset into a set of variables.
         """
-        # Get the instructions of the basic block
-        instructions = bb.instrs
-        n = len(instructions)
-        
-        # Initialize L_after(n) = S
-        live_after = s
-
-        # Iterate over the instructions in reverse order
-        for k in range(n - 1, -1, -1):
-            # Get the instruction ID
-            instr_id = (bb.index, k)
-            # Get the instruction at index k
-            instr = instructions[k]
-
-            # L_before(k) = (L_after(k) \ def(instr)) ∪ use(instr)
-            live_before = (live_after - instrDef(instr)) | instrUse(instr)
-            
-            # Update self.before and self.after
-            self.after[instr_id] = live_after
-            self.before[instr_id] = live_before
-            
-            # Set live_after for the next iteration
-            live_after = live_before
-
-        # Return L_before(0) as L_start(B, S)
-        #return live_after
-        return self.before.get((bb.index, 0), set())
-
-    def __liveness(self, g: ControlFlowGraph):
-        """
-        This method computes liveness information and fills the sets self.before and
-        self.after.
+        return {self.vars[i] for i in bits(s)}
 
-        You have to implement the algorithm for computing liveness in a CFG from
-        slide 46 here.
-        """
-        # Initialize IN and OUT sets for each block
-        in_sets: dict[int, set[tac.ident]] = {block: set() for block in g.vertices}
-        out_sets: dict[int, set[tac.ident]] = {block: set() for block in g.vertices}
-        
-        # Flag to check if any changes were made in an iteration
-        changed = True
-
-        while changed:
-            changed = False
-
-            # Process each block in reverse order of their index
-            for block_index in sorted(g.vertices, reverse=True):
-                block = g.getData(block_index)
-                
-                # Compute OUT[B] as the union of IN sets of successors
-                new_out_set: set[tac.ident] = set()
-                for succ in g.succs(block_index):
-                    new_out_set |= in_sets[succ]
-
-                # if OUT set changed
-                if new_out_set != out_sets[block_index]:
-                    out_sets[block_index] = new_out_set
-                    changed = True
-
-                # Compute IN[B] using OUT[B] and liveStart
-                new_in_set = self.__liveStart(block, out_sets[block_index])
-                if new_in_set != in_sets[block_index]:
-                    in_sets[block_index] = new_in_set
-                    changed = True
-
-        # Update self.before and self.after using the final IN and OUT sets
-        for block_index in g.vertices:
-            # Get the block and its instructions
-            block = g.getData(block_index)
-            # Get the instructions of the block
-            instructions = block.instrs
-            
-            # Initialize live_after with the OUT set of the block
-            live_after = out_sets[block_index]
-            # Iterate over the instructions in reverse order
-            for i in range(len(instructions) - 1, -1, -1):
-                # Get the instruction ID
-                instr_id = (block.index, i)
-                # Update self.before and self.after
-                self.after[instr_id] = live_after
-                self.before[instr_id] = (live_after - instrDef(instructions[i])) | instrUse(instructions[i])
-                live_after = self.before[instr_id]
-
-        #print("IN sets:", in_sets)
-        #print("OUT sets:", out_sets)
-        #print("AHHHHHH")
-
-
-    def __addEdgesForInstr(self, instrId: InstrId, instr: tac.instr, interfG: InterfGraph):
+    def analyze(self, g: ControlFlowGraph) -> list[tuple[int, InstrId, int]]:
         """
-        Given an instruction and its ID, adds the edges resulting from the instruction
-        to the interference graph.
-
-        You should implement the algorithm specified on the slide
-        "Computing the interference graph" (slide 50) here.
+        Fills self.before and self.after. Returns, for every instruction defining a
+        variable, the bitset of variables defined, the ID of the instruction and the
+        bitset of variables that do not interfere with the defined variables at this
+        instruction (the defined variables and the source of a move).
         """
-        # Get the set of variables live before and after the instruction
-        live_before = self.before[instrId]
-        live_after = self.after[instrId]
-
-        all_vars = live_before | live_after
-        def_vars = instrDef(instr)
-
-        print(f"Instruction ID: {instrId}, Instruction: {instr}")
-        print(f"Live before: {live_before}, Live after: {live_after}")
-        print(f"Def vars: {def_vars}")
-
-        for v in def_vars:
-            if v not in interfG.vertices:
-                interfG.addVertex(v, None)
-        
-        for u in all_vars:
-            if u not in interfG.vertices:
-                interfG.addVertex(u, None)
-            for v in def_vars:
-                if u != v:
-                    # Ensure we're not adding an edge if it's not a real interference
-                    if not (isinstance(instr, tac.Assign) and isinstance(instr.left, tac.BinOp) and 
-                            isinstance(instr.left.left, tac.Name) and u == instr.left.left.var):
-                        print(f"Adding edge between {u} and {v}")
-                        interfG.addEdge(u, v)
+        blocks = sorted(g.vertices)
+        # use/def bitsets of the instructions, gen/kill bitsets of the blocks
+        uses: dict[int, list[int]] = {}
+        defs: dict[int, list[int]] = {}
+        gen: dict[int, int] = {}
+        kill: dict[int, int] = {}
+        for b in blocks:
+            instrs = g.getData(b).instrs
+            uses[b] = [self.__bitset(instrUse(i)) for i in instrs]
+            defs[b] = [self.__bitset(instrDef(i)) for i in instrs]
+            genB = 0
+            killB = 0
+            for k in range(len(instrs) - 1, -1, -1):
+                genB = uses[b][k] | (genB & ~defs[b][k])
+                killB |= defs[b][k]
+            gen[b] = genB
+            kill[b] = killB
+        # Blocks not reachable from the entry are analyzed as well
+        order = list(g.reversePostorder)
+        reachable = set(order)
+        order.extend(b for b in blocks if b not in reachable)
+        liveIn: dict[int, int] = {b: 0 for b in blocks}
+        liveOut: dict[int, int] = {b: 0 for b in blocks}
+        worklist = deque(reversed(order))
+        inWorklist = set(blocks)
+        while worklist:
+            b = worklist.popleft()
+            inWorklist.discard(b)
+            out = 0
+            for s in g.succs(b):
+                out |= liveIn[s]
+            liveOut[b] = out
+            newIn = gen[b] | (out & ~kill[b])
+            if newIn != liveIn[b]:
+                liveIn[b] = newIn
+                for p in g.preds(b):
+                    if p not in inWorklist:
+                        inWorklist.add(p)
+                        worklist.append(p)
+        result: list[tuple[int, InstrId, int]] = []
+        for b in blocks:
+            instrs = g.getData(b).instrs
+            live = liveOut[b]
+            for k in range(len(instrs) - 1, -1, -1):
+                instrId = (b, k)
+                self.after[instrId] = live
+                live = uses[b][k] | (live & ~defs[b][k])
+                self.before[instrId] = live
+                if defs[b][k]:
+                    src = moveSource(instrs[k])
+                    noInterf = defs[b][k] | (self.__bit(src) if src is not None else 0)
+                    result.append((defs[b][k], instrId, noInterf))
+        return result
 
     def build(self, g: ControlFlowGraph) -> InterfGraph:
         """
         This method builds the interference graph. It performs three steps:
 
-        - Use __liveness to fill the sets self.before and self.after.
-        - Setup the interference graph as an undirected graph containing all variables
-        defined or used by any instruction of any basic block. Initially, the
-        graph does not have any edges.
-        - Use __addEdgesForInstr to fill the edges of the interference graph.
+        - Use analyze to fill the sets self.before and self.after.
+        - Compute, for every variable, the bitset of variables it interferes with. A
+        variable x defined by an instruction interferes with all variables live after
+        the instruction, except with x itself and, for a move x = y, with y.
+        - Setup the interference graph as a compact undirected graph containing all
+        variables defined or used by any instruction of any basic block.
         """
-        # Use __liveness to fill the sets self.before and self.after
-        self.__liveness(g)
-
-        # Setup the interference graph
-        interfG = Graph[tac.ident, None](kind='undirected')
-        all_vars: set[tac.ident] = set()
-
-        for block_index in g.vertices:
-            block = g.getData(block_index)
-            for i, instr in enumerate(block.instrs):
-                all_vars |= instrDef(instr) | instrUse(instr)
-
-        for var in all_vars:
-            interfG.addVertex(var, None)
-
-        for block_index in g.vertices:
-            block = g.getData(block_index)
-            for i, instr in enumerate(block.instrs):
-                instr_id = (block.index, i)
-                self.__addEdgesForInstr(instr_id, instr, interfG)
-
-        return interfG
+        defining = self.analyze(g)
+        adj = [0] * len(self.vars)
+        for (defBits, instrId, noInterf) in defining:
+            others = self.after[instrId] & ~noInterf
+            for d in bits(defBits):
+                adj[d] |= others
+        succs: list[list[int]] = [list(bits(s)) for s in adj]
+        for i, s in enumerate(adj):
+            for j in bits(s):
+                succs[j].append(i)
+        return CompactGraph[tac.ident, None]('undirected', self.vars, [None] * len(self.vars),
+                                             succs)
 
 
 def buildInterfGraph(g: ControlFlowGraph) -> InterfGraph:
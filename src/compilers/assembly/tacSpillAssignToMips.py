@@ -21,21 +21,47 @@ def mipsOp(op: tacSpill.op) -> mips.op:
         case _:
             raise ValueError(f'Unsupported operator: {op}')
 
+# Operators with their arguments swapped: c op y is the same as y op' c
+_SWAPPED = {'ADD': 'ADD', 'MUL': 'MUL', 'EQ': 'EQ', 'NE': 'NE',
+            'LT_S': 'GT_S', 'GT_S': 'LT_S', 'LE_S': 'GE_S', 'GE_S': 'LE_S'}
+
+def opWithConst(x: mips.reg, y: mips.reg, op: str, n: int) -> list[mips.instr]:
+    """
+    Instruction selection for x = y op n, using the immediate forms of instructions
+    where possible. Multiplication always uses mulo (except with 1), so that it traps
+    on overflow like add and sub. Replacing it by sll would silently wrap.
+    """
+    match op:
+        case 'ADD' if fitsImm(n):
+            return [mips.OpI(mips.AddI(), x, y, mips.Imm(n))]
+        case 'SUB' if fitsImm(-n):
+            return [mips.OpI(mips.AddI(), x, y, mips.Imm(-n))]
+        case 'LT_S' if fitsImm(n):
+            return [mips.OpI(mips.LessI(), x, y, mips.Imm(n))]
+        case 'LE_S' if fitsImm(n + 1):
+            return [mips.OpI(mips.LessI(), x, y, mips.Imm(n + 1))]
+        case 'MUL' if n == 1:
+            return [mips.Move(x, y)]
+        case _:
+            tmp = Regs.t3
+            return loadConst(tmp, n) + [mips.Op(mipsOp(tacSpill.Op(op)), x, y, tmp)]
+
 def assignToMips(i: tacSpill.Assign) -> list[mips.instr]:
     match i:
         case tacSpill.Assign(x, tacSpill.Prim(tacSpill.Const(n))):
-            return [mips.LoadI(reg(x), imm(n))]
+            return loadConst(reg(x), n)
         case tacSpill.Assign(x, tacSpill.Prim(tacSpill.Name(y))):
             return [mips.Move(reg(x), reg(y))]
         case tacSpill.Assign(x, tacSpill.BinOp(tacSpill.Const(n1), op, tacSpill.Const(n2))):
             n3 = tacInterp.evalExp(tac.BinOp(tac.Const(n1), tac.Op(op.name), tac.Const(n2)), {})
-            return [mips.LoadI(reg(x), imm(n3))]
+            return loadConst(reg(x), n3)
         case tacSpill.Assign(x, tacSpill.BinOp(tacSpill.Name(y1), op, tacSpill.Const(n2))):
-            tmp = Regs.t2
-            return [mips.LoadI(tmp, imm(n2)), mips.Op(mipsOp(op), reg(x), reg(y1), tmp)]
+            return opWithConst(reg(x), reg(y1), op.name, n2)
         case tacSpill.Assign(x, tacSpill.BinOp(tacSpill.Const(n1), op, tacSpill.Name(y2))):
-            tmp = Regs.t2
-            return [mips.LoadI(tmp, imm(n1)), mips.Op(mipsOp(op), reg(x), tmp, reg(y2))]
+            if op.name in _SWAPPED:
+                return opWithConst(reg(x), reg(y2), _SWAPPED[op.name], n1)
+            tmp = Regs.t3
+            return loadConst(tmp, n1) + [mips.Op(mipsOp(op), reg(x), tmp, reg(y2))]
         case tacSpill.Assign(x, tacSpill.BinOp(tacSpill.Name(y1), op, tacSpill.Name(y2))):
             return [mips.Op(mipsOp(op), reg(x), reg(y1), reg(y2))]
         case tacSpill.Assign(_, _):
@@ -3,7 +3,9 @@ import lang_array.array_ast as plainAst
 from common.wasm import *
 import lang_array.array_tychecker as array_tychecker
 import lang_array.array_transform as array_transform
+import compilers.lang_array.array_boundsChecks as array_boundsChecks
 from lang_array.array_compilerSupport import *
+import lang_array.array_runtime as array_runtime
 from common.compilerSupport import *
 #import common.utils as utils
 from pprint import pprint
@@ -66,6 +68,18 @@ def checkInside(ty: optional[ty]) -> ty:
             return ty
         
 # compile AtomExp to WasmInstr
+def constArrayElem(a: atomExp) -> Optional[int]:
+    """
+    The value of a constant array element, None if a is not a constant.
+    """
+    match a:
+        case IntConst(v):
+            return v
+        case BoolConst(v):
+            return int(v)
+        case _:
+            return None
+
 def compileAtomExp(a: atomExp, cfg: CompilerConfig) -> list[WasmInstr]:
     match a:
         case IntConst(v):
@@ -75,7 +89,7 @@ def compileAtomExp(a: atomExp, cfg: CompilerConfig) -> list[WasmInstr]:
         case Name(name):
             return [WasmInstrVarLocal('get', WasmId("$" + name.name))]
 
-def compileExp(exp: exp, cfg: CompilerConfig) -> list[WasmInstr]:
+def compileExp(exp: exp, cfg: CompilerConfig, bc: BoundsChecks, data: DataSegments) -> list[WasmInstr]:
     # debug info - analyze the expression
     # [,StmtExp(exp=Call(name=Ident(name='print'), args=[Name(name=Ident(name='x'))]))]
     # debug info
@@ -86,11 +100,14 @@ def compileExp(exp: exp, cfg: CompilerConfig) -> list[WasmInstr]:
         # traslate Name to WasmInstrVarLocal
         #case Name(name):
             #return [WasmInstrVarLocal('get', WasmId("$" + name.name))]
+        # len of an array is read from a local if it was hoisted out of the loop
+        case Call(Ident('len'), [AtomExp(a)]):
+            return arrayLenOf(a, cfg, bc)
         # translate Call to WasmInstrCall (and compile the arguments)
         case Call(name, args):
             instrs : list[WasmInstr] = []
             for arg in args:
-                instrs += compileExp(arg, cfg)
+                instrs += compileExp(arg, cfg, bc, data)
             # map print to print_i64 and input_int to input_i64
             if name.name == 'print':
                 if exp.ty == Void() and tyOfExp(args[0]) == Int():
@@ -111,13 +128,13 @@ def compileExp(exp: exp, cfg: CompilerConfig) -> list[WasmInstr]:
             return instrs
         # translate UnOp to WasmInstrConst and WasmInstrNumBinOp
         case UnOp(USub(), arg):
-            instrs = compileExp(arg, cfg)
+            instrs = compileExp(arg, cfg, bc, data)
             instrs.append(WasmInstrConst('i64', -1))
             instrs.append(WasmInstrNumBinOp('i64', 'mul'))
             return instrs
         # translate UnOp to WasmInstrIntRelOp
         case UnOp(Not(), arg):
-            instrs = compileExp(arg, cfg)
+            instrs = compileExp(arg, cfg, bc, data)
             # 1 auf den Stapel legen (repräsentiert True)
             instrs.append(WasmInstrConst('i32', 1))
             # Wert auf dem Stapel mit arg vergleichen
@@ -128,50 +145,50 @@ def compileExp(exp: exp, cfg: CompilerConfig) -> list[WasmInstr]:
             return instrs
         # translate BinOp to WasmInstrNumBinOp Add()
         case BinOp(left, Add(), right):
-            instrs = compileExp(left, cfg)
-            instrs += compileExp(right, cfg)
+            instrs = compileExp(left, cfg, bc, data)
+            instrs += compileExp(right, cfg, bc, data)
             instrs.append(WasmInstrNumBinOp('i64', 'add'))
             return instrs
         # translate BinOp to WasmInstrNumBinOp Sub()
         case BinOp(left, Sub(), right):
-            instrs = compileExp(left, cfg)
-            instrs += compileExp(right, cfg)
+            instrs = compileExp(left, cfg, bc, data)
+            instrs += compileExp(right, cfg, bc, data)
             instrs.append(WasmInstrNumBinOp('i64', 'sub'))
             return instrs
         # translate BinOp to WasmInstrNumBinOp Mul()
         case BinOp(left, Mul(), right):
-            instrs = compileExp(left, cfg)
-            instrs += compileExp(right, cfg)
+            instrs = compileExp(left, cfg, bc, data)
+            instrs += compileExp(right, cfg, bc, data)
             instrs.append(WasmInstrNumBinOp('i64', 'mul'))
             return instrs
         # translate BinOp to WasmInstrIntRelOp Less()
         case BinOp(left, Less(), right):
-            instrs = compileExp(left, cfg)
-            instrs += compileExp(right, cfg)
+            instrs = compileExp(left, cfg, bc, data)
+            instrs += compileExp(right, cfg, bc, data)
             instrs.append(WasmInstrIntRelOp('i64', 'lt_s'))
             return instrs
         # translate BinOp to WasmInstrIntRelOp LessEq()
         case BinOp(left, LessEq(), right):
-            instrs = compileExp(left, cfg)
-            instrs += compileExp(right, cfg)
+            instrs = compileExp(left, cfg, bc, data)
+            instrs += compileExp(right, cfg, bc, data)
             instrs.append(WasmInstrIntRelOp('i64', 'le_s'))
             return instrs
         # translate BinOp to WasmInstrIntRelOp Greater()
         case BinOp(left, Greater(), right):
-            instrs = compileExp(left, cfg)
-            instrs += compileExp(right, cfg)
+            instrs = compileExp(left, cfg, bc, data)
+            instrs += compileExp(right, cfg, bc, data)
             instrs.append(WasmInstrIntRelOp('i64', 'gt_s'))
             return instrs
         # translate BinOp to WasmInstrIntRelOp GreaterEq()
         case BinOp(left, GreaterEq(), right):
-            instrs = compileExp(left, cfg)
-            instrs += compileExp(right, cfg)
+            instrs = compileExp(left, cfg, bc, data)
+            instrs += compileExp(right, cfg, bc, data)
             instrs.append(WasmInstrIntRelOp('i64', 'ge_s'))
             return instrs
         # translate BinOp to WasmInstrIntRelOp Eq()
         case BinOp(left, Eq(), right):
-            instrs = compileExp(left, cfg)
-            instrs += compileExp(right, cfg)
+            instrs = compileExp(left, cfg, bc, data)
+            instrs += compileExp(right, cfg, bc, data)
             # check if 'i64' or 'i32'
             if tyOfExp(left) == Int():
                 instrs.append(WasmInstrIntRelOp('i64', 'eq'))
@@ -180,8 +197,8 @@ def compileExp(exp: exp, cfg: CompilerConfig) -> list[WasmInstr]:
             return instrs
         # translate BinOp to WasmInstrIntRelOp NotEq()
         case BinOp(left, NotEq(), right):
-            instrs = compileExp(left, cfg)
-            instrs += compileExp(right, cfg)
+            instrs = compileExp(left, cfg, bc, data)
+            instrs += compileExp(right, cfg, bc, data)
             if tyOfExp(left) == Int():
                 instrs.append(WasmInstrIntRelOp('i64', 'ne'))
             else:
@@ -192,18 +209,18 @@ def compileExp(exp: exp, cfg: CompilerConfig) -> list[WasmInstr]:
             #return [WasmInstrConst('i32', 1 if v else 0)]
         # translate BinOp to WasmInstrIf
         case BinOp(left, And(), right):
-            instrs = compileExp(left, cfg)
-            instrs.append(WasmInstrIf('i32', compileExp(right, cfg), [WasmInstrConst('i32', 0)]))
+            instrs = compileExp(left, cfg, bc, data)
+            instrs.append(WasmInstrIf('i32', compileExp(right, cfg, bc, data), [WasmInstrConst('i32', 0)]))
             return instrs
         # translate BinOp to WasmInstrIf using same approach like and but returning true if first true
         case BinOp(left, Or(), right):
-            instrs = compileExp(left, cfg)
-            instrs.append(WasmInstrIf('i32', [WasmInstrConst('i32', 1)], compileExp(right, cfg)))
+            instrs = compileExp(left, cfg, bc, data)
+            instrs.append(WasmInstrIf('i32', [WasmInstrConst('i32', 1)], compileExp(right, cfg, bc, data)))
             return instrs
         # create BinOp for Is operation for example to compare to arrays if they are the same
         case BinOp(left, Is(), right):
-            instrs = compileExp(left, cfg)
-            instrs += compileExp(right, cfg)
+            instrs = compileExp(left, cfg, bc, data)
+            instrs += compileExp(right, cfg, bc, data)
             instrs.append(WasmInstrIntRelOp('i32', 'eq'))
             return instrs
         # translate AtomExp which is either IntConst, BoolConst or Name
@@ -219,46 +236,27 @@ def compileExp(exp: exp, cfg: CompilerConfig) -> list[WasmInstr]:
         case ArrayInitDyn(lenExp, elemInit):
             # this leaves the array address on top of the stack
             init_array = compileInitArray(lenExp, tyInArr(exp), cfg)
-            # first element has offset of four and the value 
-            instrs = []
-            instrs.append(WasmInstrVarLocal('tee', WasmId('$@tmp_i32')))
-            instrs.append(WasmInstrVarLocal('get', WasmId('$@tmp_i32')))
-            instrs.append(WasmInstrConst('i32', 4))
-            instrs.append(WasmInstrNumBinOp('i32', 'add'))
-            # set tmp_i32 to the address of the first element
-            instrs.append(WasmInstrVarLocal('set', WasmId('$@tmp_i32')))
-            # create a block with the loop where block $loop_exit and loop $loop_start
-            instrs.append(WasmInstrBlock(
-                label=WasmId('$loop_exit'),
-                result=None,
-                body=[
-                    WasmInstrLoop(
-                        label=WasmId('$loop_start'),
-                        body=[
-                            WasmInstrVarLocal('get', WasmId('$@tmp_i32')),
-                            WasmInstrVarGlobal('get', WasmId('$@free_ptr')),
-                            WasmInstrIntRelOp('i32', 'lt_u'),
-                            WasmInstrIf(None, [], [WasmInstrBranch(WasmId('$loop_exit'), False)]),
-                            WasmInstrVarLocal('get', WasmId('$@tmp_i32')),
-                            compileAtomExp(elemInit, cfg)[0],
-                            WasmInstrMem('i64' if tyInArr(exp) == Int() else 'i32', 'store'),
-                            WasmInstrVarLocal('get', WasmId('$@tmp_i32')),
-                            # size of the element
-                            WasmInstrConst('i32', forTyRetByte(tyInArr(exp))),
-                            WasmInstrNumBinOp('i32', 'add'),
-                            WasmInstrVarLocal('set', WasmId('$@tmp_i32')),
-                            WasmInstrBranch(WasmId('$loop_start'), False)
-                        ]
-                    )
-                ]
-            ))
-            init_array += instrs
+            # a constant whose bytes are all the same (e.g. 0, -1, False) is set by memory.fill
+            value = constArrayElem(elemInit) if cfg.bulkMemory else None
+            if value is not None:
+                byte = fillByte(elemBytes(value, forTyRetByte(tyInArr(exp))))
+                if byte is not None:
+                    return init_array + fillArrayInstrs(byte, compileAtomExp(lenExp, cfg), forTyRetByte(tyInArr(exp)))
+            # the runtime sets all elements
+            init_array += compileAtomExp(elemInit, cfg)
+            init_array += array_runtime.fillInstrs('i64' if tyInArr(exp) == Int() else 'i32')
             pprint(init_array)
             return init_array
                     
         case ArrayInitStatic(elemInit):
             # this leaves the array address on top of the stack
             init_array = compileInitArray(IntConst(len(elemInit)), tyInArr(exp), cfg)
+            # constant elements are copied from a data segment
+            values = [constArrayElem(e) for e in elemInit]
+            if cfg.bulkMemory and len(values) > 1 and None not in values:
+                size = forTyRetByte(tyInArr(exp))
+                content = b''.join(elemBytes(v, size) for v in values if v is not None)
+                return init_array + copyArrayInstrs(data.add(content), len(content))
             # first element has offset of four and the value 
             instrs = []
             instrs.append(WasmInstrVarLocal('tee', WasmId('$@tmp_i32')))
@@ -286,7 +284,7 @@ def compileExp(exp: exp, cfg: CompilerConfig) -> list[WasmInstr]:
         # translate Subscript
         case Subscript(arrExp, indexExp):
             # arrayOffsetInstrs returns instructions that leave the address of a certain element on top of stack
-            instrs = arrayOffsetInstrs(arrExp, indexExp, cfg)
+            instrs = arrayOffsetInstrs(arrExp, indexExp, cfg, bc, not bc.isSafe(exp))
             # get the index
             #instrs += compileExp(indexExp, cfg)
             instrs.append(WasmInstrMem('i64' if tyOfExp(exp) == Int() else 'i32', 'load'))
@@ -295,7 +293,7 @@ def compileExp(exp: exp, cfg: CompilerConfig) -> list[WasmInstr]:
         case _:
             raise Exception(f'No match for expression {exp}')
 
-def compileStmts(stmts: list[stmt], cfg: CompilerConfig) -> list[WasmInstr]:
+def compileStmts(stmts: list[stmt], cfg: CompilerConfig, bc: BoundsChecks, data: DataSegments, frame: Frame) -> list[WasmInstr]:
     # create pattern matching stmt can be StmtExp | Assign
     # instruction list that will be returned
 
@@ -306,18 +304,20 @@ def compileStmts(stmts: list[stmt], cfg: CompilerConfig) -> list[WasmInstr]:
     for stmt in stmts:
         match stmt:
             case StmtExp(exp):
-                instrs += compileExp(exp, cfg)
+                instrs += compileExp(exp, cfg, bc, data)
                 pass
             case Assign(var, exp):
-                instrs += compileExp(exp, cfg)
+                instrs += compileExp(exp, cfg, bc, data)
                 instrs.append(WasmInstrVarLocal('set', WasmId("$" + var.name)))
+                # arrays are also stored in the roots of the garbage collector
+                instrs += frame.storeInstrs(var.name)
                 # print instrs
                 #print(instrs)
             # create case for IfStmt(cond, thenBody, elseBody)
             case IfStmt(cond, thenBody, elseBody):
-                instrs += compileExp(cond, cfg)
-                thenB = compileStmts(thenBody, cfg)
-                elseB = compileStmts(elseBody, cfg)
+                instrs += compileExp(cond, cfg, bc, data)
+                thenB = compileStmts(thenBody, cfg, bc, data, frame)
+                elseB = compileStmts(elseBody, cfg, bc, data, frame)
                 instrs.append(WasmInstrIf(None, thenB, elseB))
             # create case for WhileStmt(cond, body)
             case WhileStmt(cond, body):
@@ -325,7 +325,14 @@ def compileStmts(stmts: list[stmt], cfg: CompilerConfig) -> list[WasmInstr]:
                 label_exit = WasmId('$loop_exit')
                 label_start = WasmId('$loop_start')
 
-                body = compileExp(cond, cfg) + [WasmInstrIf(None, [], [WasmInstrBranch(label_exit, False)])] + compileStmts(body, cfg) + [WasmInstrBranch(label_start, False)]
+                # load the length of arrays not assigned in the loop only once
+                hoisted = bc.enterLoop(stmt)
+                for a in hoisted:
+                    instrs.append(WasmInstrVarLocal('get', WasmId("$" + a)))
+                    instrs += arrayLenInstrs()
+                    instrs.append(WasmInstrVarLocal('set', BoundsChecks.lenLocal(a)))
+                body = compileExp(cond, cfg, bc, data) + [WasmInstrIf(None, [], [WasmInstrBranch(label_exit, False)])] + compileStmts(body, cfg, bc, data, frame) + [WasmInstrBranch(label_start, False)]
+                bc.leaveLoop(hoisted)
                 # create a WasmInstrBlock with the label
                 instrs.append(
                     WasmInstrBlock(
@@ -340,44 +347,24 @@ def compileStmts(stmts: list[stmt], cfg: CompilerConfig) -> list[WasmInstr]:
             # create case for SubscriptAssign(leftExp, indexExp, rightExp)
             case SubscriptAssign(leftExp, indexExp, rightExp):
                 # put instructions for the right-hand side, followed by a i64.store or i32.store after these instructions
-                instrs += arrayOffsetInstrs(leftExp, indexExp, cfg)
-                instrs += compileExp(rightExp, cfg)
+                instrs += arrayOffsetInstrs(leftExp, indexExp, cfg, bc, not bc.isSafe(stmt))
+                instrs += compileExp(rightExp, cfg, bc, data)
                 instrs.append(WasmInstrMem('i64' if tyOfExp(rightExp) == Int() else 'i32', 'store'))
 
     return instrs
 
 # returns instructions that places the memory offset for a certain array element on top of the stack
-def arrayOffsetInstrs(arrayExp: atomExp, indexExp: atomExp, cfg: CompilerConfig) -> list[WasmInstr]:
-    # create bounds check
-    # ====================================================================================
-    # THIS CODE SEGMENT CHECKS THE LENGTH
-
-    # check in Wasm if the length is greater than the max array size
-    # instrs = [WasmInstrConst('i64', 9999999999)]
-    # greater : list[WasmInstr] = compileExp(indexExp, cfg)
+# the bounds check is omitted if checked is False, that is if the range analysis proved the index to be in bounds
+def arrayOffsetInstrs(arrayExp: atomExp, indexExp: atomExp, cfg: CompilerConfig, bc: BoundsChecks, checked: bool) -> list[WasmInstr]:
     greater : list[WasmInstr] = []
-    greater += compileAtomExp(indexExp, cfg)
-    # add 1 to the index to check if the index is greater than the length
-    greater.append(WasmInstrConst('i64', 1))
-    # perform addition of the index and 1
-    greater.append(WasmInstrNumBinOp('i64', 'add'))
-    greater += compileAtomExp(arrayExp, cfg)
-    greater += arrayLenInstrs()
-    greater.append(WasmInstrIntRelOp('i64', 'gt_s'))
-    # create a block with the if statement if (i32.const 0) (i32.const 14) (call $print_err) unreachable else end
-    greater.append(WasmInstrIf(None, Errors.outputError(Errors.arrayIndexOutOfBounds) + [WasmInstrTrap()], []))
-    #pprint(greater)
-    # check in Wasm if the length is smaller than 0
-    smaller = compileAtomExp(indexExp, cfg)
-    smaller.append(WasmInstrConst('i64', 0))
-    smaller.append(WasmInstrIntRelOp('i64', 'lt_s'))
-    # create a block with the if statement if (i32.const 0) (i32.const 14) (call $print_err) unreachable else end
-    smaller.append(WasmInstrIf(None, Errors.outputError(Errors.arrayIndexOutOfBounds) + [WasmInstrTrap()], []))
-    #pprint(smaller)
-    # append smaller to greater
-    greater += smaller
-
-    # ====================================================================================
+    if checked:
+        # a negative index is a huge unsigned number, so one unsigned comparison
+        # checks both 0 <= index and index < length
+        greater += compileAtomExp(indexExp, cfg)
+        greater += arrayLenOf(arrayExp, cfg, bc)
+        greater.append(WasmInstrIntRelOp('i64', 'ge_u'))
+        # create a block with the if statement if (i32.const 0) (i32.const 14) (call $print_err) unreachable else end
+        greater.append(WasmInstrIf(None, Errors.outputError(Errors.arrayIndexOutOfBounds) + [WasmInstrTrap()], []))
 
     # get the address of the array
     instrs = compileAtomExp(arrayExp, cfg)
@@ -403,6 +390,14 @@ def arrayOffsetInstrs(arrayExp: atomExp, indexExp: atomExp, cfg: CompilerConfig)
     return greater
 
 
+# puts the length of the array on top of stack, reading the local if the length was hoisted out of the loop
+def arrayLenOf(arrayExp: atomExp, cfg: CompilerConfig, bc: BoundsChecks) -> list[WasmInstr]:
+    match arrayExp:
+        case Name(a) if a.name in bc.hoisted:
+            return [WasmInstrVarLocal('get', BoundsChecks.lenLocal(a.name))]
+        case _:
+            return compileAtomExp(arrayExp, cfg) + arrayLenInstrs()
+
 # generates code that expects the array address on top of stack and puts the length on top of stack
 # searches the 28 bits of the length in the memory
 def arrayLenInstrs() -> list[WasmInstr]:
@@ -440,42 +435,10 @@ def compileInitArray(lenExp: atomExp, elemTy: ty, cfg: CompilerConfig) -> list[W
     greater += smaller
 
     # ====================================================================================
-    # THIS CODE CREATES THE HEADER
-
-    header = [WasmInstrVarGlobal('get', WasmId('$@free_ptr'))]
-    header += compileAtomExp(lenExp, cfg)
-    header.append(WasmInstrConvOp('i32.wrap_i64'))
-    header.append(WasmInstrConst('i32', 4))
-    header.append(WasmInstrNumBinOp('i32', 'shl'))
-    header.append(WasmInstrConst('i32', 1))
-    header.append(WasmInstrNumBinOp('i32', 'xor'))
-    header.append(WasmInstrMem('i32', 'store'))
-    #pprint(header)
-
-    # append header to greater
-    greater += header
-
-    # ====================================================================================
-    # THIS CODE MOVES FREE_PTR AND RETURNS THE ARRAY ADDRESS
-
-    move = [WasmInstrVarGlobal('get', WasmId('$@free_ptr'))]
-    move += compileAtomExp(lenExp, cfg)
-    move.append(WasmInstrConvOp('i32.wrap_i64'))
-    if forTyRetByte(elemTy) == 8:
-        move.append(WasmInstrConst('i32', 8))
-    else:
-        move.append(WasmInstrConst('i32', 4))
-    move.append(WasmInstrNumBinOp('i32', 'mul'))
-    move.append(WasmInstrConst('i32', 4))
-    move.append(WasmInstrNumBinOp('i32', 'add'))
-    move.append(WasmInstrVarGlobal('get', WasmId('$@free_ptr')))
-    move.append(WasmInstrNumBinOp('i32', 'add'))
-    move.append(WasmInstrVarGlobal('set', WasmId('$@free_ptr')))
+    # THIS CODE ALLOCATES THE ARRAY, WRITES THE HEADER AND RETURNS THE ARRAY ADDRESS
 
-    #pprint(move)
-
-    # append move to greater
-    greater += move
+    flags = Heap.flags(forTyRetByte(elemTy), isinstance(elemTy, Array))
+    greater += array_runtime.allocInstrs(compileAtomExp(lenExp, cfg), flags)
     return greater
     
 # create function that searches the stmt recursively for "tmp.." vars and creates locals for them
@@ -500,6 +463,21 @@ def createLocals(stmts: list[stmt]) -> list[tuple[WasmId, WasmValtype]]:
     return locals
 
 
+# the variables assigned an array in stmts, the roots of the garbage collector
+def arrayLocals(stmts: list[stmt]) -> list[str]:
+    res: list[str] = []
+    for stmt in stmts:
+        match stmt:
+            case Assign(var, right) if isinstance(right.ty, NotVoid) and isinstance(right.ty.ty, Array):
+                res.append(var.name)
+            case IfStmt(_, thenBody, elseBody):
+                res += arrayLocals(thenBody) + arrayLocals(elseBody)
+            case WhileStmt(_, body):
+                res += arrayLocals(body)
+            case _:
+                pass
+    return res
+
 def compileModule(m: plainAst.mod, cfg: CompilerConfig) -> WasmModule:
     # type check the module
     vars = array_tychecker.tycheckModule(m)
@@ -508,7 +486,10 @@ def compileModule(m: plainAst.mod, cfg: CompilerConfig) -> WasmModule:
 
     atomic_stmts = array_transform.transStmts(m.stmts, ctx)
 
-    instr = compileStmts(atomic_stmts, cfg)
+    bc = array_boundsChecks.analyze(atomic_stmts, cfg)
+    data = DataSegments()
+    frame = Frame(arrayLocals(atomic_stmts))
+    instr = compileStmts(atomic_stmts, cfg, bc, data, frame)
     #print(instr)
     #print(vars)
     # return a wasm module that simply print(1)
@@ -518,6 +499,7 @@ def compileModule(m: plainAst.mod, cfg: CompilerConfig) -> WasmModule:
     locals.append((WasmId('$@tmp_i32'), 'i32'))
     # for assign in atomic_stmts get IDENT.NAME and create locals
     locals += createLocals(atomic_stmts)
+    locals += bc.locals
 
     # extract the locals and ma the type to the wasm type
     for var, info in vars.items():
@@ -536,9 +518,9 @@ def compileModule(m: plainAst.mod, cfg: CompilerConfig) -> WasmModule:
                     result=None,
                     locals=locals,
                     instrs=instr)
-    return WasmModule(imports=wasmImports(cfg.maxMemSize),
+    return WasmModule(imports=wasmImports(cfg.maxMemSize, data.initialPages()),
                     exports=[WasmExport('main', WasmExportFunc(WasmId('$main')))],
-                    globals=Globals.decls(),
-                    data=Errors.data(),
+                    globals=data.globals() + frame.globals(),
+                    data=data.data(),
                     funcTable=WasmFuncTable([]),
-                    funcs=[main])
\ No newline at end of file
+                    funcs=[main] + array_runtime.funcs(data, frame.rootGlobals()))
\ No newline at end of file
@@ -0,0 +1,197 @@
+"""
+Range analysis for eliminating bounds checks of array subscripts, run on the body of
+every function. The same analysis as compilers.lang_array.array_boundsChecks, on the
+AST of lang_fun.
+"""
+from lang_fun.fun_astAtom import *
+from lang_array.array_compilerSupport import *
+
+def _term(e: exp) -> Optional[IndexTerm]:
+    match e:
+        case AtomExp(IntConst(v)):
+            return v
+        case AtomExp(VarName(x)):
+            return x.name
+        case Call(CallTargetBuiltin(Ident('len')), [AtomExp(VarName(a))]):
+            return LenOf(a.name)
+        case _:
+            return None
+
+def _rhs(e: exp) -> IndexRhs:
+    match e:
+        case BinOp(l, Add() | Sub() as op, r):
+            (lt, rt) = (_term(l), _term(r))
+            if lt is None or rt is None:
+                return None
+            return (lt, '+' if isinstance(op, Add) else '-', rt)
+        case ArrayInitDyn(IntConst(k), _):
+            return ArrayOfLen(k)
+        case ArrayInitDyn(VarName(n), _):
+            return ArrayOfLen(n.name)
+        case ArrayInitStatic(elems):
+            return ArrayOfLen(len(elems))
+        case _:
+            return _term(e)
+
+_REL_OPS: dict[type, IndexRelOp] = {Less: '<', LessEq: '<=', Greater: '>', GreaterEq: '>='}
+
+def _assume(cond: exp, facts: IndexFacts) -> IndexFacts:
+    """
+    The facts holding when cond is true.
+    """
+    match cond:
+        case BinOp(l, And(), r):
+            return _assume(r, _assume(l, facts))
+        case BinOp(l, op, r) if type(op) in _REL_OPS:
+            (lt, rt) = (_term(l), _term(r))
+            if lt is None or rt is None:
+                return facts
+            return facts.assume(lt, _REL_OPS[type(op)], rt)
+        case _:
+            return facts
+
+def _checkSubscript(node: object, array: atomExp, index: atomExp, facts: IndexFacts,
+                    safe: set[int]):
+    match (array, index):
+        case (VarName(a), IntConst(i)):
+            ok = facts.isSafe(a.name, i)
+        case (VarName(a), VarName(i)):
+            ok = facts.isSafe(a.name, i.name)
+        case _:
+            ok = False
+    if ok:
+        safe.add(id(node))
+
+def _checkExp(e: exp, facts: IndexFacts, safe: set[int]):
+    match e:
+        case Subscript(array, index):
+            _checkSubscript(e, array, index, facts, safe)
+        case Call(_, args):
+            for arg in args:
+                _checkExp(arg, facts, safe)
+        case UnOp(_, arg):
+            _checkExp(arg, facts, safe)
+        case BinOp(l, And(), r):
+            # r is only evaluated if l is true
+            _checkExp(l, facts, safe)
+            _checkExp(r, _assume(l, facts), safe)
+        case BinOp(l, _, r):
+            _checkExp(l, facts, safe)
+            _checkExp(r, facts, safe)
+        case _:
+            pass
+
+def _checkStmts(stmts: list[stmt], facts: IndexFacts, safe: set[int]) -> IndexFacts:
+    """
+    Adds the safe subscripts of stmts to safe and returns the facts after stmts.
+    """
+    for s in stmts:
+        match s:
+            case StmtExp(e):
+                _checkExp(e, facts, safe)
+            case Assign(x, e):
+                _checkExp(e, facts, safe)
+                facts = facts.assign(x.name, _rhs(e))
+            case IfStmt(cond, thenBody, elseBody):
+                _checkExp(cond, facts, safe)
+                thenFacts = _checkStmts(thenBody, _assume(cond, facts), safe)
+                elseFacts = _checkStmts(elseBody, facts, safe)
+                facts = thenFacts.join(elseFacts)
+            case WhileStmt(cond, body):
+                head = facts
+                while True:
+                    new = head.join(_checkStmts(body, _assume(cond, head), set()))
+                    if new == head:
+                        break
+                    head = new
+                _checkExp(cond, head, safe)
+                _checkStmts(body, _assume(cond, head), safe)
+                facts = head
+            case SubscriptAssign(left, index, right):
+                _checkSubscript(s, left, index, facts, safe)
+                _checkExp(right, facts, safe)
+            case Return(result):
+                if result is not None:
+                    _checkExp(result, facts, safe)
+    return facts
+
+def _assigned(stmts: list[stmt]) -> set[str]:
+    res: set[str] = set()
+    for s in stmts:
+        match s:
+            case Assign(x, _):
+                res.add(x.name)
+            case IfStmt(_, thenBody, elseBody):
+                res |= _assigned(thenBody) | _assigned(elseBody)
+            case WhileStmt(_, body):
+                res |= _assigned(body)
+            case _:
+                pass
+    return res
+
+def _lenUsesExp(e: exp, safe: set[int], res: list[str]):
+    """
+    Appends the arrays whose length is needed by e to res.
+    """
+    match e:
+        case Subscript(VarName(a), _) if id(e) not in safe and a.name not in res:
+            res.append(a.name)
+        case Call(CallTargetBuiltin(Ident('len')), [AtomExp(VarName(a))]) if a.name not in res:
+            res.append(a.name)
+        case Call(_, args):
+            for arg in args:
+                _lenUsesExp(arg, safe, res)
+        case UnOp(_, arg):
+            _lenUsesExp(arg, safe, res)
+        case BinOp(l, _, r):
+            _lenUsesExp(l, safe, res)
+            _lenUsesExp(r, safe, res)
+        case _:
+            pass
+
+def _lenUses(stmts: list[stmt], safe: set[int], res: list[str]):
+    for s in stmts:
+        match s:
+            case StmtExp(e) | Assign(_, e):
+                _lenUsesExp(e, safe, res)
+            case IfStmt(cond, thenBody, elseBody):
+                _lenUsesExp(cond, safe, res)
+                _lenUses(thenBody, safe, res)
+                _lenUses(elseBody, safe, res)
+            case WhileStmt(cond, body):
+                _lenUsesExp(cond, safe, res)
+                _lenUses(body, safe, res)
+            case SubscriptAssign(left, _, right):
+                if isinstance(left, VarName) and id(s) not in safe and left.var.name not in res:
+                    res.append(left.var.name)
+                _lenUsesExp(right, safe, res)
+            case Return(result):
+                if result is not None:
+                    _lenUsesExp(result, safe, res)
+
+def _hoist(stmts: list[stmt], safe: set[int], hoist: dict[int, list[str]]):
+    for s in stmts:
+        match s:
+            case IfStmt(_, thenBody, elseBody):
+                _hoist(thenBody, safe, hoist)
+                _hoist(elseBody, safe, hoist)
+            case WhileStmt(_, body):
+                uses: list[str] = []
+                _lenUses([s], safe, uses)
+                assigned = _assigned(body)
+                hoist[id(s)] = [a for a in uses if a not in assigned]
+                _hoist(body, safe, hoist)
+            case _:
+                pass
+
+def analyze(stmts: list[stmt], cfg: CompilerConfig) -> BoundsChecks:
+    """
+    Runs the range analysis on the statements of a function body.
+    """
+    if not cfg.boundsCheckElim:
+        return BoundsChecks()
+    safe: set[int] = set()
+    _checkStmts(stmts, IndexFacts(), safe)
+    hoist: dict[int, list[str]] = {}
+    _hoist(stmts, safe, hoist)
+    return BoundsChecks(safe, hoist)
@@ -67,6 +67,13 @@ def callTarget(e: exp, ctx: Ctx) -> tuple[atom.callTarget, Temporaries]:
                 case _:
                     utils.abort(f'Invalid call target after type checking: {e}')
 
+def isArray(e: exp) -> bool:
+    """
+    Arrays used as operands are stored in temporary variables, so that the garbage
+    collector finds them while the other operands are evaluated.
+    """
+    return isinstance(e.ty, NotVoid) and isinstance(e.ty.ty, Array)
+
 def transExp(e: exp, needAtomic: bool, ctx: Ctx) -> tuple[atom.exp, Temporaries]:
     t = assertResultTy(e.ty)
     match e:
@@ -75,7 +82,7 @@ def transExp(e: exp, needAtomic: bool, ctx: Ctx) -> tuple[atom.exp, Temporaries]
         case BoolConst(v):
             return (atom.AtomExp(atom.BoolConst(v, assertTy(t)), t), [])
         case Call(target, args):
-            (atomArgs, tmps) = utils.unzip([transExp(a, False, ctx) for a in args])
+            (atomArgs, tmps) = utils.unzip([transExp(a, isArray(a), ctx) for a in args])
             (atomTarget, tmps2) = callTarget(target, ctx)
             return atomic(needAtomic, atom.Call(atomTarget, atomArgs, t),
                           utils.flatten(tmps) + tmps2, ctx)
@@ -83,8 +90,8 @@ def transExp(e: exp, needAtomic: bool, ctx: Ctx) -> tuple[atom.exp, Temporaries]
             (atomSub, tmps) = transExp(sub, False, ctx)
             return atomic(needAtomic, atom.UnOp(op, atomSub, t), tmps, ctx)
         case BinOp(left, op, right):
-            (l, tmps1) = transExp(left, False, ctx)
-            (r, tmps2) = transExp(right, False, ctx)
+            (l, tmps1) = transExp(left, isArray(left), ctx)
+            (r, tmps2) = transExp(right, isArray(right), ctx)
             return atomic(needAtomic, atom.BinOp(l, op, r, t), tmps1 + tmps2, ctx)
         case Name(x, scope):
             match scope:
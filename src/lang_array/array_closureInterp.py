@@ -0,0 +1,95 @@
+"""
+Interpreter for the array language that translates the AST into closures before
+executing it (see common/closureSupport.py). Arrays are represented as Python lists.
+"""
+from lang_array.array_ast import *
+import lang_array.array_tychecker as array_tychecker
+import common.utils as utils
+from common.closureSupport import *
+from typing import *
+
+def compileFuncall(id: ident, args: list[exp], slots: Slots[Ident]) -> ExpCode:
+    match (id.name, args):
+        case ('input_int', []):
+            return lambda f: int(utils.inputInt('Enter some int: '))
+        case ('print', [e]):
+            arg = compileExp(e, slots)
+            def p(f: Frame) -> None:
+                print(arg(f))
+            return p
+        case ('len', [e]):
+            arg = compileExp(e, slots)
+            return lambda f: len(arg(f))
+        case _:
+            raise ValueError(f'Invalid function call of {id.name} with {len(args)} arguments')
+
+def binOpName(left: exp, op: binaryop) -> str:
+    """
+    Arrays are compared by identity.
+    """
+    name = type(op).__name__
+    match (left.ty, name):
+        case (NotVoid(Array()), 'Eq'):
+            return 'Is'
+        case (NotVoid(Array()), 'NotEq'):
+            return 'IsNot'
+        case _:
+            return name
+
+def compileExp(e: exp, slots: Slots[Ident]) -> ExpCode:
+    match e:
+        case IntConst(value):
+            return mkConst(value)
+        case BoolConst(value):
+            return mkConst(value)
+        case Call(id, args):
+            return compileFuncall(id, args, slots)
+        case UnOp(op, sub):
+            return mkUnOp(type(op).__name__, compileExp(sub, slots))
+        case BinOp(left, op, right):
+            return mkBinOp(binOpName(left, op), compileExp(left, slots), compileExp(right, slots))
+        case Name(name):
+            return mkGetVar(slots.slot(name), name.name)
+        case ArrayInitDyn(lenExp, initExp):
+            n = compileExp(lenExp, slots)
+            init = compileExp(initExp, slots)
+            return lambda f: n(f) * [init(f)]
+        case ArrayInitStatic(es):
+            elems = [compileExp(e, slots) for e in es]
+            return lambda f: [x(f) for x in elems]
+        case Subscript(arrayExp, indexExp):
+            a = compileExp(arrayExp, slots)
+            i = compileExp(indexExp, slots)
+            return lambda f: a(f)[i(f)]
+    raise Exception(f'No match for expression {e}')
+
+def compileStmt(s: stmt, slots: Slots[Ident]) -> StmtCode:
+    match s:
+        case StmtExp(e):
+            return mkExpStmt(compileExp(e, slots))
+        case Assign(x, e):
+            return mkSetVar(slots.slot(x), compileExp(e, slots))
+        case IfStmt(cond, thenBody, elseBody):
+            return mkIf(compileExp(cond, slots), compileStmts(thenBody, slots),
+                        compileStmts(elseBody, slots))
+        case WhileStmt(cond, body):
+            return mkWhile(compileExp(cond, slots), compileStmts(body, slots))
+        case SubscriptAssign(leftExp, idxExp, rightExp):
+            a = compileExp(leftExp, slots)
+            i = compileExp(idxExp, slots)
+            v = compileExp(rightExp, slots)
+            def store(f: Frame) -> None:
+                idx = i(f)
+                x = v(f)
+                a(f)[idx] = x
+            return store
+
+def compileStmts(stmts: list[stmt], slots: Slots[Ident]) -> StmtCode:
+    return mkSeq([compileStmt(s, slots) for s in stmts])
+
+def interpModule(m: mod):
+    utils.assertType(m, Module)
+    array_tychecker.tycheckModule(m)
+    slots: Slots[Ident] = Slots()
+    code = compileStmts(m.stmts, slots)
+    code(slots.newFrame())
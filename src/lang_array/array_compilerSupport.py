@@ -1,3 +1,4 @@
+from __future__ import annotations
 from common.wasm import *
 from common.compilerSupport import *
 import common.utils as utils
@@ -8,7 +9,9 @@ class Errors:
     """
     arraySize = 'ArraySizeError'
     arrayIndexOutOfBounds = 'IndexError'
-    allErrors = [arraySize, arrayIndexOutOfBounds]
+    outOfMemory = 'OutOfMemoryError'
+    recursion = 'RecursionError'
+    allErrors = [arraySize, arrayIndexOutOfBounds, outOfMemory, recursion]
     @staticmethod
     def data() -> list[WasmData]:
         """
@@ -43,18 +46,148 @@ class Globals:
     Class giving access to the names of global variables.
     """
     freePtr = WasmId('$@free_ptr')
+    shadowPtr = WasmId('$@shadow_ptr')
+    shadowEnd = WasmId('$@shadow_end')
+    heapStart = 100 # must be 4-byte aligned
     @staticmethod
-    def decls() -> list[WasmGlobal]:
+    def decls(heapStart: int = heapStart, shadowStack: Optional[int] = None) -> list[WasmGlobal]:
         """
-        Returns a list of Wasm global declarations.
+        Returns a list of Wasm global declarations. The heap starts at heapStart,
+        after the error messages and the data segments. shadowStack is the start
+        address of the shadow stack, if there is one. It ends where the heap starts.
         """
         errsLen = 0
         for e in Errors.allErrors:
             errsLen += len(e)
-        offset = 100 # must be 4-byte aligned
+        offset = Heap.freeLists
         if errsLen > offset:
-            utils.abort(f'Offset for free_ptr is {offset}, but error messages take {errsLen} bytes')
-        return [WasmGlobal(Globals.freePtr, 'i32', True, [WasmInstrConst('i32', 100)])]
+            utils.abort(f'Offset for the free lists is {offset}, but error messages take {errsLen} bytes')
+        res = [WasmGlobal(Globals.freePtr, 'i32', True, [WasmInstrConst('i32', heapStart)])]
+        if shadowStack is not None:
+            res.append(WasmGlobal(Globals.shadowPtr, 'i32', True,
+                                  [WasmInstrConst('i32', shadowStack)]))
+            res.append(WasmGlobal(Globals.shadowEnd, 'i32', False,
+                                  [WasmInstrConst('i32', heapStart)]))
+        return res
+
+class Heap:
+    """
+    Layout of the heap. Every array starts with a header word holding its length shifted
+    left by 4 bits and the flags below, the elements follow the header. A free block
+    starts with its size (the array flag is not set). Free blocks of at least 8 bytes are
+    linked into the free list of their size class, the heads of the free lists are stored
+    after the error messages. The heap grows upwards from Globals.heapStart (or from the
+    end of the data segments and the shadow stack) to $@free_ptr.
+    """
+    array = 1 # set for arrays, not set for free blocks
+    pointers = 2 # the elements are arrays
+    wide = 4 # the elements take 8 bytes
+    mark = 8 # set for reachable arrays while collecting garbage
+    freeLists = 56
+    # Free list i holds blocks with 2**(i+3) <= size < 2**(i+4), the last one also larger blocks
+    sizeClasses = (Globals.heapStart - freeLists) // 4
+    minBlockSize = 8
+    pageSize = 65536
+    # frames on the shadow stack, the default recursion limit of Python
+    maxRecursion = 1000
+    @staticmethod
+    def flags(elemSize: int, pointers: bool) -> int:
+        """
+        The flags in the header of an array.
+        """
+        return Heap.array | (Heap.wide if elemSize == 8 else 0) | (Heap.pointers if pointers else 0)
+
+class DataSegments:
+    """
+    Constant data, e.g. the elements of constant arrays, placed in memory by data
+    segments. The data lies between the error messages and the heap, identical
+    contents share one segment.
+    """
+    def __init__(self):
+        self.segments: list[WasmData] = []
+        self.end = Globals.heapStart
+        self.frameSize = 0
+
+    def add(self, content: bytes) -> int:
+        """
+        Returns the address of the data with the given content.
+        """
+        for d in self.segments:
+            if d.content == content:
+                return d.start
+        start = self.end
+        self.segments.append(WasmData(start, content))
+        self.end += len(content)
+        return start
+
+    def addFrame(self, size: int):
+        """
+        Registers a frame of the given size, the shadow stack holds Heap.maxRecursion
+        frames of the largest size.
+        """
+        self.frameSize = max(self.frameSize, size)
+
+    def shadowStackStart(self) -> Optional[int]:
+        """
+        Returns the start address of the shadow stack after the data, None if no frame
+        needs a shadow stack.
+        """
+        return (self.end + 3) // 4 * 4 if self.frameSize > 0 else None
+
+    def heapStart(self) -> int:
+        return (self.end + 3) // 4 * 4 + self.frameSize * Heap.maxRecursion
+
+    def initialPages(self) -> int:
+        return max(1, -(-self.heapStart() // Heap.pageSize))
+
+    def data(self) -> list[WasmData]:
+        return Errors.data() + self.segments
+
+    def globals(self) -> list[WasmGlobal]:
+        return Globals.decls(self.heapStart(), self.shadowStackStart())
+
+def elemBytes(value: int, elemSize: int) -> bytes:
+    """
+    The representation of an array element in memory (little endian).
+    """
+    return value.to_bytes(elemSize, 'little', signed=True)
+
+def fillByte(content: bytes) -> Optional[int]:
+    """
+    Returns the byte content consists of, if all its bytes are the same.
+    """
+    if content and content == bytes([content[0]]) * len(content):
+        return content[0]
+    return None
+
+def fillArrayInstrs(byte: int, length: list[WasmInstr], elemSize: int) -> list[WasmInstr]:
+    """
+    Expects the address of a new array on top of the stack and sets all bytes of its
+    elements to byte. length pushes the length of the array (i64). The address stays on
+    top of the stack.
+    """
+    return [WasmInstrVarLocal('tee', Locals.tmp_i32),
+            WasmInstrVarLocal('get', Locals.tmp_i32),
+            WasmInstrConst('i32', 4),
+            WasmInstrNumBinOp('i32', 'add'),
+            WasmInstrConst('i32', byte)] + length + \
+           [WasmInstrConvOp('i32.wrap_i64'),
+            WasmInstrConst('i32', elemSize),
+            WasmInstrNumBinOp('i32', 'mul'),
+            WasmInstrBulkMem('fill')]
+
+def copyArrayInstrs(src: int, size: int) -> list[WasmInstr]:
+    """
+    Expects the address of a new array on top of the stack and copies size bytes from
+    address src to its elements. The address stays on top of the stack.
+    """
+    return [WasmInstrVarLocal('tee', Locals.tmp_i32),
+            WasmInstrVarLocal('get', Locals.tmp_i32),
+            WasmInstrConst('i32', 4),
+            WasmInstrNumBinOp('i32', 'add'),
+            WasmInstrConst('i32', src),
+            WasmInstrConst('i32', size),
+            WasmInstrBulkMem('copy')]
 
 class Locals:
     """
@@ -69,3 +202,282 @@ class Locals:
         """
         return [(Locals.tmp_i32, 'i32'),
                 (Locals.tmp_i64, 'i64')]
+
+class Frame:
+    """
+    The roots of the garbage collector in a function: the locals holding arrays. Every
+    assignment to such a local also stores the array in its root. The roots of the main
+    function (the variables of the module) are globals, the roots of other functions are
+    the slots of their frame on the shadow stack. $@shadow_ptr points to the end of the
+    frame of the running function.
+    """
+    def __init__(self, arrays: list[str], data: Optional[DataSegments] = None):
+        self.arrays = list(dict.fromkeys(arrays))
+        self.isMain = data is None
+        if data is not None:
+            data.addFrame(self.size())
+
+    def size(self) -> int:
+        return 4 * len(self.arrays)
+
+    def rootGlobals(self) -> list[WasmId]:
+        return [WasmId('$@root_' + x) for x in self.arrays] if self.isMain else []
+
+    def globals(self) -> list[WasmGlobal]:
+        return [WasmGlobal(g, 'i32', True, [WasmInstrConst('i32', 0)]) for g in self.rootGlobals()]
+
+    def storeInstrs(self, x: str) -> list[WasmInstr]:
+        """
+        Stores the value of local x in its root, if x holds arrays.
+        """
+        if x not in self.arrays:
+            return []
+        local = WasmInstrVarLocal('get', WasmId('$' + x))
+        if self.isMain:
+            return [local, WasmInstrVarGlobal('set', WasmId('$@root_' + x))]
+        return [WasmInstrVarGlobal('get', Globals.shadowPtr),
+                WasmInstrConst('i32', self.size() - 4 * self.arrays.index(x)),
+                WasmInstrNumBinOp('i32', 'sub'),
+                local,
+                WasmInstrMem('i32', 'store')]
+
+    def enterInstrs(self, params: list[str]) -> list[WasmInstr]:
+        """
+        Pushes the frame on the shadow stack and stores the params holding arrays in
+        their roots.
+        """
+        if self.isMain or not self.arrays:
+            return []
+        sp = Globals.shadowPtr
+        instrs: list[WasmInstr] = [
+            WasmInstrVarGlobal('get', sp),
+            WasmInstrConst('i32', self.size()),
+            WasmInstrNumBinOp('i32', 'add'),
+            WasmInstrVarGlobal('set', sp),
+            WasmInstrVarGlobal('get', sp),
+            WasmInstrVarGlobal('get', Globals.shadowEnd),
+            WasmInstrIntRelOp('i32', 'gt_u'),
+            WasmInstrIf(None, Errors.outputError(Errors.recursion) + [WasmInstrTrap()], []),
+            # roots not assigned yet must not point to freed arrays
+            WasmInstrVarGlobal('get', sp),
+            WasmInstrConst('i32', self.size()),
+            WasmInstrNumBinOp('i32', 'sub'),
+            WasmInstrConst('i32', 0),
+            WasmInstrConst('i32', self.size()),
+            WasmInstrBulkMem('fill')]
+        for p in params:
+            instrs += self.storeInstrs(p)
+        return instrs
+
+    def leaveInstrs(self) -> list[WasmInstr]:
+        """
+        Pops the frame from the shadow stack.
+        """
+        if self.isMain or not self.arrays:
+            return []
+        return [WasmInstrVarGlobal('get', Globals.shadowPtr),
+                WasmInstrConst('i32', self.size()),
+                WasmInstrNumBinOp('i32', 'sub'),
+                WasmInstrVarGlobal('set', Globals.shadowPtr)]
+
+@dataclass(frozen=True)
+class LenOf:
+    """
+    The length of the array in the given variable.
+    """
+    array: str
+
+@dataclass(frozen=True)
+class ArrayOfLen:
+    """
+    A new array with the given length.
+    """
+    length: IndexTerm
+
+# A constant, an int variable or the length of an array
+type IndexTerm = int | str | LenOf
+
+# The right-hand side of an assignment as far as the range analysis is concerned.
+# None stands for everything else.
+type IndexRhs = IndexTerm | tuple[IndexTerm, Literal['+', '-'], IndexTerm] | ArrayOfLen | None
+
+type IndexRelOp = Literal['<', '<=', '>', '>=']
+
+# Upper bound for array lengths, they are stored in 28 bits
+_MAX_ARRAY_LEN = 2 ** 28
+_MAX_I64 = 2 ** 63 - 1
+
+@dataclass(frozen=True)
+class IndexFacts:
+    """
+    Facts about the variables of a function for eliminating bounds checks, valid at one
+    point of the program. A bound is the name of an array variable (standing for the
+    length of the array) or a constant. The facts only refer to variables, so they are
+    invalidated when one of the variables is assigned.
+    """
+    nonneg: frozenset[str] = frozenset()
+    # (x, b): x < b
+    below: frozenset[tuple[str, str | int]] = frozenset()
+    # (n, a): n == len(a)
+    lens: frozenset[tuple[str, str]] = frozenset()
+    # (a, k): len(a) == k
+    constLens: frozenset[tuple[str, int]] = frozenset()
+
+    def join(self, other: IndexFacts) -> IndexFacts:
+        """
+        The facts holding after two control flow paths meet.
+        """
+        return IndexFacts(self.nonneg & other.nonneg, self.below & other.below,
+                          self.lens & other.lens, self.constLens & other.constLens)
+
+    def kill(self, x: str) -> IndexFacts:
+        """
+        Removes all facts mentioning x.
+        """
+        return IndexFacts(frozenset(y for y in self.nonneg if y != x),
+                          frozenset((y, b) for (y, b) in self.below if x not in (y, b)),
+                          frozenset((n, a) for (n, a) in self.lens if x not in (n, a)),
+                          frozenset((a, k) for (a, k) in self.constLens if a != x))
+
+    def _add(self, nonneg: Iterable[str] = [], below: Iterable[tuple[str, str | int]] = [],
+             lens: Iterable[tuple[str, str]] = [],
+             constLens: Iterable[tuple[str, int]] = []) -> IndexFacts:
+        return IndexFacts(self.nonneg | frozenset(nonneg), self.below | frozenset(below),
+                          self.lens | frozenset(lens), self.constLens | frozenset(constLens))
+
+    def _maxBound(self, x: str) -> Optional[int]:
+        bounds = [b if isinstance(b, int) else _MAX_ARRAY_LEN for (y, b) in self.below if y == x]
+        return min(bounds) if bounds else None
+
+    def _lenOf(self, t: IndexTerm) -> list[str]:
+        """
+        The arrays whose length is t.
+        """
+        match t:
+            case LenOf(a):
+                return [a]
+            case str(n):
+                return [a for (m, a) in self.lens if m == n]
+            case int():
+                return []
+
+    def assign(self, x: str, rhs: IndexRhs) -> IndexFacts:
+        """
+        The facts holding after x = rhs.
+        """
+        if rhs == x:
+            return self
+        nonneg: list[str] = []
+        below: list[tuple[str, str | int]] = []
+        lens: list[tuple[str, str]] = []
+        constLens: list[tuple[str, int]] = []
+        match rhs:
+            case int(k):
+                if k >= 0:
+                    nonneg.append(x)
+            case str(y):
+                if y in self.nonneg:
+                    nonneg.append(x)
+                below = [(x, b) for (z, b) in self.below if z == y]
+                lens = [(x, a) for (n, a) in self.lens if n == y]
+            case LenOf(a):
+                nonneg.append(x)
+                lens.append((x, a))
+            case ArrayOfLen(int(k)):
+                constLens.append((x, k))
+            case ArrayOfLen(str(n)):
+                lens.append((n, x))
+            case (str(y), '+', int(c)) | (int(c), '+', str(y)):
+                m = self._maxBound(y)
+                if c >= 0 and y in self.nonneg and m is not None and m + c <= _MAX_I64:
+                    nonneg.append(x)
+            case (l, '-', int(c)) if c >= 0:
+                if c >= 1:
+                    below += [(x, a) for a in self._lenOf(l)]
+                if isinstance(l, str) and l in self.nonneg:
+                    below += [(x, b) for (z, b) in self.below if z == l]
+            case _:
+                pass
+        return self.kill(x)._add(nonneg, below, lens, constLens)
+
+    def assume(self, l: IndexTerm, op: IndexRelOp, r: IndexTerm) -> IndexFacts:
+        """
+        The facts holding when the condition l op r is true.
+        """
+        match op:
+            case '>':
+                return self.assume(r, '<', l)
+            case '>=':
+                return self.assume(r, '<=', l)
+            case _:
+                pass
+        nonneg: list[str] = []
+        below: list[tuple[str, str | int]] = []
+        # l < r is l + 1 <= r
+        strict = 1 if op == '<' else 0
+        match (l, r):
+            case (str(x), int(k)):
+                if op == '<':
+                    below.append((x, k))
+                elif k < _MAX_I64:
+                    below.append((x, k + 1))
+            case (str(x), _) if op == '<':
+                below += [(x, a) for a in self._lenOf(r)]
+            case (int(k), str(x)) if k + strict >= 0:
+                nonneg.append(x)
+            case _:
+                pass
+        return self._add(nonneg, below)
+
+    def isSafe(self, array: str, index: str | int) -> bool:
+        """
+        Is 0 <= index < len(array)?
+        """
+        constLens = [k for (a, k) in self.constLens if a == array]
+        match index:
+            case int(i):
+                return i >= 0 and any(i < k for k in constLens)
+            case x:
+                if x not in self.nonneg:
+                    return False
+                for (y, b) in self.below:
+                    if y == x and (b == array or (isinstance(b, int) and
+                                                  any(b <= k for k in constLens))):
+                        return True
+                return False
+
+class BoundsChecks:
+    """
+    The subscripts of a function proven to be in bounds by the range analysis, and the
+    arrays whose length is loaded once before a loop and kept in a local during the loop.
+    Subscripts and loops are identified by the id of their AST node.
+    """
+    def __init__(self, safe: Optional[set[int]] = None,
+                 hoist: Optional[dict[int, list[str]]] = None):
+        self.safe = safe or set()
+        self.hoist = hoist or {}
+        self.hoisted: set[str] = set()
+        self.locals: list[tuple[WasmId, WasmValtype]] = []
+
+    def isSafe(self, node: object) -> bool:
+        return id(node) in self.safe
+
+    @staticmethod
+    def lenLocal(array: str) -> WasmId:
+        return WasmId(f'$@len_{array}')
+
+    def enterLoop(self, loop: object) -> list[str]:
+        """
+        Returns the arrays whose length must be stored in their local before the loop.
+        Arrays hoisted by an enclosing loop are not hoisted again.
+        """
+        arrays = [a for a in self.hoist.get(id(loop), []) if a not in self.hoisted]
+        for a in arrays:
+            self.hoisted.add(a)
+            l = (BoundsChecks.lenLocal(a), cast(WasmValtype, 'i64'))
+            if l not in self.locals:
+                self.locals.append(l)
+        return arrays
+
+    def leaveLoop(self, arrays: list[str]):
+        self.hoisted.difference_update(arrays)
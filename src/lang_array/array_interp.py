@@ -1,6 +1,7 @@
 from lang_array.array_ast import *
 import lang_array.array_tychecker as array_tychecker
 import common.utils as utils
+from common.genericInterp import Block, execStmts
 import common.log as log
 from typing import *
 
@@ -113,37 +114,29 @@ def interpExp(e: exp, env: Env, store: Store) -> Optional[TyValue]:
             return l[i]
     raise Exception(f'No match for expression {e}')
 
-def interpStmt(s: stmt, env: Env, store: Store, cont: list[stmt]) -> None:
+def interpStmt(s: stmt, env: Env, store: Store) -> Optional[Block[stmt]]:
     match s:
         case StmtExp(e):
             interpExp(e, env, store)
-            interpStmts(cont, env, store)
         case Assign(x, e):
             v: Any = interpExp(e, env, store)
             env[x] = v
-            interpStmts(cont, env, store)
         case IfStmt(cond, thenBody, elseBody):
             v = asBool(interpExp(cond, env, store))
-            if v:
-                interpStmts(thenBody + cont, env, store)
-            else:
-                interpStmts(elseBody + cont, env, store)
+            return Block(thenBody if v else elseBody)
         case WhileStmt(cond, body):
             v = asBool(interpExp(cond, env, store))
             if v:
-                interpStmts(body + [s] + cont, env, store)
-            else:
-                interpStmts(cont, env, store)
+                return Block(body, repeat=True)
         case SubscriptAssign(leftExp, idxExp, rightExp):
             idx = asInt(interpExp(idxExp, env, store))
             v = interpExp(rightExp, env, store)
             a = asAddress(interpExp(leftExp, env, store))
             store.storeValue(a, idx, v)
-            interpStmts(cont, env, store)
+    return None
 
 def interpStmts(stmts: list[stmt], env: Env, store: Store) -> None:
-    if len(stmts) > 0:
-        interpStmt(stmts[0], env, store, stmts[1:])
+    execStmts(stmts, lambda s: interpStmt(s, env, store))
 
 def interpModule(m: mod):
     utils.assertType(m, Module)
@@ -0,0 +1,285 @@
+"""
+Runtime support for arrays, generated as Wasm functions into every module of lang_array
+and lang_fun: an allocator with free lists for size classes, and a mark-sweep garbage
+collector. See array_compilerSupport.Heap for the layout of the heap.
+
+$@alloc first searches the free lists, then takes memory above $@free_ptr. If both fail,
+it collects garbage, and grows the memory if the collection did not free enough. The
+roots of the collector are the globals of the main function and the frames on the
+shadow stack (see array_compilerSupport.Frame). The graph of arrays is acyclic and its
+depth is bounded by the nesting of array types, so marking is a simple recursion.
+"""
+from lang_array.array_compilerSupport import *
+
+def _id(x: str) -> WasmId:
+    return WasmId('$' + x)
+
+def _i32(v: int) -> WasmInstr:
+    return WasmInstrConst('i32', v)
+
+def _get(x: str) -> WasmInstr:
+    return WasmInstrVarLocal('get', _id(x))
+
+def _set(x: str) -> WasmInstr:
+    return WasmInstrVarLocal('set', _id(x))
+
+def _tee(x: str) -> WasmInstr:
+    return WasmInstrVarLocal('tee', _id(x))
+
+def _op(op: Literal['add', 'sub', 'mul', 'shr_u', 'shl', 'xor', 'and', 'or']) -> WasmInstr:
+    return WasmInstrNumBinOp('i32', op)
+
+def _rel(op: Literal['eq', 'ne', 'lt_s', 'lt_u', 'gt_s', 'gt_u', 'le_s', 'le_u', 'ge_s', 'ge_u']) \
+        -> WasmInstr:
+    return WasmInstrIntRelOp('i32', op)
+
+def _call(f: str) -> WasmInstr:
+    return WasmInstrCall(WasmId('$@' + f))
+
+def _br(label: str, conditional: bool = False) -> WasmInstr:
+    return WasmInstrBranch(_id(label), conditional)
+
+_load = WasmInstrMem('i32', 'load')
+_store = WasmInstrMem('i32', 'store')
+_eqz = WasmInstrIntTestOp('i32')
+_freePtr = [WasmInstrVarGlobal('get', Globals.freePtr)]
+# the size of the memory in bytes
+_memBytes = [WasmInstrMemPages('size'), _i32(16), _op('shl')]
+
+def _func(name: str, params: list[str], result: Optional[WasmValtype], locals: list[str],
+          instrs: list[WasmInstr]) -> WasmFunc:
+    return WasmFunc(WasmId('$@' + name), [(_id(p), 'i32') for p in params], result,
+                    [(_id(x), 'i32') for x in locals], instrs)
+
+def _sizeClass() -> WasmFunc:
+    """
+    The address of the head of the free list for blocks of the given size.
+    """
+    return _func('size_class', ['size'], 'i32', ['c'], [
+        _get('size'), _i32(4), _op('shr_u'), _set('size'),
+        WasmInstrBlock(_id('done'), None, [
+            WasmInstrLoop(_id('next'), [
+                _get('size'), _eqz, _br('done', True),
+                _get('c'), _i32(Heap.sizeClasses - 1), _rel('eq'), _br('done', True),
+                _get('size'), _i32(1), _op('shr_u'), _set('size'),
+                _get('c'), _i32(1), _op('add'), _set('c'),
+                _br('next')])]),
+        _i32(Heap.freeLists), _get('c'), _i32(2), _op('shl'), _op('add')])
+
+def _blockSize() -> WasmFunc:
+    """
+    The size of the block of an array with the given header.
+    """
+    return _func('block_size', ['h'], 'i32', ['size'], [
+        _get('h'), _i32(4), _op('shr_u'),
+        _get('h'), _i32(Heap.wide), _op('and'),
+        WasmInstrIf('i32', [_i32(3)], [_i32(2)]),
+        _op('shl'), _i32(4), _op('add'), _tee('size'),
+        _i32(Heap.minBlockSize), _rel('lt_u'),
+        WasmInstrIf('i32', [_i32(Heap.minBlockSize)], [_get('size')])])
+
+def _freeBlock() -> WasmFunc:
+    """
+    Turns the memory at p into a free block of the given size.
+    """
+    return _func('free_block', ['p', 'size'], None, ['head'], [
+        _get('p'), _get('size'), _store,
+        _get('size'), _i32(Heap.minBlockSize), _rel('ge_u'),
+        WasmInstrIf(None, [
+            _get('size'), _call('size_class'), _set('head'),
+            _get('p'), _i32(4), _op('add'), _get('head'), _load, _store,
+            _get('head'), _get('p'), _store], [])])
+
+def _take() -> WasmFunc:
+    """
+    Removes the first block with at least size bytes from the free lists, starting with
+    the list for size. The rest of the block becomes a free block. Returns 0 if there is
+    no such block.
+    """
+    return _func('take', ['size'], 'i32', ['head', 'prev', 'p', 's', 'res'], [
+        _get('size'), _call('size_class'), _set('head'),
+        WasmInstrBlock(_id('found'), None, [
+            WasmInstrLoop(_id('lists'), [
+                _get('head'), _set('prev'),
+                WasmInstrBlock(_id('next_list'), None, [
+                    WasmInstrLoop(_id('blocks'), [
+                        _get('prev'), _load, _tee('p'), _eqz, _br('next_list', True),
+                        _get('p'), _load, _tee('s'), _get('size'), _rel('ge_u'),
+                        WasmInstrIf(None, [
+                            _get('prev'), _get('p'), _i32(4), _op('add'), _load, _store,
+                            _get('s'), _get('size'), _rel('ne'),
+                            WasmInstrIf(None, [
+                                _get('p'), _get('size'), _op('add'),
+                                _get('s'), _get('size'), _op('sub'),
+                                _call('free_block')], []),
+                            _get('p'), _set('res'),
+                            _br('found')], []),
+                        _get('p'), _i32(4), _op('add'), _set('prev'),
+                        _br('blocks')])]),
+                _get('head'), _i32(4), _op('add'), _tee('head'),
+                _i32(Heap.freeLists + 4 * Heap.sizeClasses), _rel('lt_u'),
+                _br('lists', True)])]),
+        _get('res')])
+
+def _bump() -> WasmFunc:
+    """
+    Takes size bytes from the memory above $@free_ptr, returns 0 if they do not fit.
+    """
+    return _func('bump', ['size'], 'i32', [],
+        _freePtr + [_get('size'), _op('add')] + _memBytes + [_rel('gt_u'),
+        WasmInstrIf('i32', [_i32(0)], _freePtr + _freePtr + [
+            _get('size'), _op('add'), WasmInstrVarGlobal('set', Globals.freePtr)])])
+
+def _grow() -> WasmFunc:
+    """
+    Grows the memory such that size bytes fit above $@free_ptr. To keep the number of
+    collections low, the memory grows at least by its current size if possible.
+    """
+    return _func('grow', ['size'], None, ['need'],
+        _freePtr + [_get('size'), _op('add')] + _memBytes + [_op('sub'),
+        _tee('need'), _i32(0), _rel('gt_s'),
+        WasmInstrIf('i32', [
+            _get('need'), _i32(Heap.pageSize - 1), _op('add'), _i32(16), _op('shr_u')],
+            [_i32(0)]),
+        _set('need'),
+        WasmInstrMemPages('size'), _get('need'), _rel('gt_u'),
+        WasmInstrIf('i32', [WasmInstrMemPages('size')], [_get('need')]),
+        WasmInstrMemPages('grow'), _i32(-1), _rel('eq'),
+        WasmInstrIf(None, [
+            _get('need'),
+            WasmInstrIf(None, [_get('need'), WasmInstrMemPages('grow'), WasmInstrDrop()], [])],
+            [])])
+
+def _mark() -> WasmFunc:
+    """
+    Marks the array p and the arrays reachable from it. p may be 0.
+    """
+    return _func('mark', ['p'], None, ['h', 'q', 'end'], [
+        WasmInstrBlock(_id('done'), None, [
+            _get('p'), _eqz, _br('done', True),
+            _get('p'), _load, _tee('h'), _i32(Heap.mark), _op('and'), _br('done', True),
+            _get('p'), _get('h'), _i32(Heap.mark), _op('or'), _store,
+            _get('h'), _i32(Heap.pointers), _op('and'), _eqz, _br('done', True),
+            _get('p'), _i32(4), _op('add'), _tee('q'),
+            _get('h'), _i32(4), _op('shr_u'), _i32(2), _op('shl'), _op('add'), _set('end'),
+            WasmInstrLoop(_id('elems'), [
+                _get('q'), _get('end'), _rel('lt_u'),
+                WasmInstrIf(None, [
+                    _get('q'), _load, _call('mark'),
+                    _get('q'), _i32(4), _op('add'), _set('q'),
+                    _br('elems')], [])])])])
+
+def _sweep(heapStart: int) -> WasmFunc:
+    """
+    Frees the arrays that are not marked and clears the marks. Adjacent free blocks are
+    merged, and the free lists are rebuilt. A free block at the end of the heap goes back
+    to the memory above $@free_ptr. Returns the number of bytes in the free lists.
+    """
+    live = Heap.array | Heap.mark
+    return _func('sweep', [], 'i32', ['p', 'h', 'size', 'run', 'free'], [
+        _i32(Heap.freeLists), _i32(0), _i32(4 * Heap.sizeClasses), WasmInstrBulkMem('fill'),
+        _i32(heapStart), _set('p'),
+        WasmInstrBlock(_id('done'), None, [
+            WasmInstrLoop(_id('blocks'), [
+                _get('p')] + _freePtr + [_rel('ge_u'), _br('done', True),
+                _get('p'), _load, _tee('h'), _i32(Heap.array), _op('and'),
+                WasmInstrIf('i32', [_get('h'), _call('block_size')], [_get('h')]),
+                _set('size'),
+                _get('h'), _i32(live), _op('and'), _i32(live), _rel('eq'),
+                WasmInstrIf(None, [
+                    _get('p'), _get('h'), _i32(Heap.mark), _op('xor'), _store,
+                    _get('run'),
+                    WasmInstrIf(None, [
+                        _get('run'), _get('p'), _get('run'), _op('sub'), _call('free_block'),
+                        _get('free'), _get('p'), _op('add'), _get('run'), _op('sub'),
+                        _set('free'),
+                        _i32(0), _set('run')], [])],
+                    [_get('run'), _eqz, WasmInstrIf(None, [_get('p'), _set('run')], [])]),
+                _get('p'), _get('size'), _op('add'), _set('p'),
+                _br('blocks')])]),
+        _get('run'),
+        WasmInstrIf(None, [_get('run'), WasmInstrVarGlobal('set', Globals.freePtr)], []),
+        _get('free')])
+
+def _collect(roots: list[WasmId], shadowStack: Optional[int]) -> WasmFunc:
+    """
+    Collects garbage, returns the number of free bytes.
+    """
+    instrs: list[WasmInstr] = []
+    for g in roots:
+        instrs += [WasmInstrVarGlobal('get', g), _call('mark')]
+    if shadowStack is not None:
+        instrs += [
+            _i32(shadowStack), _set('q'),
+            WasmInstrLoop(_id('slots'), [
+                _get('q'), WasmInstrVarGlobal('get', Globals.shadowPtr), _rel('lt_u'),
+                WasmInstrIf(None, [
+                    _get('q'), _load, _call('mark'),
+                    _get('q'), _i32(4), _op('add'), _set('q'),
+                    _br('slots')], [])])]
+    instrs += [_call('sweep')] + _memBytes + _freePtr + [_op('sub'), _op('add')]
+    return _func('collect', [], 'i32', ['q'], instrs)
+
+def _alloc() -> WasmFunc:
+    """
+    Allocates an array with the given length and header flags and writes its header.
+    Collects garbage if the free lists and the memory above $@free_ptr cannot satisfy the
+    request. If less than a quarter of the memory is free after the collection, the
+    memory grows.
+    """
+    return _func('alloc', ['len', 'flags'], 'i32', ['h', 'size', 'p'], [
+        _get('len'), _i32(4), _op('shl'), _get('flags'), _op('or'), _tee('h'),
+        _call('block_size'), _set('size'),
+        WasmInstrBlock(_id('done'), None, [
+            _get('size'), _call('take'), _tee('p'), _br('done', True),
+            _get('size'), _call('bump'), _tee('p'), _br('done', True),
+            _call('collect'), WasmInstrMemPages('size'), _i32(14), _op('shl'), _rel('lt_u'),
+            WasmInstrIf(None, [_get('size'), _call('grow')], []),
+            _get('size'), _call('take'), _tee('p'), _br('done', True),
+            _get('size'), _call('bump'), _tee('p'), _br('done', True),
+            _get('size'), _call('grow'),
+            _get('size'), _call('bump'), _tee('p'), _br('done', True)] +
+            Errors.outputError(Errors.outOfMemory) + [WasmInstrTrap()]),
+        _get('p'), _get('h'), _store,
+        _get('p')])
+
+def _fill(ty: Literal['i32', 'i64']) -> WasmFunc:
+    """
+    Sets all elements of array p to v, returns p.
+    """
+    size = 8 if ty == 'i64' else 4
+    f = _func(f'fill_{ty}', ['p', 'v'], 'i32', ['q', 'end'], [
+        _get('p'), _i32(4), _op('add'), _tee('q'),
+        _get('p'), _load, _i32(4), _op('shr_u'), _i32(size.bit_length() - 1), _op('shl'),
+        _op('add'), _set('end'),
+        WasmInstrBlock(_id('done'), None, [
+            WasmInstrLoop(_id('elems'), [
+                _get('q'), _get('end'), _rel('ge_u'), _br('done', True),
+                _get('q'), _get('v'), WasmInstrMem(ty, 'store'),
+                _get('q'), _i32(size), _op('add'), _set('q'),
+                _br('elems')])]),
+        _get('p')])
+    return WasmFunc(f.id, [(_id('p'), 'i32'), (_id('v'), ty)], f.result, f.locals, f.instrs)
+
+def allocInstrs(length: list[WasmInstr], flags: int) -> list[WasmInstr]:
+    """
+    Allocates an array, length pushes its length (i64). Leaves the address of the array
+    on top of the stack.
+    """
+    return length + [WasmInstrConvOp('i32.wrap_i64'), _i32(flags), _call('alloc')]
+
+def fillInstrs(ty: Literal['i32', 'i64']) -> list[WasmInstr]:
+    """
+    Expects the address of an array and a value of type ty on the stack, sets all
+    elements of the array to the value. Leaves the address on top of the stack.
+    """
+    return [_call(f'fill_{ty}')]
+
+def funcs(data: DataSegments, roots: list[WasmId]) -> list[WasmFunc]:
+    """
+    The runtime functions for a module with the given data segments, roots are the root
+    globals of the main function.
+    """
+    return [_sizeClass(), _blockSize(), _freeBlock(), _take(), _bump(), _grow(), _mark(),
+            _sweep(data.heapStart()), _collect(roots, data.shadowStackStart()), _alloc(),
+            _fill('i32'), _fill('i64')]
@@ -54,6 +54,13 @@ def atomic(needAtomic: bool, e: atom.exp, tmps: Temporaries, ctx: Ctx) -> tuple[
     else:
         return (e, tmps)
 
+def isArray(e: exp) -> bool:
+    """
+    Arrays used as operands are stored in temporary variables, so that the garbage
+    collector finds them while the other operands are evaluated.
+    """
+    return isinstance(e.ty, NotVoid) and isinstance(e.ty.ty, Array)
+
 def transExp(e: exp, needAtomic: bool, ctx: Ctx) -> tuple[atom.exp, Temporaries]:
     """
     Translates expression e (of type array_ast.exp) to an expression of type
@@ -70,14 +77,14 @@ def transExp(e: exp, needAtomic: bool, ctx: Ctx) -> tuple[atom.exp, Temporaries]
         case BoolConst(v):
             return (atom.AtomExp(atom.BoolConst(v, Bool()), t), [])
         case Call(id, args):
-            (atomArgs, tmps) = utils.unzip([transExp(a, False, ctx) for a in args])
+            (atomArgs, tmps) = utils.unzip([transExp(a, isArray(a), ctx) for a in args])
             return atomic(needAtomic, atom.Call(id, atomArgs, t), utils.flatten(tmps), ctx)
         case UnOp(op, sub):
             (atomSub, tmps) = transExp(sub, False, ctx)
             return atomic(needAtomic, atom.UnOp(op, atomSub, t), tmps, ctx)
         case BinOp(left, op, right):
-            (l, tmps1) = transExp(left, False, ctx)
-            (r, tmps2) = transExp(right, False, ctx)
+            (l, tmps1) = transExp(left, isArray(left), ctx)
+            (r, tmps2) = transExp(right, isArray(right), ctx)
             return atomic(needAtomic, atom.BinOp(l, op, r, t), tmps1 + tmps2, ctx)
         case Name(x):
             xt = assertExpNotVoid(e)
@@ -0,0 +1,146 @@
+"""
+Interpreter for the fun language that translates the AST into closures before
+executing it (see common/closureSupport.py). Arrays are represented as Python lists,
+each function gets its own frame layout.
+"""
+from lang_fun.fun_ast import *
+import lang_fun.fun_tychecker as fun_tychecker
+import common.utils as utils
+from common.closureSupport import *
+from typing import *
+
+class Function:
+    """
+    A user-defined function. The parameters occupy the first slots of the frame.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.body: StmtCode = lambda f: None
+        self.frameTemplate: Frame = []
+    def __call__(self, args: list[Any]) -> Any:
+        f = self.frameTemplate.copy()
+        f[:len(args)] = args
+        r = self.body(f)
+        return None if r is None else r[0]
+    def __repr__(self):
+        return f'Function({self.name})'
+
+type FunEnv = dict[Ident, Function]
+
+class Ctx:
+    def __init__(self, funs: FunEnv, slots: Slots[Ident]):
+        self.funs = funs
+        self.slots = slots
+    def newFrameTemplate(self) -> Frame:
+        """
+        As in the AST interpreter, variables named like a function initially refer to
+        that function.
+        """
+        frame = self.slots.newFrame()
+        for (x, i) in self.slots.indices.items():
+            if x in self.funs:
+                frame[i] = self.funs[x]
+        return frame
+
+def compileFuncall(fun: exp, args: list[exp], ctx: Ctx) -> ExpCode:
+    match (fun, args):
+        case (Name(Ident('input_int')), []):
+            return lambda f: int(utils.inputInt('Enter some int: '))
+        case (Name(Ident('print')), [e]):
+            arg = compileExp(e, ctx)
+            def p(f: Frame) -> None:
+                print(arg(f))
+            return p
+        case (Name(Ident('len')), [e]):
+            arg = compileExp(e, ctx)
+            return lambda f: len(arg(f))
+        case _:
+            target = compileExp(fun, ctx)
+            argCodes = [compileExp(a, ctx) for a in args]
+            return lambda f: target(f)([a(f) for a in argCodes])
+
+def binOpName(left: exp, op: binaryop) -> str:
+    """
+    Arrays are compared by identity.
+    """
+    name = type(op).__name__
+    match (left.ty, name):
+        case (NotVoid(Array()), 'Eq'):
+            return 'Is'
+        case (NotVoid(Array()), 'NotEq'):
+            return 'IsNot'
+        case _:
+            return name
+
+def compileExp(e: exp, ctx: Ctx) -> ExpCode:
+    match e:
+        case IntConst(value):
+            return mkConst(value)
+        case BoolConst(value):
+            return mkConst(value)
+        case Call(fun, args):
+            return compileFuncall(fun, args, ctx)
+        case UnOp(op, sub):
+            return mkUnOp(type(op).__name__, compileExp(sub, ctx))
+        case BinOp(left, op, right):
+            return mkBinOp(binOpName(left, op), compileExp(left, ctx), compileExp(right, ctx))
+        case Name(name, UserFun()):
+            return mkConst(ctx.funs[name])
+        case Name(name):
+            return mkGetVar(ctx.slots.slot(name), name.name)
+        case ArrayInitDyn(lenExp, initExp):
+            n = compileExp(lenExp, ctx)
+            init = compileExp(initExp, ctx)
+            return lambda f: n(f) * [init(f)]
+        case ArrayInitStatic(es):
+            elems = [compileExp(e, ctx) for e in es]
+            return lambda f: [x(f) for x in elems]
+        case Subscript(arrayExp, indexExp):
+            a = compileExp(arrayExp, ctx)
+            i = compileExp(indexExp, ctx)
+            return lambda f: a(f)[i(f)]
+    raise Exception(f'No match for expression {e}')
+
+def compileStmt(s: stmt, ctx: Ctx) -> StmtCode:
+    match s:
+        case StmtExp(e):
+            return mkExpStmt(compileExp(e, ctx))
+        case Assign(x, e):
+            return mkSetVar(ctx.slots.slot(x), compileExp(e, ctx))
+        case IfStmt(cond, thenBody, elseBody):
+            return mkIf(compileExp(cond, ctx), compileStmts(thenBody, ctx),
+                        compileStmts(elseBody, ctx))
+        case WhileStmt(cond, body):
+            return mkWhile(compileExp(cond, ctx), compileStmts(body, ctx))
+        case SubscriptAssign(leftExp, idxExp, rightExp):
+            a = compileExp(leftExp, ctx)
+            i = compileExp(idxExp, ctx)
+            v = compileExp(rightExp, ctx)
+            def store(f: Frame) -> None:
+                idx = i(f)
+                x = v(f)
+                a(f)[idx] = x
+            return store
+        case Return(e):
+            if e is None:
+                return lambda f: (None,)
+            result = compileExp(e, ctx)
+            return lambda f: (result(f),)
+
+def compileStmts(stmts: list[stmt], ctx: Ctx) -> StmtCode:
+    return mkSeq([compileStmt(s, ctx) for s in stmts])
+
+def compileFun(fun: Function, f: FunDef, funs: FunEnv):
+    ctx = Ctx(funs, Slots([p.var for p in f.params]))
+    fun.body = compileStmts(f.body, ctx)
+    fun.frameTemplate = ctx.newFrameTemplate()
+
+def interpModule(m: mod):
+    utils.assertType(m, Module)
+    fun_tychecker.tycheckModule(m)
+    funs: FunEnv = {f.name: Function(f.name.name) for f in m.funs}
+    for f in m.funs:
+        compileFun(funs[f.name], f, funs)
+    ctx = Ctx(funs, Slots())
+    code = compileStmts(m.stmts, ctx)
+    code(ctx.newFrameTemplate())
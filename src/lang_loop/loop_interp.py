@@ -1,6 +1,7 @@
 from lang_loop.loop_ast import *
 import lang_loop.loop_tychecker as loop_tychecker
 import common.utils as utils
+from common.genericInterp import Block, execStmts
 from typing import *
 
 type Environ = dict[Ident, TyValue]
@@ -56,31 +57,24 @@ def interpExp(e: exp, env: Environ) -> Optional[TyValue]:
             return env[name]
     raise Exception(f'No match for expression {e}')
 
-def interpStmt(s: stmt, env: Environ, cont: list[stmt]) -> None:
+def interpStmt(s: stmt, env: Environ) -> Optional[Block[stmt]]:
     match s:
         case StmtExp(e):
             interpExp(e, env)
-            interpStmts(cont, env)
         case Assign(x, e):
             v: Any = interpExp(e, env)
             env[x] = v
-            interpStmts(cont, env)
         case IfStmt(cond, thenBody, elseBody):
             v: Any = interpExp(cond, env)
-            if v:
-                interpStmts(thenBody + cont, env)
-            else:
-                interpStmts(elseBody + cont, env)
+            return Block(thenBody if v else elseBody)
         case WhileStmt(cond, body):
             v: Any = interpExp(cond, env)
             if v:
-                interpStmts(body + [s] + cont, env)
-            else:
-                interpStmts(cont, env)
+                return Block(body, repeat=True)
+    return None
 
 def interpStmts(stmts: list[stmt], env: Environ) -> None:
-    if len(stmts) > 0:
-        interpStmt(stmts[0], env, stmts[1:])
+    execStmts(stmts, lambda s: interpStmt(s, env))
 
 def interpModule(m: mod):
     utils.assertType(m, Module)
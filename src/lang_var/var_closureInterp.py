@@ -0,0 +1,52 @@
+"""
+Interpreter for the var language that translates the AST into closures before
+executing it (see common/closureSupport.py).
+"""
+from lang_var.var_ast import *
+import lang_var.var_tychecker as var_tychecker
+import common.utils as utils
+from common.closureSupport import *
+from typing import *
+
+def compileFuncall(id: ident, args: list[exp], slots: Slots[Ident]) -> ExpCode:
+    match (id.name, args):
+        case ('input_int', []):
+            return lambda f: int(utils.inputInt('Enter some int: '))
+        case ('print', [e]):
+            arg = compileExp(e, slots)
+            def p(f: Frame) -> None:
+                print(arg(f))
+            return p
+        case _:
+            raise ValueError(f'Invalid function call of {id.name} with {len(args)} arguments')
+
+def compileExp(e: exp, slots: Slots[Ident]) -> ExpCode:
+    match e:
+        case IntConst(value):
+            return mkConst(value)
+        case Call(id, args):
+            return compileFuncall(id, args, slots)
+        case UnOp(op, sub):
+            return mkUnOp(type(op).__name__, compileExp(sub, slots))
+        case BinOp(left, op, right):
+            return mkBinOp(type(op).__name__, compileExp(left, slots), compileExp(right, slots))
+        case Name(name):
+            return mkGetVar(slots.slot(name), name.name)
+    raise Exception(f'No match for expression {e}')
+
+def compileStmt(s: stmt, slots: Slots[Ident]) -> StmtCode:
+    match s:
+        case StmtExp(e):
+            return mkExpStmt(compileExp(e, slots))
+        case Assign(x, e):
+            return mkSetVar(slots.slot(x), compileExp(e, slots))
+
+def compileStmts(stmts: list[stmt], slots: Slots[Ident]) -> StmtCode:
+    return mkSeq([compileStmt(s, slots) for s in stmts])
+
+def interpModule(m: mod):
+    utils.assertType(m, Module)
+    var_tychecker.tycheckModule(m)
+    slots: Slots[Ident] = Slots()
+    code = compileStmts(m.stmts, slots)
+    code(slots.newFrame())
@@ -33,12 +33,22 @@ exit codes signal a bug in the compiler itself.'''
     def addCompilerArgs(p: argparse.ArgumentParser):
         p.add_argument('--wat2wasm', default='wat2wasm',
                            help='Path to the wat2wasm tool')
+        p.add_argument('--emit', choices=genericCompiler.EMIT_MODES, default='binary-direct',
+                       help='How to produce .wasm files: encode directly (binary-direct) or via ' \
+                           'the textual format and the wat2wasm tool. Default: binary-direct')
+        p.add_argument('--pretty-wat', action='store_true',
+                       help='Layout .wat files with the pretty printer (slow for large programs)')
         p.add_argument('--output', default=DEFAULT_OUTPUT,
                        help=f'Output file (.wat or .wasm). Default: {DEFAULT_OUTPUT}')
         p.add_argument('--max-mem-size', type=int,
                        help="Max memory size in number of 64kB pages")
         p.add_argument('--max-array-size', type=int,
                        help="Max size of an array in bytes")
+        p.add_argument('-O', dest='opt_level', type=int, choices=genericCompiler.OPT_LEVELS,
+                       default=0, help='Optimization level for wasm, e.g. -O1 (default: 0)')
+        p.add_argument('--wasm-passes', metavar='PASSES',
+                       help='Comma-separated list of wasm optimization passes to run instead ' \
+                           'of those of the optimization level, e.g. fold,peephole')
         p.add_argument('input', help='Input file .py')
     addCompilerArgs(cp)
     run = subparsers.add_parser('run', help='Compiles the given program and runs it with iwasm. Also see the ' \
@@ -49,6 +59,9 @@ exit codes signal a bug in the compiler itself.'''
 
     interp = subparsers.add_parser('interp', help='Runs the given file through our own interpeter')
     interp.add_argument('--level', help='The loglevel (debug, info, warn)')
+    interp.add_argument('--engine', choices=['ast', 'closure'], default='ast',
+                        help='ast walks the AST, closure translates the AST into closures first ' \
+                            '(default: ast)')
     interp.add_argument('input', help='Input file .py')
 
     tacInterp = subparsers.add_parser('tacInterp',
@@ -58,6 +71,8 @@ exit codes signal a bug in the compiler itself.'''
     tacInterp.add_argument('input', help='Input file .py')
     tacInterp.add_argument('--print-tac', action='store_true',
                            help='Print the three-address code instructions')
+    tacInterp.add_argument('-O', dest='opt_level', type=int, choices=genericCompiler.OPT_LEVELS,
+                           default=0, help='Optimization level for TAC, e.g. -O1 (default: 0)')
 
 
     assembly = subparsers.add_parser('assembly',
@@ -66,6 +81,10 @@ exit codes signal a bug in the compiler itself.'''
     assembly.add_argument('--level', help='The loglevel (debug, info, warn)')
     assembly.add_argument('--max-registers', type=int,
                           help="Max number of registers used")
+    assembly.add_argument('--regalloc', choices=genericCompiler.REGALLOC_MODES, default='color',
+                          help='Register allocator (default: color)')
+    assembly.add_argument('-O', dest='opt_level', type=int, choices=genericCompiler.OPT_LEVELS,
+                          default=0, help='Optimization level for TAC, e.g. -O1 (default: 0)')
     assembly.add_argument('input', help='Input file .py')
     assembly.add_argument('output', default='out.as', help='Output file .as (default: out.as)')
 
@@ -90,7 +109,7 @@ exit codes signal a bug in the compiler itself.'''
         utils.abort('Language simple only available when parsing')
     return args
 
-def importModule(lang: str, kind: Literal['compile', 'interp', 'ast', 'parse']):
+def importModule(lang: str, kind: Literal['compile', 'interp', 'closureInterp', 'ast', 'parse']):
     if lang == 'simple':
         return None
     match kind:
@@ -100,6 +119,8 @@ def importModule(lang: str, kind: Literal['compile', 'interp', 'ast', 'parse']):
             modName = f'parsers.lang_{lang}.{lang}_parser'
         case "interp":
             modName = f'lang_{lang}.{lang}_interp'
+        case "closureInterp":
+            modName = f'lang_{lang}.{lang}_closureInterp'
         case "ast":
             modName = f'lang_{lang}.{lang}_ast'
     m = importlib.import_module(modName)
@@ -159,13 +180,17 @@ def main():
             compilerMod = importModule(lang, 'compile')
             compileFun = getFun(compilerMod, 'compileModule')
             compileArgs = genericCompiler.Args(args.input, args.output, args.wat2wasm,
-                                                args.max_mem_size, args.max_array_size)
+                                                args.max_mem_size, args.max_array_size,
+                                                emit=args.emit, prettyWat=args.pretty_wat,
+                                                wasmOptLevel=args.opt_level,
+                                                wasmPasses=args.wasm_passes.split(',') \
+                                                    if args.wasm_passes else None)
             genericCompiler.compileMain(compileArgs, compileFun, ast)
             if args.cmd == "run":
                 runWasm(args.run_wasm, args.output)
         case "interp":
             ast = importModule(lang, 'ast')
-            interpMod = importModule(lang, 'interp')
+            interpMod = importModule(lang, 'interp' if args.engine == 'ast' else 'closureInterp')
             interpFun = getFun(interpMod, 'interpModule')
             interpArgs = genericInterp.Args(args.input)
             genericInterp.interpMain(interpArgs, interpFun, ast)
@@ -188,11 +213,13 @@ def main():
                 parseFun = getFun(parseMod, 'parseModule')
                 genericParser.parseWithOwnParser(args.input, parserArgs, ast, parseFun)
         case "tacInterp":
-            compileArgs = genericCompiler.Args(args.input, '/tmp/dummy.wasm', 'wat2wasm', 1, 1)
+            compileArgs = genericCompiler.Args(args.input, '/tmp/dummy.wasm', 'wat2wasm', 1, 1,
+                                               optLevel=args.opt_level)
             tac_interp.interpFile(compileArgs, args.print_tac)
         case "assembly":
             compileArgs = genericCompiler.Args(args.input, args.output, 'wat2wasm', 1, 1,
-                                               args.max_registers)
+                                               args.max_registers, regAlloc=args.regalloc,
+                                               optLevel=args.opt_level)
             tac_comp.compileFile(compileArgs)
         case _:
             utils.abort(f'Unknown command: {args.cmd}')
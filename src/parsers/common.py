@@ -3,6 +3,7 @@ from lark import Lark, Token, Tree, ParseTree, tree, exceptions
 import common.log as log
 import common.utils as utils
 from dataclasses import dataclass
+import hashlib
 import os
 
 type ParseAlg = Literal['earley', 'lalr']
@@ -115,18 +116,58 @@ class ParseError(Exception):
 def mkLexer(grammarFile: str) -> Lark:
     return mkParser('earley', grammarFile, 'start')
 
+# Directory where the tables of LALR parsers are serialized, so that they survive
+# the current process. It lies in the top directory of the repository, independent of
+# the working directory. Set to None to disable the on-disk cache.
+PARSER_CACHE_DIR: Optional[str] = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '.parser_cache'))
+
+type _ParserKey = tuple[str, ParseAlg, str]
+
+# In-process cache of parsers, keyed by the sha256 of the grammar, the parsing algorithm and
+# the start symbol
+_parserCache: dict[_ParserKey, Lark] = {}
+
+def clearParserCache():
+    """
+    Clears the in-process parser cache (the on-disk cache is not affected).
+    """
+    _parserCache.clear()
+
+def _diskCacheFile(key: _ParserKey) -> Optional[str]:
+    (grammarHash, alg, start) = key
+    if alg != 'lalr' or PARSER_CACHE_DIR is None:
+        return None
+    try:
+        os.makedirs(PARSER_CACHE_DIR, exist_ok=True)
+    except OSError as err:
+        log.debug(f'Cannot create parser cache directory {PARSER_CACHE_DIR}: {err}')
+        return None
+    return os.path.join(PARSER_CACHE_DIR, f'{alg}_{start}_{grammarHash}.lark')
+
 def mkParser(alg: ParseAlg, grammarFile: str, start: str) -> Lark:
+    """
+    Returns a parser for the grammar in grammarFile. Parsers are cached in-process, the
+    tables of LALR parsers are also cached in PARSER_CACHE_DIR.
+    """
     grammar = utils.readTextFile(grammarFile)
+    key: _ParserKey = (hashlib.sha256(grammar.encode('utf-8')).hexdigest(), alg, start)
+    parser = _parserCache.get(key)
+    if parser is not None:
+        return parser
     try:
         match alg:
             case 'earley':
-                return Lark(grammar, start=start, ambiguity='explicit', parser='earley',
-                            lexer='basic', debug=True)
+                parser = Lark(grammar, start=start, ambiguity='explicit', parser='earley',
+                              lexer='basic', debug=True)
             case 'lalr':
-                return Lark(grammar, start=start, parser='lalr', strict=True,
-                            debug=True, lexer='basic')
+                cacheFile = _diskCacheFile(key)
+                parser = Lark(grammar, start=start, parser='lalr', strict=True,
+                              debug=True, lexer='basic', cache=cacheFile or False)
     except exceptions.LarkError as err:
         raise ParseError(f'Error constructing {alg} parser from grammar in {grammarFile}: {err}')
+    _parserCache[key] = parser
+    return parser
 
 def _parseAsParseTree(parser: Lark, s: str, png: Optional[str]) -> ParseTree:
     s = s.rstrip() + '\n' # ensure there is one trailing newline
@@ -0,0 +1,68 @@
+"""
+Builders for TAC and TACspill programs in the tests of the assembly backend, and
+helpers for running TAC programs.
+"""
+import io
+import pytest
+import assembly.tac_ast as tac
+import assembly.tacSpill_ast as tacSpill
+import assembly.tacVM as tacVM
+import common.testsupport as testsupport
+
+def v(s: str) -> tac.prim:
+    return tac.Name(tac.Ident(s))
+
+def c(i: int) -> tac.prim:
+    return tac.Const(i)
+
+def assign(x: str, e: tac.exp) -> tac.instr:
+    return tac.Assign(tac.Ident(x), e)
+
+def binop(p1: tac.prim, op: str, p2: tac.prim) -> tac.exp:
+    return tac.BinOp(p1, tac.Op(op), p2)
+
+def add(p1: tac.prim, p2: tac.prim) -> tac.exp:
+    return binop(p1, 'ADD', p2)
+
+def printInstr(p: tac.prim) -> tac.instr:
+    return tac.Call(None, tac.Ident('$print_i64'), [p])
+
+def inputInstr(x: str) -> tac.instr:
+    return tac.Call(tac.Ident(x), tac.Ident('$input_i64'), [])
+
+def spillV(s: str) -> tacSpill.prim:
+    return tacSpill.Name(tacSpill.Ident(s))
+
+def spillC(i: int) -> tacSpill.prim:
+    return tacSpill.Const(i)
+
+# a is live in the whole program but only used outside the loop, i and n are used
+# in the loop.
+loopInstrs: list[tac.instr] = [
+    inputInstr('a'),
+    inputInstr('n'),
+    assign('i', tac.Prim(c(0))),
+    tac.Label('loop'),
+    assign('i', add(v('i'), c(1))),
+    assign('c', binop(v('i'), 'LT_S', v('n'))),
+    tac.GotoIf(v('c'), 'loop'),
+    printInstr(v('a'))
+]
+
+def corpus() -> list[str]:
+    """
+    The test files of lang_var and lang_loop without errors.
+    """
+    return [f for (_, f) in testsupport.collectTestFiles(['test_files'], ['var', 'loop'],
+                                                         ignoreErrorFiles=True)
+            if '/lang_var/' in f or '/lang_loop/' in f]
+
+def runVM(instrs: list[tac.instr], input: str, monkeypatch: pytest.MonkeyPatch,
+          capsys: pytest.CaptureFixture[str]) -> str:
+    """
+    Runs the TAC program on the given input and returns its output.
+    """
+    monkeypatch.setattr('sys.stdin', io.StringIO(input))
+    capsys.readouterr()
+    tacVM.runInstrs(instrs)
+    return capsys.readouterr().out
@@ -24,9 +24,11 @@ def checkMaxRegisters(asFile: str, maxRegisters: int):
                 f'Only {maxRegisters} are allowed.')
 
 def runTest(lang: str, srcFile: str, maxRegisters: int,
-            tmp: str, hasErr: bool, input: str|None, extraArgs: str|None) -> shell.RunResult:
+            tmp: str, hasErr: bool, input: str|None, extraArgs: str|None,
+            regAlloc: str='color', optLevel: int=0) -> shell.RunResult:
     out = shell.mkTempFile('.as')
-    cmd = f'python src/main.py --lang={lang} assembly --max-registers {maxRegisters} {srcFile} {out}'
+    cmd = f'python src/main.py --lang={lang} assembly --max-registers {maxRegisters} ' \
+        f'--regalloc {regAlloc} -O{optLevel} {srcFile} {out}'
     log.info(f'Running command {cmd}')
     res1 = shell.run(cmd, onError='ignore')
     if res1.exitcode != 0:
@@ -53,3 +55,36 @@ def test_assembly(lang: str, srcFile: str, maxRegisters: int, tmp_path: str):
             runTest(lang, srcFile, maxRegisters, tmp_path, captureErr, input, extraArgs)
     )
 
+@pytest.mark.parametrize("lang, srcFile, maxRegisters", params())
+def test_assemblyIRC(lang: str, srcFile: str, maxRegisters: int, tmp_path: str):
+    testsupport.runFileTest(
+        srcFile,
+        lambda captureErr, input, extraArgs: \
+            runTest(lang, srcFile, maxRegisters, tmp_path, captureErr, input, extraArgs, 'irc')
+    )
+
+@pytest.mark.parametrize("lang, srcFile, maxRegisters", params())
+def test_assemblyLinear(lang: str, srcFile: str, maxRegisters: int, tmp_path: str):
+    testsupport.runFileTest(
+        srcFile,
+        lambda captureErr, input, extraArgs: \
+            runTest(lang, srcFile, maxRegisters, tmp_path, captureErr, input, extraArgs, 'linear')
+    )
+
+@pytest.mark.parametrize("lang, srcFile, maxRegisters", params())
+def test_assemblyO1(lang: str, srcFile: str, maxRegisters: int, tmp_path: str):
+    testsupport.runFileTest(
+        srcFile,
+        lambda captureErr, input, extraArgs: \
+            runTest(lang, srcFile, maxRegisters, tmp_path, captureErr, input, extraArgs,
+                    optLevel=1)
+    )
+
+@pytest.mark.parametrize("lang, srcFile, maxRegisters", params())
+def test_assemblyO2(lang: str, srcFile: str, maxRegisters: int, tmp_path: str):
+    testsupport.runFileTest(
+        srcFile,
+        lambda captureErr, input, extraArgs: \
+            runTest(lang, srcFile, maxRegisters, tmp_path, captureErr, input, extraArgs,
+                    optLevel=2)
+    )
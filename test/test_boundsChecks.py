@@ -0,0 +1,61 @@
+from common.wasm import *
+from common.compilerSupport import CompilerConfig
+import common.genericParser as genericParser
+import common.wasmOpt as wasmOpt
+import compilers.lang_array.array_compiler as array_compiler
+import lang_array.array_ast as array_ast
+from lang_array.array_compilerSupport import IndexFacts, LenOf, ArrayOfLen
+import common.utils as utils
+import shell
+
+def test_induction():
+    f = IndexFacts().assign('i', 0)
+    assert not f.isSafe('a', 'i')
+    body = f.assume('i', '<', LenOf('a'))
+    assert body.isSafe('a', 'i')
+    # i + 1 cannot overflow because i < len(a)
+    after = body.assign('i', ('i', '+', 1))
+    assert 'i' in after.nonneg and not after.isSafe('a', 'i')
+    assert f.join(after) == f
+    # Without an upper bound, i + 1 might overflow
+    assert 'i' not in f.assign('i', ('i', '+', 1)).nonneg
+
+def test_downwards():
+    f = IndexFacts().assign('n', LenOf('a')).assign('j', ('n', '-', 1))
+    assert not f.isSafe('a', 'j')
+    body = f.assume(0, '<=', 'j')
+    assert body.isSafe('a', 'j')
+    assert body.assign('j', ('j', '-', 1)).join(f) == f
+    # a negative j minus 1 might wrap around
+    assert not f.assign('j', ('j', '-', 1)).below
+
+def test_constants():
+    f = IndexFacts().assign('a', ArrayOfLen(3)).assign('i', 0)
+    assert f.isSafe('a', 2) and not f.isSafe('a', 3) and not f.isSafe('a', -1)
+    assert f.assume('i', '<', 3).isSafe('a', 'i')
+    assert not f.assume('i', '<=', 3).isSafe('a', 'i')
+    assert not f.assign('a', None).isSafe('a', 2)
+
+def boundsChecks(code: str, tmp_path: str, elim: bool = True) -> int:
+    src = shell.pjoin(tmp_path, 'test.py')
+    utils.writeTextFile(src, code)
+    cfg = CompilerConfig(CompilerConfig.defaultMaxMemSize, CompilerConfig.defaultMaxArraySize,
+                         elim)
+    m = array_compiler.compileModule(genericParser.parseFile(src, array_ast), cfg)
+    return sum(1 for i in wasmOpt.allInstrs(m.funcs[0].instrs)
+               if i == WasmInstrIntRelOp('i64', 'ge_u'))
+
+def test_compile(tmp_path: str):
+    loop = '''
+a = 10 * [0]
+i = 0
+while i < len(a):
+    a[i] = a[i] + i
+    i = i + 1
+'''
+    assert boundsChecks(loop, tmp_path) == 0
+    assert boundsChecks(loop, tmp_path, elim=False) == 2
+    offByOne = loop.replace('i < len(a)', 'i <= len(a)')
+    assert boundsChecks(offByOne, tmp_path) == 2
+    reassigned = loop.replace('    i = i + 1', '    a = [1]\n    i = i + 1')
+    assert boundsChecks(reassigned, tmp_path) == 2
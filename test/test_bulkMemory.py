@@ -0,0 +1,38 @@
+from common.wasm import *
+from common.compilerSupport import CompilerConfig
+import common.genericParser as genericParser
+import common.wasmOpt as wasmOpt
+import compilers.lang_array.array_compiler as array_compiler
+import lang_array.array_ast as array_ast
+from lang_array.array_compilerSupport import DataSegments, Errors, Globals, elemBytes, fillByte
+import common.utils as utils
+import shell
+
+def test_fillByte():
+    assert fillByte(elemBytes(0, 8)) == 0
+    assert fillByte(elemBytes(-1, 8)) == 0xff
+    assert fillByte(elemBytes(1, 4)) is None
+    assert fillByte(elemBytes(256, 8)) is None
+
+def test_dataSegments():
+    d = DataSegments()
+    assert d.heapStart() == Globals.heapStart
+    a = d.add(elemBytes(1, 4) + elemBytes(2, 4))
+    assert a == Globals.heapStart
+    assert d.add(elemBytes(1, 4) + elemBytes(2, 4)) == a
+    b = d.add(elemBytes(1, 1))
+    assert b == a + 8
+    assert d.heapStart() == a + 12
+    assert len(d.data()) == len(Errors.data()) + 2
+
+def bulkInstrs(code: str, tmp_path: str) -> list[WasmInstr]:
+    src = shell.pjoin(tmp_path, 'test.py')
+    utils.writeTextFile(src, code)
+    cfg = CompilerConfig(CompilerConfig.defaultMaxMemSize, CompilerConfig.defaultMaxArraySize)
+    m = array_compiler.compileModule(genericParser.parseFile(src, array_ast), cfg)
+    return [i for i in wasmOpt.allInstrs(m.funcs[0].instrs) if isinstance(i, WasmInstrBulkMem)]
+
+def test_compile(tmp_path: str):
+    assert bulkInstrs('a = 10 * [0]\nb = 3 * [False]', tmp_path) == [WasmInstrBulkMem('fill')] * 2
+    assert bulkInstrs('a = 10 * [1]\nb = [1, 2]', tmp_path) == [WasmInstrBulkMem('copy')]
+    assert bulkInstrs('x = 1\na = [x, 2]\nb = [1]', tmp_path) == []
@@ -3,6 +3,7 @@ import common.testsupport as testsupport
 import pytest
 import common.log as log
 import common.constants as constants
+import common.utils as utils
 
 pytestmark = pytest.mark.instructor
 
@@ -15,9 +16,10 @@ def run(wasm: str, input: str|None) -> shell.RunResult:
         res = shell.RunResult(res.stderr, res.stderr, constants.RUN_ERROR_EXIT_CODE)
     return res
 
-def runTest(lang: str, srcFile: str, tmp: str, captureErr: bool, input: str|None, extraArgs: str|None) -> shell.RunResult:
+def runTest(lang: str, srcFile: str, tmp: str, captureErr: bool, input: str|None, extraArgs: str|None,
+            optLevel: int=0) -> shell.RunResult:
     output = shell.pjoin(tmp, 'out.wasm')
-    cmd = f'python src/main.py --lang={lang} compile --output={output}'
+    cmd = f'python src/main.py --lang={lang} compile -O{optLevel} --output={output}'
     if extraArgs:
         cmd = cmd + ' ' + extraArgs
     cmd = cmd + ' ' + srcFile
@@ -39,3 +41,38 @@ def test_compiler(lang: str, srcFile: str, tmp_path: str):
             runTest(lang, srcFile, tmp_path, captureErr, input, extraArgs)
     )
 
+
+@pytest.mark.parametrize("lang, srcFile", testsupport.collectTestFiles())
+def test_compilerO1(lang: str, srcFile: str, tmp_path: str):
+    testsupport.runFileTest(
+        srcFile,
+        lambda captureErr, input, extraArgs: \
+            runTest(lang, srcFile, tmp_path, captureErr, input, extraArgs, optLevel=1)
+    )
+
+@pytest.mark.parametrize("lang, srcFile", testsupport.collectTestFiles())
+def test_compilerO2(lang: str, srcFile: str, tmp_path: str):
+    testsupport.runFileTest(
+        srcFile,
+        lambda captureErr, input, extraArgs: \
+            runTest(lang, srcFile, tmp_path, captureErr, input, extraArgs, optLevel=2)
+    )
+
+# Every call keeps five arrays on the shadow stack, the recursion is almost as deep as
+# Python allows. Not in test_files because the interpreters run out of Python stack.
+deepRecursion = '''
+def f(n: int) -> int:
+    if n == 0:
+        return 0
+    return len(n * [1]) + len(n * [2]) + len([n, 1]) + len([n]) + len(2 * [n]) + f(n - 1)
+
+print(f(950))
+'''
+
+@pytest.mark.parametrize("optLevel", [0, 1, 2])
+def test_compilerDeepRecursion(optLevel: int, tmp_path: str):
+    srcFile = shell.pjoin(tmp_path, 'input.py')
+    utils.writeTextFile(srcFile, deepRecursion)
+    res = runTest('fun', srcFile, tmp_path, True, None, None, optLevel=optLevel)
+    assert res.exitcode == 0
+    assert res.stdout.strip() == str(sum(2 * n + 5 for n in range(1, 951)))
@@ -0,0 +1,84 @@
+from typing import *
+import assembly.tac_ast as tac
+from assembly.controlFlow import buildControlFlowGraph
+from .tacSupport import v, c, assign
+
+def assignConst(x: str, n: int) -> tac.instr:
+    return assign(x, tac.Prim(c(n)))
+
+instrs: list[tac.instr] = [
+    assignConst('i', 0),            # block 0
+    tac.Label('loop'),              # block 1
+    tac.Label('loop2'),
+    assignConst('t', 1),
+    tac.GotoIf(v('t'), 'body'),
+    tac.Goto('exit'),               # block 2
+    tac.Label('body'),              # block 3
+    assignConst('i', 1),
+    tac.Goto('loop2'),
+    assignConst('dead', 1),         # block 4 (unreachable)
+    tac.Label('exit'),              # block 5
+    tac.Call(None, tac.Ident('$print_i64'), [v('i')]),
+    tac.Label('end')                # block 6
+]
+
+def test_basicBlocks():
+    g = buildControlFlowGraph(instrs)
+    blocks = [g.getData(i) for i in sorted(g.vertices)]
+    assert [b.labels for b in blocks] == [[], ['loop', 'loop2'], [], ['body'], [], ['exit'], ['end']]
+    assert [len(b.instrs) for b in blocks] == [1, 2, 1, 2, 1, 1, 0]
+    assert list(blocks[1].instrs) == instrs[3:5]
+    assert blocks[3].instrs[-1] == tac.Goto('loop2')
+    assert blocks[3].instrs == instrs[7:9]
+    assert blocks[6].last is None
+
+def test_edges():
+    g = buildControlFlowGraph(instrs)
+    assert sorted(g.succs(0)) == [1]
+    assert sorted(g.succs(1)) == [2, 3]
+    assert sorted(g.succs(2)) == [5]
+    assert sorted(g.succs(3)) == [1]
+    assert sorted(g.succs(4)) == [5]
+    assert sorted(g.succs(5)) == [6]
+    assert g.succs(6) == []
+    assert sorted(g.preds(1)) == [0, 3]
+    assert sorted(g.preds(5)) == [2, 4]
+    assert g.preds(0) == []
+
+def test_reversePostorder():
+    g = buildControlFlowGraph(instrs)
+    rpo = g.reversePostorder
+    assert sorted(rpo) == [0, 1, 2, 3, 5, 6]
+    pos = {b: i for i, b in enumerate(rpo)}
+    # Except for back edges, edges go forward in reverse postorder
+    for (src, tgt) in g.edges:
+        if src in pos and (src, tgt) != (3, 1):
+            assert pos[src] < pos[tgt]
+
+def test_emptyProgram():
+    g = buildControlFlowGraph([])
+    assert list(g.vertices) == []
+    assert g.reversePostorder == []
+
+class CountingList(list[tac.instr]):
+    """
+    Counts the instructions read by indexing and by iteration.
+    """
+    reads = 0
+    def __getitem__(self, i: Any) -> Any:
+        self.reads += 1
+        return cast(Any, super().__getitem__(i))
+    def __iter__(self) -> Iterator[tac.instr]:
+        for x in super().__iter__():
+            self.reads += 1
+            yield x
+
+def test_blockIterationIsLinear():
+    source = CountingList(instrs * 20)
+    g = buildControlFlowGraph(source)
+    for b in g.vertices:
+        r = g.getData(b).instrs
+        source.reads = 0
+        assert len(list(r)) == len(r)
+        # only the instructions of the block are read, not those before it
+        assert source.reads == len(r)
@@ -0,0 +1,41 @@
+from common.wasm import *
+from common.compilerSupport import CompilerConfig
+import common.genericParser as genericParser
+import compilers.lang_array.array_compiler as array_compiler
+import lang_array.array_ast as array_ast
+from lang_array.array_compilerSupport import DataSegments, Frame, Globals, Heap
+import common.utils as utils
+import shell
+
+def test_heap():
+    assert Heap.flags(8, False) == Heap.array | Heap.wide
+    assert Heap.flags(4, True) == Heap.array | Heap.pointers
+    assert Heap.freeLists + 4 * Heap.sizeClasses == Globals.heapStart
+
+def test_frame():
+    d = DataSegments()
+    main = Frame(['a', 'b', 'a'])
+    assert main.rootGlobals() == [WasmId('$@root_a'), WasmId('$@root_b')]
+    # functions without arrays need no shadow stack
+    assert Frame([], d).enterInstrs([]) == []
+    assert d.heapStart() == Globals.heapStart
+    assert d.shadowStackStart() is None
+    assert Frame(['x'], d).size() == 4
+    Frame(['x', 'y', 'z'], d)
+    # room for the deepest recursion with the largest frame
+    assert d.shadowStackStart() == Globals.heapStart
+    assert d.heapStart() == Globals.heapStart + 12 * Heap.maxRecursion
+
+def compile(code: str, tmp_path: str) -> WasmModule:
+    src = shell.pjoin(tmp_path, 'test.py')
+    utils.writeTextFile(src, code)
+    cfg = CompilerConfig(CompilerConfig.defaultMaxMemSize, CompilerConfig.defaultMaxArraySize)
+    return array_compiler.compileModule(genericParser.parseFile(src, array_ast), cfg)
+
+def test_compile(tmp_path: str):
+    m = compile('a = 10 * [0]\nb = [a, a]\nx = len(b)', tmp_path)
+    names = [g.id for g in m.globals]
+    assert WasmId('$@root_a') in names and WasmId('$@root_b') in names
+    assert WasmId('$@root_x') not in names
+    assert WasmId('$@alloc') in [f.id for f in m.funcs]
+    assert m.imports[0].desc == WasmImportMemory(1, CompilerConfig.defaultMaxMemSize)
@@ -0,0 +1,38 @@
+from assembly.graph import *
+
+def test_compactDirected():
+    g = Graph[str, int]('directed')
+    for i, v in enumerate(['a', 'b', 'c', 'd']):
+        g.addVertex(v, i)
+    g.addEdge('a', 'b')
+    g.addEdge('a', 'c')
+    g.addEdge('c', 'a')
+    g.addEdge('c', 'c')
+    cg = CompactGraph.fromGraph(g)
+    assert list(cg.vertices) == ['a', 'b', 'c', 'd']
+    assert cg.getData('c') == 2
+    assert cg.succs('a') == ['b', 'c']
+    assert cg.succs('b') == []
+    assert list(cg.succsIdx(2)) == [0, 2]
+    assert cg.hasEdge('a', 'b')
+    assert not cg.hasEdge('b', 'a')
+    assert cg.hasEdge('c', 'c')
+    assert not cg.hasEdge('d', 'a')
+    assert sorted(cg.edges) == sorted(g.edges)
+
+def test_compactUndirected():
+    g = Graph[int, None]('undirected')
+    n = 40
+    for i in range(n):
+        g.addVertex(i, None)
+    for i in range(n):
+        for j in range(i + 1, n):
+            if (i * j) % 7 == 1:
+                g.addEdge(i, j)
+    cg = CompactGraph.fromGraph(g)
+    for i in range(n):
+        assert cg.succs(i) == sorted(g.succs(i))
+        assert cg.degreeIdx(i) == len(g.succs(i))
+        for j in range(n):
+            assert cg.hasEdge(i, j) == (j in g.succs(i))
+    assert sorted(cg.edges) == sorted(g.edges)
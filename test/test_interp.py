@@ -1,10 +1,14 @@
 import shell
 import common.testsupport as testsupport
 import common.log as log
+import common.genericParser as genericParser
+import common.utils as utils
+import importlib
 import pytest
 
-def runTest(lang: str, srcFile: str, input: str|None):
-    cmd = ['timeout', '10s', 'python', 'src/main.py', f'--lang={lang}', 'interp', srcFile]
+def runTest(lang: str, srcFile: str, input: str|None, engine: str = 'ast'):
+    cmd = ['timeout', '10s', 'python', 'src/main.py', f'--lang={lang}', 'interp',
+           f'--engine={engine}', srcFile]
     log.info(f'Running command {" ".join(cmd)}')
     res = shell.run(cmd, input=input, captureStdout=True, captureStderr=True, onError='ignore')
     return res
@@ -17,3 +21,34 @@ def test_interp(lang: str, srcFile: str):
         errorMode='lenient'
     )
 
+@pytest.mark.parametrize("lang, srcFile", testsupport.collectTestFiles())
+def test_closureInterp(lang: str, srcFile: str):
+    testsupport.runFileTest(
+        srcFile,
+        lambda captureErr, input, _extraArgs: runTest(lang, srcFile, input, 'closure'),
+        errorMode='lenient'
+    )
+
+
+longLoop = '''
+i = 0
+s = 0
+while i < 100000:
+    if i < 50000:
+        s = s + i
+    else:
+        s = s - 1
+    i = i + 1
+print(s)
+'''
+
+@pytest.mark.parametrize("lang", ['loop', 'array', 'fun'])
+@pytest.mark.parametrize("kind", ['interp', 'closureInterp'])
+def test_interpLongLoop(lang: str, kind: str, tmp_path: str, capsys: pytest.CaptureFixture[str]):
+    # Must neither hit the recursion limit nor take quadratic time
+    srcFile = shell.pjoin(tmp_path, 'input.py')
+    utils.writeTextFile(srcFile, longLoop)
+    astMod = importlib.import_module(f'lang_{lang}.{lang}_ast')
+    interpMod = importlib.import_module(f'lang_{lang}.{lang}_{kind}')
+    interpMod.interpModule(genericParser.parseFile(srcFile, astMod))
+    assert capsys.readouterr().out.strip() == str(sum(range(50000)) - 50000)
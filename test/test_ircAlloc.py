@@ -0,0 +1,55 @@
+import assembly.tac_ast as tac
+import assembly.tacSpill_ast as tacSpill
+import assembly.controlFlow as controlFlow
+import assembly.ircAlloc as ircAlloc
+from assembly.loops import loopDepths
+import common.utils as utils
+import pytest
+from .tacSupport import v, assign, add, printInstr, loopInstrs
+
+pytestmark = pytest.mark.instructor
+
+def alloc(instrs: list[tac.instr], maxRegs: int):
+    liveness = utils.importModuleNotInStudent('compilers.assembly.liveness')
+    g = controlFlow.buildControlFlowGraph(instrs)
+    return ircAlloc.colorIRC(g, liveness.buildInterfGraph(g), maxRegs)
+
+def test_loopDepths():
+    g = controlFlow.buildControlFlowGraph(loopInstrs)
+    assert loopDepths(g) == {0: 0, 1: 1, 2: 0}
+
+def test_spillOutsideLoop():
+    # a, n, i and c interfere with each other
+    (regMap, stats) = alloc(loopInstrs, 3)
+    assert regMap.resolve(tac.Ident('a')) is None
+    assert regMap.resolve(tac.Ident('i')) is not None
+    assert regMap.resolve(tac.Ident('n')) is not None
+    assert stats.spilled == 1
+
+def test_coalesceMoves():
+    instrs: list[tac.instr] = [
+        tac.Call(tac.Ident('x'), tac.Ident('$input_i64'), []),
+        assign('y', tac.Prim(v('x'))),
+        assign('z', add(v('y'), tac.Const(1))),
+        assign('w', tac.Prim(v('z'))),
+        printInstr(v('w')),
+        printInstr(v('y'))
+    ]
+    (regMap, stats) = alloc(instrs, 2)
+    assert stats.moves == 2
+    assert stats.eliminatedMoves == 2
+    assert stats.spilled == 0
+    assert regMap.resolve(tac.Ident('x')) == regMap.resolve(tac.Ident('y'))
+    assert regMap.resolve(tac.Ident('z')) == regMap.resolve(tac.Ident('w'))
+    assert regMap.resolve(tac.Ident('y')) != regMap.resolve(tac.Ident('z'))
+
+def test_noRegisters():
+    (regMap, stats) = alloc(loopInstrs, 0)
+    assert stats.spilled == stats.variables == 4
+    assert regMap.resolve(tac.Ident('i')) is None
+
+def test_colorsWithinLimit():
+    (regMap, _) = alloc(loopInstrs, 8)
+    regs = {regMap.resolve(tac.Ident(x)) for x in ['a', 'n', 'i', 'c']}
+    assert None not in regs
+    assert all(r in [tacSpill.Ident(f'$s{k}') for k in range(8)] for r in regs)
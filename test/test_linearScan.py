@@ -0,0 +1,54 @@
+import assembly.tac_ast as tac
+import assembly.controlFlow as controlFlow
+import assembly.linearScan as linearScan
+from assembly.common import InterfGraph
+import common.utils as utils
+import pytest
+from .tacSupport import v, assign, add, printInstr, loopInstrs
+
+pytestmark = pytest.mark.instructor
+
+chainInstrs: list[tac.instr] = [
+    tac.Call(tac.Ident('x'), tac.Ident('$input_i64'), []),
+    assign('y', add(v('x'), tac.Const(1))),
+    assign('z', add(v('y'), tac.Const(1))),
+    printInstr(v('z'))
+]
+
+def test_liveIntervals():
+    g = controlFlow.buildControlFlowGraph(loopInstrs)
+    ivs = {iv.var.name: (iv.start, iv.end) for iv in linearScan.liveIntervals(g)}
+    # instruction k reads at 2k and writes at 2k+1, labels are not numbered, so the
+    # loop spans instructions 3 to 5
+    assert ivs == {'a': (1, 12), 'n': (3, 11), 'i': (5, 11), 'c': (9, 10)}
+
+def test_spillLongestInterval():
+    g = controlFlow.buildControlFlowGraph(loopInstrs)
+    regMap = linearScan.linearScan(g, 3)
+    assert regMap.resolve(tac.Ident('a')) is None
+    for x in ['n', 'i', 'c']:
+        assert regMap.resolve(tac.Ident(x)) is not None
+
+def test_reuseRegisterOfDyingOperand():
+    g = controlFlow.buildControlFlowGraph(chainInstrs)
+    regMap = linearScan.linearScan(g, 1)
+    regs = {regMap.resolve(tac.Ident(x)) for x in ['x', 'y', 'z']}
+    assert len(regs) == 1 and None not in regs
+
+@pytest.mark.parametrize("maxRegs", [0, 1, 2, 3, 8])
+def test_noInterferingVariablesShareRegister(maxRegs: int):
+    liveness = utils.importModuleNotInStudent('compilers.assembly.liveness')
+    for instrs in [loopInstrs, chainInstrs]:
+        g = controlFlow.buildControlFlowGraph(instrs)
+        regMap = linearScan.linearScan(g, maxRegs)
+        interf: InterfGraph = liveness.buildInterfGraph(g)
+        for (x, y) in interf.edges:
+            rx = regMap.resolve(x)
+            assert rx is None or rx != regMap.resolve(y)
+
+def test_stackSlots():
+    g = controlFlow.buildControlFlowGraph(loopInstrs + chainInstrs)
+    slots = linearScan.stackSlots(g, linearScan.linearScan(g, 0))
+    # x, y and z are only live after a, n, i and c are dead, the lowest free slot is reused
+    assert {x.name: s for x, s in slots.items()} == \
+        {'a': 0, 'n': 1, 'i': 2, 'c': 3, 'x': 0, 'y': 0, 'z': 0}
@@ -1,4 +1,5 @@
 import assembly.common as asTypes
+import assembly.tac_ast as tac
 import common.genericCompiler as genCompiler
 import shell
 import common.utils as utils
@@ -98,3 +99,35 @@ def test_interfGraph(lang: str, srcFile: str, tmp_path: str):
     outFile = shell.pjoin(tmp_path, "out.wasm")
     args = genCompiler.Args(srcFile, outFile)
     buildInterfGraph(args) # make sure it does not fail
+
+def test_livenessSets():
+    liveness = utils.importModuleNotInStudent('compilers.assembly.liveness')
+    def v(s: str) -> tac.prim:
+        return tac.Name(tac.Ident(s))
+    instrs: list[tac.instr] = [
+        tac.Assign(tac.Ident('i'), tac.Prim(tac.Const(0))),
+        tac.Assign(tac.Ident('s'), tac.Prim(tac.Const(0))),
+        tac.Label('loop'),
+        tac.Assign(tac.Ident('s'), tac.BinOp(v('s'), tac.Op('ADD'), v('i'))),
+        tac.Assign(tac.Ident('i'), tac.BinOp(v('i'), tac.Op('SUB'), tac.Const(1))),
+        tac.GotoIf(v('i'), 'loop'),
+        tac.Call(None, tac.Ident('$print_i64'), [v('s')]),
+        tac.Goto('end'),
+        # unreachable
+        tac.Assign(tac.Ident('u'), tac.Prim(v('s'))),
+        tac.Label('end')
+    ]
+    g = controlFlow.buildControlFlowGraph(instrs)
+    b = liveness.InterfGraphBuilder()
+    b.analyze(g)
+    def names(bits: int) -> set[str]:
+        return {x.name for x in b.varSet(bits)}
+    assert names(b.before[(0, 0)]) == set()
+    assert names(b.after[(0, 1)]) == {'i', 's'}
+    assert names(b.before[(1, 0)]) == {'i', 's'}
+    assert names(b.after[(1, 2)]) == {'i', 's'}
+    assert names(b.after[(2, 0)]) == set()
+    assert names(b.before[(3, 0)]) == {'s'}
+    interfG = b.build(g)
+    conflicts = {(x.name, y.name) for (x, y) in interfG.edges}
+    assert conflicts == {('i', 's'), ('s', 'i')}
@@ -0,0 +1,120 @@
+import pytest
+import assembly.tac_ast as tac
+import assembly.tacPretty as tacPretty
+import assembly.controlFlow as controlFlow
+import assembly.loops as loops
+import assembly.tacOptimize as tacOptimize
+from .tacSupport import v, c, assign, binop, printInstr, inputInstr
+
+pytestmark = pytest.mark.instructor
+
+# Block 0: a = input; i = 0
+# Block 1 (outer): t = i < 3; if t goto body
+# Block 2: goto exit
+# Block 3 (body): j = 0
+# Block 4 (inner): u = j < 3; if u goto innerBody
+# Block 5: i = i + 1; goto outer
+# Block 6 (innerBody): x = a == 7; print x; j = j + 1; goto inner
+# Block 7 (exit)
+nested = [
+    inputInstr('a'),
+    assign('i', tac.Prim(c(0))),
+    tac.Label('outer'),
+    assign('t', binop(v('i'), 'LT_S', c(3))),
+    tac.GotoIf(v('t'), 'body'),
+    tac.Goto('exit'),
+    tac.Label('body'),
+    assign('j', tac.Prim(c(0))),
+    tac.Label('inner'),
+    assign('u', binop(v('j'), 'LT_S', c(3))),
+    tac.GotoIf(v('u'), 'innerBody'),
+    assign('i', binop(v('i'), 'ADD', c(1))),
+    tac.Goto('outer'),
+    tac.Label('innerBody'),
+    assign('x', binop(v('a'), 'EQ', c(7))),
+    printInstr(v('x')),
+    assign('j', binop(v('j'), 'ADD', c(1))),
+    tac.Goto('inner'),
+    tac.Label('exit')
+]
+
+def test_loopForest():
+    g = controlFlow.buildControlFlowGraph(nested)
+    assert sorted(loops.backEdges(g)) == [(5, 1), (6, 4)]
+    [outer, inner] = loops.naturalLoops(g)
+    assert (outer.header, outer.body, outer.parent, outer.depth) == (1, {1, 3, 4, 5, 6}, None, 1)
+    assert (inner.header, inner.body, inner.parent, inner.depth) == (4, {4, 6}, 1, 2)
+    assert loops.loopDepths(g) == {0: 0, 1: 1, 2: 0, 3: 1, 4: 2, 5: 1, 6: 2, 7: 0}
+
+def test_insertPreheader():
+    g = controlFlow.buildControlFlowGraph(nested)
+    [_, inner] = loops.naturalLoops(g)
+    instrs = loops.insertPreheader(g, inner, 'pre', [printInstr(c(0))])
+    assert instrs is not None
+    g2 = controlFlow.buildControlFlowGraph(instrs)
+    # The preheader is block 4, it is entered from the outer loop only
+    assert g2.getData(4).labels == ['pre']
+    assert g2.preds(4) == [3]
+    assert sorted(g2.preds(5)) == [4, 7]
+
+def test_licmNested():
+    res = tacPretty.prettyInstrs(tacOptimize.licm(nested), True).split(';')
+    # x = a == 7 cannot trap and is moved out of both loops, the counters stay
+    assert res.index('x = EQ(a, 7)') < res.index('outer:')
+    assert res.index('j = 0') > res.index('outer:')
+
+def test_licmKeepsTrappingAddInBody():
+    # b + 1 may overflow, the loop body is not executed in every iteration
+    instrs = [
+        inputInstr('b'),
+        inputInstr('n'),
+        tac.Label('loop'),
+        assign('t', binop(v('n'), 'GT_S', c(0))),
+        tac.GotoIf(v('t'), 'body'),
+        tac.Goto('exit'),
+        tac.Label('body'),
+        assign('y', binop(v('b'), 'ADD', c(1))),
+        printInstr(v('y')),
+        assign('n', binop(v('n'), 'SUB', c(1))),
+        tac.Goto('loop'),
+        tac.Label('exit')
+    ]
+    assert tacOptimize.licm(instrs) == instrs
+
+def test_licmKeepsTrappingMulInBody():
+    # b * 100000 may overflow (mulo traps), the loop body is not executed in every
+    # iteration
+    instrs = [
+        inputInstr('b'),
+        inputInstr('n'),
+        tac.Label('loop'),
+        assign('t', binop(v('n'), 'GT_S', c(0))),
+        tac.GotoIf(v('t'), 'body'),
+        tac.Goto('exit'),
+        tac.Label('body'),
+        assign('y', binop(v('b'), 'MUL', c(100000))),
+        printInstr(v('y')),
+        assign('n', binop(v('n'), 'SUB', c(1))),
+        tac.Goto('loop'),
+        tac.Label('exit')
+    ]
+    assert tacOptimize.licm(instrs) == instrs
+
+def test_licmVariableLiveAtHeader():
+    # y is printed after the loop, with the value before the loop if the loop is
+    # not executed
+    instrs = [
+        inputInstr('y'),
+        inputInstr('n'),
+        tac.Label('loop'),
+        assign('t', binop(v('n'), 'GT_S', c(0))),
+        tac.GotoIf(v('t'), 'body'),
+        tac.Goto('exit'),
+        tac.Label('body'),
+        assign('y', binop(v('n'), 'MUL', c(2))),
+        assign('n', tac.Prim(c(0))),
+        tac.Goto('loop'),
+        tac.Label('exit'),
+        printInstr(v('y'))
+    ]
+    assert tacOptimize.licm(instrs) == instrs
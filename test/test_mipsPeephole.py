@@ -0,0 +1,93 @@
+import pytest
+import assembly.mips_ast as mips
+import assembly.mipsPretty as mipsPretty
+import assembly.mipsPeephole as mipsPeephole
+
+pytestmark = pytest.mark.instructor
+
+def r(name: str) -> mips.reg:
+    return mips.Reg(name)
+
+def li(t: str, i: int) -> mips.instr:
+    return mips.LoadI(r(t), mips.Imm(i))
+
+def lw(t: str, off: int) -> mips.instr:
+    return mips.LoadWord(r(t), mips.Imm(off), r('$sp'))
+
+def sw(s: str, off: int) -> mips.instr:
+    return mips.StoreWord(r(s), mips.Imm(off), r('$sp'))
+
+def add(t: str, a: str, b: str) -> mips.instr:
+    return mips.Op(mips.Add(), r(t), r(a), r(b))
+
+def pretty(instrs: list[mips.instr]) -> list[str]:
+    return [mipsPretty.mipsPrettyInstr(i).strip() for i in instrs]
+
+def test_storeThenLoad():
+    instrs = [
+        add('$s0', '$s1', '$s2'),
+        sw('$s0', 4),
+        lw('$t0', 4),
+        sw('$t0', 4),
+        add('$s3', '$t0', '$s1')
+    ]
+    assert pretty(mipsPeephole.peephole(instrs)) == [
+        'add $s0,$s1,$s2',
+        'sw $s0 4($sp)',
+        'move $t0,$s0',
+        'add $s3,$t0,$s1'
+    ]
+
+def test_loadAgainAfterLabel():
+    instrs = [sw('$s0', 4), mips.Label('L'), lw('$s1', 4),
+              mips.BranchNeqZero(r('$s1'), 'L')]
+    assert mipsPeephole.peephole(instrs) == instrs
+
+def test_moveIntoComputation():
+    instrs = [add('$t2', '$s0', '$s1'), mips.Move(r('$s2'), r('$t2')),
+              mips.Move(r('$s2'), r('$s2'))]
+    assert pretty(mipsPeephole.peephole(instrs)) == ['add $s2,$s0,$s1']
+
+def test_deadScratchLoad():
+    instrs = [li('$t2', 1), li('$t2', 2), mips.Move(r('$s0'), r('$t2')),
+              li('$s1', 3), li('$s1', 3)]
+    assert pretty(mipsPeephole.peephole(instrs)) == ['li $s0, 2', 'li $s1, 3']
+
+def test_constantBranch():
+    instrs = [
+        li('$t2', 1),
+        mips.BranchNeqZero(r('$t2'), 'L1'),
+        li('$s0', 1),
+        mips.Label('L1'),
+        li('$t2', 0),
+        mips.BranchNeqZero(r('$t2'), 'L2'),
+        li('$s0', 2),
+        mips.Label('L2'),
+        mips.Move(r('$a0'), r('$s0')),
+        li('$v0', 1),
+        mips.Syscall()
+    ]
+    # The first branch is always taken, the second one never
+    assert pretty(mipsPeephole.peephole(instrs)) == [
+        'li $s0, 2',
+        'move $a0,$s0',
+        'li $v0, 1',
+        'syscall'
+    ]
+
+def test_jumpThreading():
+    instrs = [
+        mips.Label('L1'),
+        mips.BranchNeqZero(r('$s0'), 'L2'),
+        mips.Branch('L4'),
+        mips.Label('L2'),
+        mips.Label('L3'),
+        mips.Branch('L1'),
+        mips.Label('L4'),
+        li('$s0', 1)
+    ]
+    assert pretty(mipsPeephole.peephole(instrs)) == [
+        'L1:',
+        'bnez $s0, L1',
+        'li $s0, 1'
+    ]
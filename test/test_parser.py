@@ -5,7 +5,9 @@ import parsers.lang_simple.simpleAlternative_recursiveDescentParser as simpleAlt
 import parsers.common as p
 from common.constants import *
 import pytest
+import os
 import common.log as log
+import common.utils as utils
 
 simpleExp = '1 + 2 + 3 * 4'
 
@@ -47,3 +49,36 @@ def test_simpleAlternativeRecAscParserManual():
                                    ast.Add(),
                                    ast.BinOp(ast.IntConst(3), ast.Mul(), ast.IntConst(value=4))))
     assert t == expected
+
+simpleGrammar = './src/parsers/lang_simple/simple_grammar.lark'
+
+def test_parserCacheInProcess(tmp_path: str):
+    p1 = p.mkParser('lalr', simpleGrammar, 'exp')
+    assert p.mkParser('lalr', simpleGrammar, 'exp') is p1
+    assert p.mkParser('earley', simpleGrammar, 'exp') is not p1
+    # Parsers are keyed by the content of the grammar, not by its path
+    copy = f'{tmp_path}/grammar.lark'
+    utils.writeTextFile(copy, utils.readTextFile(simpleGrammar))
+    assert p.mkParser('lalr', copy, 'exp') is p1
+    utils.writeTextFile(copy, utils.readTextFile(simpleGrammar) + '\n// changed\n')
+    assert p.mkParser('lalr', copy, 'exp') is not p1
+
+def test_parserCacheDir():
+    # the cache is in the top directory of the repository, not in the working directory
+    d = p.PARSER_CACHE_DIR
+    assert d is not None and os.path.isabs(d)
+    assert os.path.isfile(os.path.join(os.path.dirname(d), 'src', 'parsers', 'common.py'))
+
+def test_parserCacheOnDisk(tmp_path: str, monkeypatch: pytest.MonkeyPatch):
+    cacheDir = f'{tmp_path}/cache'
+    monkeypatch.setattr(p, 'PARSER_CACHE_DIR', cacheDir)
+    p.clearParserCache()
+    t1 = p.mkParser('lalr', simpleGrammar, 'exp').parse(simpleExp)
+    assert len(os.listdir(cacheDir)) == 1
+    p.clearParserCache()
+    t2 = p.mkParser('lalr', simpleGrammar, 'exp').parse(simpleExp)
+    assert t1 == t2
+    # Earley parsers are only cached in-process
+    p.mkParser('earley', simpleGrammar, 'exp')
+    assert len(os.listdir(cacheDir)) == 1
+    p.clearParserCache()
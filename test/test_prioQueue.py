@@ -61,3 +61,47 @@ def test_prioQueueIncreaseKey():
         l.append(k)
     assert l == ['c', 'a', 'b', 'e', 'd']
 
+
+def test_bucketPrioQueuePushPopIncreaseKey():
+    d = {'a': 4, 'b': 3, 'c':5, 'd':1, 'e':2}
+    q = BucketPrioQueue[str]()
+    for k, v in d.items():
+        q.push(k, v)
+    q.incPrio('a')
+    q.incPrio('a')
+    q.incPrio('b')
+    q.incPrio('d')
+    q.incPrio('d')
+    p = ['a', 'c', 'b', 'd', 'e']
+    for i in range(0, len(p)):
+        assert q.pop() == p[i]
+    assert q.isEmpty()
+
+def test_bucketPrioQueueSecondaryOrder():
+    keys = ['a', 'b', 'c', 'd', 'e', 'f']
+    secondaryOrder = {k: i for i, k in enumerate(keys)}
+    q = BucketPrioQueue[str](secondaryOrder)
+    h = PrioQueue[str](secondaryOrder)
+    for k in ['c', 'a', 'f', 'e', 'b', 'd']:
+        q.push(k)
+        h.push(k)
+    for k in ['a', 'b', 'a', 'e', 'c']:
+        q.incPrio(k)
+        h.incPrio(k)
+    l: list[str] = []
+    while not q.isEmpty():
+        x = q.pop()
+        assert x == h.pop()
+        l.append(x)
+        if x == 'a':
+            q.incPrio('f', 3)
+            h.incPrio('f', 3)
+    assert l == ['a', 'f', 'e', 'c', 'b', 'd']
+
+def test_bucketPrioQueueTies():
+    q = BucketPrioQueue[int]()
+    for k in range(4):
+        q.push(k)
+    q.incPrio(1)
+    q.incPrio(2)
+    assert [q.pop() for _ in range(4)] == [2, 1, 3, 0]
@@ -0,0 +1,59 @@
+import io
+import re
+from common.sexp import *
+
+def write(s: SExp) -> str:
+    out = io.StringIO()
+    writeSExp(s, out)
+    return out.getvalue()
+
+def test_writeFlat():
+    s = mkNamedSeq('import', SExpStr('env'), SExpStr('print'),
+                   mkNamedSeq('func', SExpId('$print'), mkNamedSeq('param', SExpId('i32'))))
+    assert write(s) == '(import "env" "print" (func $print (param i32)))\n'
+
+def test_writeFuncOneInstrPerLine():
+    f = mkNamedSeq('func', SExpId('$main'), mkNamedSeq('local', SExpId('$x'), SExpId('i64')),
+                   mkSeq(SExpId('i64.const'), SExpNum(1)), SExpId('drop'))
+    assert write(mkNamedSeq('module', f)) == '\n'.join([
+        '(module',
+        '  (func $main',
+        '    (local $x i64)',
+        '    (i64.const 1)',
+        '    drop',
+        '  )',
+        ')',
+        ''])
+
+def test_writeBlocks():
+    body: list[SExp] = [mkSeq(SExpId('local.get'), SExpId('$x')), SExpId('i32.eqz')]
+    b = SExpBlock([SExpBlockItem('if', [mkNamedSeq('result', SExpId('i32'))] + body),
+                   SExpBlockItem('else', [mkSeq(SExpId('i32.const'), SExpNum(0))])])
+    loop = SExpBlock.singleItem('loop', [SExpId('$l'), b])
+    assert write(loop) == '\n'.join([
+        'loop $l',
+        '  if (result i32)',
+        '    (local.get $x)',
+        '    i32.eqz',
+        '  else',
+        '    (i32.const 0)',
+        '  end',
+        'end',
+        ''])
+
+def test_writeBreaksLongLines():
+    s = mkNamedSeq('table', SExpId('funcref'),
+                   mkNamedSeq('elem', *[SExpId(f'$function_{i}') for i in range(10)]))
+    lines = write(s).splitlines()
+    assert len(lines) > 1
+    assert all(len(l) <= STREAM_WIDTH for l in lines)
+
+def tokens(s: str) -> list[str]:
+    return re.findall(r'[()]|[^()\s]+', s)
+
+def test_writeSameTokensAsPretty():
+    f = mkNamedSeq('func', SExpId('$f'), mkNamedSeq('param', SExpId('$x'), SExpId('i64')),
+                   SExpBlock.singleItem('block', [SExpId('$b'), SExpId('nop')]),
+                   mkSeq(SExpId('local.get'), SExpId('$x')))
+    s = mkNamedSeq('module', mkNamedSeq('memory', SExpNum(1)), f)
+    assert tokens(write(s)) == tokens(renderSExp(s))
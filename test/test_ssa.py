@@ -0,0 +1,102 @@
+from typing import Callable
+import os
+import pytest
+import assembly.tac_ast as tac
+import assembly.tacPretty as tacPretty
+import assembly.ssa as ssa
+import assembly.tacOptimize as tacOptimize
+import assembly.controlFlow as controlFlow
+import common.genericCompiler as genCompiler
+import common.utils as utils
+from assembly.loopToTac import loopToTac
+from .tacSupport import v, c, assign, binop, printInstr, inputInstr, corpus, runVM
+
+pytestmark = pytest.mark.instructor
+
+# Block 0: x = input; t = x > 0; if t goto then
+# Block 1: x = 1; goto end
+# Block 2 (then): x = 2
+# Block 3 (end): loop: x = x + 1; t = x < 10; if t goto loop
+# Block 4: print x
+diamondLoop = [
+    inputInstr('x'),
+    assign('t', binop(v('x'), 'GT_S', c(0))),
+    tac.GotoIf(v('t'), 'then'),
+    assign('x', tac.Prim(c(1))),
+    tac.Goto('end'),
+    tac.Label('then'),
+    assign('x', tac.Prim(c(2))),
+    tac.Label('end'),
+    tac.Label('loop'),
+    assign('x', binop(v('x'), 'ADD', c(1))),
+    assign('t', binop(v('x'), 'LT_S', c(10))),
+    tac.GotoIf(v('t'), 'loop'),
+    printInstr(v('x'))
+]
+
+def test_dominators():
+    g = controlFlow.buildControlFlowGraph(diamondLoop)
+    idom = ssa.dominators(g)
+    assert idom == {0: 0, 1: 0, 2: 0, 3: 0, 4: 3}
+    assert ssa.dominates(idom, 3, 4)
+    assert not ssa.dominates(idom, 1, 3)
+    df = ssa.dominanceFrontiers(g, idom)
+    assert df == {0: set(), 1: {3}, 2: {3}, 3: {3}, 4: set()}
+
+def test_phiPlacement():
+    form = ssa.toSSA(diamondLoop)
+    assert [phi.origin.name for phi in form.phis[3]] == ['x']
+    assert form.phis[3][0].args == {1: v('x.1'), 2: v('x.2'), 3: v('x.4')}
+    defs: list[tac.ident] = []
+    for b in form.blocks:
+        defs.extend(phi.var for phi in form.phis[b])
+        defs.extend(i.var for i in form.g.getData(b).instrs if isinstance(i, tac.Assign))
+    assert len(defs) == len(set(defs))
+
+def test_roundTripNeedsNoCopies():
+    instrs = ssa.fromSSA(ssa.toSSA(diamondLoop))
+    assert len(instrs) == len(diamondLoop)
+
+def test_sequentializeSwap():
+    fresh = lambda: tac.Ident('tmp')
+    copies = [(tac.Ident('a'), v('b')), (tac.Ident('b'), v('a')), (tac.Ident('c'), v('a'))]
+    res = tacPretty.prettyInstrs(ssa.sequentialize(copies, fresh), True)
+    assert res == 'c = a;tmp = a;a = b;b = tmp'
+
+def test_phiVariableLiveAfterLoop(monkeypatch: pytest.MonkeyPatch,
+                                  capsys: pytest.CaptureFixture[str]):
+    # After propagating the copy j = i on the SSA form, the version of i before the
+    # increment is used after the loop. It interferes with the version after the
+    # increment, so the phi function needs a copy (the lost copy problem).
+    instrs = [
+        assign('i', tac.Prim(c(0))),
+        tac.Label('loop'),
+        assign('j', tac.Prim(v('i'))),
+        assign('i', binop(v('i'), 'ADD', c(1))),
+        assign('t', binop(v('i'), 'LT_S', c(3))),
+        tac.GotoIf(v('t'), 'loop'),
+        printInstr(v('j')),
+        printInstr(v('i'))
+    ]
+    form = ssa.toSSA(instrs)
+    subst: Callable[[tac.prim], tac.prim] = lambda p: v('i.1') if p == v('j.1') else p
+    for b in form.blocks:
+        bb = form.g.getData(b)
+        bb.instrs = [tacOptimize.mapPrims(i, subst) for i in bb.instrs]
+    res = ssa.fromSSA(form)
+    assert assign('i.1', tac.Prim(v('i.2'))) in res
+    assert runVM(res, '', monkeypatch, capsys) == '2\n3\n'
+
+@pytest.mark.parametrize("srcFile", corpus())
+def test_roundTripLikeOriginal(srcFile: str, tmp_path: str, monkeypatch: pytest.MonkeyPatch,
+                               capsys: pytest.CaptureFixture[str]):
+    args = genCompiler.Args(srcFile, os.path.join(tmp_path, 'out.wasm'))
+    instrs = loopToTac(args)
+    labels = [i.label for i in instrs if isinstance(i, tac.Label)]
+    if len(labels) != len(set(labels)):
+        pytest.skip('Duplicate labels in TAC (nested loops)')
+    roundTrip = ssa.fromSSA(ssa.toSSA(instrs))
+    inFile = os.path.splitext(srcFile)[0] + '.in'
+    input = utils.readTextFile(inFile) if os.path.isfile(inFile) else ''
+    expected = runVM(instrs, input, monkeypatch, capsys)
+    assert runVM(roundTrip, input, monkeypatch, capsys) == expected
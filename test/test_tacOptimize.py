@@ -0,0 +1,122 @@
+import os
+import pytest
+import assembly.tac_ast as tac
+import assembly.tacPretty as tacPretty
+import assembly.tacOptimize as tacOptimize
+import common.genericCompiler as genCompiler
+import common.utils as utils
+from assembly.loopToTac import loopToTac
+from .tacSupport import v, c, assign, binop, printInstr, inputInstr, corpus, runVM
+
+pytestmark = pytest.mark.instructor
+
+def optimize(instrs: list[tac.instr], level: genCompiler.OptLevel = 1) -> str:
+    return tacPretty.prettyInstrs(tacOptimize.optimize(instrs, level), True)
+
+def test_constantBranch():
+    instrs = [
+        assign('x', tac.Prim(c(2))),
+        assign('t', binop(v('x'), 'GT_S', c(1))),
+        tac.GotoIf(v('t'), 'then'),
+        printInstr(c(0)),
+        tac.Goto('end'),
+        tac.Label('then'),
+        assign('y', binop(v('x'), 'MUL', c(21))),
+        printInstr(v('y')),
+        tac.Label('end')
+    ]
+    assert optimize(instrs) == 'then:;CALL($print_i64, 42);end:'
+
+def test_loopVariableNotConstant():
+    instrs = [
+        assign('i', tac.Prim(c(0))),
+        tac.Label('loop'),
+        assign('i', binop(v('i'), 'ADD', c(1))),
+        assign('t', binop(v('i'), 'LT_S', c(10))),
+        tac.GotoIf(v('t'), 'loop'),
+        printInstr(v('i'))
+    ]
+    assert optimize(instrs) == tacPretty.prettyInstrs(instrs, True)
+
+def test_copyPropagation():
+    instrs = [
+        inputInstr('x'),
+        assign('y', tac.Prim(v('x'))),
+        assign('y', tac.Prim(v('y'))),
+        assign('z', binop(v('y'), 'ADD', v('y'))),
+        printInstr(v('z'))
+    ]
+    assert optimize(instrs) == 'x = CALL($input_i64);z = ADD(x, x);CALL($print_i64, z)'
+
+def test_copyKilledByAssignment():
+    instrs = [
+        inputInstr('x'),
+        assign('y', tac.Prim(v('x'))),
+        inputInstr('x'),
+        printInstr(v('y')),
+        printInstr(v('x'))
+    ]
+    assert optimize(instrs) == tacPretty.prettyInstrs(instrs, True)
+
+def test_noFoldingBeyond32Bits():
+    instrs = [
+        assign('x', binop(c(2**30), 'MUL', c(4))),
+        printInstr(v('x'))
+    ]
+    assert optimize(instrs) == 'x = MUL(1073741824, 4);CALL($print_i64, x)'
+
+def test_valueNumbering():
+    # The comparison of the loop condition is computed again in the body
+    instrs = [
+        inputInstr('x'),
+        inputInstr('n'),
+        tac.Label('loop'),
+        assign('t', binop(v('x'), 'LT_S', v('n'))),
+        tac.GotoIf(v('t'), 'body'),
+        tac.Goto('exit'),
+        tac.Label('body'),
+        assign('u', binop(v('x'), 'LT_S', v('n'))),
+        printInstr(v('u')),
+        assign('s', binop(v('n'), 'ADD', v('x'))),
+        assign('x', binop(v('x'), 'ADD', v('n'))),
+        printInstr(v('s')),
+        tac.Goto('loop'),
+        tac.Label('exit')
+    ]
+    res = tacOptimize.optimize(instrs, 2)
+    ops = [i.left.op.name for i in res
+           if isinstance(i, tac.Assign) and isinstance(i.left, tac.BinOp)]
+    assert ops == ['LT_S', 'ADD']
+    assert len(res) == len(instrs) - 2
+
+def test_valueNumberingNotAcrossBranches():
+    # Neither branch dominates the other, both additions are needed
+    instrs = [
+        inputInstr('x'),
+        tac.GotoIf(v('x'), 'then'),
+        assign('y', binop(v('x'), 'ADD', c(1))),
+        printInstr(v('y')),
+        tac.Goto('end'),
+        tac.Label('then'),
+        assign('z', binop(v('x'), 'ADD', c(1))),
+        printInstr(v('z')),
+        tac.Label('end')
+    ]
+    assert optimize(instrs, 2).count('ADD') == 2
+
+@pytest.mark.parametrize("level", [1, 2])
+@pytest.mark.parametrize("srcFile", corpus())
+def test_optimizedLikeUnoptimized(srcFile: str, level: genCompiler.OptLevel, tmp_path: str,
+                                  monkeypatch: pytest.MonkeyPatch,
+                                  capsys: pytest.CaptureFixture[str]):
+    args = genCompiler.Args(srcFile, os.path.join(tmp_path, 'out.wasm'))
+    instrs = loopToTac(args)
+    labels = [i.label for i in instrs if isinstance(i, tac.Label)]
+    if len(labels) != len(set(labels)):
+        pytest.skip('Duplicate labels in TAC (nested loops)')
+    optimized = tacOptimize.optimize(instrs, level)
+    assert len(optimized) <= len(instrs)
+    inFile = os.path.splitext(srcFile)[0] + '.in'
+    input = utils.readTextFile(inFile) if os.path.isfile(inFile) else ''
+    expected = runVM(instrs, input, monkeypatch, capsys)
+    assert runVM(optimized, input, monkeypatch, capsys) == expected
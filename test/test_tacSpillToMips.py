@@ -0,0 +1,44 @@
+import pytest
+import assembly.tacSpill_ast as tacSpill
+import assembly.mips_ast as mips
+import assembly.mipsPretty as mipsPretty
+from assembly.mipsHelper import loadConst
+from compilers.assembly.tacSpillAssignToMips import assignToMips
+from .tacSupport import spillV as v, spillC as c
+
+pytestmark = pytest.mark.instructor
+
+def binop(p1: tacSpill.prim, op: str, p2: tacSpill.prim) -> list[str]:
+    i = tacSpill.Assign(tacSpill.Ident('$s0'), tacSpill.BinOp(p1, tacSpill.Op(op), p2))
+    return [mipsPretty.mipsPrettyInstr(x).strip() for x in assignToMips(i)]
+
+def test_immediateForms():
+    assert binop(v('$s1'), 'ADD', c(5)) == ['addi $s0,$s1,5']
+    assert binop(c(5), 'ADD', v('$s1')) == ['addi $s0,$s1,5']
+    assert binop(v('$s1'), 'SUB', c(5)) == ['addi $s0,$s1,-5']
+    assert binop(v('$s1'), 'LT_S', c(5)) == ['slti $s0,$s1,5']
+    assert binop(v('$s1'), 'LE_S', c(5)) == ['slti $s0,$s1,6']
+    assert binop(c(5), 'GT_S', v('$s1')) == ['slti $s0,$s1,5']
+    # 5 - x is not x - 5
+    assert binop(c(5), 'SUB', v('$s1')) == ['li $t2, 5', 'sub $s0,$t2,$s1']
+    assert binop(v('$s1'), 'GT_S', c(5)) == ['li $t2, 5', 'sgt $s0,$s1,$t2']
+    # -(-32768) does not fit into 16 bit
+    assert binop(v('$s1'), 'SUB', c(-32768)) == ['li $t2, -32768', 'sub $s0,$s1,$t2']
+
+def test_mulTrapsOnOverflow():
+    # sll would wrap around instead of trapping
+    assert binop(v('$s1'), 'MUL', c(8)) == ['li $t2, 8', 'mulo $s0,$s1,$t2']
+    assert binop(c(65536), 'MUL', v('$s1')) == ['lui $t2, 1', 'mulo $s0,$s1,$t2']
+    assert binop(v('$s1'), 'MUL', c(1)) == ['move $s0,$s1']
+    assert binop(v('$s1'), 'MUL', c(6)) == ['li $t2, 6', 'mulo $s0,$s1,$t2']
+
+def test_loadConst():
+    r = mips.Reg('$t0')
+    assert loadConst(r, -32768) == [mips.LoadI(r, mips.Imm(-32768))]
+    assert loadConst(r, 65536) == [mips.LoadUpper(r, mips.Imm(1))]
+    assert loadConst(r, 100000) == [mips.LoadUpper(r, mips.Imm(1)),
+                                    mips.OpI(mips.OrI(), r, r, mips.Imm(34464))]
+    assert loadConst(r, -100000) == [mips.LoadUpper(r, mips.Imm(0xfffe)),
+                                     mips.OpI(mips.OrI(), r, r, mips.Imm(0x7960))]
+    with pytest.raises(ValueError):
+        loadConst(r, 2**31)
@@ -0,0 +1,54 @@
+import pytest
+from assembly.tac_ast import *
+import assembly.tacInterp as tacInterp
+import assembly.tacVM as tacVM
+from .tacSupport import v, c, printInstr
+
+# Sums the numbers from 0 to 9 and counts down from 3
+loopInstrs: list[instr] = [
+    Assign(Ident('i'), Prim(c(0))),
+    Assign(Ident('s'), Prim(c(0))),
+    Label('loop'),
+    Assign(Ident('t'), BinOp(v('i'), Op('LT_S'), c(10))),
+    GotoIf(v('t'), 'body'),
+    Goto('done'),
+    Label('body'),
+    Assign(Ident('s'), BinOp(v('s'), Op('ADD'), v('i'))),
+    Assign(Ident('i'), BinOp(v('i'), Op('ADD'), c(1))),
+    Goto('loop'),
+    Label('done'),
+    printInstr(v('s')),
+    Assign(Ident('j'), Prim(c(3))),
+    Label('down'),
+    printInstr(v('j')),
+    Assign(Ident('j'), BinOp(v('j'), Op('SUB'), c(1))),
+    Assign(Ident('t'), BinOp(v('j'), Op('GT_S'), c(0))),
+    GotoIf(v('t'), 'down'),
+    # A second label with the same name is never a jump target
+    Label('down'),
+    printInstr(c(42)),
+]
+
+def test_vmLikeReference(capsys: pytest.CaptureFixture[str]):
+    tacInterp.interpInstrs(loopInstrs)
+    expected = capsys.readouterr().out
+    assert expected == '45\n3\n2\n1\n42\n'
+    tacVM.runInstrs(loopInstrs)
+    assert capsys.readouterr().out == expected
+
+def test_vmFrame():
+    p = tacVM.decode(loopInstrs)
+    assert not any(op == tacVM.OP_ERROR for (op, _, _, _) in p.code)
+    f = tacVM.run(p)
+    assert f[p.slots[Ident('s')]] == 45
+    assert f[p.slots[Ident('j')]] == 0
+
+def test_vmUnknownLabel(capsys: pytest.CaptureFixture[str]):
+    instrs: list[instr] = [printInstr(c(1)), Goto('nowhere'), printInstr(c(2))]
+    with pytest.raises(ValueError, match='nowhere'):
+        tacVM.runInstrs(instrs)
+    assert capsys.readouterr().out == '1\n'
+
+def test_vmUndefinedVariable():
+    with pytest.raises(ValueError, match='undefined'):
+        tacVM.runInstrs([printInstr(v('x'))])
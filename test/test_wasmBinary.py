@@ -0,0 +1,101 @@
+from common.wasm import *
+from common.wasmBinary import *
+
+def test_encodeU32():
+    assert encodeU32(0) == b'\x00'
+    assert encodeU32(127) == b'\x7f'
+    assert encodeU32(128) == b'\x80\x01'
+    assert encodeU32(624485) == b'\xe5\x8e\x26'
+
+def test_encodeSigned():
+    assert encodeSigned(0) == b'\x00'
+    assert encodeSigned(63) == b'\x3f'
+    assert encodeSigned(64) == b'\xc0\x00'
+    assert encodeSigned(-1) == b'\x7f'
+    assert encodeSigned(-64) == b'\x40'
+    assert encodeSigned(-65) == b'\xbf\x7f'
+    assert encodeSigned(-123456) == b'\xc0\xbb\x78'
+
+def mkModule(funcs: list[WasmFunc], elems: list[WasmId] = []) -> WasmModule:
+    imports = [WasmImport('env', 'memory', WasmImportMemory(1, None)),
+               WasmImport('env', 'print_i64', WasmImportFunc(WasmId('$print_i64'), ['i64'], None))]
+    return WasmModule(imports, [WasmExport('main', WasmExportFunc(WasmId('$main')))],
+                      [], [], WasmFuncTable(elems), funcs)
+
+def codeSection(b: bytes) -> bytes:
+    i = b.index(bytes([10]), 8)
+    return b[i:]
+
+def test_encodeMinimalModule():
+    main = WasmFunc(WasmId('$main'), [], None, [],
+                    [WasmInstrConst('i64', 42), WasmInstrCall(WasmId('$print_i64'))])
+    b = encodeModule(mkModule([main]))
+    assert b == bytes.fromhex(
+        '0061736d01000000' +
+        '0108' + '02' + '60017e00' + '600000' +
+        '021f' + '02' +
+        '03656e76' + '066d656d6f7279' + '020001' +
+        '03656e76' + '097072696e745f693634' + '0000' +
+        '03020101' +
+        '0405017001' + '0000' +
+        '070801046d61696e0001' +
+        '0a08010600' + '422a' + '10000b')
+
+def test_encodeLabels():
+    # block $outer { loop $l { br_if $outer; if { br $l } } }
+    body: list[WasmInstr] = [
+        WasmInstrBlock(WasmId('$outer'), None, [
+            WasmInstrLoop(WasmId('$l'), [
+                WasmInstrVarLocal('get', WasmId('$x')),
+                WasmInstrBranch(WasmId('$outer'), True),
+                WasmInstrConst('i32', 1),
+                WasmInstrIf(None, [WasmInstrBranch(WasmId('$l'), False)], [])
+            ])
+        ])
+    ]
+    main = WasmFunc(WasmId('$main'), [], None, [(WasmId('$x'), 'i32')], body)
+    code = codeSection(encodeModule(mkModule([main])))
+    assert code.endswith(bytes.fromhex(
+        '01017f' + '0240' + '0340' + '2000' + '0d01' + '4101' + '0440' + '0c01' + '0b' +
+        '0b' + '0b' + '0b'))
+
+def test_encodeConstants():
+    main = WasmFunc(WasmId('$main'), [], None, [],
+                    [WasmInstrConst('i32', 0xffffffff), WasmInstrDrop(),
+                     WasmInstrConst('i64', -1), WasmInstrDrop()])
+    code = codeSection(encodeModule(mkModule([main])))
+    assert code.endswith(bytes.fromhex('00417f1a427f1a0b'))
+
+def test_encodeSharesTypes():
+    f = WasmFunc(WasmId('$f'), [(WasmId('$x'), 'i64')], None, [], [])
+    main = WasmFunc(WasmId('$main'), [], None, [],
+                    [WasmInstrConst('i64', 1), WasmInstrConst('i32', 0),
+                     WasmInstrCallIndirect(['i64'], None)])
+    b = encodeModule(mkModule([f, main], [WasmId('$f')]))
+    # only the types (i64) -> () and () -> () exist, $f shares the type of $print_i64
+    assert b[8:18] == bytes.fromhex('0108' + '02' + '60017e00' + '600000')
+    # call_indirect uses type 0
+    assert bytes.fromhex('11' + '00' + '00') in codeSection(b)
+    # element segment with $f at offset 0
+    assert bytes.fromhex('0907' + '01' + '00' + '4100' + '0b' + '0101') in b
+
+def test_encodeBulkMemory():
+    main = WasmFunc(WasmId('$main'), [], None, [],
+                    [WasmInstrConst('i32', 100), WasmInstrConst('i32', 0),
+                     WasmInstrConst('i32', 8), WasmInstrBulkMem('fill'),
+                     WasmInstrConst('i32', 200), WasmInstrConst('i32', 100),
+                     WasmInstrConst('i32', 8), WasmInstrBulkMem('copy')])
+    m = mkModule([main])
+    b = encodeModule(WasmModule(m.imports, m.exports, m.globals,
+                                [WasmData(100, b'\x01\x00\xff')], m.funcTable, m.funcs))
+    assert bytes.fromhex('fc0b00') in codeSection(b)
+    assert bytes.fromhex('fc0a0000') in codeSection(b)
+    # data segment at offset 100 with three bytes
+    assert b.endswith(bytes.fromhex('0b0a' + '01' + '00' + '41e400' + '0b' + '03' + '0100ff'))
+
+def test_encodeMemPages():
+    main = WasmFunc(WasmId('$main'), [], None, [],
+                    [WasmInstrConst('i32', 1), WasmInstrMemPages('grow'), WasmInstrDrop(),
+                     WasmInstrMemPages('size'), WasmInstrDrop()])
+    code = codeSection(encodeModule(mkModule([main])))
+    assert code.endswith(bytes.fromhex('4101' + '4000' + '1a' + '3f00' + '1a' + '0b'))
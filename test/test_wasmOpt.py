@@ -0,0 +1,131 @@
+from common.wasm import *
+import common.wasmOpt as wasmOpt
+
+def const(ty: Literal['i32', 'i64'], n: int) -> WasmInstr:
+    return WasmInstrConst(ty, n)
+
+def get(x: str) -> WasmInstr:
+    return WasmInstrVarLocal('get', WasmId(x))
+
+def set(x: str) -> WasmInstr:
+    return WasmInstrVarLocal('set', WasmId(x))
+
+def call(f: str) -> WasmInstr:
+    return WasmInstrCall(WasmId(f))
+
+def test_fold():
+    instrs = [const('i64', 2), const('i64', 3), WasmInstrNumBinOp('i64', 'mul'),
+              const('i64', 1), WasmInstrNumBinOp('i64', 'add')]
+    assert wasmOpt.fold(instrs) == [const('i64', 7)]
+    instrs = [const('i32', 2**31 - 1), const('i32', 1), WasmInstrNumBinOp('i32', 'add')]
+    assert wasmOpt.fold(instrs) == [const('i32', -2**31)]
+    instrs = [const('i32', -1), const('i32', 28), WasmInstrNumBinOp('i32', 'shr_u')]
+    assert wasmOpt.fold(instrs) == [const('i32', 15)]
+    instrs = [const('i64', -1), const('i64', 1), WasmInstrIntRelOp('i64', 'lt_u')]
+    assert wasmOpt.fold(instrs) == [const('i32', 0)]
+    instrs = [const('i64', 2**32 + 5), WasmInstrConvOp('i32.wrap_i64'),
+              WasmInstrConvOp('i64.extend_i32_s')]
+    assert wasmOpt.fold(instrs) == [const('i64', 5)]
+    instrs = [const('i32', 12), const('i32', 10), WasmInstrNumBinOp('i32', 'and'),
+              const('i32', 1), WasmInstrNumBinOp('i32', 'or')]
+    assert wasmOpt.fold(instrs) == [const('i32', 9)]
+
+def test_foldIf():
+    loop = WasmInstrLoop(WasmId('$start'), [
+        const('i32', 0),
+        WasmInstrIf(None, [call('$a')], [call('$b')]),
+        const('i32', 1),
+        WasmInstrBranch(WasmId('$start'), True),
+        call('$c')
+    ])
+    assert wasmOpt.fold([loop]) == [
+        WasmInstrLoop(WasmId('$start'), [call('$b'), WasmInstrBranch(WasmId('$start'), False),
+                                         call('$c')])
+    ]
+
+def test_peepholeNot():
+    # not (x < 3)
+    instrs = [get('$x'), const('i64', 3), WasmInstrIntRelOp('i64', 'lt_s'),
+              const('i32', 1), WasmInstrIntRelOp('i32', 'eq'),
+              const('i32', 0), WasmInstrIntRelOp('i32', 'eq')]
+    assert wasmOpt.peephole(instrs) == [get('$x'), const('i64', 3),
+                                        WasmInstrIntRelOp('i64', 'ge_s')]
+    # not b, b might be any i32 value
+    instrs = [get('$b'), const('i32', 1), WasmInstrIntRelOp('i32', 'eq'),
+              const('i32', 0), WasmInstrIntRelOp('i32', 'eq')]
+    assert wasmOpt.peephole(instrs) == [get('$b'), const('i32', 1),
+                                        WasmInstrIntRelOp('i32', 'ne')]
+
+def test_peepholeArith():
+    instrs = [call('$input_i64'), set('$x'), get('$x'),
+              get('$x'), const('i64', -1), WasmInstrNumBinOp('i64', 'mul'),
+              const('i64', 8), WasmInstrNumBinOp('i64', 'mul'),
+              const('i64', 0), WasmInstrNumBinOp('i64', 'add'),
+              WasmInstrNumBinOp('i64', 'add'), get('$y'), WasmInstrDrop()]
+    assert wasmOpt.peephole(instrs) == [
+        call('$input_i64'), WasmInstrVarLocal('tee', WasmId('$x')),
+        const('i64', 0), get('$x'), WasmInstrNumBinOp('i64', 'sub'),
+        const('i64', 3), WasmInstrNumBinOp('i64', 'shl'),
+        WasmInstrNumBinOp('i64', 'add')
+    ]
+
+def test_unreachable():
+    instrs: list[WasmInstr] = [WasmInstrBlock(WasmId('$exit'), None, [
+        WasmInstrIf(None, [WasmInstrTrap(), call('$a')], []),
+        WasmInstrBranch(WasmId('$exit'), False),
+        call('$b')
+    ])]
+    assert wasmOpt.unreachable(instrs) == [WasmInstrBlock(WasmId('$exit'), None, [
+        WasmInstrIf(None, [WasmInstrTrap()], []),
+        WasmInstrBranch(WasmId('$exit'), False)
+    ])]
+
+def test_optimizeFunc():
+    # x is never read, the block is never the target of a branch
+    f = WasmFunc(WasmId('$main'), [], None, [(WasmId('$x'), 'i64'), (WasmId('$y'), 'i64')], [
+        WasmInstrBlock(WasmId('$exit'), None, [
+            call('$input_i64'), set('$x'),
+            const('i64', 1), set('$y'),
+            get('$y'), call('$print_i64')
+        ])
+    ])
+    res = wasmOpt.optimizeFunc(f, wasmOpt.O1_PASSES)
+    assert res.locals == f.locals
+    assert res.instrs == [WasmInstrBlock(WasmId('$exit'), None, [
+        call('$input_i64'), set('$x'), const('i64', 1),
+        WasmInstrVarLocal('tee', WasmId('$y')), call('$print_i64')
+    ])]
+    res = wasmOpt.optimizeFunc(f, wasmOpt.O2_PASSES)
+    assert res.locals == []
+    assert res.instrs == [call('$input_i64'), WasmInstrDrop(), const('i64', 1),
+                          call('$print_i64')]
+    assert wasmOpt.optimizeFunc(f, wasmOpt.passesForLevel(0)) == f
+
+def test_coalesce():
+    i64 = WasmInstrNumBinOp('i64', 'add')
+    i64Locals: list[tuple[WasmId, WasmValtype]] = \
+        [(WasmId(x), 'i64') for x in ['$x', '$t1', '$t2', '$t3', '$n']]
+    locals = i64Locals + [(WasmId('$b'), 'i32')]
+    f = WasmFunc(WasmId('$main'), [], None, locals, [
+        call('$input_i64'), set('$t1'),
+        get('$t1'), const('i64', 1), i64, set('$x'),
+        WasmInstrLoop(WasmId('$loop'), [
+            # n is read before it is assigned
+            get('$x'), get('$n'), i64, set('$t2'),
+            get('$t2'), get('$t2'), i64, set('$t3'),
+            get('$t3'), call('$print_i64'),
+            get('$x'), const('i64', 1), i64, set('$n'),
+            const('i32', 1), set('$b'),
+            get('$b'), WasmInstrBranch(WasmId('$loop'), True)
+        ])
+    ])
+    res = wasmOpt.coalesce(f)
+    # t1 is dead when x is assigned, t2 is dead when t3 is assigned; x is live in the
+    # whole loop and b has another type
+    assert res.locals == [(WasmId('$x'), 'i64'), (WasmId('$t2'), 'i64'), (WasmId('$n'), 'i64'),
+                          (WasmId('$b'), 'i32')]
+    assert res.instrs[:2] == [call('$input_i64'), set('$x')]
+    loop = res.instrs[-1]
+    assert isinstance(loop, WasmInstrLoop)
+    assert loop.body[3:8] == [set('$t2'), get('$t2'), get('$t2'), i64, set('$t2')]
+    assert wasmOpt.coalesce(res) == res
@@ -0,0 +1,60 @@
+from common.wasm import *
+import assembly.tac_ast as tac
+import assembly.tacPretty as tacPretty
+from assembly.wasmToTac import wasmToTac
+import pytest
+
+pytestmark = pytest.mark.instructor
+
+def getLocal(x: str) -> WasmInstr:
+    return WasmInstrVarLocal('get', WasmId(x))
+
+def setLocal(x: str) -> WasmInstr:
+    return WasmInstrVarLocal('set', WasmId(x))
+
+def const(n: int) -> WasmInstr:
+    return WasmInstrConst('i64', n)
+
+def printI64() -> WasmInstr:
+    return WasmInstrCall(WasmId('$print_i64'))
+
+def ifPrint(x: str, n: int) -> list[WasmInstr]:
+    return [getLocal(x), const(0), WasmInstrIntRelOp('i64', 'gt_s'),
+            WasmInstrIf(None, [const(n), printI64()], [])]
+
+def translate(instrs: list[WasmInstr]) -> tuple[Optional[tac.prim], list[tac.instr]]:
+    return wasmToTac(cast(list[WasmInstrL], instrs))
+
+def test_statements():
+    instrs = [WasmInstrCall(WasmId('$input_i64')), setLocal('$x'),
+              getLocal('$x'), const(1), WasmInstrNumBinOp('i64', 'add'), setLocal('$y'),
+              getLocal('$y'), printI64()]
+    (res, tacInstrs) = translate(instrs)
+    assert res is None
+    assert tacPretty.prettyInstrs(tacInstrs, True) == \
+        '$x = CALL($input_i64);$x = $x;$y = ADD($x, 1);$y = $y;CALL($print_i64, $y)'
+
+def test_resultOfLastInstruction():
+    (res, tacInstrs) = translate([const(1), setLocal('$x'), getLocal('$x'), const(2),
+                                  WasmInstrNumBinOp('i64', 'mul')])
+    assert res == tac.Name(tac.Ident('%R0'))
+    assert len(tacInstrs) == 2
+
+def test_freshLabelsAreUnique():
+    # Fresh labels and registers are shared by all statements and nested bodies
+    inner = ifPrint('$y', 2)
+    instrs = ifPrint('$x', 1) + [getLocal('$x'), const(0), WasmInstrIntRelOp('i64', 'gt_s'),
+                                 WasmInstrIf(None, inner, [])]
+    (_, tacInstrs) = translate(instrs)
+    labels = [i.label for i in tacInstrs if isinstance(i, tac.Label)]
+    assert len(labels) == 6
+    assert len(set(labels)) == 6
+    regs = {i.var for i in tacInstrs if isinstance(i, tac.Assign)}
+    assert len(regs) == 3
+
+def test_longProgram():
+    instrs: list[WasmInstr] = []
+    for _ in range(20000):
+        instrs += [const(1), setLocal('$x')]
+    (_, tacInstrs) = translate(instrs)
+    assert len(tacInstrs) == 20000
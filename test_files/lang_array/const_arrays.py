@@ -0,0 +1,19 @@
+a = 5 * [0]
+b = 3 * [-1]
+c = 4 * [False]
+d = 2 * [True]
+e = [1, 2, 3]
+f = [True, False, True]
+g = [1, 2, 3]
+h = 3 * [256]
+g[0] = 10
+print(a[4])
+print(b[2])
+print(c[3])
+print(d[1])
+print(e[0] + e[1] + e[2])
+print(g[0] + g[2])
+print(f[0])
+print(f[1])
+print(h[1])
+print(len(a) + len(e))
@@ -0,0 +1,21 @@
+# Allocates far more than the 2 pages of memory, so the garbage collector must
+# reuse the arrays that are no longer reachable.
+keep = 8 * [[0]]
+i = 0
+k = 0
+s = 0
+while i < 400:
+    a = 1000 * [i]
+    s = s + a[999]
+    if k < 8:
+        keep[k] = [i, i + 1, i + 2]
+        k = k + 1
+    else:
+        k = 0
+        i = i + 42
+    i = i + 1
+print(s)
+j = 0
+while j < len(keep):
+    print(keep[j][0] + keep[j][2])
+    j = j + 1
@@ -0,0 +1,8 @@
+### run error: IndexError
+a = input_int() * [1]
+s = 0
+i = 0
+while i <= len(a):
+    s = s + a[i]
+    i = i + 1
+print(s)
@@ -0,0 +1,6 @@
+### run error: IndexError
+a = [1, 2, 3]
+i = input_int()
+while i < len(a):
+    print(a[i])
+    i = i - 1
@@ -0,0 +1,8 @@
+### run error: IndexError
+a = input_int() * [1]
+i = 0
+while i < len(a):
+    if i == 1:
+        a = [5]
+    print(a[i])
+    i = i + 1
@@ -0,0 +1,19 @@
+a = input_int() * [0]
+i = 0
+while i < len(a):
+    a[i] = i * i
+    i = i + 1
+s = 0
+n = len(a)
+i = 0
+while i < n and a[i] < 50:
+    s = s + a[i]
+    i = i + 1
+print(s)
+j = len(a) - 1
+while j >= 0:
+    s = s - a[j]
+    j = j - 1
+print(s)
+b = [1, 2, 3]
+print(b[0] + b[2])
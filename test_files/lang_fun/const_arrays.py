@@ -0,0 +1,13 @@
+def double(n: int) -> int:
+    return 2 * n
+a = [7, 8, 9]
+b = [7, 8, 9]
+b[1] = 0
+c = double(2) * [0]
+d = 3 * [-1]
+e = [True, False]
+print(a[0] + a[1] + a[2])
+print(b[0] + b[1] + b[2])
+print(len(c) + c[3])
+print(d[0] + d[2])
+print(e[1])
@@ -0,0 +1,13 @@
+# Allocates far more than the 2 pages of memory; the arrays of the calls become
+# garbage while the global array stays alive.
+def fill(n: int, x: int) -> int:
+    return len(n * [x]) + (n * [x + 1])[n - 1]
+
+keep = [7, 8, 9]
+i = 0
+s = 0
+while i < 300:
+    s = s + fill(1000, i) + keep[1]
+    i = i + 1
+print(s)
+print(keep[0] + keep[2])
@@ -0,0 +1,9 @@
+x = input_int()
+y = x * 8
+print(y)
+print(100000 + x)
+print(x - 70000)
+print(65536 * x)
+print(1 * x - 32768)
+print(-100000)
+print(65536)